@@ -19,12 +19,10 @@ ADDITIV - Keine Breaking Changes
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 from datetime import datetime, timezone
 from pathlib import Path
 import uuid
-import io
-import json
 import os
 import logging
 
@@ -32,6 +30,10 @@ import logging
 from core.database import db
 from core.auth import require_admin
 from core.audit import create_audit_log, SYSTEM_ACTOR
+from streaming_export import (
+    iter_documents, iter_file, new_temp_path, remove_file,
+    json_dumps, write_json_array, write_xlsx, XlsxSheet, XLSX_MEDIA_TYPE
+)
 
 logger = logging.getLogger(__name__)
 
@@ -116,145 +118,155 @@ async def get_backup_status(user: dict = Depends(require_admin)):
     }
 
 
+STAFF_HEADERS = [
+    "ID", "Vorname", "Nachname", "Rufname", "E-Mail", "Telefon",
+    "Pers-Nr.", "Zeit-PIN", "Geburtstag", "Rolle", "Beschäftigung",
+    "Status", "Arbeitsbereiche", "Adresse", "Stadt", "PLZ",
+    "Steuer-ID (maskiert)", "SV-Nr. (maskiert)", "IBAN (maskiert)",
+    "Erstellt am"
+]
+STAFF_WIDTHS = [38, 16, 18, 16, 30, 18, 10, 10, 12, 14, 16, 10, 30, 30, 18, 8, 22, 22, 30, 34]
+
+TABLE_HEADERS = [
+    "ID", "Tischnummer", "Bereich", "Subbereich", "Plätze (max)",
+    "Plätze (default)", "Kombinierbar", "Kombinierbar mit",
+    "Fest", "Aktiv", "Position X", "Position Y", "Notizen", "Erstellt am"
+]
+TABLE_WIDTHS = [38, 12, 14, 14, 13, 16, 13, 20, 8, 8, 11, 11, 30, 34]
+
+# Kurzfassung für das Disk-Backup (/write)
+STAFF_HEADERS_SHORT = ["ID", "Vorname", "Nachname", "Rufname", "E-Mail", "Telefon",
+                       "Pers-Nr.", "Zeit-PIN", "Geburtstag", "Rolle", "Status"]
+TABLE_HEADERS_SHORT = ["ID", "Tischnummer", "Bereich", "Subbereich", "Plätze", "Kombinierbar", "Aktiv"]
+
+
+def staff_row(staff: dict) -> list:
+    """Staff-Zeile (sensible Felder maskiert)"""
+    address = staff.get('address', {}) or {}
+    return [
+        staff.get('id', ''),
+        staff.get('first_name', ''),
+        staff.get('last_name', ''),
+        staff.get('display_name', ''),
+        staff.get('email', ''),
+        staff.get('phone', ''),
+        staff.get('personnel_number', ''),
+        staff.get('time_pin', ''),
+        staff.get('birthday', ''),
+        staff.get('role', ''),
+        staff.get('employment_type', ''),
+        staff.get('status', ''),
+        ', '.join(staff.get('work_areas', []) or []),
+        address.get('street', ''),
+        address.get('city', ''),
+        address.get('zip', ''),
+        # Masked sensitive fields
+        mask_sensitive(staff.get('tax_id', ''), 4),
+        mask_sensitive(staff.get('social_security_number', ''), 4),
+        mask_sensitive(staff.get('bank_iban', ''), 4),
+        staff.get('created_at', ''),
+    ]
+
+
+def staff_row_short(staff: dict) -> list:
+    row = staff_row(staff)
+    return row[:10] + [row[11]]
+
+
+def table_row(table: dict) -> list:
+    return [
+        table.get('id', ''),
+        table.get('table_number', ''),
+        table.get('area', ''),
+        table.get('sub_area', ''),
+        table.get('seats_max', ''),
+        table.get('seats_default', ''),
+        "Ja" if table.get('combinable') else "Nein",
+        ', '.join(str(n) for n in (table.get('combinable_with', []) or [])),
+        "Ja" if table.get('fixed') else "Nein",
+        "Ja" if table.get('active') else "Nein",
+        table.get('position_x', ''),
+        table.get('position_y', ''),
+        table.get('notes', ''),
+        table.get('created_at', ''),
+    ]
+
+
+def table_row_short(table: dict) -> list:
+    row = table_row(table)
+    return row[:5] + [row[6], row[9]]
+
+
+async def _rows(collection, to_row) -> AsyncIterator[list]:
+    """Nicht archivierte Dokumente einer Collection als Zeilen (Cursor)"""
+    async for doc in iter_documents(collection, {"archived": {"$ne": True}}):
+        yield to_row(doc)
+
+
+def require_openpyxl():
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise HTTPException(500, "openpyxl not installed")
+
+
+async def write_events_actions_json(path: str, user: dict, include_menu_actions: bool = True) -> Dict[str, int]:
+    """
+    Events/Actions-JSON dokumentweise schreiben.
+    counts steht am Ende des Objekts (erst nach dem Durchlauf bekannt).
+    """
+    sections = ["events", "actions"] + (["menu_actions"] if include_menu_actions else [])
+    counts: Dict[str, int] = {}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        f.write(f'"export_timestamp": {json_dumps(now_iso())},\n')
+        f.write(f'"exported_by": {json_dumps(user.get("email", "unknown"))},\n')
+        for name in sections:
+            f.write(f'{json_dumps(name)}: ')
+            try:
+                counts[name] = await write_json_array(f, iter_documents(db[name], {"archived": {"$ne": True}}))
+            except Exception as e:
+                # menu_actions ist optional
+                if name != "menu_actions":
+                    raise
+                logger.debug(f"menu_actions nicht exportiert: {e}")
+                f.write("[]")
+                counts[name] = 0
+            f.write(",\n")
+        f.write(f'"counts": {json_dumps(counts)}\n}}\n')
+    return counts
+
+
 @backup_router.get("/export-xlsx")
 async def export_xlsx(user: dict = Depends(require_admin)):
     """
     GET /api/admin/backup/export-xlsx
     Download XLSX with staff_members and tables data
     Sensitive fields are masked
-    """
-    try:
-        import openpyxl
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    except ImportError:
-        raise HTTPException(500, "openpyxl not installed")
-    
-    wb = Workbook()
-    
-    # ===== Sheet 1: Staff Members =====
-    ws_staff = wb.active
-    ws_staff.title = "staff_members"
     
-    # Header style
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="002f02", end_color="002f02", fill_type="solid")
-    
-    staff_headers = [
-        "ID", "Vorname", "Nachname", "Rufname", "E-Mail", "Telefon",
-        "Pers-Nr.", "Zeit-PIN", "Geburtstag", "Rolle", "Beschäftigung",
-        "Status", "Arbeitsbereiche", "Adresse", "Stadt", "PLZ",
-        "Steuer-ID (maskiert)", "SV-Nr. (maskiert)", "IBAN (maskiert)",
-        "Erstellt am"
-    ]
-    
-    for col, header in enumerate(staff_headers, 1):
-        cell = ws_staff.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data rows
-    staff_members = await db.staff_members.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(1000)
-    
-    for row_idx, staff in enumerate(staff_members, 2):
-        address = staff.get('address', {}) or {}
-        ws_staff.cell(row=row_idx, column=1, value=staff.get('id', ''))
-        ws_staff.cell(row=row_idx, column=2, value=staff.get('first_name', ''))
-        ws_staff.cell(row=row_idx, column=3, value=staff.get('last_name', ''))
-        ws_staff.cell(row=row_idx, column=4, value=staff.get('display_name', ''))
-        ws_staff.cell(row=row_idx, column=5, value=staff.get('email', ''))
-        ws_staff.cell(row=row_idx, column=6, value=staff.get('phone', ''))
-        ws_staff.cell(row=row_idx, column=7, value=staff.get('personnel_number', ''))
-        ws_staff.cell(row=row_idx, column=8, value=staff.get('time_pin', ''))
-        ws_staff.cell(row=row_idx, column=9, value=staff.get('birthday', ''))
-        ws_staff.cell(row=row_idx, column=10, value=staff.get('role', ''))
-        ws_staff.cell(row=row_idx, column=11, value=staff.get('employment_type', ''))
-        ws_staff.cell(row=row_idx, column=12, value=staff.get('status', ''))
-        ws_staff.cell(row=row_idx, column=13, value=', '.join(staff.get('work_areas', [])))
-        ws_staff.cell(row=row_idx, column=14, value=address.get('street', ''))
-        ws_staff.cell(row=row_idx, column=15, value=address.get('city', ''))
-        ws_staff.cell(row=row_idx, column=16, value=address.get('zip', ''))
-        # Masked sensitive fields
-        ws_staff.cell(row=row_idx, column=17, value=mask_sensitive(staff.get('tax_id', ''), 4))
-        ws_staff.cell(row=row_idx, column=18, value=mask_sensitive(staff.get('social_security_number', ''), 4))
-        ws_staff.cell(row=row_idx, column=19, value=mask_sensitive(staff.get('bank_iban', ''), 4))
-        ws_staff.cell(row=row_idx, column=20, value=staff.get('created_at', ''))
-    
-    # Adjust column widths
-    for col in ws_staff.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ws_staff.column_dimensions[col_letter].width = min(max_length + 2, 40)
-    
-    # ===== Sheet 2: Tables =====
-    ws_tables = wb.create_sheet("tables")
-    
-    table_headers = [
-        "ID", "Tischnummer", "Bereich", "Subbereich", "Plätze (max)",
-        "Plätze (default)", "Kombinierbar", "Kombinierbar mit",
-        "Fest", "Aktiv", "Position X", "Position Y", "Notizen", "Erstellt am"
-    ]
-    
-    for col, header in enumerate(table_headers, 1):
-        cell = ws_tables.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-    
-    tables = await db.tables.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(500)
-    
-    for row_idx, table in enumerate(tables, 2):
-        ws_tables.cell(row=row_idx, column=1, value=table.get('id', ''))
-        ws_tables.cell(row=row_idx, column=2, value=table.get('table_number', ''))
-        ws_tables.cell(row=row_idx, column=3, value=table.get('area', ''))
-        ws_tables.cell(row=row_idx, column=4, value=table.get('sub_area', ''))
-        ws_tables.cell(row=row_idx, column=5, value=table.get('seats_max', ''))
-        ws_tables.cell(row=row_idx, column=6, value=table.get('seats_default', ''))
-        ws_tables.cell(row=row_idx, column=7, value="Ja" if table.get('combinable') else "Nein")
-        ws_tables.cell(row=row_idx, column=8, value=', '.join(table.get('combinable_with', [])))
-        ws_tables.cell(row=row_idx, column=9, value="Ja" if table.get('fixed') else "Nein")
-        ws_tables.cell(row=row_idx, column=10, value="Ja" if table.get('active') else "Nein")
-        ws_tables.cell(row=row_idx, column=11, value=table.get('position_x', ''))
-        ws_tables.cell(row=row_idx, column=12, value=table.get('position_y', ''))
-        ws_tables.cell(row=row_idx, column=13, value=table.get('notes', ''))
-        ws_tables.cell(row=row_idx, column=14, value=table.get('created_at', ''))
+    Streaming: write-only Workbook in eine Temp-Datei, Auslieferung blockweise.
+    """
+    require_openpyxl()
     
-    # Adjust column widths
-    for col in ws_tables.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ws_tables.column_dimensions[col_letter].width = min(max_length + 2, 40)
+    counts: Dict[str, int] = {}
     
-    # ===== Sheet 3: Meta =====
-    ws_meta = wb.create_sheet("meta")
-    ws_meta.cell(row=1, column=1, value="Export-Zeitpunkt")
-    ws_meta.cell(row=1, column=2, value=now_iso())
-    ws_meta.cell(row=2, column=1, value="Exportiert von")
-    ws_meta.cell(row=2, column=2, value=user.get('email', 'unknown'))
-    ws_meta.cell(row=3, column=1, value="Staff Members")
-    ws_meta.cell(row=3, column=2, value=len(staff_members))
-    ws_meta.cell(row=4, column=1, value="Tables")
-    ws_meta.cell(row=4, column=2, value=len(tables))
-    ws_meta.cell(row=5, column=1, value="Hinweis")
-    ws_meta.cell(row=5, column=2, value="Sensible Daten (Steuer-ID, SV-Nr., IBAN) sind maskiert.")
+    async def meta_rows() -> AsyncIterator[list]:
+        yield ["Export-Zeitpunkt", now_iso()]
+        yield ["Exportiert von", user.get('email', 'unknown')]
+        yield ["Staff Members", counts.get("staff_members", 0)]
+        yield ["Tables", counts.get("tables", 0)]
+        yield ["Hinweis", "Sensible Daten (Steuer-ID, SV-Nr., IBAN) sind maskiert."]
     
-    # Save to bytes
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    path = new_temp_path(".xlsx")
+    try:
+        await write_xlsx(path, [
+            XlsxSheet("staff_members", STAFF_HEADERS, _rows(db.staff_members, staff_row), STAFF_WIDTHS),
+            XlsxSheet("tables", TABLE_HEADERS, _rows(db.tables, table_row), TABLE_WIDTHS),
+            XlsxSheet("meta", ["Feld", "Wert"], meta_rows(), [20, 60]),
+        ], counts)
+    except Exception:
+        remove_file(path)
+        raise
     
     # Generate filename
     timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
@@ -266,12 +278,12 @@ async def export_xlsx(user: dict = Depends(require_admin)):
         entity="backup",
         entity_id=filename,
         action="backup_export_xlsx",
-        after={"staff_count": len(staff_members), "tables_count": len(tables)}
+        after={"staff_count": counts.get("staff_members", 0), "tables_count": counts.get("tables", 0)}
     )
     
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iter_file(path),
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
@@ -282,33 +294,12 @@ async def export_events_actions_json(user: dict = Depends(require_admin)):
     GET /api/admin/backup/export-events-actions-json
     Download JSON with events and actions data
     """
-    events = await db.events.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(1000)
-    actions = await db.actions.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(1000)
-    
-    # Also get menu_actions if separate collection exists
-    menu_actions = []
+    path = new_temp_path(".json")
     try:
-        menu_actions = await db.menu_actions.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(500)
-    except:
-        pass
-    
-    data = {
-        "export_timestamp": now_iso(),
-        "exported_by": user.get('email', 'unknown'),
-        "events": events,
-        "actions": actions,
-        "menu_actions": menu_actions,
-        "counts": {
-            "events": len(events),
-            "actions": len(actions),
-            "menu_actions": len(menu_actions)
-        }
-    }
-    
-    # Convert to JSON bytes
-    json_bytes = json.dumps(data, indent=2, ensure_ascii=False, default=str).encode('utf-8')
-    output = io.BytesIO(json_bytes)
-    output.seek(0)
+        counts = await write_events_actions_json(path, user)
+    except Exception:
+        remove_file(path)
+        raise
     
     # Generate filename
     timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
@@ -320,11 +311,11 @@ async def export_events_actions_json(user: dict = Depends(require_admin)):
         entity="backup",
         entity_id=filename,
         action="backup_export_events_json",
-        after={"events_count": len(events), "actions_count": len(actions)}
+        after={"events_count": counts["events"], "actions_count": counts["actions"]}
     )
     
     return StreamingResponse(
-        output,
+        iter_file(path),
         media_type="application/json",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -336,12 +327,7 @@ async def write_backup_to_disk(user: dict = Depends(require_admin)):
     POST /api/admin/backup/write
     Write backup files to /app/backups/ folder
     """
-    try:
-        import openpyxl
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-    except ImportError:
-        raise HTTPException(500, "openpyxl not installed")
+    require_openpyxl()
     
     written_files = []
     timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
@@ -350,74 +336,16 @@ async def write_backup_to_disk(user: dict = Depends(require_admin)):
     BACKUP_FOLDER.mkdir(parents=True, exist_ok=True)
     
     # 1. Write XLSX Backup
-    wb = Workbook()
-    ws_staff = wb.active
-    ws_staff.title = "staff_members"
-    
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="002f02", end_color="002f02", fill_type="solid")
-    
-    # Staff sheet
-    staff_headers = ["ID", "Vorname", "Nachname", "Rufname", "E-Mail", "Telefon",
-                     "Pers-Nr.", "Zeit-PIN", "Geburtstag", "Rolle", "Status"]
-    for col, header in enumerate(staff_headers, 1):
-        cell = ws_staff.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-    
-    staff_members = await db.staff_members.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(1000)
-    for row_idx, staff in enumerate(staff_members, 2):
-        ws_staff.cell(row=row_idx, column=1, value=staff.get('id', ''))
-        ws_staff.cell(row=row_idx, column=2, value=staff.get('first_name', ''))
-        ws_staff.cell(row=row_idx, column=3, value=staff.get('last_name', ''))
-        ws_staff.cell(row=row_idx, column=4, value=staff.get('display_name', ''))
-        ws_staff.cell(row=row_idx, column=5, value=staff.get('email', ''))
-        ws_staff.cell(row=row_idx, column=6, value=staff.get('phone', ''))
-        ws_staff.cell(row=row_idx, column=7, value=staff.get('personnel_number', ''))
-        ws_staff.cell(row=row_idx, column=8, value=staff.get('time_pin', ''))
-        ws_staff.cell(row=row_idx, column=9, value=staff.get('birthday', ''))
-        ws_staff.cell(row=row_idx, column=10, value=staff.get('role', ''))
-        ws_staff.cell(row=row_idx, column=11, value=staff.get('status', ''))
-    
-    # Tables sheet
-    ws_tables = wb.create_sheet("tables")
-    table_headers = ["ID", "Tischnummer", "Bereich", "Subbereich", "Plätze", "Kombinierbar", "Aktiv"]
-    for col, header in enumerate(table_headers, 1):
-        cell = ws_tables.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-    
-    tables = await db.tables.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(500)
-    for row_idx, table in enumerate(tables, 2):
-        ws_tables.cell(row=row_idx, column=1, value=table.get('id', ''))
-        ws_tables.cell(row=row_idx, column=2, value=table.get('table_number', ''))
-        ws_tables.cell(row=row_idx, column=3, value=table.get('area', ''))
-        ws_tables.cell(row=row_idx, column=4, value=table.get('sub_area', ''))
-        ws_tables.cell(row=row_idx, column=5, value=table.get('seats_max', ''))
-        ws_tables.cell(row=row_idx, column=6, value="Ja" if table.get('combinable') else "Nein")
-        ws_tables.cell(row=row_idx, column=7, value="Ja" if table.get('active') else "Nein")
-    
     xlsx_filename = f"Carlsburg_Backup_{timestamp}.xlsx"
-    xlsx_path = BACKUP_FOLDER / xlsx_filename
-    wb.save(xlsx_path)
+    await write_xlsx(str(BACKUP_FOLDER / xlsx_filename), [
+        XlsxSheet("staff_members", STAFF_HEADERS_SHORT, _rows(db.staff_members, staff_row_short)),
+        XlsxSheet("tables", TABLE_HEADERS_SHORT, _rows(db.tables, table_row_short)),
+    ])
     written_files.append(xlsx_filename)
     
     # 2. Write Events/Actions JSON
-    events = await db.events.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(1000)
-    actions = await db.actions.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(1000)
-    
-    json_data = {
-        "export_timestamp": now_iso(),
-        "exported_by": user.get('email', 'unknown'),
-        "events": events,
-        "actions": actions,
-        "counts": {"events": len(events), "actions": len(actions)}
-    }
-    
     json_filename = f"Carlsburg_EventsActions_{timestamp}.json"
-    json_path = BACKUP_FOLDER / json_filename
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(json_data, f, indent=2, ensure_ascii=False, default=str)
+    await write_events_actions_json(str(BACKUP_FOLDER / json_filename), user, include_menu_actions=False)
     written_files.append(json_filename)
     
     # Audit log
@@ -7,7 +7,8 @@ from .auth import (
     hash_password, 
     verify_password,
     create_token,
-    decode_token
+    decode_token,
+    invalidate_principal
 )
 from .audit import create_audit_log, safe_dict_for_audit
 from .models import UserRole, ReservationStatus
@@ -20,14 +21,16 @@ from .exceptions import (
     ValidationException,
     ConflictException
 )
+from .indexes import register_indexes, index, reconcile_indexes
 
 __all__ = [
     'settings', 'get_settings', 'db', 'client',
     'get_current_user', 'require_roles', 'hash_password', 'verify_password',
-    'create_token', 'decode_token',
+    'create_token', 'decode_token', 'invalidate_principal',
     'create_audit_log', 'safe_dict_for_audit',
     'UserRole', 'ReservationStatus',
     'validate_status_transition', 'validate_reservation_data',
     'GastroCoreException', 'UnauthorizedException', 'ForbiddenException',
-    'NotFoundException', 'ValidationException', 'ConflictException'
+    'NotFoundException', 'ValidationException', 'ConflictException',
+    'register_indexes', 'index', 'reconcile_indexes'
 ]
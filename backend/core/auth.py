@@ -1,10 +1,12 @@
 """
 Authentication and Authorization
 """
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timezone, timedelta
-from typing import List
+from typing import List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
+import time
 import jwt
 import bcrypt
 
@@ -51,6 +53,88 @@ def decode_token(token: str) -> dict:
         raise UnauthorizedException("Ungültiges Token")
 
 
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated users, keyed by (sub, iat) of the token.
+    
+    - Per process (each uvicorn worker has its own cache), the TTL bounds the
+      delay until changes made on another worker become visible
+    - invalidate(user_id) drops all entries of a user and marks the time, so
+      older tokens are no longer trusted in token-claims mode either
+    """
+    
+    def __init__(self, ttl_seconds: int, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[float, dict]]" = OrderedDict()
+        # user_id -> Zeitpunkt der letzten Invalidierung (Unix-Sekunden)
+        self._invalidated_at: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, sub: str, iat: Any) -> Optional[dict]:
+        key = (sub, iat)
+        entry = self._entries.get(key)
+        if entry and time.monotonic() < entry[0]:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+        if entry:
+            self._entries.pop(key, None)
+        self.misses += 1
+        return None
+    
+    def put(self, sub: str, iat: Any, user: dict):
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[(sub, iat)] = (time.monotonic() + self.ttl_seconds, dict(user))
+        self._entries.move_to_end((sub, iat))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, user_id: str):
+        """User changed (archive, password, role, staff link) - drop cached principals"""
+        for key in [k for k in self._entries if k[0] == user_id]:
+            self._entries.pop(key, None)
+        self._invalidated_at[user_id] = time.time()
+        self.invalidations += 1
+    
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+    
+    def token_revoked(self, sub: str, iat: Any) -> bool:
+        """Token issued before the last invalidation of its user (only known in this process)"""
+        invalidated_at = self._invalidated_at.get(sub)
+        if invalidated_at is None:
+            return False
+        try:
+            return float(iat) <= invalidated_at
+        except (TypeError, ValueError):
+            return True
+    
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "invalidations": self.invalidations,
+            "trust_token_roles": settings.AUTH_TRUST_TOKEN_ROLES
+        }
+
+
+principal_cache = PrincipalCache(settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def invalidate_principal(user_id: str):
+    """Call after every write that changes a user (archive, password, role, staff link)"""
+    principal_cache.invalidate(user_id)
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
     Get the current authenticated user from the JWT token.
@@ -58,6 +142,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     """
     payload = decode_token(credentials.credentials)
     
+    user = principal_cache.get(payload["sub"], payload.get("iat"))
+    if user is not None:
+        return user
+    
     user = await db.users.find_one(
         {"id": payload["sub"], "archived": False},
         {"_id": 0}
@@ -69,20 +157,54 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if not user.get("is_active", True):
         raise UnauthorizedException("Konto deaktiviert")
     
+    principal_cache.put(payload["sub"], payload.get("iat"), user)
     return user
 
 
-def require_roles(*roles: UserRole):
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+async def get_read_principal(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """
+    Principal for read-only endpoints.
+    
+    With AUTH_TRUST_TOKEN_ROLES enabled, GET/HEAD requests are authorized from the
+    signed token claims (id, email, role) without a DB lookup. Role changes then
+    take effect at the latest when the token expires (or immediately on the worker
+    that performed the change). Otherwise identical to get_current_user.
+    """
+    if settings.AUTH_TRUST_TOKEN_ROLES and request.method in READ_ONLY_METHODS:
+        payload = decode_token(credentials.credentials)
+        if payload.get("role") and not principal_cache.token_revoked(payload["sub"], payload.get("iat")):
+            return {
+                "id": payload["sub"],
+                "email": payload.get("email"),
+                "role": payload["role"],
+                "is_active": True,
+                "token_principal": True
+            }
+    return await get_current_user(credentials)
+
+
+def require_roles(*roles: UserRole, trust_token_claims: bool = False):
     """
     Dependency factory for role-based access control.
     Returns a dependency that checks if the user has one of the required roles.
     
+    trust_token_claims: read-only endpoints may be authorized from the token
+    claims (see get_read_principal) - the handler then only gets id/email/role.
+    
     Usage:
         @router.get("/admin-only")
         async def admin_endpoint(user = Depends(require_roles(UserRole.ADMIN))):
             ...
     """
-    async def role_checker(user: dict = Depends(get_current_user)):
+    principal_dependency = get_read_principal if trust_token_claims else get_current_user
+    
+    async def role_checker(user: dict = Depends(principal_dependency)):
         user_role = user.get("role")
         allowed_roles = [r.value for r in roles]
         
@@ -100,6 +222,10 @@ def require_roles(*roles: UserRole):
 require_admin = require_roles(UserRole.ADMIN)
 require_manager = require_roles(UserRole.ADMIN, UserRole.SCHICHTLEITER)
 require_terminal = require_roles(UserRole.ADMIN, UserRole.SCHICHTLEITER, UserRole.SERVICE)
+# Polling-Endpoints der Terminals (nur lesend)
+require_terminal_read = require_roles(
+    UserRole.ADMIN, UserRole.SCHICHTLEITER, UserRole.SERVICE, trust_token_claims=True
+)
 
 
 def require_not_service():
@@ -35,6 +35,11 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
     
+    # Auth Principal Cache (pro Prozess): Benutzer-Lookup pro Token für n Sekunden wiederverwenden
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    # Optional: Rollen-Claims aus dem signierten Token für lesende Endpoints vertrauen (kein DB-Lookup)
+    AUTH_TRUST_TOKEN_ROLES: bool = False
+    
     # Optional: Encryption Key für sensible Daten
     ENCRYPTION_KEY: str = Field(default="")
     
@@ -0,0 +1,163 @@
+"""
+Index Registry - Declarative MongoDB indexes per collection
+Modules declare their indexes at import time, startup reconciles them against the live DB
+"""
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    A single index definition.
+
+    keys: list of (field, direction) tuples, e.g. [("date", 1), ("status", 1)]
+    name: explicit index name - used to match against the live DB
+    unique / partial_filter / sparse / expire_after_seconds: pymongo index options
+    """
+    keys: Tuple[Tuple[str, Any], ...]
+    name: str
+    unique: bool = False
+    sparse: bool = False
+    partial_filter: Optional[Dict[str, Any]] = None
+    expire_after_seconds: Optional[int] = None
+
+    def options(self) -> Dict[str, Any]:
+        """Options passed to create_index"""
+        opts: Dict[str, Any] = {"name": self.name}
+        if self.unique:
+            opts["unique"] = True
+        if self.sparse:
+            opts["sparse"] = True
+        if self.partial_filter:
+            opts["partialFilterExpression"] = self.partial_filter
+        if self.expire_after_seconds is not None:
+            opts["expireAfterSeconds"] = self.expire_after_seconds
+        return opts
+
+
+# collection -> index name -> spec
+INDEX_REGISTRY: Dict[str, Dict[str, IndexSpec]] = {}
+
+
+def index(
+    *keys: Tuple[str, Any],
+    name: str = None,
+    unique: bool = False,
+    sparse: bool = False,
+    partial_filter: Dict[str, Any] = None,
+    expire_after_seconds: int = None
+) -> IndexSpec:
+    """
+    Build an IndexSpec. Without explicit name, a stable name is derived from the keys.
+
+    Usage:
+        index(("date", 1), ("status", 1), ("archived", 1))
+        index(("id", 1), unique=True)
+    """
+    if not name:
+        name = "_".join(f"{k}_{d}" for k, d in keys)
+    return IndexSpec(
+        keys=tuple(keys),
+        name=name,
+        unique=unique,
+        sparse=sparse,
+        partial_filter=partial_filter,
+        expire_after_seconds=expire_after_seconds
+    )
+
+
+def register_indexes(collection: str, *specs: IndexSpec):
+    """
+    Register indexes for a collection. Called at module level by each module
+    that owns the collection. Re-registering the same name overwrites.
+    """
+    bucket = INDEX_REGISTRY.setdefault(collection, {})
+    for spec in specs:
+        bucket[spec.name] = spec
+
+
+def _spec_matches(spec: IndexSpec, live: Dict[str, Any]) -> bool:
+    """Compare a registered spec with the index_information() entry of the live DB"""
+    live_keys = tuple((k, d) for k, d in live.get("key", []))
+    if live_keys != tuple(spec.keys):
+        return False
+    if bool(live.get("unique", False)) != spec.unique:
+        return False
+    if (live.get("partialFilterExpression") or None) != (spec.partial_filter or None):
+        return False
+    return True
+
+
+async def reconcile_indexes(db, create_missing: bool = True) -> Dict[str, Any]:
+    """
+    Reconcile the registry against the live DB.
+
+    - Missing indexes are created (if create_missing)
+    - Indexes with the same name but different definition are reported as "mismatched"
+      (never dropped automatically)
+    - Indexes present in the DB but not registered are reported as "extra"
+    - Failures (e.g. duplicates violating a unique index) are reported, never raised
+
+    Returns a report per collection.
+    """
+    report: Dict[str, Any] = {}
+
+    for collection, specs in sorted(INDEX_REGISTRY.items()):
+        entry = {"ok": [], "created": [], "missing": [], "mismatched": [], "extra": [], "errors": []}
+        coll = db[collection]
+
+        try:
+            live = await coll.index_information()
+        except Exception as e:
+            # Collection does not exist yet - all indexes missing
+            logger.debug(f"index_information({collection}) fehlgeschlagen: {e}")
+            live = {}
+
+        for name, spec in specs.items():
+            if name in live:
+                if _spec_matches(spec, live[name]):
+                    entry["ok"].append(name)
+                else:
+                    entry["mismatched"].append(name)
+                continue
+
+            if not create_missing:
+                entry["missing"].append(name)
+                continue
+
+            try:
+                await coll.create_index(list(spec.keys), **spec.options())
+                entry["created"].append(name)
+            except Exception as e:
+                entry["missing"].append(name)
+                entry["errors"].append({"index": name, "error": str(e)})
+                logger.warning(f"[INDEX] {collection}.{name} konnte nicht erstellt werden: {e}")
+
+        entry["extra"] = sorted(n for n in live.keys() if n != "_id_" and n not in specs)
+        report[collection] = entry
+
+    return report
+
+
+def summarize_index_report(report: Dict[str, Any]) -> Dict[str, int]:
+    """Count totals across all collections of a reconcile report"""
+    totals = {"collections": len(report), "ok": 0, "created": 0, "missing": 0, "mismatched": 0, "extra": 0, "errors": 0}
+    for entry in report.values():
+        for key in ("ok", "created", "missing", "mismatched", "extra", "errors"):
+            totals[key] += len(entry.get(key, []))
+    return totals
+
+
+def get_registered_indexes() -> Dict[str, List[Dict[str, Any]]]:
+    """Registry as plain dicts (for diagnostics output)"""
+    return {
+        collection: [
+            {"name": s.name, "keys": [list(k) for k in s.keys], **{k: v for k, v in s.options().items() if k != "name"}}
+            for s in specs.values()
+        ]
+        for collection, specs in sorted(INDEX_REGISTRY.items())
+    }
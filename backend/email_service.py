@@ -5,14 +5,24 @@ import smtplib
 import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import os
+import asyncio
 import logging
 import hashlib
 import hmac
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Dict, Optional, List, Callable, Awaitable
+
+from pymongo.errors import DuplicateKeyError
+
+from core.indexes import register_indexes, index
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -28,6 +38,17 @@ SMTP_FROM_EMAIL = os.environ.get('SMTP_FROM', os.environ.get('SMTP_FROM_EMAIL',
 SMTP_FROM_NAME = os.environ.get('SMTP_FROM_NAME', 'Carlsburg Restaurant')
 SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'false').lower() == 'true'
 APP_URL = os.environ.get('APP_URL', 'http://localhost:3000')
+
+# Outbox / Versand-Worker
+EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS', '3'))
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', str(EMAIL_WORKERS)))
+SMTP_RATE_PER_MINUTE = int(os.environ.get('SMTP_RATE_PER_MINUTE', '60'))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))
+EMAIL_RETRY_BASE_SECONDS = 30
+EMAIL_RETRY_MAX_SECONDS = 3600
+EMAIL_LEASE_SECONDS = 300
+EMAIL_IDLE_POLL_SECONDS = 5
+SMTP_CONNECTION_MAX_AGE_SECONDS = 240
 CANCEL_SECRET = os.environ.get('JWT_SECRET', 'secret-key')
 
 
@@ -337,50 +358,465 @@ async def log_email(to_email: str, subject: str, template_type: str, status: str
         logger.error(f"Failed to log email: {e}")
 
 
+def _mask_secret(text: str) -> str:
+    """NEVER log passwords or sensitive data"""
+    if SMTP_PASSWORD and SMTP_PASSWORD in text:
+        return text.replace(SMTP_PASSWORD, "***")
+    return text
+
+
+def build_message(to_email: str, subject: str, html_body: str, text_body: str) -> MIMEMultipart:
+    """Standard-Mail (Text + HTML)"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    msg['To'] = to_email
+    
+    msg.attach(MIMEText(text_body, 'plain', 'utf-8'))
+    msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+    return msg
+
+
+# ============== SMTP CONNECTION POOL ==============
+class SMTPConnectionPool:
+    """
+    Wiederverwendbare, authentifizierte SMTP-Verbindungen (thread-safe).
+    
+    - Verbindungen werden nur in Worker-Threads benutzt, nie auf dem Event-Loop
+    - Vor der Wiederverwendung: Alterscheck + NOOP, tote Verbindungen werden ersetzt
+    """
+    
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.connects = 0
+        self.reuses = 0
+    
+    def _connect(self):
+        context = ssl.create_default_context()
+        if SMTP_USE_TLS:
+            # STARTTLS (Port 587)
+            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+            server.starttls(context=context)
+        else:
+            # SSL (Port 465)
+            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context, timeout=30)
+        server.login(SMTP_USER, SMTP_PASSWORD)
+        self.connects += 1
+        return server
+    
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def _checkout(self):
+        while True:
+            try:
+                server, created_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), time.monotonic()
+            if time.monotonic() - created_at > SMTP_CONNECTION_MAX_AGE_SECONDS:
+                self._close(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    self.reuses += 1
+                    return server, created_at
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._close(server)
+    
+    def send(self, from_addr: str, recipients: List[str], message: str):
+        """Blockierend - nur aus Threads aufrufen"""
+        with self._slots:
+            server, created_at = self._checkout()
+            try:
+                server.sendmail(from_addr, recipients, message)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                # Verbindung unterwegs verloren - einmal mit frischer Verbindung
+                self._close(server)
+                server, created_at = self._connect(), time.monotonic()
+                try:
+                    server.sendmail(from_addr, recipients, message)
+                except Exception:
+                    self._close(server)
+                    raise
+            except Exception:
+                self._close(server)
+                raise
+            self._idle.put((server, created_at))
+    
+    def close_all(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+    
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": self._idle.qsize(), "connects": self.connects, "reuses": self.reuses}
+
+
+class ProviderRateLimiter:
+    """Token-Bucket pro SMTP-Provider (Host): höchstens n Mails pro Minute"""
+    
+    def __init__(self, per_minute: int):
+        self.per_minute = max(1, per_minute)
+        self._buckets: Dict[str, list] = {}
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, provider: str):
+        async with self._lock:
+            rate = self.per_minute / 60.0
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(provider, [float(self.per_minute), now])
+            tokens = min(float(self.per_minute), tokens + (now - updated) * rate) - 1
+            # Negativer Bestand = reservierte Wartezeit für diesen Aufrufer
+            wait = -tokens / rate if tokens < 0 else 0.0
+            self._buckets[provider] = [tokens, now]
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+smtp_pool = SMTPConnectionPool(SMTP_POOL_SIZE)
+_smtp_executor = ThreadPoolExecutor(max_workers=max(1, SMTP_POOL_SIZE), thread_name_prefix="smtp")
+
+
+async def deliver_message(recipients: List[str], message: str):
+    """Versand über den Pool in einem Worker-Thread (Event-Loop bleibt frei)"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_smtp_executor, smtp_pool.send, SMTP_FROM_EMAIL, recipients, message)
+
+
 async def send_email(to_email: str, subject: str, html_body: str, text_body: str, template_type: str = "other") -> bool:
-    """Send email via SMTP with TLS/SSL support"""
+    """Send email via SMTP immediately (pooled connection, off the event loop)"""
     if not is_smtp_configured():
         logger.warning("SMTP nicht konfiguriert - E-Mail wird nur geloggt")
         await log_email(to_email, subject, template_type, "skipped", "SMTP nicht konfiguriert")
         return False
     
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg['To'] = to_email
-        
-        msg.attach(MIMEText(text_body, 'plain', 'utf-8'))
-        msg.attach(MIMEText(html_body, 'html', 'utf-8'))
-        
-        context = ssl.create_default_context()
-        
-        if SMTP_USE_TLS:
-            # STARTTLS (Port 587)
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls(context=context)
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.sendmail(SMTP_FROM_EMAIL, to_email, msg.as_string())
-        else:
-            # SSL (Port 465)
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context) as server:
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.sendmail(SMTP_FROM_EMAIL, to_email, msg.as_string())
+        msg = build_message(to_email, subject, html_body, text_body)
+        await deliver_message([to_email], msg.as_string())
         
         logger.info(f"E-Mail gesendet an {to_email}")
         await log_email(to_email, subject, template_type, "sent")
         return True
         
     except Exception as e:
-        error_msg = str(e)
-        # NEVER log passwords or sensitive data
-        if SMTP_PASSWORD in error_msg:
-            error_msg = error_msg.replace(SMTP_PASSWORD, "***")
+        error_msg = _mask_secret(str(e))
         logger.error(f"E-Mail-Versand fehlgeschlagen an {to_email}: {error_msg}")
         await log_email(to_email, subject, template_type, "failed", error_msg)
         return False
 
 
+# ============== EMAIL OUTBOX ==============
+# Persistente Warteschlange (collection email_outbox), abgearbeitet von Worker-Tasks:
+# pending -> sending (Lease) -> sent | pending (Retry mit Backoff) | failed
+# Ein abgelaufener Lease (Worker-Absturz) wird von einem anderen Worker übernommen.
+
+class OutboxStatus:
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+register_indexes(
+    "email_outbox",
+    index(("id", 1), unique=True),
+    index(("status", 1), ("next_attempt_at", 1)),
+    index(("status", 1), ("lease_until", 1)),
+    index(("created_at", -1)),
+    # Idempotentes Einreihen (z.B. Newsletter: pro Inhalt + Empfänger höchstens einmal)
+    index(("dedupe_key", 1), unique=True, partial_filter={"dedupe_key": {"$exists": True}}),
+)
+
+
+class AttachmentUnavailable(Exception):
+    """Anhang-Quelle existiert nicht mehr - Mail kann nie gebaut werden"""
+
+
+# Anhänge werden nicht als MIME in der Outbox gespeichert, sondern als Referenz
+# ({"type": ..., "id": ...}) und erst beim Versand über den Loader des Moduls geladen.
+_attachment_loaders: Dict[str, Callable[[dict], Awaitable[list]]] = {}
+
+# Ergebnis-Hooks je template_type (z.B. Export-Job auf sent/failed setzen)
+_outcome_hooks: Dict[str, Callable[[dict, str, Optional[str]], Awaitable[None]]] = {}
+
+
+def register_attachment_loader(ref_type: str, loader: Callable[[dict], Awaitable[list]]):
+    """loader(ref) -> Liste von {'filename', 'content' (bytes), 'content_type'}"""
+    _attachment_loaders[ref_type] = loader
+
+
+def register_outbox_hook(template_type: str, hook: Callable[[dict, str, Optional[str]], Awaitable[None]]):
+    """hook(outbox_item, status, error) - wird nach sent / failed (endgültig) aufgerufen"""
+    _outcome_hooks[template_type] = hook
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """Adresse abgelehnt / 5xx: kein Retry"""
+    if isinstance(error, AttachmentUnavailable):
+        return True
+    # Login-Fehler (535) sind meist vorübergehend (Passwort-Rotation, Provider-Sperre) -> Retry
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600 and code not in (552,)
+
+
+def retry_delay_seconds(attempts: int) -> int:
+    """Exponentielles Backoff: 30s, 60s, 120s ... max. 1h"""
+    return min(EMAIL_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)), EMAIL_RETRY_MAX_SECONDS)
+
+
+class EmailOutbox:
+    """Worker-Pool für die email_outbox"""
+    
+    def __init__(self, workers: int = EMAIL_WORKERS):
+        self.workers = max(1, workers)
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.rate_limiter = ProviderRateLimiter(SMTP_RATE_PER_MINUTE)
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+    
+    async def enqueue(
+        self,
+        recipients: List[str],
+        subject: str,
+        message: Optional[str],
+        template_type: str = "other",
+        meta: Optional[dict] = None,
+        dedupe_key: Optional[str] = None,
+        content: Optional[dict] = None
+    ) -> Optional[str]:
+        """
+        Mail (fertige MIME-Nachricht) in die Outbox legen - Versand übernimmt der Worker.
+        Alternativ (message=None) content mit Text und Anhang-Referenz - die Nachricht
+        wird dann erst beim Versand gebaut (siehe build_attachment_message).
+        Mit dedupe_key wird eine bereits eingereihte Mail nicht erneut angelegt (Returns None).
+        """
+        from core.database import db
+        
+        now = datetime.now(timezone.utc).isoformat()
+        doc = {
+            "id": str(uuid.uuid4()),
+            "recipients": recipients,
+            "subject": subject,
+            "message": message,
+            "template_type": template_type,
+            "provider": SMTP_HOST,
+            "status": OutboxStatus.PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "lease_until": None,
+            "last_error": None,
+            "meta": meta or {},
+            "created_at": now,
+            "updated_at": now
+        }
+        if content:
+            doc["content"] = content
+        if dedupe_key:
+            doc["dedupe_key"] = dedupe_key
+        try:
+            await db.email_outbox.insert_one(doc)
+        except DuplicateKeyError:
+            return None
+        if self._wakeup:
+            self._wakeup.set()
+        return doc["id"]
+    
+    # ---------- Worker ----------
+    
+    def start(self):
+        """Worker-Tasks starten (einmal beim Startup)"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker_loop(i)) for i in range(self.workers)]
+        logger.info(f"✓ E-Mail-Outbox: {self.workers} Worker gestartet")
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        smtp_pool.close_all()
+    
+    async def _claim(self) -> Optional[dict]:
+        """Nächste fällige Mail leasen (atomar, mehrere Worker/Prozesse möglich)"""
+        from core.database import db
+        
+        now = datetime.now(timezone.utc)
+        now_str = now.isoformat()
+        return await db.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": OutboxStatus.PENDING, "next_attempt_at": {"$lte": now_str}},
+                {"status": OutboxStatus.SENDING, "lease_until": {"$lt": now_str}}
+            ]},
+            {
+                "$set": {
+                    "status": OutboxStatus.SENDING,
+                    "lease_until": (now + timedelta(seconds=EMAIL_LEASE_SECONDS)).isoformat(),
+                    "worker_id": self.worker_id,
+                    "updated_at": now_str
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            projection={"_id": 0},
+            return_document=True
+        )
+    
+    async def _process(self, item: dict):
+        from core.database import db
+        
+        to_display = ", ".join(item["recipients"])
+        now = datetime.now(timezone.utc)
+        try:
+            message = item.get("message")
+            if message is None:
+                message = (await build_attachment_message(**item["content"])).as_string()
+            await self.rate_limiter.acquire(item.get("provider") or SMTP_HOST)
+            await deliver_message(item["recipients"], message)
+        except Exception as e:
+            error_msg = _mask_secret(str(e))
+            attempts = item.get("attempts", 1)
+            if _is_permanent_error(e) or attempts >= EMAIL_MAX_ATTEMPTS:
+                self.failed += 1
+                await db.email_outbox.update_one(
+                    {"id": item["id"]},
+                    {"$set": {
+                        "status": OutboxStatus.FAILED,
+                        "last_error": error_msg,
+                        "lease_until": None,
+                        "updated_at": now.isoformat()
+                    }}
+                )
+                logger.error(f"E-Mail-Versand endgültig fehlgeschlagen an {to_display}: {error_msg}")
+                await log_email(to_display, item["subject"], item["template_type"], "failed", error_msg)
+                await self._notify(item, OutboxStatus.FAILED, error_msg)
+            else:
+                self.retried += 1
+                delay = retry_delay_seconds(attempts)
+                await db.email_outbox.update_one(
+                    {"id": item["id"]},
+                    {"$set": {
+                        "status": OutboxStatus.PENDING,
+                        "last_error": error_msg,
+                        "lease_until": None,
+                        "next_attempt_at": (now + timedelta(seconds=delay)).isoformat(),
+                        "updated_at": now.isoformat()
+                    }}
+                )
+                logger.warning(f"E-Mail an {to_display} fehlgeschlagen (Versuch {attempts}), Retry in {delay}s: {error_msg}")
+            return
+        
+        self.sent += 1
+        await db.email_outbox.update_one(
+            {"id": item["id"]},
+            {
+                "$set": {
+                    "status": OutboxStatus.SENT,
+                    "sent_at": datetime.now(timezone.utc).isoformat(),
+                    "lease_until": None,
+                    "last_error": None,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                },
+                # Nachricht nach dem Versand nicht mehr vorhalten (personenbezogene Daten)
+                "$unset": {"message": "", "content": ""}
+            }
+        )
+        logger.info(f"E-Mail gesendet an {to_display}")
+        await log_email(to_display, item["subject"], item["template_type"], "sent")
+        await self._notify(item, OutboxStatus.SENT, None)
+    
+    async def _notify(self, item: dict, status: str, error: Optional[str]):
+        """Ergebnis-Hook des Absender-Moduls - Fehler dort brechen den Worker nicht ab"""
+        hook = _outcome_hooks.get(item.get("template_type"))
+        if not hook:
+            return
+        try:
+            await hook(item, status, error)
+        except Exception as e:
+            logger.error(f"Outbox-Hook {item.get('template_type')} fehlgeschlagen für {item['id']}: {e}")
+    
+    async def _worker_loop(self, number: int):
+        while True:
+            try:
+                item = await self._claim()
+                if item:
+                    await self._process(item)
+                    continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=EMAIL_IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"E-Mail-Worker {number}: {e}")
+                await asyncio.sleep(EMAIL_IDLE_POLL_SECONDS)
+    
+    async def stats(self) -> dict:
+        from core.database import db
+        
+        counts = {}
+        async for row in db.email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return {
+            "workers": len(self._tasks),
+            "worker_id": self.worker_id,
+            "queue": counts,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rate_per_minute": SMTP_RATE_PER_MINUTE,
+            "pool": smtp_pool.stats()
+        }
+
+
+email_outbox = EmailOutbox()
+
+
+async def queue_email(
+    to_email: str,
+    subject: str,
+    html_body: str,
+    text_body: str,
+    template_type: str = "other",
+    meta: Optional[dict] = None,
+    dedupe_key: Optional[str] = None
+) -> bool:
+    """Mail in die Outbox legen (Versand asynchron durch den Worker-Pool)"""
+    if not is_smtp_configured():
+        logger.warning("SMTP nicht konfiguriert - E-Mail wird nur geloggt")
+        await log_email(to_email, subject, template_type, "skipped", "SMTP nicht konfiguriert")
+        return False
+    
+    msg = build_message(to_email, subject, html_body, text_body)
+    await email_outbox.enqueue([to_email], subject, msg.as_string(), template_type, meta, dedupe_key)
+    return True
+
+
 async def send_test_email(to_email: str) -> dict:
     """Send a test email to verify SMTP configuration"""
     if not is_smtp_configured():
@@ -417,7 +853,7 @@ async def send_test_email(to_email: str) -> dict:
 
 
 async def send_confirmation_email(reservation: dict, area_name: str = None, lang: str = "de") -> bool:
-    """Send reservation confirmation email"""
+    """Queue reservation confirmation email"""
     if not reservation.get('guest_email'):
         return False
     
@@ -440,11 +876,11 @@ async def send_confirmation_email(reservation: dict, area_name: str = None, lang
     html = get_html_template("confirmation", lang, data)
     text = f"{t['greeting']}\n\n{t['date_label']}: {data['date_formatted']}\n{t['time_label']}: {reservation.get('time')}\n{t['guests_label']}: {reservation.get('party_size')}\n\n{data['cancel_url']}"
     
-    return await send_email(reservation['guest_email'], subject, html, text, "confirmation")
+    return await queue_email(reservation['guest_email'], subject, html, text, "confirmation", {"reservation_id": reservation.get("id")})
 
 
-async def send_reminder_email(reservation: dict, area_name: str = None, lang: str = "de") -> bool:
-    """Send reminder email"""
+async def send_reminder_email(reservation: dict, area_name: str = None, lang: str = "de", dedupe_key: str = None) -> bool:
+    """Queue reminder email (dedupe_key: höchstens einmal pro Erinnerung einreihen)"""
     if not reservation.get('guest_email'):
         return False
     
@@ -462,11 +898,11 @@ async def send_reminder_email(reservation: dict, area_name: str = None, lang: st
     html = get_html_template("reminder", lang, data)
     text = f"{t['greeting']}\n\n{t['text']}\n\n{t['date_label']}: {data['date_formatted']}\n{t['time_label']}: {reservation.get('time')}"
     
-    return await send_email(reservation['guest_email'], subject, html, text, "reminder")
+    return await queue_email(reservation['guest_email'], subject, html, text, "reminder", {"reservation_id": reservation.get("id")}, dedupe_key)
 
 
 async def send_cancellation_email(reservation: dict, lang: str = "de") -> bool:
-    """Send cancellation confirmation email"""
+    """Queue cancellation confirmation email"""
     if not reservation.get('guest_email'):
         return False
     
@@ -482,11 +918,11 @@ async def send_cancellation_email(reservation: dict, lang: str = "de") -> bool:
     html = get_html_template("cancellation", lang, data)
     text = f"{t['greeting']}\n\n{t['text']}\n\n{reservation.get('date')} - {reservation.get('time')}"
     
-    return await send_email(reservation['guest_email'], subject, html, text, "cancellation")
+    return await queue_email(reservation['guest_email'], subject, html, text, "cancellation", {"reservation_id": reservation.get("id")})
 
 
 async def send_waitlist_notification(entry: dict, lang: str = "de") -> bool:
-    """Send waitlist notification email"""
+    """Queue waitlist notification email"""
     if not entry.get('guest_email'):
         return False
     
@@ -502,15 +938,25 @@ async def send_waitlist_notification(entry: dict, lang: str = "de") -> bool:
     html = get_html_template("waitlist", lang, data)
     text = f"{t['greeting']}\n\n{t['text']}\n\n{entry.get('date')}"
     
-    return await send_email(entry['guest_email'], subject, html, text, "waitlist")
+    return await queue_email(entry['guest_email'], subject, html, text, "waitlist", {"waitlist_id": entry.get("id")})
 
 
 
-async def send_email_template(to_email: str, subject: str, body: str) -> bool:
-    """Send a simple text email (for welcome emails, etc.)"""
+async def send_email_template(
+    to_email: str,
+    subject: str,
+    body: str,
+    template_type: str = "template",
+    meta: Optional[dict] = None
+) -> Optional[str]:
+    """Queue a simple text email (for welcome emails, etc.)
+    
+    template_type selects the outbox outcome hook (register_outbox_hook), meta is passed to it.
+    Returns the outbox id, None if SMTP is not configured.
+    """
     if not SMTP_USER or not SMTP_PASSWORD:
         logger.warning("SMTP credentials not configured, skipping email")
-        return False
+        return None
     
     try:
         msg = MIMEMultipart('alternative')
@@ -553,32 +999,99 @@ async def send_email_template(to_email: str, subject: str, body: str) -> bool:
         msg.attach(MIMEText(body, 'plain', 'utf-8'))
         msg.attach(MIMEText(html_body, 'html', 'utf-8'))
         
-        context = ssl.create_default_context()
-        
-        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context) as server:
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(SMTP_FROM_EMAIL, to_email, msg.as_string())
-        
-        logger.info(f"Template email sent to {to_email}")
-        await log_email(to_email, subject, "template", "sent")
-        return True
+        outbox_id = await email_outbox.enqueue([to_email], subject, msg.as_string(), template_type, meta)
+        logger.info(f"Template email queued for {to_email}")
+        return outbox_id
         
     except Exception as e:
-        logger.error(f"Failed to send template email to {to_email}: {str(e)}")
-        await log_email(to_email, subject, "template", "failed", str(e))
+        logger.error(f"Failed to queue template email to {to_email}: {str(e)}")
+        await log_email(to_email, subject, template_type, "failed", str(e))
         raise e
 
 
 
+async def build_attachment_message(
+    to_emails: list,
+    subject: str,
+    body: str,
+    cc_emails: list = None,
+    attachments: list = None,
+    attachment_ref: Optional[dict] = None
+) -> MIMEMultipart:
+    """MIME-Nachricht mit Anhängen - Anhänge direkt oder über attachment_ref geladen"""
+    from email.mime.base import MIMEBase
+    from email import encoders
+    
+    if attachment_ref:
+        loader = _attachment_loaders.get(attachment_ref.get("type"))
+        if not loader:
+            raise AttachmentUnavailable(f"Kein Loader für Anhang-Typ {attachment_ref.get('type')}")
+        attachments = await loader(attachment_ref)
+    
+    msg = MIMEMultipart('mixed')
+    msg['Subject'] = subject
+    msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    msg['To'] = ", ".join(to_emails)
+    
+    if cc_emails:
+        msg['Cc'] = ", ".join(cc_emails)
+    
+    # Add body
+    body_part = MIMEMultipart('alternative')
+    
+    # Plain text
+    body_part.attach(MIMEText(body, 'plain', 'utf-8'))
+    
+    # HTML wrapper
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head><meta charset="utf-8"></head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="text-align: center; margin-bottom: 20px;">
+                <h2 style="color: #00280b; margin: 0;">GastroCore</h2>
+            </div>
+            <div style="background-color: #f5f5f5; border-radius: 8px; padding: 20px;">
+                <p style="white-space: pre-line;">{body}</p>
+            </div>
+            <div style="text-align: center; margin-top: 20px; color: #666; font-size: 12px;">
+                <p>&copy; {datetime.now().year} GastroCore. Automatisch generierte Nachricht.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    body_part.attach(MIMEText(html_body, 'html', 'utf-8'))
+    msg.attach(body_part)
+    
+    # Add attachments
+    for attachment in attachments or []:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(attachment['content'])
+        encoders.encode_base64(part)
+        part.add_header(
+            'Content-Disposition',
+            f"attachment; filename=\"{attachment['filename']}\""
+        )
+        if attachment.get('content_type'):
+            part.replace_header('Content-Type', attachment['content_type'])
+        msg.attach(part)
+    
+    return msg
+
+
 async def send_email_with_attachments(
     to_emails: list,
     subject: str,
     body: str,
     attachments: list = None,
     cc_emails: list = None,
-    bcc_emails: list = None
-) -> bool:
-    """Send email with attachments (for tax office exports)
+    bcc_emails: list = None,
+    attachment_ref: Optional[dict] = None,
+    meta: Optional[dict] = None
+) -> Optional[str]:
+    """Queue email with attachments (for tax office exports)
     
     Args:
         to_emails: List of recipient emails
@@ -587,66 +1100,18 @@ async def send_email_with_attachments(
         attachments: List of dicts with 'filename', 'content' (bytes), 'content_type'
         cc_emails: List of CC recipients
         bcc_emails: List of BCC recipients
+        attachment_ref: Reference resolved by a registered attachment loader at send time
+            (the outbox then stores only the reference, not the MIME message)
+        meta: Passed to the outcome hook of the "taxoffice_export" template type
+    
+    Returns:
+        Outbox id of the queued mail, None if SMTP is not configured
     """
     if not SMTP_USER or not SMTP_PASSWORD:
         logger.warning("SMTP credentials not configured, skipping email")
-        return False
+        return None
     
     try:
-        from email.mime.base import MIMEBase
-        from email import encoders
-        
-        msg = MIMEMultipart('mixed')
-        msg['Subject'] = subject
-        msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg['To'] = ", ".join(to_emails)
-        
-        if cc_emails:
-            msg['Cc'] = ", ".join(cc_emails)
-        
-        # Add body
-        body_part = MIMEMultipart('alternative')
-        
-        # Plain text
-        body_part.attach(MIMEText(body, 'plain', 'utf-8'))
-        
-        # HTML wrapper
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head><meta charset="utf-8"></head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="text-align: center; margin-bottom: 20px;">
-                    <h2 style="color: #00280b; margin: 0;">GastroCore</h2>
-                </div>
-                <div style="background-color: #f5f5f5; border-radius: 8px; padding: 20px;">
-                    <p style="white-space: pre-line;">{body}</p>
-                </div>
-                <div style="text-align: center; margin-top: 20px; color: #666; font-size: 12px;">
-                    <p>&copy; {datetime.now().year} GastroCore. Automatisch generierte Nachricht.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        body_part.attach(MIMEText(html_body, 'html', 'utf-8'))
-        msg.attach(body_part)
-        
-        # Add attachments
-        if attachments:
-            for attachment in attachments:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment['content'])
-                encoders.encode_base64(part)
-                part.add_header(
-                    'Content-Disposition',
-                    f"attachment; filename=\"{attachment['filename']}\""
-                )
-                if attachment.get('content_type'):
-                    part.replace_header('Content-Type', attachment['content_type'])
-                msg.attach(part)
-        
         # Collect all recipients
         all_recipients = list(to_emails)
         if cc_emails:
@@ -654,17 +1119,24 @@ async def send_email_with_attachments(
         if bcc_emails:
             all_recipients.extend(bcc_emails)
         
-        context = ssl.create_default_context()
-        
-        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context) as server:
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(SMTP_FROM_EMAIL, all_recipients, msg.as_string())
-        
-        logger.info(f"Email with attachments sent to {', '.join(to_emails)}")
-        await log_email(", ".join(to_emails), subject, "taxoffice_export", "sent")
-        return True
+        if attachment_ref:
+            outbox_id = await email_outbox.enqueue(
+                all_recipients, subject, None, "taxoffice_export", meta,
+                content={
+                    "to_emails": list(to_emails),
+                    "cc_emails": cc_emails or [],
+                    "subject": subject,
+                    "body": body,
+                    "attachment_ref": attachment_ref
+                }
+            )
+        else:
+            msg = await build_attachment_message(to_emails, subject, body, cc_emails, attachments)
+            outbox_id = await email_outbox.enqueue(all_recipients, subject, msg.as_string(), "taxoffice_export", meta)
+        logger.info(f"Email with attachments queued for {', '.join(to_emails)}")
+        return outbox_id
         
     except Exception as e:
-        logger.error(f"Failed to send email with attachments: {str(e)}")
+        logger.error(f"Failed to queue email with attachments: {str(e)}")
         await log_email(", ".join(to_emails), subject, "taxoffice_export", "failed", str(e))
         raise e
@@ -9,17 +9,26 @@ ADDITIV - Keine Breaking Changes an bestehenden Tabellen/Endpunkten
 
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
-from datetime import datetime, timezone, date
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone, date, timedelta
 from decimal import Decimal
 from enum import Enum
 import uuid
+import os
+import json
+import hashlib
+import asyncio
+
+from pymongo import UpdateOne, UpdateMany, InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 # Import from main server module
 from core.database import db
 from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit, SYSTEM_ACTOR
 from core.exceptions import NotFoundException, ValidationException, ConflictException
+from core.indexes import register_indexes, index
+from reservation_hooks import on_reservation_changed
 
 
 # ============== ENUMS ==============
@@ -276,6 +285,149 @@ def create_entity(data: dict) -> dict:
     }
 
 
+# ============== BOOKING COUNTERS ==============
+# booked_confirmed / booked_pending auf dem Event-Dokument (Summe party_size):
+# - confirmed: bestätigt ODER bezahlt -> zählt gegen capacity_total
+# - pending:   übrige nicht stornierte Buchungen -> nur Anzeige
+# Stornierte und archivierte Buchungen zählen nicht.
+# Änderungen per $inc in jedem Schreibpfad, reconcile_event_counters repariert Drift.
+# claim_event_capacity belegt VOR dem Insert der Buchung und stempelt counters_claimed_at;
+# der Abgleich lässt frisch gestempelte Events aus, sonst würde er die Belegung einer
+# noch nicht geschriebenen Buchung wieder wegkorrigieren.
+
+EVENT_COUNTER_FIELDS = ("booked_confirmed", "booked_pending")
+EVENT_CLAIM_GRACE_SECONDS = int(os.getenv("EVENT_CLAIM_GRACE_SECONDS", "30"))
+EVENT_COUNTER_RECONCILE_MINUTES = int(os.getenv("EVENT_COUNTER_RECONCILE_MINUTES", "60"))
+
+
+def booking_counter_field(booking: Optional[dict]) -> Optional[str]:
+    """Zähler, in den eine Buchung fällt (None = zählt nicht)"""
+    if not booking or booking.get("archived", False) or booking.get("status") == "cancelled":
+        return None
+    if booking.get("status") == "confirmed" or booking.get("payment_status") == "paid":
+        return "booked_confirmed"
+    return "booked_pending"
+
+
+def booking_counter_delta(before: Optional[dict], after: Optional[dict]) -> Dict[str, int]:
+    """$inc-Dokument für den Übergang before -> after"""
+    delta: Dict[str, int] = {}
+    for booking, sign in ((before, -1), (after, 1)):
+        field = booking_counter_field(booking)
+        if field:
+            delta[field] = delta.get(field, 0) + sign * (booking.get("party_size") or 0)
+    return {k: v for k, v in delta.items() if v}
+
+
+async def apply_booking_counter_delta(before: Optional[dict], after: Optional[dict]):
+    """Event-Zähler um die Differenz einer Buchungsänderung anpassen"""
+    event_id = (after or before or {}).get("event_id")
+    delta = booking_counter_delta(before, after)
+    if not event_id or not delta:
+        return
+    # Nicht initialisierte Zähler bleiben unberührt - sie werden beim ersten Lesen aufgebaut
+    await db.events.update_one({"id": event_id, "booked_confirmed": {"$exists": True}}, {"$inc": delta})
+
+
+async def update_event_booking_counted(booking_id: str, fields: dict) -> Optional[dict]:
+    """
+    Buchung per $set ändern und die Event-Zähler nachziehen.
+    Der Vorher-Stand kommt atomar aus find_one_and_update.
+    """
+    before = await db.event_bookings.find_one_and_update(
+        {"id": booking_id},
+        {"$set": fields},
+        projection={"_id": 0}
+    )
+    if not before:
+        return None
+    after = {**before, **fields}
+    await apply_booking_counter_delta(before, after)
+    return after
+
+
+async def reconcile_event_counters(event_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Zähler aus event_bookings neu berechnen (eine Aggregation) und nur
+    abweichende Events korrigieren. Ohne event_ids: alle Events.
+    
+    Die Zählerstände werden VOR der Aggregation gelesen und die Korrektur ist
+    bedingt auf genau diesen Stand: ändert ein $inc den Zähler während des
+    Laufs, greift die Korrektur nicht (nächster Lauf gleicht ab). Ein nach
+    der Aggregation gelesener Stand könnte ein paralleles $inc bereits
+    enthalten, die Aggregation aber nicht - das würde es überschreiben.
+    
+    Events mit einer Belegung aus claim_event_capacity in den letzten
+    EVENT_CLAIM_GRACE_SECONDS werden nicht korrigiert (deferred): deren
+    Buchung ist evtl. noch nicht geschrieben, der Zähler aber schon erhöht.
+    """
+    event_query = {"id": {"$in": event_ids}} if event_ids is not None else {}
+    events = await db.events.find(
+        event_query, {"_id": 0, "id": 1, "counters_claimed_at": 1, **{f: 1 for f in EVENT_COUNTER_FIELDS}}
+    ).to_list(None)
+    claim_cutoff = (datetime.now(timezone.utc) - timedelta(seconds=EVENT_CLAIM_GRACE_SECONDS)).isoformat()
+    
+    match: Dict[str, Any] = {"archived": {"$ne": True}, "status": {"$ne": "cancelled"}}
+    if event_ids is not None:
+        match["event_id"] = {"$in": event_ids}
+    counted = {"$or": [{"$eq": ["$status", "confirmed"]}, {"$eq": ["$payment_status", "paid"]}]}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$event_id",
+            "booked_confirmed": {"$sum": {"$cond": [counted, {"$ifNull": ["$party_size", 0]}, 0]}},
+            "booked_pending": {"$sum": {"$cond": [counted, 0, {"$ifNull": ["$party_size", 0]}]}},
+        }}
+    ]
+    actual = {r["_id"]: r async for r in db.event_bookings.aggregate(pipeline)}
+    
+    ops = []
+    checked = 0
+    initialized = 0
+    deferred = 0
+    drift = []
+    for event in events:
+        checked += 1
+        want = {f: actual.get(event["id"], {}).get(f, 0) for f in EVENT_COUNTER_FIELDS}
+        have = {f: event.get(f) for f in EVENT_COUNTER_FIELDS}
+        if have == want:
+            continue
+        if (event.get("counters_claimed_at") or "") > claim_cutoff:
+            deferred += 1
+            continue
+        guard = {"id": event["id"]}
+        for f in EVENT_COUNTER_FIELDS:
+            guard[f] = event[f] if f in event else {"$exists": False}
+        ops.append(UpdateOne(guard, {"$set": want}))
+        if all(f in event for f in EVENT_COUNTER_FIELDS):
+            drift.append({"event_id": event["id"], "before": have, "after": want})
+        else:
+            initialized += 1
+    
+    if ops:
+        await db.events.bulk_write(ops, ordered=False)
+    if drift:
+        logger.warning(f"Event-Zähler korrigiert: {len(drift)} Events mit Drift")
+    
+    return {
+        "checked": checked, "initialized": initialized, "repaired": len(drift),
+        "deferred": deferred, "drift": drift[:20]
+    }
+
+
+async def event_booked_counts(event: dict) -> Dict[str, int]:
+    """Zähler eines (bereits geladenen) Events - fehlen sie, werden sie einmalig aufgebaut"""
+    if all(f in event for f in EVENT_COUNTER_FIELDS):
+        return {f: event.get(f) or 0 for f in EVENT_COUNTER_FIELDS}
+    await reconcile_event_counters([event["id"]])
+    fresh = await db.events.find_one({"id": event["id"]}, {"_id": 0, **{f: 1 for f in EVENT_COUNTER_FIELDS}}) or {}
+    return {f: fresh.get(f) or 0 for f in EVENT_COUNTER_FIELDS}
+
+
+def booked_total(counts: Dict[str, int], include_pending: bool = False) -> int:
+    return counts["booked_confirmed"] + (counts["booked_pending"] if include_pending else 0)
+
+
 async def get_event_booked_count(event_id: str, include_pending: bool = False) -> int:
     """Get total booked party_size for an event
     
@@ -284,57 +436,115 @@ async def get_event_booked_count(event_id: str, include_pending: bool = False) -
         include_pending: If False, only count confirmed/paid bookings (prevents overbooking)
                         If True, count all non-cancelled bookings (for display purposes)
     """
-    if include_pending:
-        # For display: count all non-cancelled bookings
-        match_query = {"event_id": event_id, "status": {"$nin": ["cancelled"]}, "archived": False}
-    else:
-        # For capacity check: only count confirmed bookings OR paid bookings
-        # This prevents overbooking when multiple users book but don't pay
-        match_query = {
-            "event_id": event_id,
-            "archived": False,
-            "$or": [
-                {"status": "confirmed"},
-                {"payment_status": "paid"}
-            ]
-        }
+    event = await db.events.find_one({"id": event_id}, {"_id": 0, "id": 1, **{f: 1 for f in EVENT_COUNTER_FIELDS}})
+    if not event:
+        return 0
+    return booked_total(await event_booked_counts(event), include_pending)
+
+
+async def claim_event_capacity(
+    event_id: str,
+    party_size: int,
+    counter: str = "booked_confirmed",
+    status: Optional[str] = "published"
+) -> Optional[dict]:
+    """
+    Plätze atomar belegen: ein bedingtes Update prüft
+    booked_confirmed + party_size <= capacity_total und erhöht den Zähler
+    der neuen Buchung. Schließt das Überbuchen bei parallelen Buchungen.
+    counters_claimed_at markiert die Belegung als in-flight für den Abgleich.
     
-    pipeline = [
-        {"$match": match_query},
-        {"$group": {"_id": None, "total": {"$sum": "$party_size"}}}
-    ]
-    result = await db.event_bookings.aggregate(pipeline).to_list(1)
-    return result[0]["total"] if result else 0
+    Returns: Event nach dem Update, None = keine Kapazität / nicht buchbar
+    """
+    query = {
+        "id": event_id,
+        "archived": False,
+        "booked_confirmed": {"$exists": True},
+        "$expr": {"$lte": [{"$add": ["$booked_confirmed", party_size]}, {"$ifNull": ["$capacity_total", 0]}]}
+    }
+    if status:
+        query["status"] = status
+    
+    for _ in range(2):
+        event = await db.events.find_one_and_update(
+            query,
+            {"$inc": {counter: party_size}, "$set": {"counters_claimed_at": now_iso()}},
+            projection={"_id": 0},
+            return_document=True
+        )
+        if event:
+            return event
+        # Altdaten ohne Zähler: einmalig aufbauen und erneut versuchen
+        result = await reconcile_event_counters([event_id])
+        if not result["initialized"]:
+            return None
+    return None
+
+
+async def release_event_capacity(event_id: str, party_size: int, counter: str = "booked_confirmed"):
+    """Belegung aus claim_event_capacity zurücknehmen (z.B. Insert fehlgeschlagen)"""
+    await db.events.update_one(
+        {"id": event_id, counter: {"$exists": True}},
+        {"$inc": {counter: -party_size}}
+    )
 
 
 async def check_event_capacity(event_id: str, party_size: int, exclude_booking_id: str = None) -> bool:
-    """Check if event has enough capacity"""
+    """Check if event has enough capacity (Lesen der Zähler - verbindlich ist claim_event_capacity)"""
     event = await db.events.find_one({"id": event_id, "archived": False})
     if not event:
         return False
     
-    booked = await get_event_booked_count(event_id)
+    booked = booked_total(await event_booked_counts(event))
     if exclude_booking_id:
         # Subtract existing booking if updating
         existing = await db.event_bookings.find_one({"id": exclude_booking_id})
-        if existing:
+        if booking_counter_field(existing) == "booked_confirmed":
             booked -= existing.get("party_size", 0)
     
     return (booked + party_size) <= event.get("capacity_total", 0)
 
 
 async def update_event_status_if_needed(event_id: str):
-    """Update event status to sold_out if capacity reached"""
-    event = await db.events.find_one({"id": event_id, "archived": False})
-    if not event or event.get("status") != "published":
-        return
-    
-    booked = await get_event_booked_count(event_id)
-    if booked >= event.get("capacity_total", 0):
-        await db.events.update_one(
-            {"id": event_id},
-            {"$set": {"status": "sold_out", "updated_at": now_iso()}}
-        )
+    """Update event status to sold_out if capacity reached (ein bedingtes Update)"""
+    await db.events.update_one(
+        {
+            "id": event_id,
+            "archived": False,
+            "status": "published",
+            "booked_confirmed": {"$exists": True},
+            "$expr": {"$gte": ["$booked_confirmed", {"$ifNull": ["$capacity_total", 0]}]}
+        },
+        {"$set": {"status": "sold_out", "updated_at": now_iso()}}
+    )
+
+
+async def reopen_event_if_available(event_id: str):
+    """sold_out -> published, sobald wieder Plätze frei sind (z.B. nach Storno/Erstattung)"""
+    await db.events.update_one(
+        {
+            "id": event_id,
+            "status": "sold_out",
+            "booked_confirmed": {"$exists": True},
+            "$expr": {"$lt": ["$booked_confirmed", {"$ifNull": ["$capacity_total", 0]}]}
+        },
+        {"$set": {"status": "published", "updated_at": now_iso()}}
+    )
+
+
+async def event_counter_reconcile_loop():
+    """Periodischer Abgleich der Event-Zähler (Startup-Task)"""
+    while True:
+        try:
+            result = await reconcile_event_counters()
+            logger.info(
+                f"Event-Zähler abgeglichen: {result['checked']} Events, "
+                f"{result['initialized']} initialisiert, {result['repaired']} korrigiert, "
+                f"{result['deferred']} zurückgestellt"
+            )
+        except Exception as e:
+            logger.error(f"Event-Zähler-Abgleich fehlgeschlagen: {e}")
+        await asyncio.sleep(EVENT_COUNTER_RECONCILE_MINUTES * 60)
 
 
 async def validate_preorder_items(event: dict, items: List[EventBookingItemCreate], party_size: int):
@@ -469,8 +679,8 @@ async def get_events_dashboard_summary(user: dict = Depends(require_manager)):
         # Capacity: use capacity_total if set, else DEFAULT_EVENT_CAPACITY (95)
         capacity = event.get("capacity_total") or DEFAULT_EVENT_CAPACITY
         
-        # Booked count from event_bookings
-        booked = await get_event_booked_count(event_id, include_pending=True)
+        # Booked count (Zähler auf dem Event-Dokument)
+        booked = booked_total(await event_booked_counts(event), include_pending=True)
         
         # Calculate utilization
         utilization = round((booked / capacity) * 100, 1) if capacity > 0 else 0
@@ -573,7 +783,7 @@ async def list_events(
     
     # Add booked count to each event (include_pending=True for display)
     for event in events:
-        event["booked_count"] = await get_event_booked_count(event["id"], include_pending=True)
+        event["booked_count"] = booked_total(await event_booked_counts(event), include_pending=True)
         event["available_capacity"] = event.get("capacity_total", 0) - event["booked_count"]
     
     return events
@@ -586,7 +796,7 @@ async def get_event(event_id: str, user: dict = Depends(require_manager)):
     if not event:
         raise NotFoundException("Event")
     
-    event["booked_count"] = await get_event_booked_count(event_id, include_pending=True)
+    event["booked_count"] = booked_total(await event_booked_counts(event), include_pending=True)
     event["available_capacity"] = event.get("capacity_total", 0) - event["booked_count"]
     
     # Get products if reservation_with_preorder
@@ -693,6 +903,7 @@ async def cancel_event(event_id: str, user: dict = Depends(require_admin)):
         {"event_id": event_id, "status": {"$in": ["pending", "confirmed"]}},
         {"$set": {"status": "cancelled", "updated_at": now_iso()}}
     )
+    await reconcile_event_counters([event_id])
     
     updated = await db.events.find_one({"id": event_id}, {"_id": 0})
     await create_audit_log(user, "event", event_id, "cancel", before, safe_dict_for_audit(updated))
@@ -1039,7 +1250,7 @@ async def confirm_reservation_payment(
     
     Nur für Reservierungen mit status='pending_payment'.
     """
-    reservation = await db.reservations.find_one({"id": reservation_id, "archived": False})
+    reservation = await db.reservations.find_one({"id": reservation_id, "archived": False}, {"_id": 0})
     if not reservation:
         raise NotFoundException("Reservierung")
     
@@ -1065,6 +1276,7 @@ async def confirm_reservation_payment(
     await db.reservations.update_one({"id": reservation_id}, {"$set": update_data})
     
     updated = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    await on_reservation_changed(reservation, updated)
     await create_audit_log(user, "reservation", reservation_id, "confirm_payment", before, safe_dict_for_audit(updated))
     
     return {
@@ -1092,21 +1304,21 @@ async def expire_unpaid_reservations(user: dict = Depends(require_admin)):
         "archived": False
     }
     
-    reservations = await db.reservations.find(query).to_list(500)
+    reservations = await db.reservations.find(query, {"_id": 0}).to_list(500)
     
     expired_count = 0
     expired_ids = []
     
     for res in reservations:
-        await db.reservations.update_one(
-            {"id": res["id"]},
-            {"$set": {
-                "status": "expired",
-                "payment_status": "expired",
-                "expired_at": now_iso(),
-                "updated_at": now_iso()
-            }}
-        )
+        update_data = {
+            "status": "expired",
+            "payment_status": "expired",
+            "expired_at": now_iso(),
+            "updated_at": now_iso()
+        }
+        await db.reservations.update_one({"id": res["id"]}, {"$set": update_data})
+        # Gibt die Plätze im Kapazitäts-Ledger / in den Zählern frei
+        await on_reservation_changed(res, {**res, **update_data})
         expired_count += 1
         expired_ids.append(res["id"])
     
@@ -1167,6 +1379,19 @@ async def list_pending_payment_reservations(user: dict = Depends(require_manager
     }
 
 
+@events_router.post("/counters/reconcile")
+async def reconcile_counters_endpoint(
+    event_id: Optional[str] = Query(None),
+    user: dict = Depends(require_admin)
+):
+    """Buchungszähler aus event_bookings neu abgleichen (alle Events oder eines)"""
+    result = await reconcile_event_counters([event_id] if event_id else None)
+    await create_audit_log(user, "event", event_id or "all", "reconcile_counters", None, {
+        "checked": result["checked"], "initialized": result["initialized"], "repaired": result["repaired"]
+    })
+    return result
+
+
 @events_router.post("/seed-default-prices")
 async def seed_default_event_prices(user: dict = Depends(require_admin)):
     """
@@ -1383,16 +1608,14 @@ async def update_event_booking(
     update_data = {k: v for k, v in data.model_dump().items() if v is not None}
     update_data["updated_at"] = now_iso()
     
-    await db.event_bookings.update_one({"id": booking_id}, {"$set": update_data})
+    await update_event_booking_counted(booking_id, update_data)
     
     # Check if event should be marked as sold_out
     if data.status == EventBookingStatus.CANCELLED:
-        event = await db.events.find_one({"id": event_id})
-        if event and event.get("status") == "sold_out":
-            # Check if capacity is available again (use strict count for capacity check)
-            booked = await get_event_booked_count(event_id, include_pending=False)
-            if booked < event.get("capacity_total", 0):
-                await db.events.update_one({"id": event_id}, {"$set": {"status": "published", "updated_at": now_iso()}})
+        # Check if capacity is available again (use strict count for capacity check)
+        await reopen_event_if_available(event_id)
+    else:
+        await update_event_status_if_needed(event_id)
     
     updated = await db.event_bookings.find_one({"id": booking_id}, {"_id": 0})
     await create_audit_log(user, "event_booking", booking_id, "update", before, safe_dict_for_audit(updated))
@@ -1410,7 +1633,7 @@ async def list_public_events():
     result = []
     for event in events:
         # For public display: show actual available capacity (only confirmed/paid bookings count)
-        booked = await get_event_booked_count(event["id"], include_pending=False)
+        booked = booked_total(await event_booked_counts(event))
         available = event.get("capacity_total", 0) - booked
         
         result.append({
@@ -1442,7 +1665,7 @@ async def get_public_event(event_id: str):
         raise NotFoundException("Event nicht gefunden oder nicht verfügbar")
     
     # For public display: show actual available capacity (only confirmed/paid bookings count)
-    booked = await get_event_booked_count(event_id, include_pending=False)
+    booked = booked_total(await event_booked_counts(event))
     available = event.get("capacity_total", 0) - booked
     
     result = {
@@ -1483,10 +1706,6 @@ async def create_public_event_booking(event_id: str, data: EventBookingCreate):
     if not event:
         raise NotFoundException("Event nicht gefunden oder nicht verfügbar")
     
-    # Check capacity
-    if not await check_event_capacity(event_id, data.party_size):
-        raise ConflictException("Keine ausreichende Kapazität verfügbar")
-    
     # Validate preorder items if required
     if data.items:
         await validate_preorder_items(event, data.items, data.party_size)
@@ -1526,7 +1745,16 @@ async def create_public_event_booking(event_id: str, data: EventBookingCreate):
     }
     
     booking = create_entity(booking_data)
-    await db.event_bookings.insert_one(booking)
+    
+    # Check capacity: Plätze atomar belegen (bedingtes $inc auf dem Event)
+    counter = booking_counter_field(booking)
+    if not await claim_event_capacity(event_id, data.party_size, counter):
+        raise ConflictException("Keine ausreichende Kapazität verfügbar")
+    try:
+        await db.event_bookings.insert_one(booking)
+    except Exception:
+        await release_event_capacity(event_id, data.party_size, counter)
+        raise
     
     # Create booking items
     if data.items:
@@ -2017,7 +2245,7 @@ def map_wordpress_event_to_gastrocore(wp_event: dict) -> dict:
     
     # ============== AKTIONEN-LOGIK (Sprint: Aktionen-Infrastruktur) ==============
     # Bestimme content_category basierend auf event_type UND Titel
-    content_category = determine_content_category(event_type, title=title)
+    content_category = determine_content_category(event_type, [c.get("name") or "" for c in categories], title)
     
     # Für Aktionen: Zusätzliche Felder ermitteln
     action_type = None
@@ -2058,18 +2286,24 @@ def map_wordpress_event_to_gastrocore(wp_event: dict) -> dict:
     }
 
 
-async def fetch_wordpress_events(min_date: date = None) -> List[dict]:
+async def _fetch_wordpress_pages(
+    min_date: date,
+    modified_after: Optional[str] = None,
+    etag: Optional[str] = None
+) -> Tuple[Optional[List[dict]], Optional[str]]:
     """
-    Holt alle Events von WordPress mit Pagination.
-    Filtert auf zukünftige Events (ab min_date).
+    Holt alle Events (alle Status) von WordPress mit Pagination.
+
+    modified_after: nur seitdem geänderte Events (inkrementeller Lauf)
+    etag: ETag der letzten identischen Abfrage - bei 304 auf Seite 1 ist nichts zu tun
+
+    Returns: (events, etag) - events ist None bei 304 Not Modified
     """
     all_events = []
     page = 1
     per_page = 50
-    
-    if min_date is None:
-        min_date = date.today() - timedelta(days=1)  # Ab gestern
-    
+    response_etag = None
+
     async with httpx.AsyncClient(timeout=30.0) as client:
         while True:
             try:
@@ -2078,222 +2312,378 @@ async def fetch_wordpress_events(min_date: date = None) -> List[dict]:
                     "page": page,
                     "start_date": min_date.isoformat(),
                 }
-                
-                response = await client.get(WORDPRESS_EVENTS_API, params=params)
+                if modified_after:
+                    params["modified_after"] = modified_after
+
+                headers = {"If-None-Match": etag} if etag and page == 1 else {}
+                response = await client.get(WORDPRESS_EVENTS_API, params=params, headers=headers)
+                if response.status_code == 304:
+                    return None, etag
                 response.raise_for_status()
-                
+                if page == 1:
+                    response_etag = response.headers.get("etag")
+
                 data = response.json()
                 events = data.get("events", [])
-                
+
                 if not events:
                     break
-                
-                # Nur veröffentlichte Events
-                published = [e for e in events if e.get("status") == "publish"]
-                all_events.extend(published)
-                
+
+                all_events.extend(events)
+
                 # Pagination prüfen
                 total_pages = data.get("total_pages", 1)
                 if page >= total_pages:
                     break
-                
+
                 page += 1
-                
+
             except httpx.HTTPError as e:
                 logger.error(f"WordPress API Fehler: {e}")
                 raise HTTPException(status_code=502, detail=f"WordPress API nicht erreichbar: {str(e)}")
             except Exception as e:
                 logger.error(f"Unerwarteter Fehler beim WordPress-Sync: {e}")
                 raise HTTPException(status_code=500, detail=f"Sync-Fehler: {str(e)}")
-    
-    return all_events
 
+    return all_events, response_etag
 
-@events_router.post("/sync/wordpress", tags=["Events Sync"])
-async def sync_wordpress_events(user: dict = Depends(require_admin)):
+
+async def fetch_wordpress_events(min_date: date = None) -> List[dict]:
     """
-    Synchronisiert Events von WordPress (The Events Calendar / Tribe).
-    
-    - Idempotent: Mehrfach ausführbar ohne Duplikate
-    - READ-ONLY: WordPress ist Single Source of Truth
-    - Archiviert alte Events (löscht nicht)
-    
-    Returns: Report mit created, updated, archived, skipped
+    Holt alle Events von WordPress mit Pagination.
+    Filtert auf zukünftige Events (ab min_date).
+    """
+    if min_date is None:
+        min_date = date.today() - timedelta(days=1)  # Ab gestern
+
+    events, _ = await _fetch_wordpress_pages(min_date)
+    # Nur veröffentlichte Events
+    return [e for e in events if e.get("status") == "publish"]
+
+
+# ============== SYNC-ENGINE ==============
+"""
+Ein Sync-Lauf für Scheduler (server.py), Cron-Skript (scripts/run_wordpress_sync.py)
+und den manuellen Sync-Button:
+
+- Lease in sync_state (statt /tmp-Lockdatei) - mehrere Worker/Prozesse starten keinen Doppellauf
+- Inkrementell: nur seit dem letzten erfolgreichen Lauf geänderte Events (modified_after),
+  regelmäßig ein Voll-Lauf, der auch gelöschte Events erkennt
+- ETag: unveränderte Abfrage wird mit 304 beantwortet
+- Hash der gemappten Felder: unveränderte Events werden nicht neu geschrieben
+- Schreiben per bulk_write, Archivieren per update_many
+"""
+
+WP_SYNC_NAME = "wordpress_events"
+WP_SYNC_INTERVAL_SECONDS = int(os.getenv("WP_SYNC_INTERVAL_SECONDS", "3600"))
+WP_SYNC_LEASE_SECONDS = int(os.getenv("WP_SYNC_LEASE_SECONDS", "900"))
+WP_SYNC_FULL_EVERY_HOURS = int(os.getenv("WP_SYNC_FULL_EVERY_HOURS", "24"))
+WP_SYNC_MODIFIED_OVERLAP_MINUTES = 10
+WP_SYNC_ARCHIVE_AFTER_DAYS = 2
+
+# Gemappte Felder, die der Sync auf das Event schreibt (Basis des Inhalts-Hashes)
+WP_SYNC_FIELDS = (
+    "title", "description", "short_description", "image_url",
+    "start_datetime", "end_datetime", "entry_price", "website_url", "slug",
+    "event_type", "content_category", "wp_categories",
+    "action_type", "menu_only", "restriction_notice", "guest_notice",
+)
+
+register_indexes(
+    "sync_state",
+    index(("name", 1), unique=True),
+)
+register_indexes(
+    "events",
+    index(("external_source", 1), ("external_id", 1)),
+)
+
+
+def wordpress_event_hash(mapped: dict) -> str:
+    """Inhalts-Hash eines gemappten Events (Reihenfolge-unabhängig)"""
+    payload = {field: mapped.get(field) for field in WP_SYNC_FIELDS}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def acquire_sync_lease(name: str, owner: str, force: bool = False) -> Optional[dict]:
+    """
+    Lease für einen Sync-Lauf nehmen (atomar, über Prozesse hinweg).
+    Ein abgelaufener Lease (Absturz) wird übernommen, force übernimmt auch einen aktiven.
+
+    Returns: Sync-State-Dokument oder None, wenn ein anderer Lauf aktiv ist
+    """
+    now = datetime.now(timezone.utc)
+    now_str = now.isoformat()
+    query: Dict[str, Any] = {"name": name}
+    if not force:
+        query["$or"] = [{"lease_until": None}, {"lease_until": {"$lt": now_str}}]
+    try:
+        return await db.sync_state.find_one_and_update(
+            query,
+            {"$set": {
+                "lease_owner": owner,
+                "lease_until": (now + timedelta(seconds=WP_SYNC_LEASE_SECONDS)).isoformat(),
+                "lease_acquired_at": now_str,
+            }},
+            upsert=True,
+            projection={"_id": 0},
+            return_document=True
+        )
+    except DuplicateKeyError:
+        # Dokument existiert, Lease gehört einem anderen Lauf
+        return None
+
+
+async def release_sync_lease(name: str, owner: str, state: Optional[dict] = None):
+    """Lease freigeben und (optional) den Sync-State fortschreiben"""
+    await db.sync_state.update_one(
+        {"name": name, "lease_owner": owner},
+        {"$set": {**(state or {}), "lease_until": None, "lease_owner": None}}
+    )
+
+
+def _new_synced_event(mapped: dict, sync_hash: str, now: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "external_source": mapped["external_source"],
+        "external_id": mapped["external_id"],
+        **{field: mapped.get(field) for field in WP_SYNC_FIELDS},
+        "wp_sync_hash": sync_hash,
+        # GastroCore Standard-Felder
+        "status": "published",
+        "capacity_total": 100,  # Default, manuell anpassbar
+        "booking_mode": "ticket_only",
+        "pricing_mode": "free_config",
+        "requires_payment": False,
+        "is_public": True,
+        "archived": False,
+        "created_at": now,
+        "updated_at": now,
+        "last_sync_at": now,
+    }
+
+
+async def apply_wordpress_events(wp_events: List[dict], full: bool, report: Dict[str, Any]):
+    """
+    Events in die DB übernehmen: ein Query für die Bestandsdaten,
+    ein bulk_write für Neuanlagen/Änderungen, ein update_many fürs Archivieren.
+
+    - fields_locked: nur last_sync_at, keine Inhalte
+    - category_locked: content_category bleibt unangetastet
+    - event_pricing / payment_policy werden nie geschrieben
+    """
+    now = now_iso()
+    mapped_by_id: Dict[str, dict] = {}
+    seen_ids = set()
+    withdrawn_ids = set()
+
+    for wp_event in wp_events:
+        external_id = str(wp_event.get("id", ""))
+        seen_ids.add(external_id)
+        if wp_event.get("status", "publish") != "publish":
+            # Entwurf/Papierkorb/privat in WordPress: nicht mehr öffentlich
+            withdrawn_ids.add(external_id)
+            continue
+        try:
+            mapped_by_id[external_id] = map_wordpress_event_to_gastrocore(wp_event)
+        except Exception as e:
+            report["errors"].append(f"Event {external_id}: {str(e)}")
+            report["skipped"] += 1
+    report["fetched"] = len(mapped_by_id) + report["skipped"]
+
+    existing_by_id: Dict[str, dict] = {}
+    if mapped_by_id:
+        cursor = db.events.find(
+            {
+                "external_source": SYNC_SOURCE,
+                "external_id": {"$in": list(mapped_by_id)},
+                "archived": {"$ne": True}
+            },
+            {
+                "_id": 0, "id": 1, "external_id": 1, "fields_locked": 1, "category_locked": 1,
+                "wp_sync_hash": 1, "title": 1, "short_description": 1, "description": 1,
+                "start_datetime": 1, "end_datetime": 1, "image_url": 1, "entry_price": 1,
+            }
+        )
+        async for doc in cursor:
+            existing_by_id[doc["external_id"]] = doc
+
+    ops = []
+    kinds = []
+    unchanged_ids = []
+    for external_id, mapped in mapped_by_id.items():
+        sync_hash = wordpress_event_hash(mapped)
+        existing = existing_by_id.get(external_id)
+
+        if not existing:
+            ops.append(InsertOne(_new_synced_event(mapped, sync_hash, now)))
+            kinds.append(("created", external_id))
+            continue
+
+        # Gelockt oder unverändert: nur last_sync_at (gesammelt)
+        if existing.get("fields_locked") or existing.get("wp_sync_hash") == sync_hash:
+            unchanged_ids.append(existing["id"])
+            continue
+
+        if not existing.get("wp_sync_hash") and not has_real_changes(existing, mapped):
+            # Bestand vor Einführung des Hashes: Hash nachtragen, ohne updated_at zu ändern
+            ops.append(UpdateOne(
+                {"id": existing["id"]},
+                {"$set": {"wp_sync_hash": sync_hash, "last_sync_at": now}}
+            ))
+            kinds.append(("unchanged", external_id))
+            continue
+
+        update_fields = {field: mapped.get(field) for field in WP_SYNC_FIELDS}
+        if existing.get("category_locked"):
+            update_fields.pop("content_category")
+        update_fields.update({"wp_sync_hash": sync_hash, "updated_at": now, "last_sync_at": now})
+        ops.append(UpdateOne({"id": existing["id"]}, {"$set": update_fields}))
+        kinds.append(("updated", external_id))
+
+    counts = {"created": 0, "updated": 0, "unchanged": len(unchanged_ids)}
+    for kind, _ in kinds:
+        counts[kind] += 1
+    if unchanged_ids:
+        ops.append(UpdateMany({"id": {"$in": unchanged_ids}}, {"$set": {"last_sync_at": now}}))
+        kinds.append(("unchanged", None))
+
+    if ops:
+        try:
+            await db.events.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                kind, external_id = kinds[write_error["index"]]
+                # None = Sammel-Update der unveränderten Events (nur last_sync_at, nicht gezählt)
+                if external_id is None:
+                    continue
+                counts[kind] -= 1
+                report["errors"].append(f"Event {external_id}: {write_error.get('errmsg')}")
+                report["skipped"] += 1
+
+    for kind, value in counts.items():
+        report[kind] += value
+
+    report["archived"] = await archive_wordpress_events(
+        withdrawn_ids=withdrawn_ids,
+        # Nur ein Voll-Lauf sieht alle Events - fehlende sind in WordPress gelöscht.
+        # Leere Antwort nicht als "alles gelöscht" werten.
+        keep_ids=seen_ids if full and seen_ids else None
+    )
+
+
+async def archive_wordpress_events(withdrawn_ids=None, keep_ids=None) -> int:
+    """
+    Ein update_many: abgelaufene Events (> 2 Tage), in WordPress zurückgezogene
+    und - bei Voll-Läufen - nicht mehr gelieferte Events archivieren.
+    """
+    cutoff_date = (datetime.now(timezone.utc) - timedelta(days=WP_SYNC_ARCHIVE_AFTER_DAYS)).isoformat()
+    conditions: List[Dict[str, Any]] = [{"end_datetime": {"$lt": cutoff_date}}]
+    if withdrawn_ids:
+        conditions.append({"external_id": {"$in": list(withdrawn_ids)}})
+    if keep_ids is not None:
+        conditions.append({"external_id": {"$nin": list(keep_ids)}})
+
+    result = await db.events.update_many(
+        {"external_source": SYNC_SOURCE, "archived": {"$ne": True}, "$or": conditions},
+        {"$set": {"archived": True, "status": "archived", "updated_at": now_iso()}}
+    )
+    return result.modified_count
+
+
+def _sync_due_full(state: dict) -> bool:
+    last_full = state.get("last_full_at")
+    if not last_full or not state.get("last_success_started_at"):
+        return True
+    try:
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(last_full)
+    except ValueError:
+        return True
+    return age >= timedelta(hours=WP_SYNC_FULL_EVERY_HOURS)
+
+
+async def run_wordpress_sync(
+    trigger: str = "scheduler",
+    actor: Optional[dict] = None,
+    force_full: bool = False,
+    force_lease: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Ein WordPress-Sync-Lauf (idempotent, READ-ONLY gegenüber WordPress).
+
+    Returns: Report mit fetched, created, updated, unchanged, archived, skipped -
+             None, wenn bereits ein anderer Lauf den Lease hält
     """
     import time
+    owner = f"{trigger}:{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    state = await acquire_sync_lease(WP_SYNC_NAME, owner, force=force_lease)
+    if state is None:
+        logger.info(f"[WP-SYNC] Übersprungen ({trigger}): anderer Lauf aktiv")
+        return None
+
     start_time = time.time()
-    
+    started_at = now_iso()
+    full = force_full or _sync_due_full(state)
     report = {
+        "mode": "full" if full else "incremental",
+        "not_modified": False,
         "fetched": 0,
         "created": 0,
         "updated": 0,
-        "unchanged": 0,  # NEU: Events ohne echte Änderungen
+        "unchanged": 0,  # Events ohne echte Änderungen
         "archived": 0,
         "skipped": 0,
         "errors": [],
     }
-    
+    state_update: Dict[str, Any] = {"last_run_at": started_at}
+    actor_name = (actor or {}).get("email") or trigger
+
     try:
-        # 1. Events von WordPress holen
-        wp_events = await fetch_wordpress_events()
-        report["fetched"] = len(wp_events)
-        
-        # Track welche external_ids wir gesehen haben
-        seen_external_ids = set()
-        
-        # 2. Für jedes Event: Create oder Update
-        for wp_event in wp_events:
-            try:
-                mapped = map_wordpress_event_to_gastrocore(wp_event)
-                external_id = mapped["external_id"]
-                seen_external_ids.add(external_id)
-                
-                # Prüfe ob Event bereits existiert
-                existing = await db.events.find_one({
-                    "external_source": SYNC_SOURCE,
-                    "external_id": external_id,
-                    "archived": {"$ne": True}
-                })
-                
-                if existing:
-                    # PRÜFE FIELDS_LOCKED - Wenn gelockt, keine Änderungen durch Sync!
-                    if existing.get("fields_locked"):
-                        # Nur last_sync_at aktualisieren, keine anderen Felder
-                        await db.events.update_one(
-                            {"id": existing["id"]},
-                            {"$set": {"last_sync_at": now_iso()}}
-                        )
-                        report["unchanged"] += 1
-                        continue
-                    
-                    # Prüfe ob sich wirklich etwas geändert hat
-                    if has_real_changes(existing, mapped):
-                        # ECHTES UPDATE - Nur gemappte Felder aktualisieren
-                        # ABER: event_pricing und payment_policy NIEMALS überschreiben!
-                        update_fields = {
-                            "title": mapped["title"],
-                            "description": mapped["description"],
-                            "short_description": mapped["short_description"],
-                            "image_url": mapped["image_url"],
-                            "start_datetime": mapped["start_datetime"],
-                            "end_datetime": mapped["end_datetime"],
-                            "entry_price": mapped["entry_price"],
-                            "website_url": mapped["website_url"],
-                            "slug": mapped["slug"],
-                            "event_type": mapped["event_type"],
-                            "wp_categories": mapped["wp_categories"],
-                            "updated_at": now_iso(),
-                            "last_sync_at": now_iso(),
-                        }
-                        
-                        # content_category nur setzen wenn nicht manuell überschrieben
-                        if not existing.get("category_locked"):
-                            # Neu bestimmen basierend auf aktualisierten Daten
-                            new_category = determine_content_category(
-                                mapped["event_type"],
-                                mapped["wp_categories"],
-                                mapped["title"]
-                            )
-                            update_fields["content_category"] = new_category
-                        
-                        await db.events.update_one(
-                            {"id": existing["id"]},
-                            {"$set": update_fields}
-                        )
-                        report["updated"] += 1
-                    else:
-                        # Keine echten Änderungen - nur last_sync_at aktualisieren
-                        await db.events.update_one(
-                            {"id": existing["id"]},
-                            {"$set": {"last_sync_at": now_iso()}}
-                        )
-                        report["unchanged"] += 1
-                    
-                else:
-                    # CREATE - Neues Event
-                    new_event = {
-                        "id": str(uuid.uuid4()),
-                        "external_source": mapped["external_source"],
-                        "external_id": mapped["external_id"],
-                        "title": mapped["title"],
-                        "description": mapped["description"],
-                        "short_description": mapped["short_description"],
-                        "image_url": mapped["image_url"],
-                        "start_datetime": mapped["start_datetime"],
-                        "end_datetime": mapped["end_datetime"],
-                        "entry_price": mapped["entry_price"],
-                        "website_url": mapped["website_url"],
-                        "slug": mapped["slug"],
-                        "event_type": mapped["event_type"],
-                        "content_category": "VERANSTALTUNG",
-                        "wp_categories": mapped["wp_categories"],
-                        # GastroCore Standard-Felder
-                        "status": "published",
-                        "capacity_total": 100,  # Default, manuell anpassbar
-                        "booking_mode": "ticket_only",
-                        "pricing_mode": "free_config",
-                        "requires_payment": False,
-                        "is_public": True,
-                        "archived": False,
-                        "created_at": now_iso(),
-                        "updated_at": now_iso(),
-                        "last_sync_at": now_iso(),
-                    }
-                    
-                    await db.events.insert_one(new_event)
-                    report["created"] += 1
-                    
-            except Exception as e:
-                report["errors"].append(f"Event {wp_event.get('id')}: {str(e)}")
-                report["skipped"] += 1
-        
-        # 3. Archivieren: Events die nicht mehr in WordPress sind
-        # oder deren end_datetime > 2 Tage vergangen
-        cutoff_date = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
-        
-        # Finde alle WordPress-Events in DB
-        all_wp_events_in_db = await db.events.find({
-            "external_source": SYNC_SOURCE,
-            "archived": {"$ne": True}
-        }).to_list(1000)
-        
-        for db_event in all_wp_events_in_db:
-            ext_id = db_event.get("external_id")
-            end_dt = db_event.get("end_datetime")
-            
-            should_archive = False
-            
-            # Nicht mehr in WordPress vorhanden
-            if ext_id not in seen_external_ids:
-                should_archive = True
-            
-            # Oder Event ist abgelaufen (> 2 Tage)
-            if end_dt and end_dt < cutoff_date:
-                should_archive = True
-            
-            if should_archive:
-                await db.events.update_one(
-                    {"id": db_event["id"]},
-                    {"$set": {"archived": True, "status": "archived", "updated_at": now_iso()}}
-                )
-                report["archived"] += 1
-        
-        # 4. Import-Log schreiben
+        min_date = date.today() - timedelta(days=1)  # Ab gestern
+        modified_after = None
+        if not full:
+            since = datetime.fromisoformat(state["last_success_started_at"])
+            since -= timedelta(minutes=WP_SYNC_MODIFIED_OVERLAP_MINUTES)
+            modified_after = since.strftime("%Y-%m-%d %H:%M:%S")
+
+        # ETag gilt nur für exakt dieselbe Abfrage
+        signature = f"{min_date.isoformat()}|{modified_after or ''}"
+        etag = state.get("etag") if state.get("etag_signature") == signature else None
+        wp_events, new_etag = await _fetch_wordpress_pages(min_date, modified_after, etag)
+
+        if wp_events is None:
+            report["not_modified"] = True
+            report["archived"] = await archive_wordpress_events()
+        else:
+            await apply_wordpress_events(wp_events, full, report)
+
+        state_update.update({
+            "etag": new_etag,
+            "etag_signature": signature,
+            "last_success_started_at": started_at,
+        })
+        if full:
+            state_update["last_full_at"] = started_at
+
         duration_ms = int((time.time() - start_time) * 1000)
         report["duration_ms"] = duration_ms
-        
+
         # Bestimme Ergebnis-Status
         if len(report["errors"]) > 0:
             result_status = "partial" if report["created"] > 0 or report["updated"] > 0 else "error"
         else:
             result_status = "success"
-        
-        import_log = {
+
+        await db.import_logs.insert_one({
             "id": str(uuid.uuid4()),
             "type": "wordpress_events_sync",
             "timestamp": now_iso(),
-            "user": user.get("email", "unknown"),
+            "user": actor_name,
+            "trigger": trigger,
             "source": WORDPRESS_EVENTS_API,
+            "mode": report["mode"],
+            "not_modified": report["not_modified"],
             "fetched": report["fetched"],
             "created": report["created"],
             "updated": report["updated"],
@@ -2304,46 +2694,94 @@ async def sync_wordpress_events(user: dict = Depends(require_admin)):
             "duration_ms": duration_ms,
             "success": result_status == "success",
             "result": result_status,
-        }
-        
-        await db.import_logs.insert_one(import_log)
-        
-        # Audit Log
-        await create_audit_log(
-            actor=user,
-            action="sync",
-            entity="events",
-            entity_id="wordpress",
-            after={"report": report}
+        })
+
+        logger.info(
+            f"[WP-SYNC] Abgeschlossen ({trigger}, {report['mode']}): {report['created']} neu, "
+            f"{report['updated']} geändert, {report['unchanged']} unverändert, "
+            f"{report['archived']} archiviert ({duration_ms}ms)"
         )
-        
-        logger.info(f"WordPress Sync abgeschlossen: {report}")
-        
-        return {
-            "success": True,
-            "message": f"Sync abgeschlossen: {report['created']} neu, {report['updated']} geändert, {report['unchanged']} unverändert, {report['archived']} archiviert",
-            "report": report
-        }
-        
-    except HTTPException:
-        raise
+        return report
+
     except Exception as e:
-        logger.error(f"WordPress Sync Fehler: {e}")
-        
-        # Fehler-Log schreiben
-        error_log = {
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"[WP-SYNC] Fehler ({trigger}): {error}")
+        await db.import_logs.insert_one({
             "id": str(uuid.uuid4()),
             "type": "wordpress_events_sync",
             "timestamp": now_iso(),
-            "user": user.get("email", "unknown"),
+            "user": actor_name,
+            "trigger": trigger,
             "source": WORDPRESS_EVENTS_API,
+            "mode": report["mode"],
             "success": False,
-            "error": str(e),
-        }
-        await db.import_logs.insert_one(error_log)
-        
+            "result": "error",
+            "error": error,
+        })
+        raise
+
+    finally:
+        await release_sync_lease(WP_SYNC_NAME, owner, state_update)
+
+
+async def wordpress_sync_scheduler(initial_delay: int = 120):
+    """
+    Hintergrund-Scheduler für den WordPress Event Sync (Startup in server.py).
+    Läuft in jedem Worker - der Lease sorgt für genau einen Lauf pro Intervall.
+    """
+    logger.info(f"[WP-SYNC] Scheduler gestartet (Intervall: {WP_SYNC_INTERVAL_SECONDS}s)")
+
+    # Initiale Verzögerung damit alle Services hochgefahren sind
+    await asyncio.sleep(initial_delay)
+
+    while True:
+        try:
+            await run_wordpress_sync(trigger="scheduler")
+        except Exception:
+            pass  # bereits geloggt + in import_logs
+        await asyncio.sleep(WP_SYNC_INTERVAL_SECONDS)
+
+
+@events_router.post("/sync/wordpress", tags=["Events Sync"])
+async def sync_wordpress_events(
+    full: bool = Query(default=False, description="Voll-Lauf erzwingen (erkennt gelöschte Events)"),
+    user: dict = Depends(require_admin)
+):
+    """
+    Synchronisiert Events von WordPress (The Events Calendar / Tribe).
+
+    - Idempotent: Mehrfach ausführbar ohne Duplikate
+    - READ-ONLY: WordPress ist Single Source of Truth
+    - Inkrementell (modified_after), regelmäßig bzw. mit full=true als Voll-Lauf
+    - Archiviert alte Events (löscht nicht)
+
+    Returns: Report mit created, updated, archived, skipped
+    """
+    try:
+        report = await run_wordpress_sync(trigger="manual", actor=user, force_full=full)
+    except HTTPException:
+        raise
+    except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sync fehlgeschlagen: {str(e)}")
 
+    if report is None:
+        raise ConflictException("WordPress-Sync läuft bereits")
+
+    # Audit Log
+    await create_audit_log(
+        actor=user,
+        action="sync",
+        entity="events",
+        entity_id="wordpress",
+        after={"report": report}
+    )
+
+    return {
+        "success": True,
+        "message": f"Sync abgeschlossen: {report['created']} neu, {report['updated']} geändert, {report['unchanged']} unverändert, {report['archived']} archiviert",
+        "report": report
+    }
+
 
 @events_router.get("/sync/wordpress/status", tags=["Events Sync"])
 async def get_wordpress_sync_status(user: dict = Depends(require_manager)):
@@ -2376,6 +2814,10 @@ async def get_wordpress_sync_status(user: dict = Depends(require_manager)):
     # Bestimme Result-Status
     result = last_sync.get("result", "success" if last_sync.get("success") else "error")
     
+    # Lease / inkrementeller Stand
+    state = await db.sync_state.find_one({"name": WP_SYNC_NAME}, {"_id": 0}) or {}
+    running = bool(state.get("lease_until")) and state["lease_until"] > now_iso()
+    
     return {
         "last_run_at": last_sync.get("timestamp"),
         "last_duration_ms": last_sync.get("duration_ms"),
@@ -2390,6 +2832,9 @@ async def get_wordpress_sync_status(user: dict = Depends(require_manager)):
             "skipped": last_sync.get("skipped", 0),
         },
         "current_wordpress_events": wp_events_count,
+        "last_mode": last_sync.get("mode"),
+        "last_full_at": state.get("last_full_at"),
+        "running": running,
     }
 
 
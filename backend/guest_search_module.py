@@ -0,0 +1,444 @@
+"""
+GastroCore Guest Search Index
+Schnelle Gäste-Suche (Autocomplete) über eine vorberechnete Such-Collection
+
+ARCHITEKTUR:
+- guest_search_index: 1 Dokument pro Gast-Identität (normalisierte Telefonnummer,
+  sonst E-Mail, sonst Quell-ID)
+- Quellen mit Priorität: guests > guest_contacts (Legacy) > reservations
+- prefixes: Präfixe von Namens-Tokens, Telefonziffern und E-Mail (Multikey-Index)
+- visit_count / last_visit: vorberechnet, gepflegt bei Statuswechseln der Reservierungen
+
+Autocomplete = 1 Query auf (prefixes, visit_count) - sortiert nach Besuchszähler.
+"""
+
+from fastapi import APIRouter, Depends
+from typing import Optional, List, Dict, Any
+from datetime import datetime, timezone
+import unicodedata
+import asyncio
+import logging
+import re
+
+from pymongo import UpdateOne
+
+from core.database import db
+from core.auth import require_admin, require_manager
+from core.audit import create_audit_log
+from core.indexes import register_indexes, index
+
+logger = logging.getLogger(__name__)
+
+
+# ============== ROUTER ==============
+guest_search_router = APIRouter(prefix="/api/guests/search-index", tags=["Guests"])
+
+
+# ============== CONSTANTS ==============
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 20
+VISIT_STATUSES = ("angekommen", "abgeschlossen")
+SOURCE_PRIORITY = {"guests": 3, "guest_contacts": 2, "reservations": 1}
+BULK_BATCH_SIZE = 1000
+
+
+# ============== INDEXES ==============
+register_indexes(
+    "guest_search_index",
+    index(("key", 1), unique=True),
+    index(("prefixes", 1), ("archived", 1), ("visit_count", -1)),
+)
+
+
+# ============== NORMALIZATION ==============
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Kleinschreibung, Umlaute/Akzente entfernen (Müller → mueller, José → jose)"""
+    if not value:
+        return ""
+    value = value.lower()
+    value = value.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss")
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in value if not unicodedata.combining(c))
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Nur Ziffern, deutsche Vorwahl vereinheitlicht (0170… / +49170… / 0049170… → 49170…)"""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = "49" + digits[1:]
+    return digits
+
+
+def _phone_variants(phone: Optional[str]) -> List[str]:
+    """Schreibweisen, unter denen eine Nummer gesucht wird (49170…, 0170…, 170…)"""
+    canonical = normalize_phone(phone)
+    if not canonical:
+        return []
+    variants = [canonical]
+    if canonical.startswith("49"):
+        variants.append("0" + canonical[2:])
+        variants.append(canonical[2:])
+    return variants
+
+
+def _prefixes(token: str) -> List[str]:
+    upper = min(len(token), MAX_PREFIX_LENGTH)
+    return [token[:i] for i in range(MIN_PREFIX_LENGTH, upper + 1)]
+
+
+def build_prefixes(name: Optional[str], phone: Optional[str], email: Optional[str]) -> List[str]:
+    """Alle Such-Präfixe für einen Eintrag"""
+    tokens = set()
+    for part in re.split(r"[^a-z0-9]+", normalize_text(name)):
+        if part:
+            tokens.add(part)
+    for variant in _phone_variants(phone):
+        tokens.add(variant)
+    if email:
+        email_norm = normalize_text(email.strip())
+        tokens.add(email_norm)
+        for part in re.split(r"[^a-z0-9]+", email_norm.split("@")[0]):
+            if part:
+                tokens.add(part)
+
+    prefixes = set()
+    for token in tokens:
+        prefixes.update(_prefixes(token))
+    return sorted(prefixes)
+
+
+def query_tokens(q: str) -> List[str]:
+    """Suchbegriff in Index-Tokens zerlegen (Telefonnummern als Ziffernfolge)"""
+    stripped = q.strip()
+    digits = re.sub(r"\D", "", stripped)
+    # Reine Telefonnummer (evtl. mit +, Leerzeichen, Bindestrichen)
+    if digits and re.fullmatch(r"[\d\s+\-/()]+", stripped):
+        if digits.startswith("00"):
+            digits = digits[2:]
+        return [digits[:MAX_PREFIX_LENGTH]] if len(digits) >= MIN_PREFIX_LENGTH else []
+
+    normalized = normalize_text(stripped)
+    if "@" in normalized:
+        return [normalized[:MAX_PREFIX_LENGTH]]
+    return [
+        t[:MAX_PREFIX_LENGTH]
+        for t in re.split(r"[^a-z0-9]+", normalized)
+        if len(t) >= MIN_PREFIX_LENGTH
+    ]
+
+
+def identity_key(phone: Optional[str], email: Optional[str], fallback: str) -> str:
+    """Gast-Identität: Telefonnummer vor E-Mail vor Quell-ID"""
+    canonical = normalize_phone(phone)
+    if canonical:
+        return f"phone:{canonical}"
+    if email:
+        return f"email:{email.strip().lower()}"
+    return fallback
+
+
+def contact_display_name(contact: dict) -> str:
+    """Namen formatieren: "V. Nachname" (Legacy-Kontakte)"""
+    fn = contact.get("first_name", "")
+    ln = contact.get("last_name", "")
+    if fn and ln:
+        return f"{fn[0]}. {ln}"
+    elif ln:
+        return ln
+    elif fn:
+        return fn
+    return "Unbekannt"
+
+
+# ============== ENTRY BUILDERS ==============
+
+def entry_from_guest(guest: dict) -> dict:
+    return {
+        "key": identity_key(guest.get("phone"), guest.get("email"), f"guest:{guest.get('id')}"),
+        "source": "guests",
+        "ref_id": guest.get("id"),
+        "name": guest.get("name"),
+        "phone": guest.get("phone"),
+        "email": guest.get("email"),
+        "flag": guest.get("flag"),
+        "notes": guest.get("notes"),
+        "newsletter_subscribed": guest.get("newsletter_subscribed", True),
+        "archived": bool(guest.get("archived", False)),
+    }
+
+
+def entry_from_contact(contact: dict) -> dict:
+    return {
+        "key": identity_key(contact.get("phone"), contact.get("email"), f"contact:{contact.get('id')}"),
+        "source": "guest_contacts",
+        "ref_id": contact.get("id"),
+        "name": contact_display_name(contact),
+        "search_name": f"{contact.get('first_name', '')} {contact.get('last_name', '')}",
+        "phone": contact.get("phone"),
+        "email": contact.get("email"),
+        "flag": None,
+        "notes": contact.get("notes"),
+        "newsletter_subscribed": False,  # WICHTIG: Legacy-Kontakte haben KEIN Marketing
+        "marketing_consent": contact.get("marketing_consent", False),
+        "legacy_visit_count": contact.get("reservation_count", 0) or 0,
+        "legacy_last_visit": contact.get("last_reservation_date"),
+        "archived": bool(contact.get("archived", False)) or contact.get("contact_type") != "reservation_guest",
+    }
+
+
+def entry_from_reservation(reservation: dict) -> dict:
+    return {
+        "key": identity_key(reservation.get("guest_phone"), reservation.get("guest_email"), f"reservation:{reservation.get('id')}"),
+        "source": "reservations",
+        "ref_id": None,
+        "name": reservation.get("guest_name"),
+        "phone": reservation.get("guest_phone"),
+        "email": reservation.get("guest_email"),
+        "flag": None,
+        "notes": None,
+        "newsletter_subscribed": True,
+        "archived": False,
+    }
+
+
+def _finalize(entry: dict) -> dict:
+    """Präfixe und Ranking-Felder berechnen"""
+    entry["prefixes"] = build_prefixes(entry.get("search_name") or entry.get("name"), entry.get("phone"), entry.get("email"))
+    entry["visit_count"] = entry.get("visits", 0) + entry.get("legacy_visit_count", 0)
+    last_dates = [d for d in (entry.get("last_visit_date"), entry.get("legacy_last_visit")) if d]
+    entry["last_visit"] = max(last_dates) if last_dates else None
+    entry["updated_at"] = now_iso()
+    return entry
+
+
+# ============== SEARCH ==============
+
+async def search_guest_index(q: str, limit: int = 10) -> List[dict]:
+    """
+    Autocomplete: 1 Query über den Präfix-Index, sortiert nach Besuchszähler.
+    Mehrere Suchwörter müssen alle passen (z.B. "max mu").
+    """
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+
+    prefix_filter = tokens[0] if len(tokens) == 1 else {"$all": tokens}
+    entries = await db.guest_search_index.find(
+        {"prefixes": prefix_filter, "archived": False},
+        {"_id": 0, "prefixes": 0}
+    ).sort("visit_count", -1).limit(limit).to_list(limit)
+
+    result = []
+    for e in entries:
+        item = {
+            "id": e.get("ref_id"),
+            "name": e.get("name"),
+            "phone": e.get("phone"),
+            "email": e.get("email"),
+            "flag": e.get("flag"),
+            "notes": e.get("notes"),
+            "newsletter_subscribed": e.get("newsletter_subscribed", True),
+            "visit_count": e.get("visit_count", 0),
+            "last_visit": e.get("last_visit"),
+            "source": e.get("source")
+        }
+        if e.get("source") == "guest_contacts":
+            item["marketing_consent"] = e.get("marketing_consent", False)
+        result.append(item)
+    return result
+
+
+# ============== INCREMENTAL MAINTENANCE ==============
+
+async def upsert_guest_search_entry(entry: dict):
+    """
+    Eintrag einer Quelle übernehmen. Eine Quelle mit höherer Priorität wird nicht
+    von einer niedrigeren überschrieben; Besuchszähler bleiben erhalten.
+    """
+    if not entry.get("key"):
+        return
+    existing = await db.guest_search_index.find_one({"key": entry["key"]}, {"_id": 0, "prefixes": 0})
+    if existing and SOURCE_PRIORITY.get(existing.get("source"), 0) > SOURCE_PRIORITY.get(entry["source"], 0):
+        return
+
+    merged = {**(existing or {}), **entry}
+    if existing:
+        # Besuchsdaten stammen aus Reservierungen, nicht aus der Quelle
+        for field in ("visits", "last_visit_date"):
+            if field in existing:
+                merged[field] = existing[field]
+        if entry["source"] != "guest_contacts":
+            for field in ("legacy_visit_count", "legacy_last_visit"):
+                if field in existing:
+                    merged[field] = existing[field]
+
+    await db.guest_search_index.update_one(
+        {"key": entry["key"]},
+        {"$set": _finalize(merged)},
+        upsert=True
+    )
+
+
+async def index_guest(guest: Optional[dict]):
+    """Nach Anlage/Änderung eines Gasts aufrufen"""
+    if guest:
+        await upsert_guest_search_entry(entry_from_guest(guest))
+
+
+async def record_reservation_visit(before: Optional[dict], after: Optional[dict]):
+    """
+    Besuchszähler pflegen, wenn eine Reservierung in einen Besuchs-Status
+    (angekommen/abgeschlossen) wechselt oder ihn verlässt.
+    Neue Gäste aus Reservierungen werden dabei ebenfalls in den Index aufgenommen.
+    """
+    res = after or before
+    if not res:
+        return
+    was_visit = bool(before) and before.get("status") in VISIT_STATUSES and not before.get("archived")
+    is_visit = bool(after) and after.get("status") in VISIT_STATUSES and not after.get("archived")
+
+    key = identity_key(res.get("guest_phone"), res.get("guest_email"), "")
+    if not key:
+        return
+
+    if before is None and after is not None:
+        # Neue Reservierung: Gast auffindbar machen (ohne höherwertige Quelle zu überschreiben)
+        await db.guest_search_index.update_one(
+            {"key": key},
+            {"$setOnInsert": {k: v for k, v in _finalize(entry_from_reservation(after)).items() if k != "key"}},
+            upsert=True
+        )
+
+    if was_visit == is_visit:
+        return
+
+    update: Dict[str, Any] = {"$inc": {"visits": 1 if is_visit else -1, "visit_count": 1 if is_visit else -1}}
+    if is_visit and res.get("date"):
+        update["$max"] = {"last_visit_date": res["date"], "last_visit": res["date"]}
+    await db.guest_search_index.update_one({"key": key}, update)
+
+
+# ============== FULL REBUILD ==============
+
+async def rebuild_guest_search_index() -> dict:
+    """
+    Kompletter Neuaufbau aus guests, guest_contacts und reservations.
+    Läuft per Cursor, schreibt per bulk_write, entfernt danach veraltete Einträge.
+    """
+    started = now_iso()
+    entries: Dict[str, dict] = {}
+
+    def merge(entry: dict):
+        current = entries.get(entry["key"])
+        if current is None or SOURCE_PRIORITY[entry["source"]] > SOURCE_PRIORITY[current["source"]]:
+            if current:
+                for field in ("visits", "last_visit_date", "legacy_visit_count", "legacy_last_visit"):
+                    if field in current and field not in entry:
+                        entry[field] = current[field]
+            entries[entry["key"]] = entry
+        else:
+            for field in ("legacy_visit_count", "legacy_last_visit"):
+                if field in entry and field not in current:
+                    current[field] = entry[field]
+
+    # 1. Besuche aus Reservierungen (pro Telefonnummer / E-Mail)
+    visits_by_key: Dict[str, dict] = {}
+    cursor = db.reservations.find(
+        {"archived": False},
+        {"_id": 0, "id": 1, "guest_name": 1, "guest_phone": 1, "guest_email": 1, "status": 1, "date": 1}
+    )
+    async for res in cursor:
+        # Wie record_reservation_visit: ohne Telefon/E-Mail (Walk-ins) kein eigener Eintrag
+        if not identity_key(res.get("guest_phone"), res.get("guest_email"), ""):
+            continue
+        entry = entry_from_reservation(res)
+        stats = visits_by_key.setdefault(entry["key"], {"visits": 0, "last_visit_date": None})
+        if res.get("status") in VISIT_STATUSES:
+            stats["visits"] += 1
+            if res.get("date") and (not stats["last_visit_date"] or res["date"] > stats["last_visit_date"]):
+                stats["last_visit_date"] = res["date"]
+        if entry["key"] not in entries and (res.get("guest_name") or res.get("guest_phone")):
+            entries[entry["key"]] = entry
+
+    # 2. Legacy-Kontakte
+    async for contact in db.guest_contacts.find({"archived": False}, {"_id": 0}):
+        merge(entry_from_contact(contact))
+
+    # 3. Gäste (höchste Priorität)
+    async for guest in db.guests.find({"archived": False}, {"_id": 0}):
+        merge(entry_from_guest(guest))
+
+    # Bulk-Upsert
+    written = 0
+    batch = []
+    for key, entry in entries.items():
+        entry.update(visits_by_key.get(key, {"visits": 0, "last_visit_date": None}))
+        batch.append(UpdateOne({"key": key}, {"$set": _finalize(entry)}, upsert=True))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await db.guest_search_index.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await db.guest_search_index.bulk_write(batch, ordered=False)
+        written += len(batch)
+
+    # Veraltete Einträge entfernen (nicht mehr in den Quellen vorhanden)
+    removed = await db.guest_search_index.delete_many({"updated_at": {"$lt": started}})
+
+    return {
+        "entries": written,
+        "removed": removed.deleted_count,
+        "started_at": started,
+        "finished_at": now_iso()
+    }
+
+
+async def ensure_guest_search_index():
+    """Startup: Index im Hintergrund aufbauen, falls noch leer"""
+    try:
+        if await db.guest_search_index.estimated_document_count() > 0:
+            return
+        logger.info("[GUEST-SEARCH] Index leer - starte Neuaufbau im Hintergrund")
+        asyncio.create_task(_rebuild_in_background())
+    except Exception as e:
+        logger.warning(f"[GUEST-SEARCH] Prüfung fehlgeschlagen: {e}")
+
+
+async def _rebuild_in_background():
+    try:
+        result = await rebuild_guest_search_index()
+        logger.info(f"[GUEST-SEARCH] Neuaufbau abgeschlossen: {result['entries']} Einträge")
+    except Exception as e:
+        logger.error(f"[GUEST-SEARCH] Neuaufbau fehlgeschlagen: {e}")
+
+
+# ============== API ENDPOINTS ==============
+
+@guest_search_router.get("/status")
+async def get_guest_search_index_status(user: dict = Depends(require_manager)):
+    """Größe und Stand des Such-Index"""
+    total = await db.guest_search_index.count_documents({})
+    latest = await db.guest_search_index.find_one({}, {"_id": 0, "updated_at": 1}, sort=[("updated_at", -1)])
+    by_source = await db.guest_search_index.aggregate([
+        {"$group": {"_id": "$source", "count": {"$sum": 1}}}
+    ]).to_list(10)
+    return {
+        "total": total,
+        "by_source": {s["_id"]: s["count"] for s in by_source},
+        "last_updated": latest.get("updated_at") if latest else None
+    }
+
+
+@guest_search_router.post("/rebuild")
+async def rebuild_guest_search_index_endpoint(user: dict = Depends(require_admin)):
+    """Such-Index vollständig neu aufbauen (z.B. nach Legacy-Import)"""
+    result = await rebuild_guest_search_index()
+    await create_audit_log(user, "guest_search_index", "all", "rebuild", None, result)
+    return {"success": True, **result}
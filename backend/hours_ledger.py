@@ -0,0 +1,345 @@
+"""
+GastroCore Hours Ledger
+================================================================================
+Vorberechnetes Stundenkonto: ein Dokument pro Mitarbeiter und Tag.
+
+- planned_hours: aus zugewiesenen Schichten (Legacy staff_member_id + V2 assigned_staff_ids,
+  ohne archivierte / CANCELLED)
+- actual_hours: Netto-Arbeitszeit abgeschlossener time_sessions (ohne Pausen)
+
+Pflege: Schicht- und Session-Schreibpfade rufen refresh_* auf - die betroffenen
+(Mitarbeiter, Tag)-Zeilen werden aus den Quelldaten neu berechnet (idempotent).
+Lesen: ein indizierter Range-Query über day_key (hours-overview, Steuerbüro-Exporte).
+Monate, die noch nie aufgebaut wurden, werden beim ersten Lesen einmal komplett
+aufgebaut (Bestandsdaten vor Einführung des Ledgers).
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Set
+import logging
+
+from pymongo import UpdateOne, DeleteMany
+
+from core.database import db
+from core.indexes import register_indexes, index
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+LEDGER_STATE_NAME = "hours_ledger"
+SESSION_CLOSED = "CLOSED"
+SHIFT_CANCELLED = "CANCELLED"
+
+register_indexes(
+    "hours_ledger",
+    index(("staff_member_id", 1), ("day_key", 1), unique=True),
+    index(("day_key", 1), ("staff_member_id", 1)),
+)
+
+LedgerKey = Tuple[str, str]  # (staff_member_id, day_key)
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ============== BERECHNUNG ==============
+
+def shift_day_key(shift: dict) -> Optional[str]:
+    day = shift.get("date_local") or shift.get("shift_date") or shift.get("date")
+    return day[:10] if day else None
+
+
+def shift_staff(shift: dict) -> Set[str]:
+    staff = set(shift.get("assigned_staff_ids") or [])
+    if shift.get("staff_member_id"):
+        staff.add(shift["staff_member_id"])
+    return staff
+
+
+def shift_counts(shift: dict) -> bool:
+    return not shift.get("archived") and shift.get("status") != SHIFT_CANCELLED
+
+
+def planned_shift_hours(shift: dict) -> float:
+    """hours-Feld der Schicht, sonst aus Start/Ende (wie hours-overview)"""
+    if shift.get("hours"):
+        return float(shift["hours"])
+    try:
+        start_h, start_m = map(int, shift.get("start_time", "").split(":"))
+        end_h, end_m = map(int, shift.get("end_time", "").split(":"))
+    except (ValueError, AttributeError):
+        return 0.0
+    minutes = end_h * 60 + end_m - start_h * 60 - start_m
+    if minutes < 0:
+        minutes += 24 * 60  # über Mitternacht
+    return minutes / 60
+
+
+def _parse_utc(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def session_net_seconds(session: dict) -> Tuple[int, int]:
+    """
+    (Netto-Arbeitszeit, Pausenzeit) einer abgeschlossenen Session in Sekunden.
+    Aus den Zeitstempeln berechnet - Admin-Korrekturen ändern nur diese.
+    """
+    try:
+        gross = int((_parse_utc(session["clock_out_at"]) - _parse_utc(session["clock_in_at"])).total_seconds())
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return 0, 0
+    breaks = 0
+    for brk in session.get("breaks") or []:
+        try:
+            breaks += int((_parse_utc(brk["end_at"]) - _parse_utc(brk["start_at"])).total_seconds())
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return max(0, gross - breaks), breaks
+
+
+def _iso_week(day_key: str) -> Tuple[int, int]:
+    iso = date.fromisoformat(day_key).isocalendar()
+    return iso[0], iso[1]
+
+
+def _empty_row(staff_member_id: str, day_key: str) -> Dict[str, Any]:
+    iso_year, iso_week = _iso_week(day_key)
+    return {
+        "staff_member_id": staff_member_id,
+        "day_key": day_key,
+        "iso_year": iso_year,
+        "iso_week": iso_week,
+        "planned_hours": 0.0,
+        "planned_shift_count": 0,
+        "actual_hours": 0.0,
+        "break_hours": 0.0,
+        "session_count": 0,
+    }
+
+
+def _accumulate(rows: Dict[LedgerKey, dict], shifts: Iterable[dict], sessions: Iterable[dict], keys: Optional[Set[LedgerKey]]):
+    for shift in shifts:
+        day_key = shift_day_key(shift)
+        if not day_key or not shift_counts(shift):
+            continue
+        hours = planned_shift_hours(shift)
+        for staff_id in shift_staff(shift):
+            key = (staff_id, day_key)
+            if keys is not None and key not in keys:
+                continue
+            row = rows.setdefault(key, _empty_row(staff_id, day_key))
+            row["planned_hours"] += hours
+            row["planned_shift_count"] += 1
+
+    for session in sessions:
+        key = (session.get("staff_member_id"), session.get("day_key"))
+        if not all(key) or (keys is not None and key not in keys):
+            continue
+        net, breaks = session_net_seconds(session)
+        row = rows.setdefault(key, _empty_row(*key))
+        row["actual_hours"] += net / 3600
+        row["break_hours"] += breaks / 3600
+        row["session_count"] += 1
+
+
+SHIFT_PROJECTION = {
+    "_id": 0, "date_local": 1, "shift_date": 1, "date": 1, "staff_member_id": 1,
+    "assigned_staff_ids": 1, "hours": 1, "start_time": 1, "end_time": 1, "status": 1, "archived": 1,
+}
+SESSION_PROJECTION = {
+    "_id": 0, "staff_member_id": 1, "day_key": 1, "clock_in_at": 1, "clock_out_at": 1, "breaks": 1,
+}
+
+
+async def _write_rows(rows: Dict[LedgerKey, dict], keys: Iterable[LedgerKey]):
+    """Zeilen upserten, leere Zeilen (keine Schicht, keine Session) entfernen"""
+    now = now_iso()
+    ops = []
+    empty: Dict[str, List[str]] = {}
+    for key in keys:
+        row = rows.get(key)
+        if row is None:
+            empty.setdefault(key[0], []).append(key[1])
+            continue
+        row = {
+            **row,
+            "planned_hours": round(row["planned_hours"], 2),
+            "actual_hours": round(row["actual_hours"], 2),
+            "break_hours": round(row["break_hours"], 2),
+            "updated_at": now,
+        }
+        ops.append(UpdateOne(
+            {"staff_member_id": key[0], "day_key": key[1]},
+            {"$set": row},
+            upsert=True
+        ))
+    for staff_id, days in empty.items():
+        ops.append(DeleteMany({"staff_member_id": staff_id, "day_key": {"$in": days}}))
+    if ops:
+        await db.hours_ledger.bulk_write(ops, ordered=False)
+
+
+# ============== PFLEGE ==============
+
+async def refresh_ledger(keys: Iterable[LedgerKey]):
+    """
+    (Mitarbeiter, Tag)-Zeilen aus den Quelldaten neu berechnen.
+    Ein Query für Schichten, einer für Sessions - unabhängig von der Anzahl Keys.
+    """
+    keys = {(staff_id, day_key[:10]) for staff_id, day_key in keys if staff_id and day_key}
+    if not keys:
+        return
+    staff_ids = sorted({k[0] for k in keys})
+    day_keys = sorted({k[1] for k in keys})
+
+    shifts = await db.shifts.find(
+        {
+            "archived": {"$ne": True},
+            "$and": [
+                {"$or": [
+                    {"staff_member_id": {"$in": staff_ids}},
+                    {"assigned_staff_ids": {"$in": staff_ids}},
+                ]},
+                {"$or": [
+                    {"date_local": {"$in": day_keys}},
+                    {"shift_date": {"$in": day_keys}},
+                    {"date": {"$in": day_keys}},
+                ]},
+            ],
+        },
+        SHIFT_PROJECTION
+    ).to_list(None)
+    sessions = await db.time_sessions.find(
+        {"staff_member_id": {"$in": staff_ids}, "day_key": {"$in": day_keys}, "state": SESSION_CLOSED},
+        SESSION_PROJECTION
+    ).to_list(None)
+
+    rows: Dict[LedgerKey, dict] = {}
+    _accumulate(rows, shifts, sessions, keys)
+    await _write_rows(rows, keys)
+
+
+def shift_ledger_keys(*shifts: Optional[dict]) -> Set[LedgerKey]:
+    """Betroffene Zeilen einer Schichtänderung (Zustand vorher und nachher)"""
+    keys = set()
+    for shift in shifts:
+        if not shift:
+            continue
+        day_key = shift_day_key(shift)
+        if day_key:
+            keys.update((staff_id, day_key) for staff_id in shift_staff(shift))
+    return keys
+
+
+async def refresh_ledger_for_shifts(*shifts: Optional[dict]):
+    """Nach Schicht-Schreibzugriffen - Fehler brechen den Schreibpfad nicht ab"""
+    try:
+        await refresh_ledger(shift_ledger_keys(*shifts))
+    except Exception as e:
+        logger.warning(f"Stundenkonto konnte nicht aktualisiert werden: {e}")
+
+
+async def refresh_ledger_for_session(session: Optional[dict]):
+    """Nach Session-Abschluss / Admin-Korrektur"""
+    if not session:
+        return
+    try:
+        await refresh_ledger([(session.get("staff_member_id"), session.get("day_key"))])
+    except Exception as e:
+        logger.warning(f"Stundenkonto konnte nicht aktualisiert werden: {e}")
+
+
+async def rebuild_ledger(start_date: date, end_date: date) -> int:
+    """
+    Zeitraum komplett neu aufbauen (ein Query je Quelle).
+    Returns: Anzahl Zeilen
+    """
+    range_query = {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
+    shifts = await db.shifts.find(
+        {
+            "archived": {"$ne": True},
+            "$or": [{"date_local": range_query}, {"shift_date": range_query}, {"date": range_query}],
+        },
+        SHIFT_PROJECTION
+    ).to_list(None)
+    sessions = await db.time_sessions.find(
+        {"day_key": range_query, "state": SESSION_CLOSED},
+        SESSION_PROJECTION
+    ).to_list(None)
+
+    rows: Dict[LedgerKey, dict] = {}
+    _accumulate(rows, shifts, sessions, None)
+    # Nur Zeilen im Zeitraum (Schichten mit mehreren Datumsfeldern)
+    rows = {k: v for k, v in rows.items() if range_query["$gte"] <= k[1] <= range_query["$lte"]}
+
+    existing = await db.hours_ledger.find(
+        {"day_key": range_query}, {"_id": 0, "staff_member_id": 1, "day_key": 1}
+    ).to_list(None)
+    keys = set(rows) | {(r["staff_member_id"], r["day_key"]) for r in existing}
+    await _write_rows(rows, keys)
+    return len(rows)
+
+
+def _months(start_date: date, end_date: date) -> List[str]:
+    months = []
+    current = start_date.replace(day=1)
+    while current <= end_date:
+        months.append(current.strftime("%Y-%m"))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+async def ensure_ledger(start_date: date, end_date: date):
+    """Noch nie aufgebaute Monate des Zeitraums einmal aufbauen"""
+    state = await db.sync_state.find_one({"name": LEDGER_STATE_NAME}, {"_id": 0}) or {}
+    built = set(state.get("months", []))
+    missing = [m for m in _months(start_date, end_date) if m not in built]
+    if not missing:
+        return
+    for month in missing:
+        first = date.fromisoformat(f"{month}-01")
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        count = await rebuild_ledger(first, last)
+        logger.info(f"[HOURS-LEDGER] {month} aufgebaut ({count} Zeilen)")
+    await db.sync_state.update_one(
+        {"name": LEDGER_STATE_NAME},
+        {"$addToSet": {"months": {"$each": missing}}, "$set": {"updated_at": now_iso()}},
+        upsert=True
+    )
+
+
+# ============== LESEN ==============
+
+async def read_ledger(start_date: date, end_date: date) -> Dict[str, Dict[str, Any]]:
+    """
+    Summen pro Mitarbeiter für den Zeitraum - ein Range-Query auf day_key.
+
+    Returns: {staff_member_id: {"planned_hours", "actual_hours", "break_hours",
+                                "shift_count", "session_count", "days": [...]}}
+    """
+    await ensure_ledger(start_date, end_date)
+    totals: Dict[str, Dict[str, Any]] = {}
+    async for row in db.hours_ledger.find(
+        {"day_key": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}},
+        {"_id": 0}
+    ).sort("day_key", 1):
+        entry = totals.setdefault(row["staff_member_id"], {
+            "planned_hours": 0.0,
+            "actual_hours": 0.0,
+            "break_hours": 0.0,
+            "shift_count": 0,
+            "session_count": 0,
+            "days": [],
+        })
+        entry["planned_hours"] += row.get("planned_hours", 0)
+        entry["actual_hours"] += row.get("actual_hours", 0)
+        entry["break_hours"] += row.get("break_hours", 0)
+        entry["shift_count"] += row.get("planned_shift_count", 0)
+        entry["session_count"] += row.get("session_count", 0)
+        entry["days"].append(row)
+    for entry in totals.values():
+        for field in ("planned_hours", "actual_hours", "break_hours"):
+            entry[field] = round(entry[field], 2)
+    return totals
@@ -13,6 +13,8 @@ import hashlib
 import hmac
 import logging
 import os
+import time
+import asyncio
 
 from core.database import db
 from core.auth import get_current_user, require_roles, require_admin, require_manager
@@ -182,8 +184,19 @@ SOCIAL_CONNECTORS = {
 }
 
 # ============== NEWSLETTER SENDING ==============
-async def get_newsletter_recipients(audience: str, language: str = None) -> List[dict]:
-    """Get recipients based on audience, respecting opt-in"""
+# Versand in Batches über einen Cursor (sortiert nach Kunden-ID):
+# - pro Batch parallel bis NEWSLETTER_CONCURRENCY Empfänger, Logs per insert_many
+# - nach jedem Batch Checkpoint (letzte Kunden-ID + Zähler) am marketing_jobs-Dokument
+# - Retry übernimmt den Checkpoint, fehlgeschlagene Empfänger werden zuerst wiederholt
+# - Outbox-dedupe_key pro Inhalt + Empfänger: ein abgebrochener Batch wird nie doppelt versendet
+NEWSLETTER_BATCH_SIZE = int(os.environ.get("NEWSLETTER_BATCH_SIZE", "200"))
+NEWSLETTER_CONCURRENCY = int(os.environ.get("NEWSLETTER_CONCURRENCY", "10"))
+NEWSLETTER_MAX_TRACKED_FAILURES = 1000
+NEWSLETTER_STALE_MINUTES = 10  # RUNNING-Job ohne Checkpoint seit n Minuten gilt als abgebrochen
+
+
+def newsletter_recipient_query(audience: str, language: str = None) -> dict:
+    """Empfänger-Filter nach Zielgruppe, nur mit Opt-in"""
     query = {"newsletter_optin": True, "archived": {"$ne": True}}
     
     if audience == Audience.LOYALTY_CUSTOMERS:
@@ -193,16 +206,24 @@ async def get_newsletter_recipients(audience: str, language: str = None) -> List
     if language:
         query["$or"] = [{"language": language}, {"language": {"$exists": False}}]
     
+    return query
+
+async def get_newsletter_recipients(audience: str, language: str = None) -> List[dict]:
+    """Get recipients based on audience, respecting opt-in"""
+    query = newsletter_recipient_query(audience, language)
     customers = await db.customers.find(query, {"_id": 0}).to_list(10000)
     return customers
 
-async def send_newsletter_to_recipient(content: dict, recipient: dict, job_id: str) -> bool:
-    """Send newsletter to single recipient"""
-    from email_service import send_email
+async def queue_newsletter_for_recipient(content: dict, recipient: dict, job_id: str) -> tuple:
+    """
+    Newsletter für einen Empfänger in die E-Mail-Outbox legen.
+    Returns (status, log) - status: queued | failed | skipped (keine E-Mail-Adresse)
+    """
+    from email_service import queue_email
     
     email = recipient.get("email")
     if not email:
-        return False
+        return "skipped", None
     
     customer_id = recipient.get("id", "unknown")
     unsubscribe_url = get_unsubscribe_url(customer_id)
@@ -220,23 +241,120 @@ async def send_newsletter_to_recipient(content: dict, recipient: dict, job_id: s
     
     subject = content.get("title", "Newsletter")
     
-    success = await send_email(email, subject, html_body, text_body, "newsletter")
+    # Testversand ohne Dedupe, echter Versand höchstens einmal pro Inhalt + Empfänger
+    dedupe_key = None if job_id.startswith("test_") else f"newsletter:{content.get('id')}:{customer_id}"
+    success = await queue_email(email, subject, html_body, text_body, "newsletter", {"job_id": job_id}, dedupe_key)
     
-    # Log
-    await db.marketing_logs.insert_one({
+    log = {
         "id": str(uuid.uuid4()),
         "marketing_content_id": content.get("id"),
         "job_id": job_id,
         "channel": "email",
         "recipient_hash": hashlib.sha256(email.encode()).hexdigest()[:16],
-        "status": "sent" if success else "failed",
+        "status": "queued" if success else "failed",
         "timestamp": now_iso()
-    })
+    }
+    return ("queued" if success else "failed"), log
+
+async def send_newsletter_to_recipient(content: dict, recipient: dict, job_id: str) -> bool:
+    """Queue newsletter for a single recipient (sent by the email outbox workers)"""
+    status, log = await queue_newsletter_for_recipient(content, recipient, job_id)
+    if log:
+        await db.marketing_logs.insert_one(log)
+    return status == "queued"
+
+
+class NewsletterProgress:
+    """Zähler + Checkpoint eines Newsletter-Jobs (überlebt Abbruch über marketing_jobs)"""
+    
+    def __init__(self, total: int, checkpoint: Optional[dict] = None):
+        checkpoint = checkpoint or {}
+        self.total = total
+        self.processed = checkpoint.get("processed", 0)
+        self.sent = checkpoint.get("sent", 0)
+        self.failed = checkpoint.get("failed", 0)
+        self.skipped = checkpoint.get("skipped", 0)
+        self.last_recipient_id = checkpoint.get("last_recipient_id")
+        self.failed_ids: List[str] = list(checkpoint.get("failed_recipient_ids", []))
+        self.started = time.monotonic()
+        self.processed_this_run = 0
+    
+    def record(self, recipient: dict, status: str):
+        self.processed += 1
+        self.processed_this_run += 1
+        if status == "queued":
+            self.sent += 1
+        elif status == "skipped":
+            self.skipped += 1
+        else:
+            self.failed += 1
+            if recipient.get("id") and len(self.failed_ids) < NEWSLETTER_MAX_TRACKED_FAILURES:
+                self.failed_ids.append(recipient["id"])
+    
+    def checkpoint(self) -> dict:
+        return {
+            "last_recipient_id": self.last_recipient_id,
+            "processed": self.processed,
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "failed_recipient_ids": self.failed_ids,
+            "updated_at": now_iso()
+        }
     
-    return success
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        throughput = self.processed_this_run / elapsed
+        remaining = max(self.total - self.processed, 0)
+        return {
+            "recipients_total": self.total,
+            "recipients_processed": self.processed,
+            "recipients_sent": self.sent,
+            "recipients_skipped": self.skipped,
+            "failures_count": self.failed,
+            "throughput_per_second": round(throughput, 2),
+            "eta_seconds": round(remaining / throughput) if throughput > 0 else None,
+            "elapsed_seconds": round(elapsed, 1)
+        }
+
+
+async def _process_newsletter_batch(content: dict, batch: List[dict], job_id: str, progress: NewsletterProgress,
+                                    advance_checkpoint: bool = True):
+    """Ein Batch parallel einreihen, Logs gesammelt schreiben, Checkpoint setzen.
+    
+    last_recipient_id rückt erst nach dem Schreiben der Logs vor – bricht der Batch
+    vorher ab, wird er beim Resume vollständig wiederholt.
+    """
+    semaphore = asyncio.Semaphore(max(1, NEWSLETTER_CONCURRENCY))
+    
+    async def queue_one(recipient: dict):
+        async with semaphore:
+            try:
+                return await queue_newsletter_for_recipient(content, recipient, job_id)
+            except Exception as e:
+                logger.error(f"Error sending to recipient: {e}")
+                return "failed", None
+    
+    results = await asyncio.gather(*(queue_one(r) for r in batch))
+    
+    logs = [log for _, log in results if log]
+    if logs:
+        await db.marketing_logs.insert_many(logs, ordered=False)
+    
+    for recipient, (status, _) in zip(batch, results):
+        progress.record(recipient, status)
+    if advance_checkpoint:
+        progress.last_recipient_id = batch[-1].get("id") or progress.last_recipient_id
+    
+    await db.marketing_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"checkpoint": progress.checkpoint(), "stats": progress.stats()}}
+    )
 
 async def run_newsletter_job(job_id: str, content_id: str):
-    """Background task to send newsletter"""
+    """Background task to send newsletter (resumes from the job's checkpoint)"""
+    job = await db.marketing_jobs.find_one({"id": job_id}, {"_id": 0}) or {}
+    
     # Update job status
     await db.marketing_jobs.update_one(
         {"id": job_id},
@@ -255,41 +373,78 @@ async def run_newsletter_job(job_id: str, content_id: str):
     if not is_smtp_configured():
         logger.warning("SMTP not configured - newsletter will be logged only")
     
-    # Get recipients
-    recipients = await get_newsletter_recipients(content.get("audience", Audience.NEWSLETTER_OPTIN), content.get("language"))
-    
-    stats = {
-        "recipients_total": len(recipients),
-        "recipients_sent": 0,
-        "failures_count": 0
-    }
-    
-    for recipient in recipients:
-        try:
-            success = await send_newsletter_to_recipient(content, recipient, job_id)
-            if success:
-                stats["recipients_sent"] += 1
-            else:
-                stats["failures_count"] += 1
-        except Exception as e:
-            logger.error(f"Error sending to recipient: {e}")
-            stats["failures_count"] += 1
+    query = newsletter_recipient_query(content.get("audience", Audience.NEWSLETTER_OPTIN), content.get("language"))
+    total = await db.customers.count_documents(query)
+    progress = NewsletterProgress(total, job.get("checkpoint"))
+    
+    try:
+        # 1. Beim letzten Lauf fehlgeschlagene Empfänger zuerst wiederholen
+        retry_ids = progress.failed_ids
+        if retry_ids:
+            progress.failed_ids = []
+            progress.failed -= len(retry_ids)
+            progress.processed -= len(retry_ids)
+            retry_batch = await db.customers.find(
+                {**query, "id": {"$in": retry_ids}}, {"_id": 0}
+            ).to_list(len(retry_ids))
+            # Inzwischen abgemeldete Empfänger fallen aus der Zählung
+            progress.total -= len(retry_ids) - len(retry_batch)
+            if retry_batch:
+                await _process_newsletter_batch(content, retry_batch, job_id, progress, advance_checkpoint=False)
+        
+        # 2. Ab Checkpoint weiter streamen
+        cursor_query = dict(query)
+        if progress.last_recipient_id:
+            cursor_query["id"] = {"$gt": progress.last_recipient_id}
+        cursor = db.customers.find(cursor_query, {"_id": 0}).sort("id", 1).batch_size(NEWSLETTER_BATCH_SIZE)
+        
+        batch: List[dict] = []
+        async for recipient in cursor:
+            batch.append(recipient)
+            if len(batch) >= NEWSLETTER_BATCH_SIZE:
+                await _process_newsletter_batch(content, batch, job_id, progress)
+                batch = []
+        if batch:
+            await _process_newsletter_batch(content, batch, job_id, progress)
+    
+    except Exception as e:
+        logger.error(f"Newsletter-Job {job_id} abgebrochen: {e}")
+        await db.marketing_jobs.update_one(
+            {"id": job_id},
+            {"$set": {
+                "status": JobStatus.FAILED,
+                "error": str(e),
+                "finished_at": now_iso(),
+                "checkpoint": progress.checkpoint(),
+                "stats": progress.stats()
+            }}
+        )
+        await db.marketing_content.update_one(
+            {"id": content_id},
+            {"$set": {"status": ContentStatus.FAILED, "updated_at": now_iso()}}
+        )
+        return
     
     # Update job
+    stats = progress.stats()
     final_status = JobStatus.DONE if stats["failures_count"] == 0 else JobStatus.FAILED
     await db.marketing_jobs.update_one(
         {"id": job_id},
         {"$set": {
             "status": final_status,
             "finished_at": now_iso(),
+            "checkpoint": progress.checkpoint(),
             "stats": stats
         }}
     )
     
-    # Update content status
+    # Update content status (fehlgeschlagene Empfänger -> Retry möglich)
     await db.marketing_content.update_one(
         {"id": content_id},
-        {"$set": {"status": ContentStatus.SENT, "updated_at": now_iso()}}
+        {"$set": {
+            "status": ContentStatus.SENT if final_status == JobStatus.DONE else ContentStatus.FAILED,
+            "updated_at": now_iso()
+        }}
     )
 
 async def run_social_post_job(job_id: str, content_id: str):
@@ -585,7 +740,7 @@ async def send_test_newsletter(
     
     smtp_configured = is_smtp_configured()
     
-    # Send immediately (not as job)
+    # Direkt in die Outbox (kein Job)
     success = await send_newsletter_to_recipient(content, test_recipient, f"test_{content_id}")
     
     await create_audit_log(user, "marketing_content", content_id, "test_send", None, {"to": data.test_email, "smtp_configured": smtp_configured})
@@ -676,18 +831,39 @@ async def post_social_now(
     
     return {"success": True, "job_id": job["id"], "platform_config": config_status}
 
+def _is_stale_newsletter_job(job: Optional[dict]) -> bool:
+    """RUNNING-Job, dessen Checkpoint seit NEWSLETTER_STALE_MINUTES nicht fortgeschrieben wurde (Prozess-Abbruch)"""
+    if not job or job.get("status") != JobStatus.RUNNING:
+        return False
+    last_update = (job.get("checkpoint") or {}).get("updated_at") or job.get("started_at")
+    if not last_update:
+        return True
+    try:
+        updated = datetime.fromisoformat(last_update.replace("Z", "+00:00"))
+    except ValueError:
+        return True
+    return datetime.now(timezone.utc) - updated > timedelta(minutes=NEWSLETTER_STALE_MINUTES)
+
 @marketing_router.post("/{content_id}/retry")
 async def retry_failed_content(
     content_id: str,
     background_tasks: BackgroundTasks,
     user: dict = Depends(require_admin)
 ):
-    """Retry failed content (Admin only)"""
+    """Retry failed content (Admin only) - newsletters resume from the last checkpoint"""
     content = await db.marketing_content.find_one({"id": content_id}, {"_id": 0})
     if not content:
         raise HTTPException(status_code=404, detail="Content nicht gefunden")
     
-    if content["status"] != ContentStatus.FAILED:
+    last_job = None
+    if content["content_type"] == ContentType.NEWSLETTER:
+        last_job = await db.marketing_jobs.find_one(
+            {"marketing_content_id": content_id, "job_type": JobType.NEWSLETTER_SEND},
+            {"_id": 0},
+            sort=[("created_at", -1)]
+        )
+    
+    if content["status"] != ContentStatus.FAILED and not _is_stale_newsletter_job(last_job):
         raise HTTPException(status_code=400, detail="Nur fehlgeschlagene Inhalte können wiederholt werden")
     
     # Reset to approved
@@ -705,6 +881,14 @@ async def retry_failed_content(
             "status": JobStatus.PENDING,
             "created_at": now_iso()
         }
+        if last_job and last_job.get("checkpoint"):
+            job["checkpoint"] = last_job["checkpoint"]
+            job["resumed_from_job_id"] = last_job["id"]
+            if last_job.get("status") == JobStatus.RUNNING:
+                await db.marketing_jobs.update_one(
+                    {"id": last_job["id"]},
+                    {"$set": {"status": JobStatus.FAILED, "error": "Abgebrochen (Retry)", "finished_at": now_iso()}}
+                )
         await db.marketing_jobs.insert_one(job)
         background_tasks.add_task(run_newsletter_job, job["id"], content_id)
     else:
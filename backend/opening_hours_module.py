@@ -20,9 +20,13 @@ ADDITIV - Keine Breaking Changes
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple
 from datetime import datetime, timezone, date, timedelta
+from collections import OrderedDict
 from enum import Enum
+import asyncio
+import copy
+import time as time_module
 import uuid
 
 # Core imports
@@ -322,22 +326,138 @@ def weekday_name_de(day_num: int) -> str:
     return names[day_num]
 
 
-async def get_active_period_for_date(target_date: date) -> Optional[dict]:
+# ============== OPENING CALENDAR CACHE ==============
+# Regelwerk (Perioden, Sperrtage, Sondertage, Overrides) wird einmal pro Version
+# geladen und pro Datum aufgelöst. Ergebnisse liegen in einem LRU-Memo.
+# - Jede Schreiboperation auf das Regelwerk ruft opening_calendar.bump_version()
+# - Die TTL begrenzt den Drift bei mehreren Workern bzw. Änderungen durch Skripte
+
+OPENING_CALENDAR_TTL_SECONDS = 300
+OPENING_CALENDAR_MEMO_SIZE = 512
+
+
+class OpeningCalendar:
     """
-    Finde die aktive Periode für ein Datum.
-    Unterstützt:
-    - Feste Datumsbereiche (start_date/end_date im Format YYYY-MM-DD)
-    - Wiederkehrende Saisons (start_month_day/end_month_day im Format MM-DD)
-    Bei Überlappung gewinnt höhere Priority.
+    Kompilierter Öffnungszeiten-Kalender im Prozess-Speicher.
+    
+    rules: {"periods", "closures", "special_days", "overrides"} - je ein Mongo-Query pro Version
+    memo:  (art, datum) -> aufgelöstes Ergebnis (calculate_effective_hours / resolve_opening_hours)
     """
+    
+    def __init__(self, ttl_seconds: int = OPENING_CALENDAR_TTL_SECONDS, memo_size: int = OPENING_CALENDAR_MEMO_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.memo_size = memo_size
+        self._version = 0
+        self._rules: Optional[dict] = None
+        self._rules_version = -1
+        self._loaded_at = 0.0
+        self._memo: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def add_listener(self, callback: Callable[[], None]):
+        """Abhängige Caches (z.B. Kapazitäts-Ledger) bei jeder Regel-Änderung mit invalidieren"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+    
+    def bump_version(self):
+        """Regelwerk geändert - Regeln und Memo verwerfen"""
+        self._version += 1
+        self._rules = None
+        self._memo.clear()
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Opening-Calendar Listener fehlgeschlagen: {e}")
+    
+    def _rules_fresh(self) -> bool:
+        if self._rules is None or self._rules_version != self._version:
+            return False
+        return (time_module.monotonic() - self._loaded_at) < self.ttl_seconds
+    
+    async def rules(self) -> dict:
+        """Regelwerk (lädt bei Bedarf alle vier Collections)"""
+        if self._rules_fresh():
+            return self._rules
+        
+        async with self._lock:
+            if self._rules_fresh():
+                return self._rules
+            
+            version = self._version
+            rules = {
+                "periods": await db.opening_hours_master.find(
+                    {"active": True, "archived": {"$ne": True}}, {"_id": 0}
+                ).to_list(100),
+                "closures": await db.closures.find(
+                    {"active": True, "archived": {"$ne": True}}, {"_id": 0}
+                ).to_list(200),
+                "special_days": await db.special_days.find(
+                    {"active": True}, {"_id": 0}
+                ).to_list(100),
+                "overrides": await db.opening_overrides.find(
+                    {"active": {"$ne": False}, "archived": {"$ne": True}}, {"_id": 0}
+                ).to_list(500),
+            }
+            self.loads += 1
+            
+            # Nur übernehmen, wenn während des Ladens keine Änderung kam
+            if version == self._version:
+                self._rules = rules
+                self._rules_version = version
+                self._loaded_at = time_module.monotonic()
+                self._memo.clear()
+            return rules
+    
+    async def resolve(self, kind: str, target_date: date, compute: Callable[[date, dict], dict]) -> dict:
+        """Memoisiertes Ergebnis von compute(target_date, rules) - Rückgabe ist immer eine Kopie"""
+        version = self._version
+        rules = await self.rules()
+        key = (kind, target_date.isoformat())
+        
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(cached)
+        
+        self.misses += 1
+        result = compute(target_date, rules)
+        if version == self._version and self._rules is rules:
+            self._memo[key] = result
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return copy.deepcopy(result)
+    
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "rules_loaded": self._rules is not None,
+            "memo_entries": len(self._memo),
+            "memo_size": self.memo_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+opening_calendar = OpeningCalendar()
+
+
+def _match_period(periods: List[dict], target_date: date) -> Optional[dict]:
+    """Aktive Periode aus dem geladenen Regelwerk (siehe get_active_period_for_date)"""
     date_str = target_date.strftime("%Y-%m-%d")
     month_day = target_date.strftime("%m-%d")
     
-    # Alle aktiven Perioden laden
-    periods = await db.opening_hours_master.find(
-        {"active": True, "archived": {"$ne": True}}
-    ).to_list(100)
-    
     matching = []
     for period in periods:
         # Variante 1: Wiederkehrende Saison (MM-DD Format)
@@ -370,39 +490,21 @@ async def get_active_period_for_date(target_date: date) -> Optional[dict]:
     return matching[0]
 
 
-async def get_special_day_for_date(target_date: date) -> Optional[dict]:
-    """
-    Prüfe ob ein fester Sondertag (z.B. 24.12, 01.01, 31.12) vorliegt.
-    Sondertage haben höchste Priorität über Saisons.
-    """
+def _match_special_day(special_days: List[dict], target_date: date) -> Optional[dict]:
+    """Fester Sondertag aus dem geladenen Regelwerk (siehe get_special_day_for_date)"""
     month_day = target_date.strftime("%m-%d")
-    
-    special_day = await db.special_days.find_one({
-        "month_day": month_day,
-        "active": True
-    })
-    
-    return special_day
+    for special_day in special_days:
+        if special_day.get("month_day") == month_day:
+            return special_day
+    return None
 
 
-async def get_closures_for_date(target_date: date) -> List[dict]:
-    """
-    Finde alle aktiven Sperrtage für ein Datum.
-    Prüft:
-    1. Einfache Datumsbereiche (start_date/end_date) - HÖCHSTE PRIORITÄT
-    2. Recurring (jährlich wiederkehrend)
-    3. One-off (einmalig mit one_off_rule)
-    
-    Bei Überlappung: closed_all_day > closed_partial
-    """
+def _match_closures(closures: List[dict], target_date: date) -> List[dict]:
+    """Sperrtage aus dem geladenen Regelwerk (siehe get_closures_for_date) - liefert Kopien"""
     date_str = target_date.strftime("%Y-%m-%d")
     month = target_date.month
     day = target_date.day
     
-    closures = await db.closures.find(
-        {"active": True, "archived": {"$ne": True}}
-    ).to_list(200)
-    
     matching = []
     for closure in closures:
         closure_type = closure.get("type", "")
@@ -414,22 +516,19 @@ async def get_closures_for_date(target_date: date) -> List[dict]:
             if start <= date_str <= end:
                 # Priorität basierend auf Typ
                 priority = 100 if closure_type == "closed_all_day" else 50
-                closure["_match_priority"] = priority
-                matching.append(closure)
+                matching.append({**closure, "_match_priority": priority})
         
         # 2. Legacy: Recurring (jährlich)
         elif closure_type == "recurring":
             rule = closure.get("recurring_rule", {})
             if rule.get("month") == month and rule.get("day") == day:
-                closure["_match_priority"] = 90
-                matching.append(closure)
+                matching.append({**closure, "_match_priority": 90})
         
         # 3. Legacy: One-off (einmalig)
         elif closure_type == "one_off":
             rule = closure.get("one_off_rule", {})
             if rule.get("date") == date_str:
-                closure["_match_priority"] = 80
-                matching.append(closure)
+                matching.append({**closure, "_match_priority": 80})
     
     # Sortiere: closed_all_day vor closed_partial, dann nach Priority
     matching.sort(key=lambda x: x.get("_match_priority", 0), reverse=True)
@@ -437,6 +536,73 @@ async def get_closures_for_date(target_date: date) -> List[dict]:
     return matching
 
 
+def _match_override(overrides: List[dict], target_date: date) -> Optional[dict]:
+    """Override aus dem geladenen Regelwerk (siehe get_override_for_date)"""
+    date_str = target_date.strftime("%Y-%m-%d")
+    month = target_date.month
+    day = target_date.day
+    
+    matching = []
+    for override in overrides:
+        override_type = override.get("type", "")
+        
+        # 1. Recurring (jährlich wiederkehrend)
+        if override_type == "recurring":
+            rule = override.get("recurring_rule", {})
+            if rule.get("month") == month and rule.get("day") == day:
+                matching.append(override)
+                continue
+        
+        # 2. Datumsbereich (date_from/date_to)
+        date_from = override.get("date_from", "")
+        date_to = override.get("date_to", date_from)
+        
+        if date_from and date_from <= date_str <= (date_to or date_from):
+            matching.append(override)
+    
+    if not matching:
+        return None
+    
+    # Sortiere nach Priority (höchste zuerst)
+    matching.sort(key=lambda x: x.get("priority", 100), reverse=True)
+    return matching[0]
+
+
+async def get_active_period_for_date(target_date: date) -> Optional[dict]:
+    """
+    Finde die aktive Periode für ein Datum.
+    Unterstützt:
+    - Feste Datumsbereiche (start_date/end_date im Format YYYY-MM-DD)
+    - Wiederkehrende Saisons (start_month_day/end_month_day im Format MM-DD)
+    Bei Überlappung gewinnt höhere Priority.
+    """
+    rules = await opening_calendar.rules()
+    return copy.deepcopy(_match_period(rules["periods"], target_date))
+
+
+async def get_special_day_for_date(target_date: date) -> Optional[dict]:
+    """
+    Prüfe ob ein fester Sondertag (z.B. 24.12, 01.01, 31.12) vorliegt.
+    Sondertage haben höchste Priorität über Saisons.
+    """
+    rules = await opening_calendar.rules()
+    return copy.deepcopy(_match_special_day(rules["special_days"], target_date))
+
+
+async def get_closures_for_date(target_date: date) -> List[dict]:
+    """
+    Finde alle aktiven Sperrtage für ein Datum.
+    Prüft:
+    1. Einfache Datumsbereiche (start_date/end_date) - HÖCHSTE PRIORITÄT
+    2. Recurring (jährlich wiederkehrend)
+    3. One-off (einmalig mit one_off_rule)
+    
+    Bei Überlappung: closed_all_day > closed_partial
+    """
+    rules = await opening_calendar.rules()
+    return _match_closures(rules["closures"], target_date)
+
+
 async def calculate_effective_hours(target_date: date) -> dict:
     """
     Berechne die effektiven Öffnungszeiten für ein Datum.
@@ -447,7 +613,30 @@ async def calculate_effective_hours(target_date: date) -> dict:
     2. holidays (können Ruhetag überschreiben → offen 11:30-20:00)
     3. opening_hours_periods (Sommer/Winter Regelwerk)
     4. Fallback: Standard-Öffnungszeiten
+    
+    Ergebnis wird pro Datum im opening_calendar memoisiert.
+    """
+    return await opening_calendar.resolve("effective", target_date, _compute_effective_hours)
+
+
+async def calculate_effective_hours_range(start_date: date, end_date: date) -> Dict[str, dict]:
+    """
+    Effektive Öffnungszeiten für einen Zeitraum (inkl. end_date).
+    Regelwerk wird einmal geladen, jeder Tag im Speicher aufgelöst.
+
+    Returns: {"YYYY-MM-DD": effective_hours}
     """
+    rules = await opening_calendar.rules()
+    result = {}
+    current = start_date
+    while current <= end_date:
+        result[current.isoformat()] = copy.deepcopy(_compute_effective_hours(current, rules))
+        current += timedelta(days=1)
+    return result
+
+
+def _compute_effective_hours(target_date: date, rules: dict) -> dict:
+    """Auflösung für calculate_effective_hours auf dem geladenen Regelwerk"""
     date_str = target_date.strftime("%Y-%m-%d")
     weekday = target_date.weekday()
     weekday_key = weekday_name(weekday)
@@ -472,7 +661,7 @@ async def calculate_effective_hours(target_date: date) -> dict:
     }
     
     # ========== 0. OPENING OVERRIDES (ABSOLUT HÖCHSTE PRIORITÄT) ==========
-    override = await get_override_for_date(target_date)
+    override = _match_override(rules["overrides"], target_date)
     if override:
         if override.get("status") == "closed":
             result["is_open"] = False
@@ -497,7 +686,7 @@ async def calculate_effective_hours(target_date: date) -> dict:
             return result
     
     # ========== 1. CLOSURES (SPERRTAGE) ==========
-    closures = await get_closures_for_date(target_date)
+    closures = _match_closures(rules["closures"], target_date)
     full_day_closure = None
     time_range_closures = []
     
@@ -524,7 +713,7 @@ async def calculate_effective_hours(target_date: date) -> dict:
         return result
     
     # ========== 1.5 FESTE SONDERTAGE (Priorität über Saisons) ==========
-    special_day = await get_special_day_for_date(target_date)
+    special_day = _match_special_day(rules["special_days"], target_date)
     if special_day:
         if special_day.get("is_closed"):
             result["is_open"] = False
@@ -552,7 +741,7 @@ async def calculate_effective_hours(target_date: date) -> dict:
     # (is_holiday Flag wird trotzdem gesetzt für Info-Zwecke)
     
     # ========== 3. PERIODEN (Saisons) ==========
-    period = await get_active_period_for_date(target_date)
+    period = _match_period(rules["periods"], target_date)
     
     if period:
         result["period_name"] = period.get("name")
@@ -700,6 +889,7 @@ async def create_period(
     }
     
     await db.opening_hours_master.insert_one(period)
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -762,6 +952,7 @@ async def update_period(
         {"id": period_id},
         {"$set": update_data}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -805,6 +996,7 @@ async def delete_period(
         {"id": period_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -886,6 +1078,7 @@ async def create_closure(
     }
     
     await db.closures.insert_one(closure)
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -934,6 +1127,7 @@ async def update_closure(
         {"id": closure_id},
         {"$set": update_data}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -977,6 +1171,7 @@ async def delete_closure(
         {"id": closure_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -1028,6 +1223,7 @@ async def create_simple_closure(
     }
     
     await db.closures.insert_one(closure)
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -1104,6 +1300,7 @@ async def delete_simple_closure(
         {"id": closure_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -1352,38 +1549,8 @@ async def get_override_for_date(target_date: date) -> Optional[dict]:
     
     Bei mehreren Overlaps gewinnt höchste Priority.
     """
-    date_str = target_date.strftime("%Y-%m-%d")
-    month = target_date.month
-    day = target_date.day
-    
-    overrides = await db.opening_overrides.find(
-        {"active": {"$ne": False}, "archived": {"$ne": True}}
-    ).to_list(500)
-    
-    matching = []
-    for override in overrides:
-        override_type = override.get("type", "")
-        
-        # 1. Recurring (jährlich wiederkehrend)
-        if override_type == "recurring":
-            rule = override.get("recurring_rule", {})
-            if rule.get("month") == month and rule.get("day") == day:
-                matching.append(override)
-                continue
-        
-        # 2. Datumsbereich (date_from/date_to)
-        date_from = override.get("date_from", "")
-        date_to = override.get("date_to", date_from)
-        
-        if date_from and date_from <= date_str <= (date_to or date_from):
-            matching.append(override)
-    
-    if not matching:
-        return None
-    
-    # Sortiere nach Priority (höchste zuerst)
-    matching.sort(key=lambda x: x.get("priority", 100), reverse=True)
-    return matching[0]
+    rules = await opening_calendar.rules()
+    return copy.deepcopy(_match_override(rules["overrides"], target_date))
 
 
 async def resolve_opening_hours(target_date: date) -> dict:
@@ -1402,7 +1569,14 @@ async def resolve_opening_hours(target_date: date) -> dict:
         reason: "override" | "holiday" | "period" | "weekday_closed" | "fallback",
         meta: { holiday_name?, period_name?, override_note? }
     }
+    
+    Ergebnis wird pro Datum im opening_calendar memoisiert.
     """
+    return await opening_calendar.resolve("resolved", target_date, _compute_resolved_hours)
+
+
+def _compute_resolved_hours(target_date: date, rules: dict) -> dict:
+    """Auflösung für resolve_opening_hours auf dem geladenen Regelwerk"""
     date_str = target_date.strftime("%Y-%m-%d")
     weekday = target_date.weekday()
     weekday_key = weekday_name(weekday)
@@ -1421,7 +1595,7 @@ async def resolve_opening_hours(target_date: date) -> dict:
     }
     
     # ========== 1. OVERRIDES (HÖCHSTE PRIORITÄT) ==========
-    override = await get_override_for_date(target_date)
+    override = _match_override(rules["overrides"], target_date)
     if override:
         if override.get("status") == "closed":
             result["status"] = "closed"
@@ -1450,7 +1624,7 @@ async def resolve_opening_hours(target_date: date) -> dict:
     is_holiday, holiday_name_str = is_holiday_brandenburg(target_date)
     
     # ========== 3. PERIODEN ==========
-    period = await get_active_period_for_date(target_date)
+    period = _match_period(rules["periods"], target_date)
     
     if period:
         rules = period.get("rules_by_weekday", {})
@@ -1583,6 +1757,7 @@ async def create_override(
     }
     
     await db.opening_overrides.insert_one(override)
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -1633,6 +1808,7 @@ async def update_override(
         {"id": override_id},
         {"$set": update_data}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
@@ -1672,6 +1848,7 @@ async def delete_override(
         {"id": override_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    opening_calendar.bump_version()
     
     # Audit Log
     await create_audit_log(
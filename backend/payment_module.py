@@ -57,6 +57,8 @@ from core.database import db
 from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit, SYSTEM_ACTOR
 from core.exceptions import NotFoundException, ValidationException, ConflictException
+from reservation_hooks import on_reservation_changed
+from events_module import update_event_booking_counted, update_event_status_if_needed, reopen_event_if_available
 
 logger = logging.getLogger(__name__)
 
@@ -198,6 +200,24 @@ async def check_guest_greylist(phone: str) -> bool:
     return guest.get("flag") == "greylist" if guest else False
 
 
+async def update_reservation_payment(reservation_id: str, fields: dict) -> Optional[dict]:
+    """
+    Reservierung nach Zahlungsänderung per $set ändern und den abgeleiteten
+    Zustand (Kapazität, Erinnerungen, ...) nachziehen - wie jeder andere
+    Reservierungs-Schreibpfad über on_reservation_changed.
+    """
+    before = await db.reservations.find_one_and_update(
+        {"id": reservation_id},
+        {"$set": fields},
+        projection={"_id": 0}
+    )
+    if not before:
+        return None
+    after = {**before, **fields}
+    await on_reservation_changed(before, after)
+    return after
+
+
 # ============== PAYMENT LOG ==============
 async def create_payment_log(
     transaction_id: str,
@@ -454,15 +474,12 @@ async def create_checkout_session(
             }}
         )
     elif data.entity_type == "event_booking":
-        await db.event_bookings.update_one(
-            {"id": data.entity_id},
-            {"$set": {
-                "payment_status": PaymentStatus.PAYMENT_PENDING.value,
-                "payment_amount": amount,
-                "payment_transaction_id": transaction["id"],
-                "updated_at": now_iso()
-            }}
-        )
+        await update_event_booking_counted(data.entity_id, {
+            "payment_status": PaymentStatus.PAYMENT_PENDING.value,
+            "payment_amount": amount,
+            "payment_transaction_id": transaction["id"],
+            "updated_at": now_iso()
+        })
     
     # Create payment log
     await create_payment_log(
@@ -546,13 +563,15 @@ async def get_checkout_status(session_id: str):
                 update_data = {"payment_status": new_status, "updated_at": now_iso()}
                 if new_status == PaymentStatus.PAID.value:
                     update_data["status"] = "bestaetigt"  # Auto-confirm on payment
-                await db.reservations.update_one({"id": entity_id}, {"$set": update_data})
+                await update_reservation_payment(entity_id, update_data)
                 
             elif entity_type == "event_booking":
                 update_data = {"payment_status": new_status, "updated_at": now_iso()}
                 if new_status == PaymentStatus.PAID.value:
                     update_data["status"] = "confirmed"
-                await db.event_bookings.update_one({"id": entity_id}, {"$set": update_data})
+                booking = await update_event_booking_counted(entity_id, update_data)
+                if booking:
+                    await update_event_status_if_needed(booking.get("event_id"))
             
             # Create payment log
             await create_payment_log(
@@ -640,13 +659,15 @@ async def handle_stripe_webhook(request: Request):
                     update_data = {"payment_status": new_status, "updated_at": now_iso()}
                     if new_status == PaymentStatus.PAID.value:
                         update_data["status"] = "bestaetigt"
-                    await db.reservations.update_one({"id": entity_id}, {"$set": update_data})
+                    await update_reservation_payment(entity_id, update_data)
                     
                 elif entity_type == "event_booking":
                     update_data = {"payment_status": new_status, "updated_at": now_iso()}
                     if new_status == PaymentStatus.PAID.value:
                         update_data["status"] = "confirmed"
-                    await db.event_bookings.update_one({"id": entity_id}, {"$set": update_data})
+                    booking = await update_event_booking_counted(entity_id, update_data)
+                    if booking:
+                        await update_event_status_if_needed(booking.get("event_id"))
                 
                 await create_payment_log(
                     transaction_id=transaction["id"],
@@ -705,15 +726,17 @@ async def mark_payment_manual(
     entity_id = transaction.get("entity_id")
     
     if entity_type == "reservation":
-        await db.reservations.update_one(
-            {"id": entity_id},
-            {"$set": {"payment_status": PaymentStatus.PAID.value, "status": "bestaetigt", "updated_at": now_iso()}}
+        await update_reservation_payment(
+            entity_id,
+            {"payment_status": PaymentStatus.PAID.value, "status": "bestaetigt", "updated_at": now_iso()}
         )
     elif entity_type == "event_booking":
-        await db.event_bookings.update_one(
-            {"id": entity_id},
-            {"$set": {"payment_status": PaymentStatus.PAID.value, "status": "confirmed", "updated_at": now_iso()}}
+        booking = await update_event_booking_counted(
+            entity_id,
+            {"payment_status": PaymentStatus.PAID.value, "status": "confirmed", "updated_at": now_iso()}
         )
+        if booking:
+            await update_event_status_if_needed(booking.get("event_id"))
     
     # Create logs
     await create_payment_log(
@@ -797,9 +820,9 @@ async def cancel_payment(session_id: str):
                     {"$set": {"payment_status": PaymentStatus.FAILED.value, "updated_at": now_iso()}}
                 )
             elif entity_type == "event_booking":
-                await db.event_bookings.update_one(
-                    {"id": entity_id},
-                    {"$set": {"payment_status": PaymentStatus.FAILED.value, "updated_at": now_iso()}}
+                await update_event_booking_counted(
+                    entity_id,
+                    {"payment_status": PaymentStatus.FAILED.value, "updated_at": now_iso()}
                 )
             
             await create_payment_log(
@@ -853,35 +876,20 @@ async def request_refund(
     entity_id = transaction.get("entity_id")
     
     if entity_type == "reservation":
-        await db.reservations.update_one(
-            {"id": entity_id},
-            {"$set": {
-                "payment_status": PaymentStatus.REFUNDED.value,
-                "status": "storniert",  # Also cancel the reservation
-                "updated_at": now_iso()
-            }}
-        )
+        await update_reservation_payment(entity_id, {
+            "payment_status": PaymentStatus.REFUNDED.value,
+            "status": "storniert",  # Also cancel the reservation
+            "updated_at": now_iso()
+        })
     elif entity_type == "event_booking":
-        await db.event_bookings.update_one(
-            {"id": entity_id},
-            {"$set": {
-                "payment_status": PaymentStatus.REFUNDED.value,
-                "status": "cancelled",  # Also cancel the booking
-                "updated_at": now_iso()
-            }}
-        )
+        booking = await update_event_booking_counted(entity_id, {
+            "payment_status": PaymentStatus.REFUNDED.value,
+            "status": "cancelled",  # Also cancel the booking
+            "updated_at": now_iso()
+        })
         # Check if event can be reopened for bookings
-        booking = await db.event_bookings.find_one({"id": entity_id})
         if booking:
-            from events_module import update_event_status_if_needed, get_event_booked_count
-            event = await db.events.find_one({"id": booking.get("event_id")})
-            if event and event.get("status") == "sold_out":
-                booked = await get_event_booked_count(booking.get("event_id"), include_pending=False)
-                if booked < event.get("capacity_total", 0):
-                    await db.events.update_one(
-                        {"id": booking.get("event_id")},
-                        {"$set": {"status": "published", "updated_at": now_iso()}}
-                    )
+            await reopen_event_if_available(booking.get("event_id"))
     
     await create_payment_log(
         transaction_id=transaction_id,
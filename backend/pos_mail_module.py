@@ -19,6 +19,9 @@ import hashlib
 import logging
 import asyncio
 import imaplib
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Any, Tuple
 from enum import Enum
@@ -28,6 +31,8 @@ from email.header import decode_header
 from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
 from pydantic import BaseModel, Field
 
+from pos_rollups import safe_refresh_rollups, get_rollup, list_rollups, rebuild_rollups
+
 # Logging
 logger = logging.getLogger("pos_mail")
 logging.basicConfig(level=logging.INFO)
@@ -42,6 +47,24 @@ except ImportError:
     # Fallback for standalone usage
     db = None
 
+# Dupe-Check per $in auf den Hash, Upsert der Tageskennzahlen über das Datum
+try:
+    from core.indexes import register_indexes, index
+    register_indexes(
+        "pos_documents",
+        index(("file_hash_sha256", 1)),
+    )
+    register_indexes(
+        "pos_daily_metrics",
+        index(("date", 1)),
+    )
+    register_indexes(
+        "pos_ingest_logs",
+        index(("timestamp", -1)),
+    )
+except ImportError:
+    pass
+
 def set_db(database):
     """Set database reference (fallback if core.database not available)"""
     global db
@@ -65,6 +88,10 @@ PARSER_VERSION = "1.1.0"
 ALLOWED_SENDERS = ["noreply@gastronovi.de"]
 SUBJECT_PREFIXES = ["Tagesbericht", "Monatsbericht"]
 
+# Ingest-Pipeline
+IMAP_FETCH_BATCH_SIZE = int(os.getenv("POS_IMAP_FETCH_BATCH_SIZE", "25"))  # UIDs pro UID FETCH
+PDF_PARSE_WORKERS = int(os.getenv("POS_PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
 
 # ============== ENUMS & MODELS ==============
 
@@ -473,51 +500,94 @@ class IMAPClient:
             if status != "OK" or not data or not data[0]:
                 return None
             
-            raw_email = data[0][1]
-            msg = email.message_from_bytes(raw_email)
-            
-            # Extract headers
-            from_addr = decode_email_header(msg.get('From', ''))
-            subject = decode_email_header(msg.get('Subject', ''))
-            message_id = msg.get('Message-ID', '')
-            date_str = msg.get('Date', '')
-            
-            # Filter: Subject must start with Tagesbericht or Monatsbericht
-            subject_ok = any(subject.startswith(prefix) for prefix in SUBJECT_PREFIXES)
-            if not subject_ok:
-                logger.debug(f"Skipping mail UID {uid}: subject '{subject}' doesn't match filter")
-                return None
-            
-            # Extract PDF attachments
-            attachments = []
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = part.get('Content-Disposition', '')
-                
-                if 'attachment' in content_disposition or content_type == 'application/pdf':
-                    filename = part.get_filename()
-                    if filename:
-                        filename = decode_email_header(filename)
-                        if filename.lower().endswith('.pdf'):
-                            content = part.get_payload(decode=True)
-                            if content:
-                                attachments.append({
-                                    "name": filename,
-                                    "content": content
-                                })
-            
-            return {
-                "uid": uid,
-                "message_id": message_id,
-                "from": from_addr,
-                "subject": subject,
-                "date": date_str,
-                "attachments": attachments
-            }
+            return parse_mail_message(uid, data[0][1])
             
         except Exception as e:
             logger.error(f"Fetch mail UID {uid} failed: {e}")
             return None
+    
+    def fetch_mails(self, uids: List[int]) -> Tuple[Dict[int, Optional[Dict[str, Any]]], List[str]]:
+        """
+        Fetch many mails with one UID FETCH per batch (IMAP_FETCH_BATCH_SIZE).
+        Returns ({uid: mail_info or None (filtered)}, errors)
+        """
+        mails: Dict[int, Optional[Dict[str, Any]]] = {}
+        errors: List[str] = []
+        
+        for i in range(0, len(uids), IMAP_FETCH_BATCH_SIZE):
+            chunk = uids[i:i + IMAP_FETCH_BATCH_SIZE]
+            try:
+                status, data = self.connection.uid('fetch', ",".join(str(u) for u in chunk), '(UID RFC822)')
+                if status != "OK":
+                    raise RuntimeError(f"UID FETCH status {status}")
+                
+                # Antwort: [(b'1 (UID 123 RFC822 {4711}', raw_bytes), b')', ...]
+                for item in data or []:
+                    if not isinstance(item, tuple) or len(item) < 2:
+                        continue
+                    uid_match = re.search(rb'UID (\d+)', item[0])
+                    if not uid_match:
+                        continue
+                    uid = int(uid_match.group(1))
+                    try:
+                        mails[uid] = parse_mail_message(uid, item[1])
+                    except Exception as e:
+                        logger.error(f"Parse mail UID {uid} failed: {e}")
+                        errors.append(f"UID {uid}: {e}")
+                        mails[uid] = None
+            except Exception as e:
+                logger.error(f"UID FETCH {chunk[0]}..{chunk[-1]} failed: {e}")
+                errors.append(f"UID {chunk[0]}..{chunk[-1]}: {e}")
+                # Einzeln nachladen, damit ein defekter Batch nicht alles blockiert
+                for uid in chunk:
+                    if uid not in mails:
+                        mails[uid] = self.fetch_mail(uid)
+        
+        return mails, errors
+
+
+def parse_mail_message(uid: int, raw_email: bytes) -> Optional[Dict[str, Any]]:
+    """RFC822-Nachricht zerlegen: Header + PDF-Anhänge (None wenn Betreff nicht passt)"""
+    msg = email.message_from_bytes(raw_email)
+    
+    # Extract headers
+    from_addr = decode_email_header(msg.get('From', ''))
+    subject = decode_email_header(msg.get('Subject', ''))
+    message_id = msg.get('Message-ID', '')
+    date_str = msg.get('Date', '')
+    
+    # Filter: Subject must start with Tagesbericht or Monatsbericht
+    subject_ok = any(subject.startswith(prefix) for prefix in SUBJECT_PREFIXES)
+    if not subject_ok:
+        logger.debug(f"Skipping mail UID {uid}: subject '{subject}' doesn't match filter")
+        return None
+    
+    # Extract PDF attachments
+    attachments = []
+    for part in msg.walk():
+        content_type = part.get_content_type()
+        content_disposition = part.get('Content-Disposition', '')
+        
+        if 'attachment' in content_disposition or content_type == 'application/pdf':
+            filename = part.get_filename()
+            if filename:
+                filename = decode_email_header(filename)
+                if filename.lower().endswith('.pdf'):
+                    content = part.get_payload(decode=True)
+                    if content:
+                        attachments.append({
+                            "name": filename,
+                            "content": content
+                        })
+    
+    return {
+        "uid": uid,
+        "message_id": message_id,
+        "from": from_addr,
+        "subject": subject,
+        "date": date_str,
+        "attachments": attachments
+    }
 
 
 # ============== INGEST LOGIC ==============
@@ -540,155 +610,240 @@ async def check_hash_exists(file_hash: str) -> bool:
     existing = await db.pos_documents.find_one({"file_hash_sha256": file_hash})
     return existing is not None
 
-async def process_pdf_attachment(
-    pdf_content: bytes,
-    filename: str,
-    mail_info: Dict[str, Any]
-) -> Dict[str, Any]:
-    """
-    Process a single PDF attachment.
-    Returns result dict with status.
+def _elapsed_ms(started: float) -> int:
+    return int((time.monotonic() - started) * 1000)
+
+def fetch_new_mails(last_uid: int) -> Dict[str, Any]:
     """
-    result = {
-        "status": "error",
-        "filename": filename,
-        "doc_id": None,
-        "date": None,
-        "error": None
-    }
+    Blockierender IMAP-Teil (läuft in einem Thread, nie auf dem Event-Loop):
+    verbinden, suchen, Mails in UID-Batches laden.
     
-    # Calculate hash
-    file_hash = calculate_sha256(pdf_content)
-    
-    # Check for duplicate
-    if await check_hash_exists(file_hash):
-        result["status"] = "duplicate"
-        result["error"] = f"PDF bereits importiert (Hash: {file_hash[:16]}...)"
-        logger.info(f"Skipping duplicate PDF: {filename}")
-        return result
-    
-    # Determine doc type from subject
-    doc_type = determine_doc_type(mail_info.get("subject", ""))
-    
-    # Save PDF to storage
-    now = datetime.now(timezone.utc)
-    year_month = now.strftime("%Y/%m")
-    storage_path = f"{STORAGE_DIR}/{year_month}"
-    os.makedirs(storage_path, exist_ok=True)
-    
-    safe_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
-    file_path = f"{storage_path}/{file_hash[:16]}_{safe_filename}"
-    
-    with open(file_path, 'wb') as f:
-        f.write(pdf_content)
-    
-    # Create pos_documents entry
-    doc = PosDocument(
-        doc_type=doc_type,
-        source="email",
-        imap_uid=mail_info.get("uid"),
-        message_id=mail_info.get("message_id"),
-        received_at=mail_info.get("date", now.isoformat()),
-        from_email=mail_info.get("from"),
-        subject=mail_info.get("subject"),
-        file_name=filename,
-        file_hash_sha256=file_hash,
-        file_path=file_path,
-        parse_status=ParseStatus.STORED
-    )
+    Returns: {ok, uids, mails: {uid: mail_info|None}, errors, timings_ms}
+    """
+    fetched = {"ok": False, "uids": [], "mails": {}, "errors": [], "timings_ms": {}}
+    client = IMAPClient()
+    started = time.monotonic()
     
-    await db.pos_documents.insert_one(doc.model_dump())
-    result["doc_id"] = doc.id
+    try:
+        # Connect
+        if not client.connect():
+            fetched["errors"].append("IMAP connection failed")
+            return fetched
+        
+        # Select folder
+        if not client.select_folder(POS_IMAP_FOLDER):
+            fetched["errors"].append(f"Could not select folder: {POS_IMAP_FOLDER}")
+            return fetched
+        
+        # Search for new mails
+        fetched["uids"] = client.search_mails(since_uid=last_uid)
+        fetched["timings_ms"]["imap_search"] = _elapsed_ms(started)
+        logger.info(f"Found {len(fetched['uids'])} potential new mails")
+        
+        fetch_started = time.monotonic()
+        fetched["mails"], errors = client.fetch_mails(fetched["uids"])
+        fetched["errors"].extend(errors)
+        fetched["timings_ms"]["imap_fetch"] = _elapsed_ms(fetch_started)
+        fetched["ok"] = True
+    finally:
+        client.disconnect()
     
-    # Parse PDF
-    parse_result = parse_gastronovi_pdf_v1(file_path)
+    return fetched
+
+def store_pdf_files(files: List[Tuple[str, bytes]]):
+    """PDFs ablegen (Thread)"""
+    for file_path, content in files:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+def parse_pdfs_parallel(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    PDFs in Worker-Prozessen parsen (pdfplumber ist CPU-lastig).
+    Läuft selbst in einem Thread; ohne Prozesspool sequenziell.
+    """
+    if not paths:
+        return []
+    if PDF_PARSE_WORKERS <= 1 or len(paths) == 1:
+        return [parse_gastronovi_pdf_v1(path) for path in paths]
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(PDF_PARSE_WORKERS, len(paths)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            return list(pool.map(parse_gastronovi_pdf_v1, paths))
+    except Exception as e:
+        logger.warning(f"PDF-Prozesspool nicht verfügbar ({e}) - sequenzielles Parsing")
+        return [parse_gastronovi_pdf_v1(path) for path in paths]
+
+async def process_pdf_attachments(
+    attachments: List[Tuple[bytes, str, Dict[str, Any]]],
+    timings: Dict[str, int]
+) -> List[Dict[str, Any]]:
+    """
+    Process PDF attachments as one batch:
+    Dupe-Check ($in), Ablage + Parsing außerhalb des Event-Loops,
+    pos_documents / pos_daily_metrics per bulk_write.
     
-    if not parse_result["success"]:
-        # Update document with error
-        await db.pos_documents.update_one(
-            {"id": doc.id},
-            {"$set": {
-                "parse_status": ParseStatus.FAILED.value,
-                "parse_error": parse_result.get("error"),
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
+    attachments: [(content, filename, mail_info)]
+    Returns one result dict per attachment (status/filename/doc_id/date/error).
+    """
+    from pymongo import UpdateOne
+    
+    results: List[Dict[str, Any]] = []
+    if not attachments:
+        return results
+    
+    # 1. Dupe-Check: ein Query für alle Hashes (auch Dubletten innerhalb des Batches)
+    stage_started = time.monotonic()
+    hashes = [calculate_sha256(content) for content, _, _ in attachments]
+    existing = {
+        d["file_hash_sha256"] async for d in db.pos_documents.find(
+            {"file_hash_sha256": {"$in": list(set(hashes))}},
+            {"_id": 0, "file_hash_sha256": 1}
         )
-        result["status"] = "parse_failed"
-        result["error"] = parse_result.get("error")
-        return result
-    
-    # Update document with parsed data
-    parsed_meta = {
-        "date": parse_result.get("date"),
-        "month": parse_result.get("month"),
-        "is_monthly": parse_result.get("is_monthly"),
-        "net_total": parse_result.get("net_total"),
-        "food_net": parse_result.get("food_net"),
-        "beverage_net": parse_result.get("beverage_net")
     }
     
-    await db.pos_documents.update_one(
-        {"id": doc.id},
-        {"$set": {
-            "parse_status": ParseStatus.PARSED.value,
-            "parsed_meta": parsed_meta,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    result["date"] = parse_result.get("date")
-    
-    # For daily reports: upsert pos_daily_metrics
-    if doc_type == DocType.DAILY and parse_result.get("date"):
-        metrics = PosDailyMetrics(
-            date=parse_result["date"],
-            net_total=parse_result["net_total"],
-            food_net=parse_result["food_net"],
-            beverage_net=parse_result["beverage_net"],
-            source_doc_id=doc.id
-        )
+    now = datetime.now(timezone.utc)
+    storage_path = f"{STORAGE_DIR}/{now.strftime('%Y/%m')}"
+    pending = []  # (result, doc, content)
+    for (content, filename, mail_info), file_hash in zip(attachments, hashes):
+        result = {"status": "error", "filename": filename, "doc_id": None, "date": None, "error": None}
+        results.append(result)
+        if file_hash in existing:
+            result["status"] = "duplicate"
+            result["error"] = f"PDF bereits importiert (Hash: {file_hash[:16]}...)"
+            logger.info(f"Skipping duplicate PDF: {filename}")
+            continue
+        existing.add(file_hash)
         
-        await db.pos_daily_metrics.update_one(
-            {"date": metrics.date},
-            {"$set": metrics.model_dump()},
-            upsert=True
+        safe_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
+        doc = PosDocument(
+            doc_type=determine_doc_type(mail_info.get("subject", "")),
+            source="email",
+            imap_uid=mail_info.get("uid"),
+            message_id=mail_info.get("message_id"),
+            received_at=mail_info.get("date", now.isoformat()),
+            from_email=mail_info.get("from"),
+            subject=mail_info.get("subject"),
+            file_name=filename,
+            file_hash_sha256=file_hash,
+            file_path=f"{storage_path}/{file_hash[:16]}_{safe_filename}",
+            parse_status=ParseStatus.STORED
         )
+        result["doc_id"] = doc.id
+        pending.append((result, doc, content))
+    timings["dedupe"] = _elapsed_ms(stage_started)
+    
+    if not pending:
+        return results
+    
+    # 2. Ablage (Thread)
+    stage_started = time.monotonic()
+    await asyncio.to_thread(store_pdf_files, [(doc.file_path, content) for _, doc, content in pending])
+    timings["store_files"] = _elapsed_ms(stage_started)
+    
+    # 3. Parsing (Prozesspool, gesteuert aus einem Thread)
+    stage_started = time.monotonic()
+    parse_results = await asyncio.to_thread(parse_pdfs_parallel, [doc.file_path for _, doc, _ in pending])
+    timings["parse_pdfs"] = _elapsed_ms(stage_started)
+    
+    # 4. Bulk-Writes
+    stage_started = time.monotonic()
+    doc_ops = []
+    metrics_ops = []
+    metric_dates = []
+    monthly = []
+    for (result, doc, _), parse_result in zip(pending, parse_results):
+        doc_data = doc.model_dump()
+        if not parse_result["success"]:
+            doc_data.update({
+                "parse_status": ParseStatus.FAILED.value,
+                "parse_error": parse_result.get("error")
+            })
+            result["status"] = "parse_failed"
+            result["error"] = parse_result.get("error")
+        else:
+            doc_data.update({
+                "parse_status": ParseStatus.PARSED.value,
+                "parsed_meta": {
+                    "date": parse_result.get("date"),
+                    "month": parse_result.get("month"),
+                    "is_monthly": parse_result.get("is_monthly"),
+                    "net_total": parse_result.get("net_total"),
+                    "food_net": parse_result.get("food_net"),
+                    "beverage_net": parse_result.get("beverage_net")
+                }
+            })
+            result["date"] = parse_result.get("date")
+            
+            # For daily reports: upsert pos_daily_metrics
+            if doc.doc_type == DocType.DAILY and parse_result.get("date"):
+                metrics = PosDailyMetrics(
+                    date=parse_result["date"],
+                    net_total=parse_result["net_total"],
+                    food_net=parse_result["food_net"],
+                    beverage_net=parse_result["beverage_net"],
+                    source_doc_id=doc.id
+                )
+                metrics_ops.append(UpdateOne({"date": metrics.date}, {"$set": metrics.model_dump()}, upsert=True))
+                metric_dates.append(metrics.date)
+                result["status"] = "success"
+                logger.info(f"Daily metrics saved for {metrics.date}: net={metrics.net_total}, food={metrics.food_net}, bev={metrics.beverage_net}")
+            elif doc.doc_type == DocType.MONTHLY:
+                # Monthly: just store, no metrics update (crosscheck only)
+                result["status"] = "success_monthly"
+                monthly.append(parse_result)
+                logger.info(f"Monthly report stored: {parse_result.get('month')}")
         
-        result["status"] = "success"
-        logger.info(f"Daily metrics saved for {metrics.date}: net={metrics.net_total}, food={metrics.food_net}, bev={metrics.beverage_net}")
-    
-    elif doc_type == DocType.MONTHLY:
-        # Monthly: just store, no metrics update (crosscheck only)
-        result["status"] = "success_monthly"
-        logger.info(f"Monthly report stored: {parse_result.get('month')}")
+        # Upsert über den Hash: parallele Läufe legen kein Dokument doppelt an
+        doc_ops.append(UpdateOne(
+            {"file_hash_sha256": doc.file_hash_sha256},
+            {"$setOnInsert": doc_data},
+            upsert=True
+        ))
+    
+    await db.pos_documents.bulk_write(doc_ops, ordered=False)
+    if metrics_ops:
+        await db.pos_daily_metrics.bulk_write(metrics_ops, ordered=True)
+    timings["bulk_write"] = _elapsed_ms(stage_started)
+    
+    # Wochen/Monats/Jahres-Rollups der betroffenen Tage
+    if metric_dates:
+        stage_started = time.monotonic()
+        await safe_refresh_rollups("pos_daily_metrics", metric_dates)
+        timings["rollups"] = _elapsed_ms(stage_started)
+    
+    # Optional: Crosscheck with daily sum
+    for parse_result in monthly:
+        month = parse_result.get("month")
+        if not month:
+            continue
+        daily_rollup = await get_rollup("pos_daily_metrics", "month", month)
         
-        # Optional: Crosscheck with daily sum
-        if parse_result.get("month"):
-            month = parse_result["month"]
-            daily_sum = await db.pos_daily_metrics.aggregate([
-                {"$match": {"date": {"$regex": f"^{month}"}}},
-                {"$group": {"_id": None, "total": {"$sum": "$net_total"}}}
-            ]).to_list(1)
+        if daily_rollup and daily_rollup.get("days"):
+            daily_total = daily_rollup["sums"].get("net_total", 0)
+            monthly_total = parse_result.get("net_total", 0)
+            diff = abs(monthly_total - daily_total)
+            diff_pct = (diff / monthly_total * 100) if monthly_total > 0 else 0
             
-            if daily_sum:
-                daily_total = daily_sum[0].get("total", 0)
-                monthly_total = parse_result.get("net_total", 0)
-                diff = abs(monthly_total - daily_total)
-                diff_pct = (diff / monthly_total * 100) if monthly_total > 0 else 0
-                
-                if diff > 50 or diff_pct > 1:
-                    logger.warning(
-                        f"Monthly crosscheck mismatch for {month}: "
-                        f"Monthly={monthly_total:.2f}, Daily Sum={daily_total:.2f}, "
-                        f"Diff={diff:.2f} ({diff_pct:.1f}%)"
-                    )
+            if diff > 50 or diff_pct > 1:
+                logger.warning(
+                    f"Monthly crosscheck mismatch for {month}: "
+                    f"Monthly={monthly_total:.2f}, Daily Sum={daily_total:.2f}, "
+                    f"Diff={diff:.2f} ({diff_pct:.1f}%)"
+                )
     
-    return result
+    return results
+
+_ingest_lock = asyncio.Lock()
 
 async def run_mail_ingest() -> Dict[str, Any]:
     """
     Main ingest function: Connect to IMAP, fetch new mails, process PDFs.
     Called by scheduler every 10 minutes.
+    
+    IMAP und PDF-Parsing laufen in Thread/Prozesspool; Laufzeiten pro Stufe in result["timings_ms"].
     """
     result = {
         "status": "error",
@@ -697,6 +852,7 @@ async def run_mail_ingest() -> Dict[str, Any]:
         "failed": 0,
         "duplicates": 0,
         "errors": [],
+        "timings_ms": {},
         "started_at": datetime.now(timezone.utc).isoformat(),
         "finished_at": None
     }
@@ -708,95 +864,79 @@ async def run_mail_ingest() -> Dict[str, Any]:
         logger.warning("Mail ingest skipped: POS_IMAP_PASSWORD not configured")
         return result
     
-    client = IMAPClient()
+    total_started = time.monotonic()
+    timings = result["timings_ms"]
     
-    try:
-        # Connect
-        if not client.connect():
-            result["errors"].append("IMAP connection failed")
-            return result
-        
-        # Select folder
-        if not client.select_folder(POS_IMAP_FOLDER):
-            result["errors"].append(f"Could not select folder: {POS_IMAP_FOLDER}")
-            return result
-        
-        # Get last processed UID
-        last_uid = await get_last_processed_uid()
-        logger.info(f"Starting mail ingest from UID > {last_uid}")
-        
-        # Search for new mails
-        uids = client.search_mails(since_uid=last_uid)
-        logger.info(f"Found {len(uids)} potential new mails")
-        
-        max_uid = last_uid
-        
-        for uid in uids:
-            try:
-                # Fetch mail
-                mail_info = client.fetch_mail(uid)
-                
-                if not mail_info:
-                    result["skipped"] += 1
-                    max_uid = max(max_uid, uid)
-                    continue
-                
-                # Process attachments
-                if not mail_info.get("attachments"):
-                    logger.debug(f"Mail UID {uid} has no PDF attachments")
-                    result["skipped"] += 1
+    async with _ingest_lock:
+        try:
+            # Get last processed UID
+            last_uid = await get_last_processed_uid()
+            logger.info(f"Starting mail ingest from UID > {last_uid}")
+            
+            fetched = await asyncio.to_thread(fetch_new_mails, last_uid)
+            timings.update(fetched["timings_ms"])
+            result["errors"].extend(fetched["errors"])
+            
+            if fetched["ok"]:
+                max_uid = last_uid
+                attachments = []
+                for uid in fetched["uids"]:
                     max_uid = max(max_uid, uid)
-                    continue
-                
-                for attachment in mail_info["attachments"]:
-                    proc_result = await process_pdf_attachment(
-                        attachment["content"],
-                        attachment["name"],
-                        mail_info
-                    )
+                    mail_info = fetched["mails"].get(uid)
                     
-                    if proc_result["status"] == "success":
-                        result["processed"] += 1
-                    elif proc_result["status"] == "success_monthly":
+                    if not mail_info:
+                        result["skipped"] += 1
+                        continue
+                    
+                    if not mail_info.get("attachments"):
+                        logger.debug(f"Mail UID {uid} has no PDF attachments")
+                        result["skipped"] += 1
+                        continue
+                    
+                    for attachment in mail_info["attachments"]:
+                        attachments.append((attachment["content"], attachment["name"], mail_info))
+                
+                for proc_result in await process_pdf_attachments(attachments, timings):
+                    if proc_result["status"] in ("success", "success_monthly"):
                         result["processed"] += 1
                     elif proc_result["status"] == "duplicate":
                         result["duplicates"] += 1
                     else:
                         result["failed"] += 1
-                        result["errors"].append(f"{attachment['name']}: {proc_result.get('error')}")
+                        result["errors"].append(f"{proc_result['filename']}: {proc_result.get('error')}")
                 
-                max_uid = max(max_uid, uid)
+                # Update last processed UID
+                if max_uid > last_uid:
+                    await set_last_processed_uid(max_uid)
+                    logger.info(f"Updated last processed UID to {max_uid}")
                 
-            except Exception as e:
-                logger.error(f"Error processing mail UID {uid}: {e}")
-                result["failed"] += 1
-                result["errors"].append(f"UID {uid}: {str(e)}")
-                max_uid = max(max_uid, uid)
-        
-        # Update last processed UID
-        if max_uid > last_uid:
-            await set_last_processed_uid(max_uid)
-            logger.info(f"Updated last processed UID to {max_uid}")
-        
-        result["status"] = "success"
-        
-    except Exception as e:
-        logger.error(f"Mail ingest error: {e}")
-        result["errors"].append(str(e))
-    
-    finally:
-        client.disconnect()
+                result["status"] = "success"
+            
+        except Exception as e:
+            logger.error(f"Mail ingest error: {e}")
+            result["errors"].append(str(e))
     
+    timings["total"] = _elapsed_ms(total_started)
     result["finished_at"] = datetime.now(timezone.utc).isoformat()
     
     # Log summary
     logger.info(
         f"Mail ingest complete: {result['processed']} processed, "
-        f"{result['duplicates']} duplicates, {result['failed']} failed"
+        f"{result['duplicates']} duplicates, {result['failed']} failed ({timings['total']} ms)"
     )
     
     return result
 
+async def record_ingest_log(result: Dict[str, Any], trigger: str = "scheduler"):
+    """Ingest-Ergebnis inkl. Stufen-Laufzeiten in pos_ingest_logs speichern"""
+    await db.pos_ingest_logs.insert_one({
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "trigger": trigger,
+        "timings_ms": result.get("timings_ms", {}),
+        "result": result
+    })
+
 
 # ============== SCHEDULER ==============
 
@@ -813,11 +953,7 @@ async def scheduler_loop():
             result = await run_mail_ingest()
             
             # Save ingest log
-            await db.pos_ingest_logs.insert_one({
-                "id": str(uuid.uuid4()),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "result": result
-            })
+            await record_ingest_log(result, "scheduler")
             
         except Exception as e:
             logger.error(f"Scheduler error: {e}")
@@ -865,6 +1001,7 @@ async def trigger_ingest(user: dict = Depends(require_admin)):
     Useful for testing or immediate import.
     """
     result = await run_mail_ingest()
+    await record_ingest_log(result, "manual")
     return result
 
 @pos_mail_router.get("/documents")
@@ -973,6 +1110,24 @@ async def stop_scheduler_endpoint(user: dict = Depends(require_admin)):
     return {"status": "stopped"}
 
 
+@pos_mail_router.get("/daily-metrics/rollups")
+async def list_daily_metrics_rollups(
+    period: str = Query("month", pattern="^(week|month|year)$"),
+    from_bucket: Optional[str] = Query(None, alias="from"),
+    to_bucket: Optional[str] = Query(None, alias="to"),
+    user: dict = Depends(require_admin)
+):
+    """Vorberechnete Wochen-/Monats-/Jahreswerte (admin-only), z.B. Vorjahresvergleich"""
+    rollups = await list_rollups("pos_daily_metrics", period, from_bucket, to_bucket)
+    return {"period": period, "count": len(rollups), "rollups": rollups}
+
+
+@pos_mail_router.post("/daily-metrics/rollups/rebuild")
+async def rebuild_daily_metrics_rollups(user: dict = Depends(require_admin)):
+    """Rollups komplett neu aufbauen (admin-only)"""
+    return await rebuild_rollups("pos_daily_metrics")
+
+
 # ============== CROSSCHECK & MONTHLY CONFIRM ==============
 
 # Crosscheck thresholds (configurable)
@@ -1015,26 +1170,16 @@ async def crosscheck_pos_month(month: str) -> Dict[str, Any]:
         "checked_at": datetime.now(timezone.utc).isoformat()
     }
     
-    # 1. Get daily sum for month
-    daily_pipeline = [
-        {"$match": {"date": {"$regex": f"^{month}"}}},
-        {"$group": {
-            "_id": None,
-            "count": {"$sum": 1},
-            "net_total": {"$sum": "$net_total"},
-            "food_net": {"$sum": "$food_net"},
-            "beverage_net": {"$sum": "$beverage_net"}
-        }}
-    ]
-    
-    daily_agg = await db.pos_daily_metrics.aggregate(daily_pipeline).to_list(1)
+    # 1. Get daily sum for month (Monats-Rollup, wird bei jedem Import aktualisiert)
+    daily_rollup = await get_rollup("pos_daily_metrics", "month", month)
     
-    if daily_agg:
+    if daily_rollup and daily_rollup.get("days"):
+        sums = daily_rollup["sums"]
         result["has_daily_data"] = True
-        result["daily_count"] = daily_agg[0].get("count", 0)
-        result["daily_sum_net_total"] = round(daily_agg[0].get("net_total", 0), 2)
-        result["daily_sum_food_net"] = round(daily_agg[0].get("food_net", 0), 2)
-        result["daily_sum_beverage_net"] = round(daily_agg[0].get("beverage_net", 0), 2)
+        result["daily_count"] = daily_rollup["days"]
+        result["daily_sum_net_total"] = round(sums.get("net_total", 0), 2)
+        result["daily_sum_food_net"] = round(sums.get("food_net", 0), 2)
+        result["daily_sum_beverage_net"] = round(sums.get("beverage_net", 0), 2)
     
     # 2. Get monthly PDF (latest for this month)
     monthly_doc = await db.pos_documents.find_one(
@@ -0,0 +1,334 @@
+"""
+GastroCore POS KPI Rollups
+================================================================================
+Vorberechnete Aggregate über die POS-Tageswerte.
+
+Quellen:
+- pos_daily_metrics (Mail-Ingest, pos_mail_module)
+- pos_daily_kpis    (Z-Bericht-Import, pos_zreport_module)
+
+Buckets pro Quelle in pos_kpi_rollups:
+- week  (ISO-Woche, z.B. 2025-W09)
+- month (z.B. 2025-03)
+- year  (z.B. 2025, Summe der Monats-Rollups)
+
+Jeder Bucket enthält Tage, Summen je Kennzahl, Summen je Wochentag
+und je Warengruppe. Alle Werte sind additiv - Anteile/Durchschnitte
+werden erst beim Lesen gebildet.
+
+Aktualisierung: nach jedem Import werden nur die betroffenen Wochen/Monate
+aus den Tageswerten neu berechnet, danach die Jahre aus den Monaten.
+"""
+
+from datetime import datetime, date as date_type, timedelta, timezone
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+import logging
+
+from pymongo import UpdateOne
+
+from core.database import db
+from core.indexes import register_indexes, index
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+ROLLUP_COLLECTION = "pos_kpi_rollups"
+PERIODS = ("week", "month", "year")
+
+ROLLUP_SOURCES: Dict[str, Dict[str, Any]] = {
+    "pos_daily_metrics": {
+        "date_field": "date",
+        "fields": ["net_total", "food_net", "beverage_net"],
+        "groups": {"food": "food_net", "beverage": "beverage_net"},
+    },
+    "pos_daily_kpis": {
+        "date_field": "date_business",
+        "fields": [
+            "net_total", "gross_total", "net_food", "net_beverage", "net_nonfood",
+            "tax_7", "tax_19", "tax_0", "discount_amount", "storno_amount", "tips_amount",
+            # Summe der Tagesanteile -> Ø Getränkeanteil pro Tag = Summe / Tage
+            "beverage_share",
+        ],
+        "groups": {"food": "net_food", "beverage": "net_beverage", "nonfood": "net_nonfood"},
+    },
+}
+
+register_indexes(
+    ROLLUP_COLLECTION,
+    index(("key", 1), unique=True),
+    index(("source", 1), ("period", 1), ("bucket", 1)),
+)
+
+
+# ============== BUCKETS ==============
+
+def _parse_date(value: str) -> Optional[date_type]:
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None
+
+
+def week_bucket(day: date_type) -> str:
+    iso = day.isocalendar()
+    return f"{iso[0]}-W{iso[1]:02d}"
+
+
+def bucket_range(period: str, bucket: str) -> Tuple[str, str]:
+    """Erster und letzter Tag eines Buckets (YYYY-MM-DD)"""
+    if period == "week":
+        year, week = bucket.split("-W")
+        start = date_type.fromisocalendar(int(year), int(week), 1)
+        end = start + timedelta(days=6)
+    elif period == "month":
+        year, month = (int(p) for p in bucket.split("-"))
+        start = date_type(year, month, 1)
+        end = (date_type(year + month // 12, month % 12 + 1, 1)) - timedelta(days=1)
+    else:
+        start = date_type(int(bucket), 1, 1)
+        end = date_type(int(bucket), 12, 31)
+    return start.isoformat(), end.isoformat()
+
+
+def _rollup_key(source: str, period: str, bucket: str) -> str:
+    return f"{source}:{period}:{bucket}"
+
+
+def _empty_totals(fields: List[str]) -> Dict[str, Any]:
+    return {"days": 0, "sums": {f: 0.0 for f in fields}, "by_weekday": {}}
+
+
+def _add_day(totals: Dict[str, Any], fields: List[str], weekday: int, doc: Dict[str, Any]):
+    totals["days"] += 1
+    wd = totals["by_weekday"].setdefault(str(weekday), {"days": 0, **{f: 0.0 for f in fields}})
+    wd["days"] += 1
+    for f in fields:
+        value = doc.get(f) or 0
+        totals["sums"][f] += value
+        wd[f] += value
+
+
+def _merge(totals: Dict[str, Any], other: Dict[str, Any], fields: List[str]):
+    totals["days"] += other.get("days", 0)
+    for f in fields:
+        totals["sums"][f] += (other.get("sums") or {}).get(f, 0) or 0
+    for wd_key, wd_vals in (other.get("by_weekday") or {}).items():
+        wd = totals["by_weekday"].setdefault(wd_key, {"days": 0, **{f: 0.0 for f in fields}})
+        wd["days"] += wd_vals.get("days", 0)
+        for f in fields:
+            wd[f] += wd_vals.get(f, 0) or 0
+
+
+def _rollup_doc(source: str, period: str, bucket: str, totals: Dict[str, Any]) -> Dict[str, Any]:
+    config = ROLLUP_SOURCES[source]
+    from_date, to_date = bucket_range(period, bucket)
+    sums = {f: round(v, 2) for f, v in totals["sums"].items()}
+    by_weekday = {
+        k: {f: (round(v, 2) if f != "days" else v) for f, v in vals.items()}
+        for k, vals in sorted(totals["by_weekday"].items())
+    }
+    return {
+        "key": _rollup_key(source, period, bucket),
+        "source": source,
+        "period": period,
+        "bucket": bucket,
+        "from_date": from_date,
+        "to_date": to_date,
+        "days": totals["days"],
+        "sums": sums,
+        "by_weekday": by_weekday,
+        "groups": {group: sums.get(field, 0) for group, field in config["groups"].items()},
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+# ============== REFRESH ==============
+
+async def _load_days(source: str, from_date: str, to_date: str) -> List[Dict[str, Any]]:
+    config = ROLLUP_SOURCES[source]
+    date_field = config["date_field"]
+    projection = {"_id": 0, date_field: 1, **{f: 1 for f in config["fields"]}}
+    return await db[source].find(
+        {date_field: {"$gte": from_date, "$lte": to_date}},
+        projection
+    ).to_list(None)
+
+
+async def refresh_rollups(source: str, dates: Iterable[str]) -> Dict[str, int]:
+    """
+    Rollups der von `dates` betroffenen Buckets neu berechnen.
+
+    Wochen/Monate aus den Tageswerten (ein Query über die Gesamtspanne),
+    Jahre aus den Monats-Rollups.
+    """
+    config = ROLLUP_SOURCES[source]
+    fields = config["fields"]
+    date_field = config["date_field"]
+
+    days = sorted({d for d in (_parse_date(x) for x in dates if x) if d})
+    if not days:
+        return {"week": 0, "month": 0, "year": 0}
+
+    weeks = {week_bucket(d) for d in days}
+    months = {d.strftime("%Y-%m") for d in days}
+    years = {str(d.year) for d in days}
+
+    ranges = [bucket_range("week", w) for w in weeks] + [bucket_range("month", m) for m in months]
+    span_from = min(r[0] for r in ranges)
+    span_to = max(r[1] for r in ranges)
+
+    totals = {("week", w): _empty_totals(fields) for w in weeks}
+    totals.update({("month", m): _empty_totals(fields) for m in months})
+
+    for doc in await _load_days(source, span_from, span_to):
+        day = _parse_date(doc.get(date_field))
+        if not day:
+            continue
+        weekday = day.isoweekday()
+        for key in (("week", week_bucket(day)), ("month", day.strftime("%Y-%m"))):
+            if key in totals:
+                _add_day(totals[key], fields, weekday, doc)
+
+    ops = [
+        UpdateOne(
+            {"key": _rollup_key(source, period, bucket)},
+            {"$set": _rollup_doc(source, period, bucket, t)},
+            upsert=True
+        )
+        for (period, bucket), t in totals.items()
+    ]
+    await db[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+
+    # Jahre aus den (jetzt aktuellen) Monats-Rollups
+    month_docs = await db[ROLLUP_COLLECTION].find(
+        {"source": source, "period": "month", "bucket": {"$regex": f"^({'|'.join(sorted(years))})-"}},
+        {"_id": 0}
+    ).to_list(None)
+    year_totals = {y: _empty_totals(fields) for y in years}
+    for doc in month_docs:
+        _merge(year_totals[doc["bucket"][:4]], doc, fields)
+    await db[ROLLUP_COLLECTION].bulk_write([
+        UpdateOne(
+            {"key": _rollup_key(source, "year", year)},
+            {"$set": _rollup_doc(source, "year", year, t)},
+            upsert=True
+        )
+        for year, t in year_totals.items()
+    ], ordered=False)
+
+    return {"week": len(weeks), "month": len(months), "year": len(years)}
+
+
+async def safe_refresh_rollups(source: str, dates: Iterable[str]):
+    """Rollup-Refresh nach einem Import - Fehler blockieren den Import nicht"""
+    try:
+        await refresh_rollups(source, dates)
+    except Exception as e:
+        logger.warning(f"Rollup-Refresh {source} fehlgeschlagen: {e}")
+
+
+async def rebuild_rollups(source: str) -> Dict[str, Any]:
+    """Alle Rollups einer Quelle neu aufbauen (Backfill / Reparatur)"""
+    date_field = ROLLUP_SOURCES[source]["date_field"]
+    dates = await db[source].distinct(date_field)
+    await db[ROLLUP_COLLECTION].delete_many({"source": source})
+    counts = await refresh_rollups(source, dates)
+    logger.info(f"Rollups {source} neu aufgebaut: {len(dates)} Tage, {counts}")
+    return {"source": source, "days": len(dates), "buckets": counts}
+
+
+# ============== READ ==============
+
+async def get_rollup(source: str, period: str, bucket: str, build_missing: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Ein Bucket. Fehlt er (Altdaten vor Einführung der Rollups),
+    wird er einmalig aus den Tageswerten aufgebaut.
+    """
+    doc = await db[ROLLUP_COLLECTION].find_one({"key": _rollup_key(source, period, bucket)}, {"_id": 0})
+    if doc or not build_missing:
+        return doc
+    from_date, _ = bucket_range(period, bucket)
+    if period == "year":
+        # Alle Monate des Jahres mit Daten
+        date_field = ROLLUP_SOURCES[source]["date_field"]
+        dates = await db[source].distinct(date_field, {date_field: {"$regex": f"^{bucket}-"}})
+    else:
+        dates = [from_date]
+    if not dates:
+        return None
+    await refresh_rollups(source, dates)
+    return await db[ROLLUP_COLLECTION].find_one({"key": _rollup_key(source, period, bucket)}, {"_id": 0})
+
+
+async def list_rollups(
+    source: str,
+    period: str,
+    from_bucket: Optional[str] = None,
+    to_bucket: Optional[str] = None,
+    limit: int = 500
+) -> List[Dict[str, Any]]:
+    """Buckets eines Zeitraums, aufsteigend"""
+    query: Dict[str, Any] = {"source": source, "period": period}
+    if from_bucket or to_bucket:
+        query["bucket"] = {}
+        if from_bucket:
+            query["bucket"]["$gte"] = from_bucket
+        if to_bucket:
+            query["bucket"]["$lte"] = to_bucket
+    return await db[ROLLUP_COLLECTION].find(query, {"_id": 0}).sort("bucket", 1).to_list(limit)
+
+
+async def summarize_range(source: str, from_date: str, to_date: str) -> Dict[str, Any]:
+    """
+    Summen über einen beliebigen Datumsbereich:
+    vollständig enthaltene Monate aus den Rollups, Randtage aus den Tageswerten.
+
+    Returns: {"days", "sums", "by_weekday", "groups"} (additiv, ungerundet)
+    """
+    config = ROLLUP_SOURCES[source]
+    fields = config["fields"]
+    date_field = config["date_field"]
+    start, end = _parse_date(from_date), _parse_date(to_date)
+    totals = _empty_totals(fields)
+    if not start or not end or start > end:
+        return {**totals, "groups": {}}
+
+    full_months: List[str] = []
+    partial: List[Tuple[str, str]] = []
+    cursor = date_type(start.year, start.month, 1)
+    while cursor <= end:
+        month = cursor.strftime("%Y-%m")
+        m_from, m_to = bucket_range("month", month)
+        if m_from >= start.isoformat() and m_to <= end.isoformat():
+            full_months.append(month)
+        else:
+            partial.append((max(m_from, start.isoformat()), min(m_to, end.isoformat())))
+        cursor = date_type(cursor.year + cursor.month // 12, cursor.month % 12 + 1, 1)
+
+    if full_months:
+        docs = await db[ROLLUP_COLLECTION].find(
+            {"source": source, "period": "month", "bucket": {"$in": full_months}},
+            {"_id": 0}
+        ).to_list(len(full_months))
+        # Rollups ohne alle aktuellen Kennzahlen (Feld neu hinzugekommen) gelten als fehlend
+        complete = {d["bucket"] for d in docs if all(f in (d.get("sums") or {}) for f in fields)}
+        missing = set(full_months) - complete
+        if missing:
+            # Altdaten: fehlende Monate einmalig aufbauen
+            await refresh_rollups(source, [bucket_range("month", m)[0] for m in missing])
+            docs = await db[ROLLUP_COLLECTION].find(
+                {"source": source, "period": "month", "bucket": {"$in": full_months}},
+                {"_id": 0}
+            ).to_list(len(full_months))
+        for doc in docs:
+            _merge(totals, doc, fields)
+
+    for p_from, p_to in partial:
+        for doc in await _load_days(source, p_from, p_to):
+            day = _parse_date(doc.get(date_field))
+            if day:
+                _add_day(totals, fields, day.isoweekday(), doc)
+
+    totals["groups"] = {group: totals["sums"].get(field, 0) for group, field in config["groups"].items()}
+    return totals
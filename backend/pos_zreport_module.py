@@ -8,17 +8,27 @@ Gastronovi Z-Bericht PDF Import Module
 
 import os
 import re
+import time
+import asyncio
 import hashlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from enum import Enum
 import uuid
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from pydantic import BaseModel
+from pymongo import UpdateOne
 import pdfplumber
 
+from core.auth import require_admin
+from core.indexes import register_indexes, index
+from pos_rollups import safe_refresh_rollups, summarize_range, list_rollups, rebuild_rollups
+
 # Logging
 logger = logging.getLogger("pos_zreport")
 
@@ -38,6 +48,23 @@ def set_db(database):
 PARSER_VERSION = "1.0.0"
 UPLOAD_DIR = "/app/uploads/z_reports"
 
+# Text-Extraktion (pdfplumber) ist CPU-lastig -> Worker-Prozesse
+ZREPORT_PARSE_WORKERS = int(os.getenv("ZREPORT_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+TEXT_EXTRACTOR = "pdfplumber"
+BULK_REPARSE_BATCH_SIZE = 500  # Berichte pro Block im Bulk-Reparse
+
+# Extrahierter Seitentext pro PDF-Hash (Reparse ohne erneute Extraktion)
+register_indexes(
+    "pos_z_reports_text",
+    index(("pdf_hash", 1), unique=True),
+)
+register_indexes(
+    "pos_z_reports_raw",
+    index(("pdf_hash", 1)),
+    index(("report_key", 1)),
+    index(("date_business", 1)),
+)
+
 # ============== MODELS ==============
 
 class ImportStatus(str, Enum):
@@ -320,6 +347,11 @@ def extract_pdf_text(pdf_path: str) -> tuple[str, bool]:
 
 def parse_zreport_pdf(pdf_path: str) -> Dict[str, Any]:
     """Full parsing pipeline for Z-Report PDF"""
+    text, has_text = extract_pdf_text(pdf_path)
+    return parse_zreport_text(text, has_text)
+
+def parse_zreport_text(text: str, has_text: bool = True) -> Dict[str, Any]:
+    """Section-Parser (Regex) auf bereits extrahiertem Text"""
     result = {
         "success": False,
         "error": None,
@@ -329,9 +361,6 @@ def parse_zreport_pdf(pdf_path: str) -> Dict[str, Any]:
         "kpis": {}
     }
     
-    # Extract text
-    text, has_text = extract_pdf_text(pdf_path)
-    
     if not has_text:
         result["error"] = "needs_ocr"
         return result
@@ -401,6 +430,166 @@ def parse_zreport_pdf(pdf_path: str) -> Dict[str, Any]:
     
     return result
 
+def parse_zreport_texts(texts: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    """Section-Parser für einen Block von Texten (ein Worker-Aufruf pro Block)"""
+    return [parse_zreport_text(text, has_text) for text, has_text in texts]
+
+# ============== PARSE POOL & TEXT CACHE ==============
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Prozesspool für die Text-Extraktion (lazy, None bei ZREPORT_PARSE_WORKERS <= 1)"""
+    global _parse_pool
+    if ZREPORT_PARSE_WORKERS <= 1:
+        return None
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=ZREPORT_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+def shutdown_parse_pool():
+    """Prozesspool beenden (Shutdown)"""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+async def run_in_parse_pool(func, *args):
+    """
+    func(*args) in einem Worker-Prozess ausführen.
+    Fällt auf einen Thread zurück, wenn der Pool nicht verfügbar/defekt ist.
+    """
+    global _parse_pool
+    loop = asyncio.get_running_loop()
+    pool = None
+    try:
+        pool = get_parse_pool()
+    except Exception as e:
+        logger.warning(f"Z-Bericht Prozesspool nicht verfügbar: {e}")
+    if pool is not None:
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool as e:
+            # Worker abgestürzt - Pool verwerfen, im Thread weiter
+            logger.warning(f"Z-Bericht Prozesspool defekt ({e}) - Fallback auf Thread")
+            _parse_pool = None
+    return await asyncio.to_thread(func, *args)
+
+async def get_cached_texts(pdf_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Gecachte Texte per Hash (ein Query)"""
+    if not pdf_hashes:
+        return {}
+    docs = await db.pos_z_reports_text.find(
+        {"pdf_hash": {"$in": list(set(pdf_hashes))}},
+        {"_id": 0}
+    ).to_list(len(pdf_hashes))
+    return {d["pdf_hash"]: d for d in docs}
+
+def _text_cache_op(pdf_hash: str, text: str, has_text: bool) -> UpdateOne:
+    return UpdateOne(
+        {"pdf_hash": pdf_hash},
+        {"$set": {
+            "pdf_hash": pdf_hash,
+            "text": text,
+            "has_text": has_text,
+            "extractor": TEXT_EXTRACTOR,
+            "extracted_at": datetime.now(timezone.utc).isoformat()
+        }},
+        upsert=True
+    )
+
+async def extract_text_cached(pdf_hash: str, pdf_path: str, refresh: bool = False) -> Tuple[str, bool]:
+    """Seitentext aus dem Cache, sonst im Worker-Prozess extrahieren und cachen"""
+    if not refresh:
+        cached = await db.pos_z_reports_text.find_one({"pdf_hash": pdf_hash}, {"_id": 0})
+        if cached:
+            return cached.get("text", ""), cached.get("has_text", False)
+    
+    text, has_text = await run_in_parse_pool(extract_pdf_text, pdf_path)
+    if text:
+        await db.pos_z_reports_text.bulk_write([_text_cache_op(pdf_hash, text, has_text)])
+    return text, has_text
+
+def build_report_writes(
+    report_key: str,
+    date_business: str,
+    parse_result: Dict[str, Any]
+) -> Tuple[Dict[str, List[UpdateOne]], Dict[str, Any]]:
+    """
+    Schreib-Operationen eines geparsten Berichts je Collection
+    (extracted, KPIs, Kellner, Artikel) - für Import, Einzel- und Bulk-Reparse.
+    
+    Returns: (writes, kpis)
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    sections = parse_result["sections"]
+    
+    kpis = dict(parse_result["kpis"])
+    kpis["date_business"] = date_business
+    kpis["report_key"] = report_key
+    kpis["updated_at"] = now
+    
+    writes = {
+        "pos_z_reports_extracted": [UpdateOne(
+            {"report_key": report_key},
+            {
+                "$set": {
+                    "report_key": report_key,
+                    "extracted_at": now,
+                    "parser_version": PARSER_VERSION,
+                    "sections": sections
+                },
+                "$setOnInsert": {"id": str(uuid.uuid4())}
+            },
+            upsert=True
+        )],
+        "pos_daily_kpis": [UpdateOne({"date_business": date_business}, {"$set": kpis}, upsert=True)],
+        "pos_waiter_daily": [],
+        "pos_item_daily": []
+    }
+    
+    for waiter in sections.get("waiters") or []:
+        writes["pos_waiter_daily"].append(UpdateOne(
+            {"date_business": date_business, "waiter_name": waiter["name"]},
+            {"$set": {
+                "date_business": date_business,
+                "waiter_name": waiter["name"],
+                "transactions": waiter["transactions"],
+                "gross_amount": waiter["gross_amount"],
+                "updated_at": now
+            }},
+            upsert=True
+        ))
+    
+    for item in sections.get("items") or []:
+        writes["pos_item_daily"].append(UpdateOne(
+            {"date_business": date_business, "item_name": item["name"]},
+            {"$set": {
+                "date_business": date_business,
+                "item_name": item["name"],
+                "quantity": item["quantity"],
+                "gross_amount": item["gross_amount"],
+                "updated_at": now
+            }},
+            upsert=True
+        ))
+    
+    return writes, kpis
+
+async def apply_report_writes(writes: Dict[str, List[UpdateOne]], dates: List[str]):
+    """
+    bulk_write je Collection (ordered: spätere Berichte eines Tages gewinnen),
+    danach Rollups der betroffenen Tage aktualisieren.
+    """
+    for collection, ops in writes.items():
+        if ops:
+            await db[collection].bulk_write(ops, ordered=True)
+    if writes.get("pos_daily_kpis"):
+        await safe_refresh_rollups("pos_daily_kpis", dates)
+
 # ============== IMPORT LOGIC ==============
 
 async def import_pdf_file(
@@ -428,8 +617,9 @@ async def import_pdf_file(
     with open(temp_path, 'wb') as f:
         f.write(pdf_content)
     
-    # Parse PDF
-    parse_result = parse_zreport_pdf(temp_path)
+    # Parse PDF (Extraktion im Worker-Prozess, Text wird per Hash gecacht)
+    text, has_text = await extract_text_cached(pdf_hash, temp_path)
+    parse_result = parse_zreport_text(text, has_text)
     
     if not parse_result["success"]:
         os.remove(temp_path)
@@ -468,33 +658,9 @@ async def import_pdf_file(
     }
     await db.pos_z_reports_raw.insert_one(raw_doc)
     
-    # Save extracted data
-    extracted_doc = {
-        "id": str(uuid.uuid4()),
-        "report_key": report_key,
-        "extracted_at": datetime.now(timezone.utc).isoformat(),
-        "parser_version": PARSER_VERSION,
-        "sections": parse_result["sections"]
-    }
-    await db.pos_z_reports_extracted.insert_one(extracted_doc)
-    
-    # Update raw status
-    await db.pos_z_reports_raw.update_one(
-        {"report_key": report_key},
-        {"$set": {"status": ImportStatus.EXTRACTED.value}}
-    )
-    
-    # Save/Update KPIs
-    kpis = parse_result["kpis"]
-    kpis["date_business"] = date_business
-    kpis["report_key"] = report_key
-    kpis["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
-    await db.pos_daily_kpis.update_one(
-        {"date_business": date_business},
-        {"$set": kpis},
-        upsert=True
-    )
+    # Save extracted data, KPIs, waiters, items
+    writes, kpis = build_report_writes(report_key, date_business, parse_result)
+    await apply_report_writes(writes, [date_business])
     
     # Update raw status to normalized
     await db.pos_z_reports_raw.update_one(
@@ -502,36 +668,6 @@ async def import_pdf_file(
         {"$set": {"status": ImportStatus.NORMALIZED.value}}
     )
     
-    # Save waiter data
-    if parse_result["sections"].get("waiters"):
-        for waiter in parse_result["sections"]["waiters"]:
-            await db.pos_waiter_daily.update_one(
-                {"date_business": date_business, "waiter_name": waiter["name"]},
-                {"$set": {
-                    "date_business": date_business,
-                    "waiter_name": waiter["name"],
-                    "transactions": waiter["transactions"],
-                    "gross_amount": waiter["gross_amount"],
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }},
-                upsert=True
-            )
-    
-    # Save item data
-    if parse_result["sections"].get("items"):
-        for item in parse_result["sections"]["items"]:
-            await db.pos_item_daily.update_one(
-                {"date_business": date_business, "item_name": item["name"]},
-                {"$set": {
-                    "date_business": date_business,
-                    "item_name": item["name"],
-                    "quantity": item["quantity"],
-                    "gross_amount": item["gross_amount"],
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }},
-                upsert=True
-            )
-    
     return {
         "status": "success",
         "report_key": report_key,
@@ -543,7 +679,8 @@ async def import_pdf_file(
 
 @pos_router.post("/upload")
 async def upload_zreport(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    user: dict = Depends(require_admin)
 ):
     """
     Upload a Z-Report PDF manually.
@@ -579,7 +716,8 @@ async def upload_zreport(
 
 @pos_router.get("/import-status")
 async def get_import_status(
-    date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format")
+    date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format"),
+    user: dict = Depends(require_admin)
 ):
     """Get import status for a specific date or all"""
     query = {}
@@ -602,7 +740,8 @@ async def get_import_status(
 async def get_kpis(
     from_date: Optional[str] = Query(None, alias="from"),
     to_date: Optional[str] = Query(None, alias="to"),
-    limit: int = Query(30, le=365)
+    limit: int = Query(30, le=365),
+    user: dict = Depends(require_admin)
 ):
     """Get daily KPIs for date range"""
     query = {}
@@ -622,25 +761,51 @@ async def get_kpis(
     
     # Calculate aggregates
     if kpis:
-        total_gross = sum(k.get("gross_total", 0) for k in kpis)
-        total_net = sum(k.get("net_total", 0) for k in kpis)
-        avg_beverage_share = sum(k.get("beverage_share", 0) for k in kpis) / len(kpis)
+        if from_date and to_date:
+            # Gesamter Zeitraum aus den Rollups (unabhängig von limit)
+            totals = await summarize_range("pos_daily_kpis", from_date, to_date)
+            days = totals["days"] or len(kpis)
+            total_gross = totals["sums"].get("gross_total", 0)
+            total_net = totals["sums"].get("net_total", 0)
+            # Ø der Tagesanteile (wie ohne Zeitraum), nicht Getränke-Netto / Gesamt-Brutto
+            avg_beverage_share = totals["sums"].get("beverage_share", 0) / days if totals["days"] else 0
+        else:
+            days = len(kpis)
+            total_gross = sum(k.get("gross_total", 0) for k in kpis)
+            total_net = sum(k.get("net_total", 0) for k in kpis)
+            avg_beverage_share = sum(k.get("beverage_share", 0) for k in kpis) / len(kpis)
         
         return {
             "kpis": kpis,
             "summary": {
-                "days": len(kpis),
+                "days": days,
                 "total_gross": round(total_gross, 2),
                 "total_net": round(total_net, 2),
-                "avg_daily_gross": round(total_gross / len(kpis), 2),
+                "avg_daily_gross": round(total_gross / days, 2),
                 "avg_beverage_share": round(avg_beverage_share, 1)
             }
         }
     
     return {"kpis": [], "summary": None}
 
+@pos_router.get("/kpis/rollups")
+async def get_kpi_rollups(
+    period: str = Query("month", pattern="^(week|month|year)$"),
+    from_bucket: Optional[str] = Query(None, alias="from"),
+    to_bucket: Optional[str] = Query(None, alias="to"),
+    user: dict = Depends(require_admin)
+):
+    """Vorberechnete Wochen-/Monats-/Jahreswerte (Summen, Wochentage, Warengruppen)"""
+    rollups = await list_rollups("pos_daily_kpis", period, from_bucket, to_bucket)
+    return {"period": period, "count": len(rollups), "rollups": rollups}
+
+@pos_router.post("/kpis/rollups/rebuild")
+async def rebuild_kpi_rollups(user: dict = Depends(require_admin)):
+    """Rollups komplett neu aufbauen (admin only)"""
+    return await rebuild_rollups("pos_daily_kpis")
+
 @pos_router.get("/kpis/latest")
-async def get_latest_kpis():
+async def get_latest_kpis(user: dict = Depends(require_admin)):
     """Get the most recent KPIs for dashboard"""
     latest = await db.pos_daily_kpis.find_one(
         {},
@@ -678,7 +843,7 @@ async def get_latest_kpis():
     }
 
 @pos_router.get("/raw/{report_key}")
-async def get_raw_report(report_key: str):
+async def get_raw_report(report_key: str, user: dict = Depends(require_admin)):
     """Get raw report metadata"""
     raw = await db.pos_z_reports_raw.find_one(
         {"report_key": report_key},
@@ -699,58 +864,183 @@ async def get_raw_report(report_key: str):
     }
 
 @pos_router.post("/reparse/{report_key}")
-async def reparse_report(report_key: str):
-    """Re-parse an existing raw PDF (admin only)"""
+async def reparse_report(
+    report_key: str,
+    refresh_text: bool = Query(False),
+    user: dict = Depends(require_admin)
+):
+    """Re-parse an existing raw PDF (admin only) - nutzt den Text-Cache, refresh_text extrahiert neu"""
     raw = await db.pos_z_reports_raw.find_one({"report_key": report_key})
     
     if not raw:
         raise HTTPException(status_code=404, detail="Report not found")
     
     pdf_path = raw.get("pdf_path")
-    if not os.path.exists(pdf_path):
+    cached = None if refresh_text else await db.pos_z_reports_text.find_one({"pdf_hash": raw.get("pdf_hash")}, {"_id": 0})
+    if not cached and not (pdf_path and os.path.exists(pdf_path)):
         raise HTTPException(status_code=404, detail="PDF file not found")
     
     # Re-parse
-    parse_result = parse_zreport_pdf(pdf_path)
+    if cached:
+        text, has_text = cached.get("text", ""), cached.get("has_text", False)
+    else:
+        text, has_text = await extract_text_cached(raw["pdf_hash"], pdf_path, refresh=True)
+    parse_result = parse_zreport_text(text, has_text)
     
     if not parse_result["success"]:
         raise HTTPException(status_code=422, detail=f"Parse failed: {parse_result.get('error')}")
     
-    # Update extracted
-    await db.pos_z_reports_extracted.update_one(
-        {"report_key": report_key},
-        {"$set": {
-            "extracted_at": datetime.now(timezone.utc).isoformat(),
-            "parser_version": PARSER_VERSION,
-            "sections": parse_result["sections"]
-        }},
-        upsert=True
-    )
-    
-    # Update KPIs
-    kpis = parse_result["kpis"]
-    kpis["date_business"] = raw["date_business"]
-    kpis["report_key"] = report_key
-    kpis["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
-    await db.pos_daily_kpis.update_one(
-        {"date_business": raw["date_business"]},
-        {"$set": kpis},
-        upsert=True
-    )
+    # Update extracted, KPIs, waiters, items
+    writes, kpis = build_report_writes(report_key, raw["date_business"], parse_result)
+    await apply_report_writes(writes, [raw["date_business"]])
     
     return {
         "success": True,
         "message": "Report re-parsed successfully",
+        "text_cached": bool(cached),
         "kpis": kpis
     }
 
+class BulkReparseRequest(BaseModel):
+    from_date: Optional[str] = None
+    to_date: Optional[str] = None
+    report_keys: Optional[List[str]] = None
+    refresh_text: bool = False  # True: PDFs neu extrahieren, sonst nur Section-Parser auf gecachtem Text
+
+@pos_router.post("/reparse")
+async def bulk_reparse_reports(data: BulkReparseRequest, user: dict = Depends(require_admin)):
+    """
+    Bulk-Reparse (admin only), z.B. nach einem Regex-Fix.
+    
+    - Text aus pos_z_reports_text (fehlende Texte werden parallel in Worker-Prozessen extrahiert)
+    - Section-Parser blockweise über alle CPU-Kerne
+    - Ergebnisse per bulk_write
+    """
+    started = time.monotonic()
+    timings: Dict[str, int] = {"load": 0, "extract": 0, "parse": 0, "write": 0}
+    
+    query: Dict[str, Any] = {}
+    if data.report_keys:
+        query["report_key"] = {"$in": data.report_keys}
+    if data.from_date or data.to_date:
+        query["date_business"] = {}
+        if data.from_date:
+            query["date_business"]["$gte"] = data.from_date
+        if data.to_date:
+            query["date_business"]["$lte"] = data.to_date
+    
+    totals = {"total": 0, "reparsed": 0, "hits": 0, "extracted": 0}
+    failed: List[Dict[str, Any]] = []
+    
+    def lap(stage_name: str, since: float) -> float:
+        now = time.monotonic()
+        timings[stage_name] += int((now - since) * 1000)
+        return now
+    
+    async def reparse_batch(raws: List[dict], stage: float):
+        cached = {} if data.refresh_text else await get_cached_texts([r["pdf_hash"] for r in raws if r.get("pdf_hash")])
+        stage = lap("load", stage)
+        texts: Dict[str, Tuple[str, bool]] = {
+            h: (c.get("text", ""), c.get("has_text", False)) for h, c in cached.items()
+        }
+        
+        # Fehlende Texte extrahieren (je PDF ein Worker-Job)
+        to_extract: Dict[str, str] = {}
+        for raw in raws:
+            pdf_hash = raw.get("pdf_hash")
+            if not pdf_hash or pdf_hash in texts or pdf_hash in to_extract:
+                continue
+            if raw.get("pdf_path") and os.path.exists(raw["pdf_path"]):
+                to_extract[pdf_hash] = raw["pdf_path"]
+        
+        if to_extract:
+            extracted = await asyncio.gather(*[
+                run_in_parse_pool(extract_pdf_text, path) for path in to_extract.values()
+            ])
+            cache_ops = []
+            for pdf_hash, (text, has_text) in zip(to_extract.keys(), extracted):
+                texts[pdf_hash] = (text, has_text)
+                if text:
+                    cache_ops.append(_text_cache_op(pdf_hash, text, has_text))
+            if cache_ops:
+                await db.pos_z_reports_text.bulk_write(cache_ops, ordered=False)
+        stage = lap("extract", stage)
+        
+        # Section-Parser blockweise über den Pool
+        parsable = []
+        for raw in raws:
+            if raw.get("pdf_hash") in texts:
+                parsable.append(raw)
+            else:
+                failed.append({"report_key": raw["report_key"], "error": "pdf_not_found"})
+        
+        chunk_size = max(1, -(-len(parsable) // max(1, ZREPORT_PARSE_WORKERS * 4)))
+        chunks = [parsable[i:i + chunk_size] for i in range(0, len(parsable), chunk_size)]
+        parsed_chunks = await asyncio.gather(*[
+            run_in_parse_pool(parse_zreport_texts, [texts[r["pdf_hash"]] for r in chunk])
+            for chunk in chunks
+        ])
+        stage = lap("parse", stage)
+        
+        # Schreiben
+        all_writes: Dict[str, List[UpdateOne]] = {}
+        dates: List[str] = []
+        for chunk, results in zip(chunks, parsed_chunks):
+            for raw, parse_result in zip(chunk, results):
+                if not parse_result["success"]:
+                    failed.append({"report_key": raw["report_key"], "error": parse_result.get("error")})
+                    continue
+                writes, _ = build_report_writes(raw["report_key"], raw["date_business"], parse_result)
+                for collection, ops in writes.items():
+                    all_writes.setdefault(collection, []).extend(ops)
+                dates.append(raw["date_business"])
+                totals["reparsed"] += 1
+        await apply_report_writes(all_writes, dates)
+        lap("write", stage)
+        
+        totals["total"] += len(raws)
+        totals["hits"] += len(cached)
+        totals["extracted"] += len(to_extract)
+    
+    # Chronologisch: bei mehreren Berichten eines Tages gewinnt der zuletzt empfangene (KPIs je Tag).
+    # Cursor blockweise abarbeiten - kein Limit, Speicher bleibt pro Block begrenzt
+    batch: List[dict] = []
+    stage = time.monotonic()
+    async for raw in db.pos_z_reports_raw.find(
+        query,
+        {"_id": 0, "report_key": 1, "date_business": 1, "pdf_hash": 1, "pdf_path": 1}
+    ).sort([("date_business", 1), ("received_at", 1)]):
+        batch.append(raw)
+        if len(batch) >= BULK_REPARSE_BATCH_SIZE:
+            await reparse_batch(batch, stage)
+            batch = []
+            stage = time.monotonic()
+    if batch:
+        await reparse_batch(batch, stage)
+    timings["total"] = int((time.monotonic() - started) * 1000)
+    
+    logger.info(
+        f"Z-Bericht Bulk-Reparse: {totals['reparsed']}/{totals['total']} ok, "
+        f"{totals['extracted']} extrahiert, {totals['hits']} aus Cache ({timings['total']} ms)"
+    )
+    
+    return {
+        "success": not failed,
+        "total": totals["total"],
+        "reparsed": totals["reparsed"],
+        "failed": failed,
+        "text_cache": {"hits": totals["hits"], "extracted": totals["extracted"]},
+        "parser_version": PARSER_VERSION,
+        "timings_ms": timings
+    }
+
 @pos_router.get("/stats")
-async def get_import_stats():
+async def get_import_stats(user: dict = Depends(require_admin)):
     """Get overall import statistics"""
     raw_count = await db.pos_z_reports_raw.count_documents({})
     extracted_count = await db.pos_z_reports_extracted.count_documents({})
     kpis_count = await db.pos_daily_kpis.count_documents({})
+    text_cache_count = await db.pos_z_reports_text.count_documents({})
     
     # Status breakdown
     status_counts = {}
@@ -762,5 +1052,6 @@ async def get_import_stats():
         "raw_reports": raw_count,
         "extracted_reports": extracted_count,
         "daily_kpis": kpis_count,
+        "text_cache": text_cache_count,
         "status_breakdown": status_counts
     }
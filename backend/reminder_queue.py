@@ -0,0 +1,443 @@
+"""
+GastroCore Reminder Queue
+================================================================================
+Ereignisgesteuerte Reservierungs-Erinnerungen (ersetzt den manuellen Sweep
+über /reminders/process).
+
+- Beim Anlegen/Bestätigen/Verschieben einer Reservierung werden die Fälligkeiten
+  aller aktiven reminder_rules berechnet und in reminder_queue abgelegt
+  (1 Dokument pro Reservierung + Regel, key = "<reservation_id>:<rule_id>")
+- Storno/Archivierung/Statuswechsel weg von "bestaetigt" storniert offene Einträge
+- Ein Hintergrund-Worker least fällige Einträge batchweise (due_at-Index),
+  prüft sie gegen den aktuellen Stand der Reservierungen (ein $in-Query),
+  reiht die Mails in die E-Mail-Outbox ein und setzt die reminder_<n>h_sent-Flags
+  per bulk_write
+
+Zeiten: Reservierungsdatum/-uhrzeit sind Ortszeit (Europe/Berlin), due_at ist UTC.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, List
+
+import pytz
+from pymongo import UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError
+
+from core.database import db
+from core.indexes import register_indexes, index
+from email_service import send_reminder_email
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+BERLIN_TZ = pytz.timezone("Europe/Berlin")
+REMINDER_STATUS = "bestaetigt"  # Nur bestätigte Reservierungen erhalten Erinnerungen
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "100"))
+REMINDER_LEASE_SECONDS = 300
+REMINDER_IDLE_POLL_SECONDS = 60
+REMINDER_MAX_ATTEMPTS = 5
+REMINDER_LATE_GRACE_MINUTES = 60  # Verpasste Fälligkeit: nur innerhalb dieser Frist nachholen
+REMINDER_BACKFILL_DAYS = 8  # > längste Regel (168h)
+
+
+class QueueStatus:
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    CANCELLED = "cancelled"
+
+
+register_indexes(
+    "reminder_queue",
+    index(("key", 1), unique=True),
+    index(("status", 1), ("due_at", 1)),
+    index(("status", 1), ("lease_until", 1)),
+    index(("reservation_id", 1), ("status", 1)),
+)
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def reminder_key(hours_before: int) -> str:
+    """Flag auf der Reservierung, z.B. reminder_24h_sent"""
+    return f"reminder_{hours_before}h_sent"
+
+
+def reservation_start_utc(reservation: dict) -> Optional[datetime]:
+    """Beginn der Reservierung (Ortszeit Europe/Berlin) als UTC"""
+    try:
+        local = datetime.strptime(f"{reservation.get('date')} {(reservation.get('time') or '')[:5]}", "%Y-%m-%d %H:%M")
+    except (ValueError, TypeError):
+        return None
+    return BERLIN_TZ.localize(local).astimezone(timezone.utc)
+
+
+def wants_reminders(reservation: Optional[dict]) -> bool:
+    return bool(reservation) and reservation.get("status") == REMINDER_STATUS and not reservation.get("archived")
+
+
+async def load_active_rules() -> List[dict]:
+    return await db.reminder_rules.find({"is_active": True, "archived": False}, {"_id": 0}).to_list(100)
+
+
+def build_queue_ops(reservation: dict, rules: List[dict], now: datetime) -> List[UpdateOne]:
+    """Upserts für alle Regeln, deren Erinnerung noch aussteht"""
+    start = reservation_start_utc(reservation)
+    if start is None or start <= now:
+        return []
+    ops = []
+    for rule in rules:
+        hours_before = rule.get("hours_before", 24)
+        flag = reminder_key(hours_before)
+        if reservation.get(flag):
+            continue
+        due = start - timedelta(hours=hours_before)
+        if due < now - timedelta(minutes=REMINDER_LATE_GRACE_MINUTES):
+            # Zu spät gebucht für diese Regel (z.B. 24h-Erinnerung bei Buchung 5h vorher)
+            continue
+        key = f"{reservation['id']}:{rule['id']}"
+        ops.append(UpdateOne(
+            # Versendete/gerade geleaste Einträge nicht anfassen (Upsert scheitert dann am Unique-Key)
+            {"key": key, "status": {"$nin": [QueueStatus.SENT, QueueStatus.SENDING]}},
+            {
+                "$set": {
+                    "due_at": max(due, now).isoformat(),
+                    "event_at": start.isoformat(),
+                    "hours_before": hours_before,
+                    "channel": rule.get("channel", "email"),
+                    "reminder_key": flag,
+                    "status": QueueStatus.PENDING,
+                    "lease_until": None,
+                    "updated_at": now.isoformat(),
+                },
+                "$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "key": key,
+                    "reservation_id": reservation["id"],
+                    "rule_id": rule["id"],
+                    "attempts": 0,
+                    "created_at": now.isoformat(),
+                },
+            },
+            upsert=True
+        ))
+    return ops
+
+
+async def _write_queue(ops: List[UpdateOne]):
+    if not ops:
+        return
+    try:
+        await db.reminder_queue.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Versendete/geleaste Einträge lösen beim Upsert einen Duplicate Key aus - gewollt
+        if any(w.get("code") != 11000 for w in e.details.get("writeErrors", [])):
+            raise
+
+
+# ============== SCHEDULING (Reservierungs-Hook) ==============
+
+async def schedule_reservation_reminders(before: Optional[dict], after: Optional[dict]):
+    """
+    Nach jeder Reservierungsänderung aufrufen (on_reservation_changed).
+    Plant nur neu, wenn sich Status, Datum oder Uhrzeit geändert haben.
+    """
+    res = after or before
+    if not res or not res.get("id"):
+        return
+    if not wants_reminders(after):
+        if wants_reminders(before):
+            await cancel_reservation_reminders(res["id"])
+        return
+    if before and wants_reminders(before) and all(
+        before.get(f) == after.get(f) for f in ("date", "time")
+    ):
+        return
+
+    rules = await load_active_rules()
+    if before and wants_reminders(before):
+        # Verschoben: offene Einträge verwerfen, neu planen
+        await cancel_reservation_reminders(res["id"])
+    await _write_queue(build_queue_ops(after, rules, datetime.now(timezone.utc)))
+    reminder_scheduler.wake()
+
+
+async def cancel_reservation_reminders(reservation_id: str):
+    await db.reminder_queue.update_many(
+        {"reservation_id": reservation_id, "status": {"$in": [QueueStatus.PENDING, QueueStatus.SENDING]}},
+        {"$set": {"status": QueueStatus.CANCELLED, "lease_until": None, "updated_at": now_iso()}}
+    )
+
+
+async def backfill_reminder_queue(days: int = REMINDER_BACKFILL_DAYS) -> Dict[str, int]:
+    """
+    Warteschlange für die kommenden Tage (neu) aufbauen - nach Regeländerungen,
+    beim Start und für Reservierungen, die außerhalb des Hooks bestätigt wurden.
+    Ein Range-Query über (date, status), kein Scan aller Reservierungen.
+    """
+    now = datetime.now(timezone.utc)
+    rules = await load_active_rules()
+    rule_ids = [r["id"] for r in rules]
+
+    # Einträge inaktiver/gelöschter Regeln verwerfen
+    cancelled = await db.reminder_queue.update_many(
+        {"status": QueueStatus.PENDING, "rule_id": {"$nin": rule_ids}},
+        {"$set": {"status": QueueStatus.CANCELLED, "updated_at": now.isoformat()}}
+    )
+
+    today = now.astimezone(BERLIN_TZ).date()
+    cursor = db.reservations.find(
+        {
+            "date": {"$gte": today.isoformat(), "$lte": (today + timedelta(days=days)).isoformat()},
+            "status": REMINDER_STATUS,
+            "archived": False
+        },
+        {"_id": 0, "id": 1, "date": 1, "time": 1, "status": 1, "archived": 1,
+         **{reminder_key(r.get("hours_before", 24)): 1 for r in rules}}
+    )
+    scheduled = 0
+    ops: List[UpdateOne] = []
+    async for res in cursor:
+        ops.extend(build_queue_ops(res, rules, now))
+        if len(ops) >= 500:
+            await _write_queue(ops)
+            scheduled += len(ops)
+            ops = []
+    await _write_queue(ops)
+    scheduled += len(ops)
+
+    reminder_scheduler.wake()
+    return {"scheduled": scheduled, "cancelled": cancelled.modified_count}
+
+
+# ============== DISPATCH ==============
+
+async def claim_due_reminders(worker_id: str, limit: int = REMINDER_BATCH_SIZE) -> List[dict]:
+    """
+    Fällige Einträge batchweise leasen (mehrere Worker/Prozesse möglich):
+    Kandidaten nach due_at, dann ein update_many mit Status-Bedingung -
+    zurück kommen nur die Einträge, die dieser Lauf tatsächlich bekommen hat.
+    """
+    now = datetime.now(timezone.utc)
+    now_str = now.isoformat()
+    due_query = {"$or": [
+        {"status": QueueStatus.PENDING, "due_at": {"$lte": now_str}},
+        {"status": QueueStatus.SENDING, "lease_until": {"$lt": now_str}},
+    ]}
+    candidates = await db.reminder_queue.find(due_query, {"_id": 0, "id": 1}).sort("due_at", 1).to_list(limit)
+    if not candidates:
+        return []
+
+    claim_token = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    await db.reminder_queue.update_many(
+        {"id": {"$in": [c["id"] for c in candidates]}, **due_query},
+        {
+            "$set": {
+                "status": QueueStatus.SENDING,
+                "lease_until": (now + timedelta(seconds=REMINDER_LEASE_SECONDS)).isoformat(),
+                "claim_token": claim_token,
+                "updated_at": now_str
+            },
+            "$inc": {"attempts": 1}
+        }
+    )
+    return await db.reminder_queue.find(
+        {"claim_token": claim_token, "status": QueueStatus.SENDING}, {"_id": 0}
+    ).to_list(limit)
+
+
+async def dispatch_reminders(items: List[dict]) -> Dict[str, int]:
+    """
+    Geleaste Einträge abarbeiten: Reservierungen und Bereiche je ein Query,
+    Flags und Queue-Status je ein bulk_write.
+    """
+    result = {"sent": 0, "cancelled": 0}
+    if not items:
+        return result
+
+    now = datetime.now(timezone.utc)
+    now_str = now.isoformat()
+    reservations = {
+        r["id"]: r for r in await db.reservations.find(
+            {"id": {"$in": list({i["reservation_id"] for i in items})}}, {"_id": 0}
+        ).to_list(None)
+    }
+    area_ids = list({r["area_id"] for r in reservations.values() if r.get("area_id")})
+    area_names = {}
+    if area_ids:
+        async for area in db.areas.find({"id": {"$in": area_ids}}, {"_id": 0, "id": 1, "name": 1}):
+            area_names[area["id"]] = area.get("name")
+
+    sent_ids: List[str] = []
+    cancelled_ids: List[str] = []
+    flags: Dict[str, List[str]] = {}
+    message_logs: List[dict] = []
+
+    for item in items:
+        res = reservations.get(item["reservation_id"])
+        start = reservation_start_utc(res) if res else None
+        # Stand der Reservierung hat sich seit der Planung geändert → verwerfen
+        if (
+            not wants_reminders(res)
+            or res.get(item["reminder_key"])
+            or start is None
+            or start.isoformat() != item.get("event_at")
+            or start <= now
+        ):
+            cancelled_ids.append(item["id"])
+            continue
+
+        channel = item.get("channel", "email")
+        if channel in ("email", "both") and res.get("guest_email"):
+            try:
+                await send_reminder_email(
+                    res, area_names.get(res.get("area_id")), res.get("language", "de"),
+                    dedupe_key=f"reminder:{item['key']}"
+                )
+            except Exception as e:
+                logger.warning(f"Erinnerung {item['key']} fehlgeschlagen (Versuch {item.get('attempts')}): {e}")
+                if item.get("attempts", 1) >= REMINDER_MAX_ATTEMPTS:
+                    cancelled_ids.append(item["id"])
+                # sonst läuft der Lease ab und ein späterer Lauf versucht es erneut
+                continue
+            message_logs.append({
+                "id": str(uuid.uuid4()),
+                "reservation_id": res["id"],
+                "channel": "email",
+                "message_type": "reminder",
+                "recipient": res["guest_email"],
+                "status": "sent",
+                "error_message": None,
+                "timestamp": now_str
+            })
+
+        sent_ids.append(item["id"])
+        flags.setdefault(item["reminder_key"], []).append(res["id"])
+
+    if flags:
+        await db.reservations.bulk_write([
+            UpdateMany({"id": {"$in": ids}}, {"$set": {key: True, "updated_at": now_str}})
+            for key, ids in flags.items()
+        ], ordered=False)
+    if message_logs:
+        await db.message_logs.insert_many(message_logs)
+
+    queue_ops = []
+    if sent_ids:
+        queue_ops.append(UpdateMany(
+            {"id": {"$in": sent_ids}},
+            {"$set": {"status": QueueStatus.SENT, "sent_at": now_str, "lease_until": None, "updated_at": now_str}}
+        ))
+    if cancelled_ids:
+        queue_ops.append(UpdateMany(
+            {"id": {"$in": cancelled_ids}},
+            {"$set": {"status": QueueStatus.CANCELLED, "lease_until": None, "updated_at": now_str}}
+        ))
+    if queue_ops:
+        await db.reminder_queue.bulk_write(queue_ops, ordered=False)
+
+    result["sent"] = len(sent_ids)
+    result["cancelled"] = len(cancelled_ids)
+    return result
+
+
+class ReminderScheduler:
+    """Hintergrund-Worker für die reminder_queue (schläft bis zur nächsten Fälligkeit)"""
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.cancelled = 0
+
+    def start(self):
+        """Worker starten (einmal beim Startup)"""
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info("✓ Reminder-Scheduler gestartet")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """Neue/vorgezogene Fälligkeit: Wartezeit neu berechnen"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def run_due(self) -> Dict[str, int]:
+        """Alle fälligen Einträge abarbeiten (Batch für Batch)"""
+        totals = {"sent": 0, "cancelled": 0}
+        while True:
+            items = await claim_due_reminders(self.worker_id)
+            if not items:
+                break
+            result = await dispatch_reminders(items)
+            for k in totals:
+                totals[k] += result[k]
+        self.sent += totals["sent"]
+        self.cancelled += totals["cancelled"]
+        return totals
+
+    async def _seconds_until_next(self) -> float:
+        nxt = await db.reminder_queue.find_one(
+            {"status": QueueStatus.PENDING}, {"_id": 0, "due_at": 1}, sort=[("due_at", 1)]
+        )
+        if not nxt:
+            return REMINDER_IDLE_POLL_SECONDS
+        delta = (datetime.fromisoformat(nxt["due_at"]) - datetime.now(timezone.utc)).total_seconds()
+        return min(max(delta, 0), REMINDER_IDLE_POLL_SECONDS)
+
+    async def _loop(self):
+        try:
+            result = await backfill_reminder_queue()
+            logger.info(f"[REMINDER] Warteschlange aufgebaut: {result}")
+        except Exception as e:
+            logger.warning(f"[REMINDER] Backfill fehlgeschlagen: {e}")
+
+        while True:
+            try:
+                result = await self.run_due()
+                if result["sent"] or result["cancelled"]:
+                    logger.info(f"[REMINDER] {result['sent']} versendet, {result['cancelled']} verworfen")
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=await self._seconds_until_next())
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[REMINDER] Fehler: {e}")
+                await asyncio.sleep(REMINDER_IDLE_POLL_SECONDS)
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = {}
+        async for row in db.reminder_queue.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        nxt = await db.reminder_queue.find_one(
+            {"status": QueueStatus.PENDING}, {"_id": 0, "due_at": 1}, sort=[("due_at", 1)]
+        )
+        return {
+            "running": self._task is not None,
+            "worker_id": self.worker_id,
+            "queue": counts,
+            "next_due_at": nxt.get("due_at") if nxt else None,
+            "sent": self.sent,
+            "cancelled": self.cancelled,
+        }
+
+
+reminder_scheduler = ReminderScheduler()
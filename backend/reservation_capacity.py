@@ -25,15 +25,20 @@ from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, date, timedelta, time
 from enum import Enum
 import uuid
+import asyncio
+from collections import OrderedDict
+import time as time_module
 
 # Core imports
 from core.database import db
 from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit
 from core.exceptions import NotFoundException, ValidationException, ConflictException
+from core.indexes import register_indexes, index
+from pymongo.errors import DuplicateKeyError
 
 # Import Opening Hours
-from opening_hours_module import calculate_effective_hours
+from opening_hours_module import calculate_effective_hours, opening_calendar
 
 import logging
 logger = logging.getLogger(__name__)
@@ -469,62 +474,416 @@ async def get_reservations_for_date(target_date: date) -> List[dict]:
     
     reservations = await db.reservations.find({
         "date": date_str,
-        "status": {"$nin": ["cancelled", "storniert", "no_show"]},
+        "status": {"$nin": list(CAPACITY_EXCLUDED_STATUSES)},
         "archived": {"$ne": True}
     }).to_list(500)
     
     return reservations
 
 
-async def calculate_slot_capacity(target_date: date) -> dict:
+# ============== DAY-CAPACITY LEDGER ==============
+# Sitzplatz-Belegung pro Datum im Prozess-Speicher.
+# - Aufbau aus Mongo bei Cache-Miss, Versionswechsel oder nach Ablauf der TTL
+# - Inkrementelle Pflege über capacity_ledger.apply(before, after) bei jeder
+#   Reservierungsänderung (Anlage, Änderung, Storno, Archivierung)
+# - Die TTL begrenzt den Drift zwischen mehreren Workern (kein geteilter Speicher)
+# - Höchstens LEDGER_MAX_DATES Tage im Speicher (LRU), vergangene Tage fallen zuerst
+
+CAPACITY_EXCLUDED_STATUSES = ("cancelled", "storniert", "no_show")
+LEDGER_TTL_SECONDS = 60
+LEDGER_MAX_DATES = 120
+
+
+def reservation_counts_for_capacity(reservation: Optional[dict]) -> bool:
+    """Zählt eine Reservierung zur Sitzplatz-Belegung? (gleiche Regel wie get_reservations_for_date)"""
+    if not reservation:
+        return False
+    if reservation.get("archived") is True:
+        return False
+    if reservation.get("status") in CAPACITY_EXCLUDED_STATUSES:
+        return False
+    return bool(reservation.get("time"))
+
+
+def _reservation_seats(reservation: dict) -> int:
+    return reservation.get("party_size", reservation.get("guests", 1)) or 0
+
+
+class DayCapacityLedger:
     """
-    Berechne Kapazität pro Slot für ein Datum.
+    In-Memory Kapazitäts-Ledger pro Datum.
     
-    Returns: {
-        "date": "2025-12-28",
-        "day_type": "weekend",
-        "capacity_per_seating": 95,
-        "block_duration_minutes": 120,
-        "slots": [
+    Eintrag pro Datum:
+        seatings_data  - Ergebnis von calculate_seatings_and_slots (Struktur des Tages)
+        contributions  - reservation_id -> (time, seats), macht apply() idempotent
+        slot_usage     - time -> belegte Plätze
+    """
+    
+    def __init__(self, ttl_seconds: int = LEDGER_TTL_SECONDS, max_dates: int = LEDGER_MAX_DATES):
+        self.ttl_seconds = ttl_seconds
+        self.max_dates = max_dates
+        self._days: "OrderedDict[str, dict]" = OrderedDict()
+        self._version = 0
+        # Änderungszähler pro Datum - ein Aufbau, der während einer Änderung lief, wird verworfen
+        self._mutations: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    # ---------- Invalidierung ----------
+    
+    def bump_version(self):
+        """Struktur-Änderung (Feiertage, Overrides, Öffnungszeiten) - alle Einträge werden neu aufgebaut"""
+        self._version += 1
+    
+    def invalidate(self, date_str: Optional[str] = None):
+        """Einzelnes Datum (oder alles) verwerfen"""
+        if date_str is None:
+            self._days.clear()
+            self.bump_version()
+        else:
+            self._days.pop(date_str, None)
+            self._mutations[date_str] = self._mutations.get(date_str, 0) + 1
+    
+    # ---------- Lesen ----------
+    
+    def _is_fresh(self, entry: Optional[dict]) -> bool:
+        if not entry:
+            return False
+        if entry["version"] != self._version:
+            return False
+        return (time_module.monotonic() - entry["built_at"]) < self.ttl_seconds
+    
+    async def get(self, target_date: date) -> dict:
+        """Ledger-Eintrag für ein Datum (baut bei Bedarf aus Mongo auf)"""
+        date_str = target_date.strftime("%Y-%m-%d")
+        entry = self._days.get(date_str)
+        if self._is_fresh(entry):
+            self.hits += 1
+            self._days.move_to_end(date_str)
+            return entry
+        
+        lock = self._locks.setdefault(date_str, asyncio.Lock())
+        async with lock:
+            entry = self._days.get(date_str)
+            if self._is_fresh(entry):
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return await self._build(target_date, date_str)
+    
+    async def _build(self, target_date: date, date_str: str) -> dict:
+        version = self._version
+        mutation_mark = self._mutations.get(date_str, 0)
+        
+        seatings_data = await calculate_seatings_and_slots(target_date)
+        contributions: Dict[str, Tuple[str, int]] = {}
+        slot_usage: Dict[str, int] = {}
+        
+        if seatings_data.get("open", True):
+            for res in await get_reservations_for_date(target_date):
+                res_time = res.get("time")
+                if not res_time:
+                    continue
+                seats = _reservation_seats(res)
+                contributions[res.get("id") or str(res.get("_id"))] = (res_time, seats)
+                slot_usage[res_time] = slot_usage.get(res_time, 0) + seats
+        
+        entry = {
+            "date": date_str,
+            "version": version,
+            "built_at": time_module.monotonic(),
+            "seatings_data": seatings_data,
+            "contributions": contributions,
+            "slot_usage": slot_usage,
+        }
+        
+        # Nur speichern, wenn währenddessen keine Änderung/Invalidierung kam
+        if version == self._version and mutation_mark == self._mutations.get(date_str, 0):
+            self._days[date_str] = entry
+            self._days.move_to_end(date_str)
+            self._evict()
+        return entry
+    
+    def _evict(self):
+        """Vergangene Tage verwerfen, danach die am längsten ungenutzten über max_dates"""
+        # Vortag bleibt (Service über Mitternacht, Zeitzonen-Versatz zu UTC)
+        cutoff = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
+        stale = [d for d in self._days if d < cutoff]
+        overflow = len(self._days) - len(stale) - self.max_dates
+        if overflow > 0:
+            stale += [d for d in self._days if d >= cutoff][:overflow]
+        for date_str in stale:
+            self._days.pop(date_str, None)
+            self.evictions += 1
+        # Locks / Änderungszähler nur für Tage ohne Eintrag und ohne laufenden Aufbau
+        for date_str in [d for d in self._locks if d not in self._days and not self._locks[d].locked()]:
+            self._locks.pop(date_str, None)
+            self._mutations.pop(date_str, None)
+        for date_str in [d for d in self._mutations if d not in self._days and d not in self._locks]:
+            self._mutations.pop(date_str, None)
+    
+    # ---------- Inkrementelle Pflege ----------
+    
+    def _remove(self, date_str: str, reservation_id: str):
+        entry = self._days.get(date_str)
+        if not entry:
+            return
+        previous = entry["contributions"].pop(reservation_id, None)
+        if previous:
+            res_time, seats = previous
+            remaining = entry["slot_usage"].get(res_time, 0) - seats
+            if remaining > 0:
+                entry["slot_usage"][res_time] = remaining
+            else:
+                entry["slot_usage"].pop(res_time, None)
+    
+    def apply(self, before: Optional[dict], after: Optional[dict]):
+        """
+        Reservierungsänderung einbuchen (nach dem erfolgreichen DB-Write aufrufen).
+        before: Zustand vor der Änderung (None bei Anlage)
+        after:  Zustand nach der Änderung (None bei Löschung)
+        """
+        reservation_id = (after or before or {}).get("id")
+        if not reservation_id:
+            return
+        
+        dates = {d for d in ((before or {}).get("date"), (after or {}).get("date")) if d}
+        for date_str in dates:
+            self._mutations[date_str] = self._mutations.get(date_str, 0) + 1
+            self._remove(date_str, reservation_id)
+        
+        if not reservation_counts_for_capacity(after):
+            return
+        entry = self._days.get(after.get("date"))
+        if not entry:
+            return  # Datum nicht im Cache - wird beim nächsten Lesen vollständig aufgebaut
+        res_time = after["time"]
+        seats = _reservation_seats(after)
+        entry["contributions"][reservation_id] = (res_time, seats)
+        entry["slot_usage"][res_time] = entry["slot_usage"].get(res_time, 0) + seats
+    
+    def stats(self) -> dict:
+        return {
+            "cached_dates": len(self._days),
+            "max_dates": self.max_dates,
+            "evictions": self.evictions,
+            "version": self._version,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+capacity_ledger = DayCapacityLedger()
+
+# Öffnungszeiten-Änderungen verändern die Struktur der Tage (Durchgänge, Schließzeit)
+opening_calendar.add_listener(capacity_ledger.bump_version)
+
+
+# ============== SEATING CAPACITY COUNTERS ==============
+# Atomare Platzvergabe pro Datum + Durchgang in Mongo (collection capacity_counters).
+# - Ein Dokument pro Durchgang: used (belegte Plätze) + claims (reservation_id -> Plätze)
+# - Prüfung und Belegung in einem find_one_and_update mit bedingtem $inc,
+#   dadurch kein Überbuchen bei parallelen Buchungen über mehrere Worker
+# - Der Schlüssel enthält die Startzeit des Durchgangs: ändert sich die
+#   Tagesstruktur (Feiertag, Override), wird ein neuer Zähler aus den
+#   Reservierungen aufgebaut
+# - Der Ledger oben bleibt für Anzeige/Slots zuständig, die Zähler für die Vergabe
+
+register_indexes(
+    "capacity_counters",
+    index(("key", 1), unique=True),
+    index(("date", 1)),
+)
+
+
+class SeatingCapacityCounters:
+    """Mongo-Zähler pro Durchgang; claim/release sind idempotent pro Reservierung"""
+    
+    async def _target(self, reservation: dict) -> Optional[dict]:
+        """Durchgang einer Reservierung (None: Tag geschlossen oder Zeit in keinem Durchgang)"""
+        try:
+            target_date = datetime.strptime(reservation["date"], "%Y-%m-%d").date()
+        except (KeyError, TypeError, ValueError):
+            return None
+        
+        entry = await capacity_ledger.get(target_date)
+        seatings_data = entry["seatings_data"]
+        if not seatings_data.get("open", True):
+            return None
+        
+        seating_number = next(
+            (s["seating_number"] for s in seatings_data.get("all_slots", []) if s["time"] == reservation.get("time")),
+            None
+        )
+        seating = next(
+            (s for s in seatings_data.get("seatings", []) if s.get("seating_number") == seating_number),
+            None
+        )
+        if not seating:
+            return None
+        
+        return {
+            "key": f"{reservation['date']}#{seating['seating_number']}#{seating['start_time']}",
+            "date": reservation["date"],
+            "seating_number": seating["seating_number"],
+            "slots": seating.get("slots", []),
+            "capacity": seatings_data.get("capacity_per_seating", DEFAULT_CAPACITY_PER_SEATING),
+        }
+    
+    async def _ensure_counter(self, target: dict):
+        """Zähler anlegen (Startwert aus den bestehenden Reservierungen des Durchgangs)"""
+        if await db.capacity_counters.find_one({"key": target["key"]}, {"_id": 1}):
+            return
+        
+        reservations = await db.reservations.find(
             {
-                "time": "11:00",
-                "seating": 1,
-                "capacity_total": 95,
-                "capacity_used": 12,
-                "capacity_available": 83,
-                "disabled": false,
-                "reason": null
+                "date": target["date"],
+                "time": {"$in": target["slots"]},
+                "status": {"$nin": list(CAPACITY_EXCLUDED_STATUSES)},
+                "archived": {"$ne": True}
             },
-            ...
-        ]
-    }
-    """
-    # Hole Durchgänge und Slots
-    seatings_data = await calculate_seatings_and_slots(target_date)
+            {"_id": 0, "id": 1, "party_size": 1, "guests": 1, "time": 1, "status": 1}
+        ).to_list(1000)
+        claims = {r["id"]: _reservation_seats(r) for r in reservations if r.get("id")}
+        
+        try:
+            await db.capacity_counters.update_one(
+                {"key": target["key"]},
+                {"$setOnInsert": {
+                    "key": target["key"],
+                    "date": target["date"],
+                    "seating_number": target["seating_number"],
+                    "capacity": target["capacity"],
+                    "used": sum(claims.values()),
+                    "claims": claims,
+                    "created_at": now_iso(),
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # paralleler Aufbau - der andere Worker war schneller
     
+    async def claim(self, reservation: dict, enforce: bool = True) -> dict:
+        """
+        Plätze einer Reservierung im Durchgang belegen.
+        
+        enforce=False: Belegung auch über der Kapazität (nachträgliche Synchronisation
+        bestehender Reservierungen, z.B. Statuswechsel zurück auf bestätigt).
+        
+        Returns:
+            {"claimed": bool, "tracked": bool, "used": int, "capacity": int}
+            tracked=False: Reservierung liegt in keinem Durchgang (keine Zählung)
+        """
+        target = await self._target(reservation)
+        if not target or not reservation.get("id"):
+            return {"claimed": True, "tracked": False}
+        
+        await self._ensure_counter(target)
+        
+        claim_field = f"claims.{reservation['id']}"
+        seats = _reservation_seats(reservation)
+        query = {"key": target["key"], claim_field: {"$exists": False}}
+        if enforce:
+            query["used"] = {"$lte": target["capacity"] - seats}
+        
+        counter = await db.capacity_counters.find_one_and_update(
+            query,
+            {
+                "$inc": {"used": seats},
+                "$set": {claim_field: seats, "capacity": target["capacity"], "updated_at": now_iso()}
+            },
+            projection={"_id": 0, "used": 1, "capacity": 1},
+            return_document=True
+        )
+        if counter:
+            return {"claimed": True, "tracked": True, "used": counter["used"], "capacity": counter["capacity"]}
+        
+        # Nicht belegt: entweder bereits belegt (idempotent) oder Durchgang voll
+        current = await db.capacity_counters.find_one(
+            {"key": target["key"]},
+            {"_id": 0, "used": 1, "capacity": 1, claim_field: 1}
+        ) or {}
+        already_claimed = reservation["id"] in (current.get("claims") or {})
+        return {
+            "claimed": already_claimed,
+            "tracked": True,
+            "used": current.get("used", 0),
+            "capacity": target["capacity"],
+        }
+    
+    async def release(self, reservation: dict, keep_key: Optional[str] = None, keep_seats: Optional[int] = None):
+        """
+        Belegung einer Reservierung in allen Zählern ihres Datums freigeben.
+        keep_key/keep_seats: diese Belegung bleibt bestehen (unveränderter Durchgang)
+        """
+        reservation_id = reservation.get("id")
+        if not reservation_id or not reservation.get("date"):
+            return
+        
+        claim_field = f"claims.{reservation_id}"
+        query: Dict[str, Any] = {"date": reservation["date"], claim_field: {"$exists": True}}
+        if keep_key:
+            query["$nor"] = [{"key": keep_key, claim_field: keep_seats}]
+        
+        await db.capacity_counters.update_many(
+            query,
+            [
+                {"$set": {"used": {"$subtract": ["$used", f"${claim_field}"]}, "updated_at": now_iso()}},
+                {"$unset": claim_field}
+            ]
+        )
+    
+    async def sync(self, before: Optional[dict], after: Optional[dict]):
+        """
+        Zähler nach einer Reservierungsänderung nachziehen (nach dem DB-Write aufrufen).
+        Storno, No-Show und Archivierung geben frei, Umbuchungen wechseln den Durchgang.
+        """
+        try:
+            dates = {d for d in ((before or {}).get("date"), (after or {}).get("date")) if d}
+            base = after or before or {}
+            
+            if reservation_counts_for_capacity(after):
+                target = await self._target(after)
+                keep_key = target["key"] if target else None
+                for date_str in dates:
+                    await self.release({"id": base.get("id"), "date": date_str}, keep_key, _reservation_seats(after))
+                if target:
+                    await self.claim(after, enforce=False)
+            else:
+                for date_str in dates:
+                    await self.release({"id": base.get("id"), "date": date_str})
+        except Exception as e:
+            # Zähler dürfen den eigentlichen Write nie scheitern lassen - Rebuild über Admin-Endpoint
+            logger.warning(f"Kapazitätszähler-Sync fehlgeschlagen ({base.get('id')}): {e}")
+    
+    async def reset(self, date_str: str) -> int:
+        """Zähler eines Datums verwerfen - werden bei der nächsten Buchung neu aufgebaut"""
+        result = await db.capacity_counters.delete_many({"date": date_str})
+        return result.deleted_count
+    
+    async def for_date(self, date_str: str) -> List[dict]:
+        return await db.capacity_counters.find(
+            {"date": date_str},
+            {"_id": 0, "claims": 0}
+        ).sort("seating_number", 1).to_list(50)
+
+
+capacity_counters = SeatingCapacityCounters()
+
+
+def build_slot_capacity(seatings_data: dict, slot_usage: Dict[str, int]) -> dict:
+    """Kapazität pro Slot aus Tagesstruktur + Belegung berechnen - O(Slots), ohne DB"""
     if not seatings_data.get("open", True):
         return {
             "date": seatings_data["date"],
             "open": False,
             "slots": [],
-            "notes": seatings_data.get("notes", [])
+            "notes": list(seatings_data.get("notes", []))
         }
     
-    # Hole bestehende Reservierungen
-    reservations = await get_reservations_for_date(target_date)
-    
-    # Berechne belegte Plätze pro Slot
-    slot_usage = {}  # time -> total party_size
-    
-    for res in reservations:
-        res_time = res.get("time")
-        party_size = res.get("party_size", res.get("guests", 1))
-        
-        if res_time:
-            if res_time not in slot_usage:
-                slot_usage[res_time] = 0
-            slot_usage[res_time] += party_size
-    
     # Berechne Kapazität pro Slot
     capacity_per_seating = seatings_data.get("capacity_per_seating", DEFAULT_CAPACITY_PER_SEATING)
     slots_result = []
@@ -575,8 +934,36 @@ async def calculate_slot_capacity(target_date: date) -> dict:
         "closing_time": seatings_data["closing_time"],
         "seatings": seatings_data["seatings"],
         "slots": slots_result,
-        "notes": seatings_data.get("notes", [])
+        "notes": list(seatings_data.get("notes", []))
+    }
+
+
+async def calculate_slot_capacity(target_date: date) -> dict:
+    """
+    Berechne Kapazität pro Slot für ein Datum.
+    Liest aus dem Day-Capacity-Ledger (DB nur bei Cache-Miss).
+    
+    Returns: {
+        "date": "2025-12-28",
+        "day_type": "weekend",
+        "capacity_per_seating": 95,
+        "block_duration_minutes": 120,
+        "slots": [
+            {
+                "time": "11:00",
+                "seating": 1,
+                "capacity_total": 95,
+                "capacity_used": 12,
+                "capacity_available": 83,
+                "disabled": false,
+                "reason": null
+            },
+            ...
+        ]
     }
+    """
+    entry = await capacity_ledger.get(target_date)
+    return build_slot_capacity(entry["seatings_data"], entry["slot_usage"])
 
 
 # ============== API ENDPOINTS ==============
@@ -709,6 +1096,7 @@ async def create_capacity_holiday(
     }
     
     await db.capacity_holidays.insert_one(holiday)
+    capacity_ledger.bump_version()
     
     await create_audit_log(
         actor=current_user,
@@ -747,6 +1135,7 @@ async def delete_capacity_holiday(
         {"id": holiday_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    capacity_ledger.bump_version()
     
     await create_audit_log(
         actor=current_user,
@@ -828,6 +1217,7 @@ async def create_capacity_override(
     }
     
     await db.capacity_overrides.insert_one(override)
+    capacity_ledger.bump_version()
     
     await create_audit_log(
         actor=current_user,
@@ -866,6 +1256,7 @@ async def delete_capacity_override(
         {"id": override_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    capacity_ledger.bump_version()
     
     await create_audit_log(
         actor=current_user,
@@ -877,6 +1268,35 @@ async def delete_capacity_override(
     return None
 
 
+@capacity_router.post(
+    "/admin/capacity-counters/reset",
+    summary="Kapazitätszähler eines Datums neu aufbauen",
+    description="Verwirft die Durchgangs-Zähler; sie werden bei der nächsten Buchung aus den Reservierungen neu berechnet."
+)
+async def reset_capacity_counters(
+    date: str = Query(..., description="Datum (YYYY-MM-DD)"),
+    current_user: dict = Depends(require_admin)
+):
+    """POST /api/admin/capacity-counters/reset?date=YYYY-MM-DD"""
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise ValidationException("Ungültiges Datumsformat")
+    
+    deleted = await capacity_counters.reset(date)
+    capacity_ledger.invalidate(date)
+    
+    await create_audit_log(
+        actor=current_user,
+        action="reset",
+        entity="capacity_counters",
+        entity_id=date,
+        after={"deleted": deleted}
+    )
+    
+    return {"date": date, "deleted": deleted}
+
+
 # ============== DEBUG ENDPOINT ==============
 
 @capacity_router.get(
@@ -910,5 +1330,8 @@ async def debug_capacity(
         "capacity_config": config,
         "closing_time": closing_time,
         "seatings_calculation": seatings,
-        "final_capacity": capacity
+        "final_capacity": capacity,
+        "ledger": capacity_ledger.stats(),
+        "seating_counters": await capacity_counters.for_date(date),
+        "opening_calendar": opening_calendar.stats()
     }
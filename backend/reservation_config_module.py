@@ -23,6 +23,13 @@ from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit
 from core.exceptions import NotFoundException, ValidationException, ConflictException
 
+# Öffnungszeiten-Kalender (Invalidierung bei Konfigurationsänderungen)
+from opening_hours_module import opening_calendar
+
+# Tages-Belegungsindex für Tisch-Konflikte
+from table_occupancy import DayTableOccupancy, load_day_table_occupancy, minutes_to_time
+from reservation_hooks import on_reservation_changed
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -490,51 +497,53 @@ async def check_table_conflict(
         if duration_minutes is None:
             duration_minutes = await get_default_duration()
         
-        # Berechne Zeitfenster der neuen Reservierung
-        start_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-        end_dt = start_dt + timedelta(minutes=duration_minutes)
-        
-        # Suche alle Reservierungen am selben Tag mit diesem Tisch
-        query = {
-            "date": date_str,
-            "table_number": table_number,
-            "status": {"$in": ["neu", "bestaetigt", "angekommen"]},
-            "archived": False
-        }
-        if exclude_reservation_id:
-            query["id"] = {"$ne": exclude_reservation_id}
-        
-        existing = await db.reservations.find(query, {"_id": 0}).to_list(100)
-        
+        # Alle Reservierungen am selben Tag mit diesem Tisch (ein Query, Intervall-Index)
         default_duration = await get_default_duration()
-        
-        for res in existing:
-            res_start = datetime.strptime(f"{res['date']} {res['time']}", "%Y-%m-%d %H:%M")
-            res_duration = res.get("duration_minutes", default_duration)
-            res_end = res_start + timedelta(minutes=res_duration)
-            
-            # Prüfe Überlappung
-            if start_dt < res_end and end_dt > res_start:
-                return {
-                    "available": False,
-                    "conflict": {
-                        "id": res["id"],
-                        "guest_name": res.get("guest_name"),
-                        "time": res["time"],
-                        "end_time": res_end.strftime("%H:%M"),
-                        "party_size": res.get("party_size"),
-                        "table_number": res.get("table_number")
-                    },
-                    "message": f"Tisch {table_number} ist von {res['time']} bis {res_end.strftime('%H:%M')} durch {res.get('guest_name')} belegt"
-                }
-        
-        return {"available": True, "conflict": None}
+        day_index = await load_day_table_occupancy(
+            date_str,
+            default_duration=default_duration,
+            table_number=table_number,
+            exclude_reservation_id=exclude_reservation_id
+        )
+        return _table_conflict_result(day_index, time_str, table_number, duration_minutes)
         
     except Exception as e:
         logger.error(f"Tisch-Konfliktprüfung fehlgeschlagen: {e}")
         return {"available": True, "error": str(e)}
 
 
+def _table_conflict_result(
+    day_index: DayTableOccupancy,
+    time_str: str,
+    table_number: str,
+    duration_minutes: int
+) -> Dict[str, Any]:
+    """Konfliktprüfung eines Tisches gegen einen vorgeladenen Tages-Index"""
+    # Berechne Zeitfenster der neuen Reservierung
+    start_dt = datetime.strptime(f"{day_index.date} {time_str}", "%Y-%m-%d %H:%M")
+    start_min = start_dt.hour * 60 + start_dt.minute
+    end_min = start_min + duration_minutes
+    
+    # Prüfe Überlappung
+    res = day_index.find_conflict(start_min, end_min, table_number=table_number)
+    if res is None:
+        return {"available": True, "conflict": None}
+    
+    end_time = minutes_to_time(day_index.reservation_end(res))
+    return {
+        "available": False,
+        "conflict": {
+            "id": res["id"],
+            "guest_name": res.get("guest_name"),
+            "time": res["time"],
+            "end_time": end_time,
+            "party_size": res.get("party_size"),
+            "table_number": res.get("table_number")
+        },
+        "message": f"Tisch {table_number} ist von {res['time']} bis {end_time} durch {res.get('guest_name')} belegt"
+    }
+
+
 async def get_available_tables_for_slot(
     date_str: str,
     time_str: str,
@@ -567,10 +576,11 @@ async def get_available_tables_for_slot(
         existing_tables = await db.reservations.distinct("table_number", {"archived": False, "table_number": {"$ne": None}})
         all_tables.update([t for t in existing_tables if t])
         
-        # Prüfe jeden Tisch auf Verfügbarkeit
+        # Prüfe jeden Tisch auf Verfügbarkeit (ein Tages-Index für alle Tische)
+        day_index = await load_day_table_occupancy(date_str, default_duration=await get_default_duration())
         available_tables = []
         for table in sorted(all_tables, key=lambda x: (int(x) if x.isdigit() else 999, x)):
-            check = await check_table_conflict(date_str, time_str, table, duration_minutes)
+            check = _table_conflict_result(day_index, time_str, table, duration_minutes)
             if check["available"]:
                 available_tables.append(table)
         
@@ -659,6 +669,7 @@ async def update_reservation_settings(
         )
         updated.append(field)
     
+    opening_calendar.bump_version()
     await create_audit_log(current_user, "settings", "reservation_config", "update", None, data.model_dump(exclude_none=True))
     
     return {
@@ -750,6 +761,7 @@ async def create_or_update_time_slot_config(
             {"id": existing["id"]},
             {"$set": update_data}
         )
+        opening_calendar.bump_version()
         await create_audit_log(current_user, "time_slot_config", existing["id"], "update")
         
         return {
@@ -761,6 +773,7 @@ async def create_or_update_time_slot_config(
         doc = create_entity(data.model_dump())
         doc["day_name"] = day_names[data.day_of_week]
         await db.time_slot_configs.insert_one(doc)
+        opening_calendar.bump_version()
         await create_audit_log(current_user, "time_slot_config", doc["id"], "create")
         
         return {
@@ -783,6 +796,8 @@ async def delete_time_slot_config(
     if result.modified_count == 0:
         raise NotFoundException("Zeitslot-Konfiguration")
     
+    opening_calendar.bump_version()
+    
     return {"message": "Zeitslot-Konfiguration gelöscht (Standard wird verwendet)"}
 
 
@@ -866,6 +881,7 @@ async def create_opening_period(
     })
     
     await db.opening_hours_periods.insert_one(doc)
+    opening_calendar.bump_version()
     await create_audit_log(current_user, "opening_period", doc["id"], "create")
     
     return {"message": f"[DEPRECATED] Periode '{data.name}' erstellt in opening_hours_periods", "id": doc["id"]}
@@ -912,6 +928,7 @@ async def update_opening_period(
         {"id": period_id},
         {"$set": update_data}
     )
+    opening_calendar.bump_version()
     await create_audit_log(current_user, "opening_period", period_id, "update")
     
     return {"message": "[DEPRECATED] Periode aktualisiert in opening_hours_periods", "id": period_id}
@@ -936,6 +953,7 @@ async def delete_opening_period(
     if result.modified_count == 0:
         raise NotFoundException("Öffnungszeiten-Periode")
     
+    opening_calendar.bump_version()
     await create_audit_log(current_user, "opening_period", period_id, "archive")
     
     return {"message": "[DEPRECATED] Periode gelöscht aus opening_hours_periods"}
@@ -1079,6 +1097,7 @@ async def update_duration_settings(
             upsert=True
         )
     
+    opening_calendar.bump_version()
     await create_audit_log(current_user, "settings", "duration", "update")
     
     return {
@@ -1154,6 +1173,8 @@ async def extend_reservation_duration(
         {"id": reservation_id},
         {"$set": update_data}
     )
+    # Längere Dauer belegt weitere Slots im Kapazitäts-Ledger
+    await on_reservation_changed(reservation, {**reservation, **update_data})
     
     await create_audit_log(
         current_user, "reservation", reservation_id, "extend",
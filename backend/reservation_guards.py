@@ -452,40 +452,76 @@ async def is_waitlist_offer_valid(waitlist_id: str) -> Tuple[bool, Optional[str]
 
 # ============== C1: GÄSTE PRO STUNDE AGGREGIEREN ==============
 
-async def get_guests_per_hour(date_str: str) -> Dict[str, int]:
+# Status, die in Gäste-Statistiken zählen (Stunden-/Tagesübersicht)
+STATS_STATUSES = ["neu", "bestaetigt", "angekommen", "abgeschlossen"]
+
+# Gruppierungsschlüssel für aggregate_reservation_stats
+STATS_GROUP_KEYS = {
+    "hour": {"$substr": ["$time", 0, 2]},
+    "day": "$date",
+    "area": "$area_id",
+    "source": "$source",
+}
+
+
+async def aggregate_reservation_stats(
+    date_from: str,
+    date_to: Optional[str] = None,
+    group_by: str = "day",
+    statuses: Optional[List[str]] = STATS_STATUSES
+) -> List[Dict[str, Any]]:
     """
-    C1) Aggregiere Gästeanzahl pro Stunde für ein Datum.
+    C1) Eine Aggregation über einen Datumsbereich, gruppiert nach hour|day|area|source.
     
-    Für Modul 30 Vorbereitung (Schichtbelegung).
+    Basis für Tagesübersicht (Dashboard), Stundenübersicht und Modul 30.
+    statuses=None zählt alle nicht archivierten Reservierungen.
     
     Returns:
-        {"10": 15, "11": 42, "12": 78, ...} - Gäste pro Stunde
+        [{"key": "2025-12-28", "guests": 45, "reservations": 12}, ...] sortiert nach key
     """
+    if group_by not in STATS_GROUP_KEYS:
+        raise ValidationException(f"Ungültige Gruppierung: {group_by} (erlaubt: {', '.join(STATS_GROUP_KEYS)})")
+    
+    match: Dict[str, Any] = {"archived": {"$ne": True}}
+    if date_to and date_to != date_from:
+        match["date"] = {"$gte": date_from, "$lte": date_to}
+    else:
+        match["date"] = date_from
+    if statuses is not None:
+        match["status"] = {"$in": statuses}
+    
     pipeline = [
-        {
-            "$match": {
-                "date": date_str,
-                "archived": {"$ne": True},
-                "status": {"$in": ["neu", "bestaetigt", "angekommen", "abgeschlossen"]}
-            }
-        },
-        {
-            "$addFields": {
-                "hour": {"$substr": ["$time", 0, 2]}
-            }
-        },
+        {"$match": match},
         {
             "$group": {
-                "_id": "$hour",
-                "guests": {"$sum": "$party_size"}
+                "_id": STATS_GROUP_KEYS[group_by],
+                "guests": {"$sum": {"$ifNull": ["$party_size", 0]}},
+                "reservations": {"$sum": 1}
             }
         },
         {"$sort": {"_id": 1}}
     ]
     
-    results = await db.reservations.aggregate(pipeline).to_list(24)
+    results = await db.reservations.aggregate(pipeline).to_list(None)
     
-    return {r["_id"]: r["guests"] for r in results}
+    return [
+        {"key": r["_id"], "guests": r["guests"], "reservations": r["reservations"]}
+        for r in results
+    ]
+
+
+async def get_guests_per_hour(date_str: str) -> Dict[str, int]:
+    """
+    C1) Aggregiere Gästeanzahl pro Stunde für ein Datum.
+    
+    Für Modul 30 Vorbereitung (Schichtbelegung).
+    
+    Returns:
+        {"10": 15, "11": 42, "12": 78, ...} - Gäste pro Stunde
+    """
+    results = await aggregate_reservation_stats(date_str, group_by="hour")
+    
+    return {r["key"]: r["guests"] for r in results}
 
 
 async def get_hourly_overview(date_str: str) -> List[Dict[str, Any]]:
@@ -495,35 +531,12 @@ async def get_hourly_overview(date_str: str) -> List[Dict[str, Any]]:
     Returns:
         [{"hour": "11", "guests": 45, "reservations": 12}, ...]
     """
-    pipeline = [
-        {
-            "$match": {
-                "date": date_str,
-                "archived": {"$ne": True},
-                "status": {"$in": ["neu", "bestaetigt", "angekommen", "abgeschlossen"]}
-            }
-        },
-        {
-            "$addFields": {
-                "hour": {"$substr": ["$time", 0, 2]}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$hour",
-                "guests": {"$sum": "$party_size"},
-                "reservations": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]
-    
-    results = await db.reservations.aggregate(pipeline).to_list(24)
+    results = await aggregate_reservation_stats(date_str, group_by="hour")
     
     return [
         {
-            "hour": r["_id"],
-            "hour_display": f"{r['_id']}:00",
+            "hour": r["key"],
+            "hour_display": f"{r['key']}:00",
             "guests": r["guests"],
             "reservations": r["reservations"]
         }
@@ -0,0 +1,28 @@
+"""
+GastroCore Reservation Hooks
+================================================================================
+Abgeleiteter Zustand, der nach JEDEM Schreiben einer Reservierung nachgezogen
+wird - unabhängig davon, welches Modul schreibt (server.py, Zahlungen, ...):
+
+- Tages-Kapazität (capacity_ledger, im Speicher)
+- Platz-Zähler pro Durchgang (capacity_counters)
+- Gäste-Suchindex (Besuche)
+- Erinnerungs-Warteschlange (reminder_queue)
+"""
+
+from typing import Optional
+
+from reservation_capacity import capacity_ledger, capacity_counters
+from guest_search_module import record_reservation_visit
+from reminder_queue import schedule_reservation_reminders
+
+
+async def on_reservation_changed(before: Optional[dict], after: Optional[dict]):
+    """
+    Derived state to update after every reservation write.
+    before: state before the change (None on create), after: state after (None on archive)
+    """
+    capacity_ledger.apply(before, after)
+    await capacity_counters.sync(before, after)
+    await record_reservation_visit(before, after)
+    await schedule_reservation_reminders(before, after)
@@ -30,6 +30,7 @@ from core.database import db
 from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit
 from core.exceptions import NotFoundException, ValidationException, ConflictException
+from core.indexes import register_indexes, index
 
 # Import Opening Hours für effective hours
 from opening_hours_module import calculate_effective_hours, is_holiday_brandenburg
@@ -42,6 +43,19 @@ logger = logging.getLogger(__name__)
 slots_router = APIRouter(tags=["Reservation Slots"])
 
 
+# ============== INDEXES ==============
+# Range-Abfragen der Slot-Engine (Ausnahmen + Events über das ganze Fenster)
+register_indexes(
+    "reservation_slot_exceptions",
+    index(("date", 1), ("active", 1)),
+)
+register_indexes(
+    "events",
+    index(("dates", 1)),
+    index(("start_date", 1)),
+)
+
+
 # ============== CONSTANTS ==============
 DEFAULT_SLOT_INTERVAL = 30  # Minuten
 DEFAULT_EVENT_CUTOFF = 120  # Minuten vor Event
@@ -190,20 +204,23 @@ class SlotExceptionUpdate(BaseModel):
 
 
 # ============== CORE BUSINESS LOGIC ==============
+# Range-Engine: Regeln, Ausnahmen, Events und Konfiguration werden für das ganze
+# Zeitfenster mit je einer Abfrage geladen (load_slot_context), danach werden
+# alle Tage ohne weitere DB-Zugriffe berechnet (compute_effective_slots).
 
-async def get_slot_rule_for_date(target_date: date) -> Optional[dict]:
-    """
-    Finde die passende Slot-Regel für ein Datum.
-    Berücksichtigt valid_from/to und applies_days.
-    Bei mehreren: höchste priority gewinnt.
-    """
-    date_str = target_date.strftime("%Y-%m-%d")
+MAX_SLOT_RANGE_DAYS = 90  # Buchungshorizont (Monatsansicht)
+
+
+def _parse_day(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _match_slot_rule(rules: List[dict], target_date: date) -> Optional[dict]:
+    """Passende Slot-Regel aus vorgeladenen Regeln (siehe get_slot_rule_for_date)"""
     weekday = target_date.weekday()  # 0=Mo..6=So
     
-    rules = await db.reservation_slot_rules.find(
-        {"active": True, "archived": {"$ne": True}}
-    ).to_list(100)
-    
     matching = []
     for rule in rules:
         # Prüfe Wochentag
@@ -211,18 +228,13 @@ async def get_slot_rule_for_date(target_date: date) -> Optional[dict]:
             continue
         
         # Prüfe valid_from/to
-        valid_from = rule.get("valid_from")
-        valid_to = rule.get("valid_to")
-        
-        if valid_from:
-            from_date = datetime.strptime(valid_from, "%Y-%m-%d").date()
-            if target_date < from_date:
-                continue
+        from_date = _parse_day(rule.get("valid_from"))
+        if from_date and target_date < from_date:
+            continue
         
-        if valid_to:
-            to_date = datetime.strptime(valid_to, "%Y-%m-%d").date()
-            if target_date > to_date:
-                continue
+        to_date = _parse_day(rule.get("valid_to"))
+        if to_date and target_date > to_date:
+            continue
         
         matching.append(rule)
     
@@ -234,6 +246,82 @@ async def get_slot_rule_for_date(target_date: date) -> Optional[dict]:
     return matching[0]
 
 
+def _event_dates(event: dict) -> set:
+    """Alle Datumsangaben eines Events (dates-Array bzw. -String + start_date)"""
+    dates = event.get("dates") or []
+    if isinstance(dates, str):
+        dates = [dates]
+    result = set(dates)
+    if event.get("start_date"):
+        result.add(event["start_date"])
+    return result
+
+
+async def load_slot_context(start: date, end: date) -> dict:
+    """
+    Lade alle Eingaben der Slot-Berechnung für [start, end] - eine Abfrage pro Collection.
+    
+    Returns:
+        config, rules, exceptions (date -> exception), events (date -> [events])
+    """
+    date_strs = []
+    current = start
+    while current <= end:
+        date_strs.append(current.strftime("%Y-%m-%d"))
+        current += timedelta(days=1)
+    
+    config = await get_reservation_config()
+    
+    rules = await db.reservation_slot_rules.find(
+        {"active": True, "archived": {"$ne": True}}, {"_id": 0}
+    ).to_list(100)
+    
+    exceptions: Dict[str, dict] = {}
+    exception_docs = await db.reservation_slot_exceptions.find(
+        {"date": {"$gte": date_strs[0], "$lte": date_strs[-1]}, "active": True, "archived": {"$ne": True}},
+        {"_id": 0}
+    ).to_list(len(date_strs) * 5)
+    for exception in exception_docs:
+        # Erste Ausnahme pro Datum gewinnt (wie find_one)
+        exceptions.setdefault(exception["date"], exception)
+    
+    events: Dict[str, List[dict]] = {}
+    event_docs = await db.events.find(
+        {
+            "archived": {"$ne": True},
+            "$or": [
+                {"dates": {"$in": date_strs}},
+                {"start_date": {"$in": date_strs}}
+            ]
+        },
+        {"_id": 0}
+    ).to_list(2000)
+    wanted = set(date_strs)
+    for event in event_docs:
+        for date_str in _event_dates(event) & wanted:
+            events.setdefault(date_str, []).append(event)
+    
+    return {
+        "config": config,
+        "rules": rules,
+        "exceptions": exceptions,
+        "events": events,
+    }
+
+
+async def get_slot_rule_for_date(target_date: date) -> Optional[dict]:
+    """
+    Finde die passende Slot-Regel für ein Datum.
+    Berücksichtigt valid_from/to und applies_days.
+    Bei mehreren: höchste priority gewinnt.
+    """
+    rules = await db.reservation_slot_rules.find(
+        {"active": True, "archived": {"$ne": True}}
+    ).to_list(100)
+    
+    return _match_slot_rule(rules, target_date)
+
+
 async def get_slot_exception_for_date(target_date: date) -> Optional[dict]:
     """Finde Ausnahme für ein Datum"""
     date_str = target_date.strftime("%Y-%m-%d")
@@ -310,6 +398,26 @@ async def calculate_effective_slots(target_date: date) -> dict:
     5. Entferne blocked windows
     6. Berücksichtige Event-Cutoff
     """
+    days = await calculate_effective_slots_range(target_date, target_date)
+    return days[0]
+
+
+async def calculate_effective_slots_range(start: date, end: date) -> List[dict]:
+    """Effektive Slots für alle Tage in [start, end] (ein Kontext-Load für das ganze Fenster)"""
+    context = await load_slot_context(start, end)
+    
+    results = []
+    current = start
+    while current <= end:
+        effective_hours = await calculate_effective_hours(current)
+        results.append(compute_effective_slots(current, effective_hours, context))
+        current += timedelta(days=1)
+    
+    return results
+
+
+def compute_effective_slots(target_date: date, effective_hours: dict, context: dict) -> dict:
+    """Slot-Berechnung für ein Datum auf vorgeladenem Kontext (siehe load_slot_context)"""
     date_str = target_date.strftime("%Y-%m-%d")
     weekday = target_date.weekday()
     weekday_names = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag", "Samstag", "Sonntag"]
@@ -327,19 +435,17 @@ async def calculate_effective_slots(target_date: date) -> dict:
     }
     
     # 1. Prüfe Öffnungsstatus
-    effective_hours = await calculate_effective_hours(target_date)
-    
     if not effective_hours.get("is_open", False):
         result["open"] = False
         result["notes"].append(effective_hours.get("closure_reason") or "Geschlossen")
         return result
     
     # 2. Hole Konfiguration
-    config = await get_reservation_config()
+    config = context["config"]
     event_cutoff = config.get("event_cutoff_minutes_default", DEFAULT_EVENT_CUTOFF)
     
     # 3. Prüfe Exception
-    exception = await get_slot_exception_for_date(target_date)
+    exception = context["exceptions"].get(date_str)
     blocked_windows = []
     
     if exception:
@@ -360,7 +466,7 @@ async def calculate_effective_slots(target_date: date) -> dict:
     
     # 4. Wenn keine Exception-Slots: Hole Regel und generiere Slots
     if not result["slots"]:
-        rule = await get_slot_rule_for_date(target_date)
+        rule = _match_slot_rule(context["rules"], target_date)
         
         if rule:
             result["rule_name"] = rule.get("name")
@@ -409,7 +515,7 @@ async def calculate_effective_slots(target_date: date) -> dict:
         result["blocked"] = blocked_windows
     
     # 6. Event-Cutoff
-    events = await get_events_for_date(target_date)
+    events = context["events"].get(date_str, [])
     
     for event in events:
         event_start = event.get("start_time")
@@ -484,16 +590,10 @@ async def get_effective_slots_range(
     if end < start:
         raise ValidationException("Enddatum muss nach Startdatum liegen")
     
-    if (end - start).days > 30:
-        raise ValidationException("Maximaler Zeitraum: 30 Tage")
+    if (end - start).days > MAX_SLOT_RANGE_DAYS:
+        raise ValidationException(f"Maximaler Zeitraum: {MAX_SLOT_RANGE_DAYS} Tage")
     
-    results = []
-    current = start
-    
-    while current <= end:
-        effective = await calculate_effective_slots(current)
-        results.append(effective)
-        current += timedelta(days=1)
+    results = await calculate_effective_slots_range(start, end)
     
     return {
         "from": from_date,
@@ -31,6 +31,11 @@ from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from streaming_export import iter_documents, iter_file, new_temp_path, remove_file, write_json_array
+
 # Logging
 logger = logging.getLogger("seeds_backup")
 
@@ -99,6 +104,11 @@ SEED_COLLECTIONS = {
     }
 }
 
+# Felder, die beim Import gesetzt werden und nicht in den Content-Hash eingehen
+SEED_VOLATILE_FIELDS = {"_id", "created_at", "updated_at", "_seed_imported"}
+SEED_BULK_BATCH_SIZE = 500
+DIFF_SAMPLE_SIZE = 20
+
 # Import order (verbindlich)
 IMPORT_ORDER = [
     "system_settings",
@@ -157,34 +167,72 @@ def calculate_seeds_fingerprint(seed_data: Dict[str, List[dict]]) -> str:
     canonical_json = json.dumps(sorted_data, sort_keys=True, ensure_ascii=False, default=str)
     return hashlib.sha256(canonical_json.encode('utf-8')).hexdigest()[:12]
 
-async def get_current_seeds_fingerprint() -> Dict[str, Any]:
+class SeedFingerprint:
     """
-    Calculate fingerprint of current DB seed state.
-    Returns hash and metadata.
+    Inkrementelle Variante von calculate_seeds_fingerprint (identischer Hash).
+    Collections in sortierter Reihenfolge, Dokumente nach id sortiert zuführen.
     """
-    seed_data = {}
     
-    for name, config in SEED_COLLECTIONS.items():
-        collection = db[config["collection"]]
-        filter_query = config.get("filter", {})
-        docs = await collection.find(filter_query, {"_id": 0}).to_list(1000)
+    def __init__(self):
+        self._hash = hashlib.sha256(b"{")
+        self._collections = 0
+        self._docs = 0
+    
+    def _update(self, text: str):
+        self._hash.update(text.encode('utf-8'))
+    
+    def start_collection(self, name: str):
+        prefix = ", " if self._collections else ""
+        self._update(f"{prefix}{json.dumps(name, ensure_ascii=False)}: [")
+        self._collections += 1
+        self._docs = 0
+    
+    def add(self, doc: dict):
+        prefix = ", " if self._docs else ""
+        self._update(prefix + json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str))
+        self._docs += 1
+    
+    def end_collection(self):
+        self._update("]")
+    
+    def hexdigest(self) -> str:
+        final = self._hash.copy()
+        final.update(b"}")
+        return final.hexdigest()[:12]
+
+async def iter_seed_documents(name: str, fingerprint: Optional[SeedFingerprint] = None):
+    """Bereinigte Seed-Dokumente einer Collection per Cursor (nach id sortiert)"""
+    config = SEED_COLLECTIONS[name]
+    async for doc in iter_documents(db[config["collection"]], config.get("filter", {}), sort=[("id", 1)]):
+        cleaned = clean_document(doc)
         
-        # Clean documents
-        cleaned_docs = []
-        for doc in docs:
-            cleaned = clean_document(doc)
-            if name == "shift_templates" and "department" in cleaned:
-                cleaned["department"] = normalize_department(cleaned["department"])
-            cleaned_docs.append(cleaned)
+        # Normalize shift_templates departments
+        if name == "shift_templates" and "department" in cleaned:
+            cleaned["department"] = normalize_department(cleaned["department"])
         
-        seed_data[name] = cleaned_docs
+        if fingerprint is not None:
+            fingerprint.add(cleaned)
+        yield cleaned
+
+async def get_current_seeds_fingerprint() -> Dict[str, Any]:
+    """
+    Calculate fingerprint of current DB seed state.
+    Returns hash and metadata.
+    """
+    fingerprint = SeedFingerprint()
+    counts = {}
     
-    fingerprint = calculate_seeds_fingerprint(seed_data)
+    for name in sorted(SEED_COLLECTIONS):
+        fingerprint.start_collection(name)
+        counts[name] = 0
+        async for _ in iter_seed_documents(name, fingerprint):
+            counts[name] += 1
+        fingerprint.end_collection()
     
     return {
-        "fingerprint": fingerprint,
+        "fingerprint": fingerprint.hexdigest(),
         "calculated_at": datetime.now(timezone.utc).isoformat(),
-        "collections": {name: len(docs) for name, docs in seed_data.items()}
+        "collections": counts
     }
 
 
@@ -208,62 +256,33 @@ def normalize_department(value: str) -> str:
     }
     return aliases.get(value.lower(), value.lower())
 
-async def export_collection(name: str) -> Tuple[List[dict], int]:
-    """Export a single collection, returns (documents, count)"""
-    config = SEED_COLLECTIONS.get(name)
-    if not config:
-        return [], 0
-    
-    collection = db[config["collection"]]
-    filter_query = config.get("filter", {})
-    
-    docs = await collection.find(filter_query, {"_id": 0}).to_list(1000)
-    
-    # Clean and normalize
-    cleaned_docs = []
-    for doc in docs:
-        cleaned = clean_document(doc)
-        
-        # Normalize shift_templates departments
-        if name == "shift_templates" and "department" in cleaned:
-            cleaned["department"] = normalize_department(cleaned["department"])
-        
-        cleaned_docs.append(cleaned)
-    
-    return cleaned_docs, len(cleaned_docs)
-
-async def create_backup_zip() -> Tuple[io.BytesIO, Dict[str, int], str]:
-    """Create ZIP backup of all seed collections. Returns (buffer, counts, fingerprint)"""
-    buffer = io.BytesIO()
+async def write_backup_zip(path: str) -> Tuple[Dict[str, int], str]:
+    """
+    ZIP backup of all seed collections into `path`.
+    Einträge werden dokumentweise geschrieben, Fingerprint läuft mit.
+    Returns (counts, fingerprint)
+    """
     counts = {}
-    seed_data = {}
-    
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for name, config in SEED_COLLECTIONS.items():
-            docs, count = await export_collection(name)
-            counts[name] = count
-            seed_data[name] = docs
-            
-            # Create JSON content
-            json_content = json.dumps(docs, indent=2, ensure_ascii=False, default=str)
-            
-            # Add to ZIP
-            zf.writestr(config["export_path"], json_content)
-        
-        # Calculate fingerprint
-        fingerprint = calculate_seeds_fingerprint(seed_data)
+    fingerprint = SeedFingerprint()
+    
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in sorted(SEED_COLLECTIONS):
+            config = SEED_COLLECTIONS[name]
+            fingerprint.start_collection(name)
+            with io.TextIOWrapper(zf.open(config["export_path"], "w", force_zip64=True), encoding="utf-8") as entry:
+                counts[name] = await write_json_array(entry, iter_seed_documents(name, fingerprint))
+            fingerprint.end_collection()
         
         # Add manifest with fingerprint
         manifest = {
             "version": "1.0",
-            "fingerprint": fingerprint,
+            "fingerprint": fingerprint.hexdigest(),
             "created_at": datetime.now(timezone.utc).isoformat(),
             "counts": counts
         }
         zf.writestr("seed/manifest.json", json.dumps(manifest, indent=2))
     
-    buffer.seek(0)
-    return buffer, counts, fingerprint
+    return counts, manifest["fingerprint"]
 
 
 # ============== IMPORT FUNCTIONS ==============
@@ -312,19 +331,76 @@ def parse_seed_file(zf: zipfile.ZipFile, path: str) -> Tuple[List[dict], List[st
     
     return docs, errors
 
+def content_hash_for(doc: dict, keys: List[str]) -> str:
+    """Content hash über die gegebenen Felder (fehlende Felder fließen nicht ein)"""
+    payload = {k: doc[k] for k in keys if k in doc}
+    return calculate_content_hash(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str))
+
+async def diff_collection(name: str, docs: List[dict]) -> Dict[str, Any]:
+    """
+    Seed-Dokumente gegen den DB-Stand abgleichen (ein Query für alle ids).
+    
+    Ein Dokument gilt als unverändert, wenn $set mit seinen Feldern
+    (ohne Zeitstempel/Import-Marker) nichts ändern würde.
+    
+    Returns: {"create": [...], "update": [...], "unchanged": [...], "warnings": [...]}
+    """
+    collection = db[SEED_COLLECTIONS[name]["collection"]]
+    
+    by_id: Dict[str, dict] = {}
+    warnings = []
+    for doc in docs:
+        doc = clean_document(doc)
+        if not doc.get("id"):
+            # Generate ID if missing
+            doc["id"] = str(uuid.uuid4())
+        
+        # Normalize department for shift_templates
+        if name == "shift_templates" and "department" in doc:
+            doc["department"] = normalize_department(doc["department"])
+        
+        if doc["id"] in by_id:
+            warnings.append(f"{name}: doppelte id {doc['id']} - letzter Eintrag gewinnt")
+        by_id[doc["id"]] = doc
+    
+    existing: Dict[str, dict] = {}
+    async for doc in iter_documents(collection, {"id": {"$in": list(by_id.keys())}}):
+        existing[doc["id"]] = doc
+    
+    diff = {"create": [], "update": [], "unchanged": [], "warnings": warnings}
+    for doc_id, doc in by_id.items():
+        current = existing.get(doc_id)
+        if current is None:
+            diff["create"].append(doc)
+            continue
+        keys = [k for k in doc.keys() if k not in SEED_VOLATILE_FIELDS]
+        if content_hash_for(doc, keys) == content_hash_for(current, keys):
+            diff["unchanged"].append(doc)
+        else:
+            diff["update"].append(doc)
+    return diff
+
 async def import_collection(
     name: str, 
     docs: List[dict], 
     options: ImportOptions
 ) -> Dict[str, Any]:
-    """Import documents into a collection"""
+    """
+    Import documents into a collection.
+    
+    Diff per Content-Hash, danach geordnete bulk_write-Batches nur für
+    neue/geänderte Dokumente, archive_missing als ein update_many.
+    dry_run liefert denselben Diff ohne Schreibzugriffe.
+    """
     result = {
         "created": 0,
         "updated": 0,
+        "unchanged": 0,
         "archived": 0,
         "skipped": 0,
         "warnings": [],
-        "errors": []
+        "errors": [],
+        "sample_ids": {"created": [], "updated": []}
     }
     
     config = SEED_COLLECTIONS.get(name)
@@ -335,61 +411,49 @@ async def import_collection(
     collection = db[config["collection"]]
     now = datetime.now(timezone.utc).isoformat()
     
-    imported_ids = set()
+    diff = await diff_collection(name, docs)
+    result["warnings"].extend(diff["warnings"])
+    result["unchanged"] = len(diff["unchanged"])
+    result["skipped"] = len(diff["unchanged"])
+    result["sample_ids"]["created"] = [d["id"] for d in diff["create"][:DIFF_SAMPLE_SIZE]]
+    result["sample_ids"]["updated"] = [d["id"] for d in diff["update"][:DIFF_SAMPLE_SIZE]]
+    
+    imported_ids = [d["id"] for d in diff["create"] + diff["update"] + diff["unchanged"]]
+    archive_filter = {"id": {"$nin": imported_ids}, "archived": {"$ne": True}}
+    
+    if options.dry_run:
+        result["created"] = len(diff["create"])
+        result["updated"] = len(diff["update"])
+        if options.archive_missing:
+            result["archived"] = await collection.count_documents(archive_filter)
+        return result
     
-    for doc in docs:
+    ops = []
+    for doc in diff["create"]:
+        ops.append(InsertOne({**doc, "created_at": now, "updated_at": now, "_seed_imported": True}))
+    for doc in diff["update"]:
+        ops.append(UpdateOne({"id": doc["id"]}, {"$set": {**doc, "updated_at": now, "_seed_imported": True}}))
+    
+    for i in range(0, len(ops), SEED_BULK_BATCH_SIZE):
         try:
-            doc_id = doc.get("id")
-            if not doc_id:
-                # Generate ID if missing
-                doc_id = str(uuid.uuid4())
-                doc["id"] = doc_id
-            
-            imported_ids.add(doc_id)
-            
-            # Normalize department for shift_templates
-            if name == "shift_templates" and "department" in doc:
-                doc["department"] = normalize_department(doc["department"])
-            
-            # Check existing
-            existing = await collection.find_one({"id": doc_id})
-            
-            if existing:
-                # Update
-                if not options.dry_run:
-                    doc["updated_at"] = now
-                    doc["_seed_imported"] = True
-                    await collection.update_one(
-                        {"id": doc_id},
-                        {"$set": doc}
-                    )
-                result["updated"] += 1
-            else:
-                # Create
-                if not options.dry_run:
-                    doc["created_at"] = now
-                    doc["updated_at"] = now
-                    doc["_seed_imported"] = True
-                    await collection.insert_one(doc)
-                result["created"] += 1
-                
-        except Exception as e:
-            result["errors"].append(f"Error importing {doc.get('id', 'unknown')}: {e}")
+            bulk = await collection.bulk_write(ops[i:i + SEED_BULK_BATCH_SIZE], ordered=True)
+            result["created"] += bulk.inserted_count
+            result["updated"] += bulk.modified_count
+        except BulkWriteError as e:
+            details = e.details or {}
+            result["created"] += details.get("nInserted", 0)
+            result["updated"] += details.get("nModified", 0)
+            for err in details.get("writeErrors", [])[:5]:
+                result["errors"].append(f"Error importing {name}: {err.get('errmsg')}")
+            break
     
     # Archive missing (if requested)
-    if options.archive_missing and not options.dry_run:
-        # Find documents not in import
-        existing_docs = await collection.find(
-            {"id": {"$nin": list(imported_ids)}, "archived": {"$ne": True}},
-            {"id": 1}
-        ).to_list(1000)
-        
-        for doc in existing_docs:
-            await collection.update_one(
-                {"id": doc["id"]},
-                {"$set": {"archived": True, "updated_at": now}}
-            )
-            result["archived"] += 1
+    if options.archive_missing and not result["errors"]:
+        archived = await collection.update_many(
+            archive_filter,
+            {"$set": {"archived": True, "updated_at": now}}
+        )
+        result["archived"] = archived.modified_count
     
     return result
 
@@ -500,8 +564,13 @@ async def export_seeds(user: dict = Depends(require_admin)):
     READ-ONLY operation, never destructive.
     """
     try:
-        # Create backup with fingerprint
-        zip_buffer, counts, fingerprint = await create_backup_zip()
+        # Create backup with fingerprint (Temp-Datei, wird nach dem Download gelöscht)
+        zip_path = new_temp_path(".zip")
+        try:
+            counts, fingerprint = await write_backup_zip(zip_path)
+        except Exception:
+            remove_file(zip_path)
+            raise
         
         # Generate filename with fingerprint
         timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
@@ -525,7 +594,7 @@ async def export_seeds(user: dict = Depends(require_admin)):
         logger.info(f"Seeds exported by {user.get('email')}: fingerprint={fingerprint}, counts={counts}")
         
         return StreamingResponse(
-            zip_buffer,
+            iter_file(zip_path),
             media_type="application/zip",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -603,18 +672,26 @@ async def import_seeds(
             result.created += import_result["created"]
             result.updated += import_result["updated"]
             result.archived += import_result["archived"]
+            result.skipped += import_result["skipped"]
             result.warnings.extend(import_result["warnings"])
             result.errors.extend(import_result["errors"])
             
             result.details[collection_name] = {
                 "created": import_result["created"],
                 "updated": import_result["updated"],
+                "unchanged": import_result["unchanged"],
                 "archived": import_result["archived"],
-                "total": len(docs)
+                "total": len(docs),
+                "sample_ids": import_result["sample_ids"]
             }
         
         zf.close()
         
+        # Öffnungszeiten-Kalender neu laden (opening_hours_master u.a. können sich geändert haben)
+        if not dry_run:
+            from opening_hours_module import opening_calendar
+            opening_calendar.bump_version()
+        
         # Set status
         if result.errors:
             result.status = "error"
@@ -655,6 +732,7 @@ async def import_seeds(
                 "fingerprint": imported_fingerprint,
                 "created": result.created,
                 "updated": result.updated,
+                "unchanged": result.skipped,
                 "archived": result.archived,
                 "errors": len(result.errors)
             }
@@ -26,10 +26,14 @@ load_dotenv(ROOT_DIR / '.env')
 from core.config import settings
 from core.database import db, client, close_db_connection
 from core.auth import (
-    get_current_user, require_roles, require_admin, require_manager, require_terminal,
-    hash_password, verify_password, create_token, decode_token
+    get_current_user, get_read_principal, require_roles, require_admin, require_manager,
+    require_terminal, require_terminal_read, hash_password, verify_password, create_token, decode_token,
+    invalidate_principal, principal_cache
 )
 from core.audit import create_audit_log, safe_dict_for_audit, SYSTEM_ACTOR
+from core.indexes import (
+    register_indexes, index, reconcile_indexes, summarize_index_report, get_registered_indexes
+)
 from core.models import UserRole, ReservationStatus, WaitlistStatus, GuestFlag, ReservationSource
 from core.validators import (
     validate_status_transition, validate_reservation_data,
@@ -44,7 +48,7 @@ from core.exceptions import (
 from email_service import (
     send_confirmation_email, send_reminder_email, send_cancellation_email,
     send_waitlist_notification, verify_cancel_token, get_email_templates,
-    send_test_email, get_smtp_status, is_smtp_configured
+    send_test_email, get_smtp_status, is_smtp_configured, email_outbox
 )
 from pdf_service import generate_table_plan_pdf
 from import_module import (
@@ -83,7 +87,7 @@ from opening_hours_module import (
 from reservation_slots_module import slots_router
 
 # Reservation Capacity Module (Sprint: Kapazität & Durchgänge)
-from reservation_capacity import capacity_router
+from reservation_capacity import capacity_router, capacity_counters
 
 # Table Module (Sprint: Tischplan & Belegung)
 from table_module import (
@@ -126,6 +130,7 @@ from reservation_guards import (
     is_waitlist_offer_valid,
     get_guests_per_hour,
     get_hourly_overview,
+    aggregate_reservation_stats,
     apply_reservation_guards,
     STANDARD_RESERVATION_DURATION_MINUTES
 )
@@ -133,12 +138,25 @@ from reservation_guards import (
 # POS Mail Automation Module (Sprint: POS PDF Mail-Automation V1)
 from pos_mail_module import pos_mail_router, set_db as set_pos_mail_db
 
+# POS Z-Bericht Import (PDF-Upload, Reparse, KPI-Rollups)
+from pos_zreport_module import pos_router as pos_zreport_router, set_db as set_pos_zreport_db, shutdown_parse_pool
+
 # Shift Template Migration Module (Sprint: Schema V2 Migration)
 from shift_template_migration import migration_router as shift_migration_router, set_db as set_migration_db
 
 # Seeds Backup & Restore Module (Modul 10_COCKPIT)
 from seeds_backup_module import seeds_router
 
+# Guest Search Index (Autocomplete)
+from guest_search_module import (
+    guest_search_router, search_guest_index, index_guest,
+    ensure_guest_search_index
+)
+
+# Reminder Queue (ereignisgesteuerte Erinnerungen)
+from reminder_queue import reminder_scheduler, backfill_reminder_queue
+from reservation_hooks import on_reservation_changed
+
 # ============== APP SETUP ==============
 app = FastAPI(
     title="GastroCore API",
@@ -153,6 +171,34 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 
+# ============== INDEXES ==============
+# Hot paths: check_capacity / check_capacity_with_duration / calculate_table_occupancy
+# (date + status + archived), get_current_user (users.id), guest lookups by phone
+register_indexes(
+    "reservations",
+    index(("id", 1), unique=True),
+    index(("date", 1), ("status", 1), ("archived", 1)),
+    index(("date", 1), ("time", 1)),
+    index(("guest_phone", 1), ("date", -1)),
+)
+register_indexes(
+    "users",
+    index(("id", 1), unique=True),
+    index(("email", 1), ("archived", 1)),
+)
+register_indexes(
+    "guests",
+    index(("phone", 1), ("archived", 1)),
+)
+register_indexes(
+    "settings",
+    index(("key", 1)),
+)
+
+# Letzter Abgleich beim Startup (für /diagnostics/indexes)
+_startup_index_report: Dict[str, Any] = {}
+
+
 # ============== EXCEPTION HANDLERS ==============
 @app.exception_handler(GastroCoreException)
 async def gastrocore_exception_handler(request: Request, exc: GastroCoreException):
@@ -373,6 +419,50 @@ async def get_guest_by_phone(phone: str) -> Optional[dict]:
     """Get guest record by phone number"""
     return await db.guests.find_one({"phone": phone, "archived": False}, {"_id": 0})
 
+async def insert_reservation_with_claim(reservation: dict, enforce: bool = True) -> bool:
+    """
+    Platz im Durchgang atomar belegen und Reservierung speichern.
+    Returns False, wenn der Durchgang voll ist (nichts gespeichert).
+    """
+    claim = await capacity_counters.claim(reservation, enforce=enforce)
+    if not claim["claimed"]:
+        return False
+    try:
+        await db.reservations.insert_one(reservation)
+    except Exception:
+        await capacity_counters.release(reservation)
+        raise
+    return True
+
+async def get_guests_by_phones(phones: List[str]) -> Dict[str, dict]:
+    """Get guest records for many phone numbers in one query (phone -> guest)"""
+    unique_phones = list({p for p in phones if p})
+    if not unique_phones:
+        return {}
+    
+    guests = await db.guests.find(
+        {"phone": {"$in": unique_phones}, "archived": False},
+        {"_id": 0, "phone": 1, "flag": 1, "no_show_count": 1}
+    ).to_list(len(unique_phones))
+    return {g["phone"]: g for g in guests}
+
+def guest_flag_snapshot(guest: Optional[dict]) -> dict:
+    """Denormalized guest flag fields stored on reservations (empty when unflagged)"""
+    if guest and guest.get("flag") and guest["flag"] != "none":
+        return {"guest_flag": guest["flag"], "no_show_count": guest.get("no_show_count", 0)}
+    return {}
+
+async def sync_guest_flag_snapshot(phone: str, flag: Optional[str], no_show_count: int = 0):
+    """Keep the guest_flag snapshot on all open reservations of a guest in sync"""
+    if not phone:
+        return
+    query = {"guest_phone": phone, "archived": False}
+    snapshot = guest_flag_snapshot({"flag": flag, "no_show_count": no_show_count})
+    if snapshot:
+        await db.reservations.update_many(query, {"$set": snapshot})
+    else:
+        await db.reservations.update_many(query, {"$unset": {"guest_flag": "", "no_show_count": ""}})
+
 async def update_guest_no_show(phone: str, increment: int = 1):
     """Update guest no-show count and flag if threshold reached"""
     guest = await get_guest_by_phone(phone)
@@ -402,6 +492,8 @@ async def update_guest_no_show(phone: str, increment: int = 1):
             {"phone": phone},
             {"$set": {"no_show_count": new_count, "flag": new_flag, "updated_at": now_iso()}}
         )
+        await sync_guest_flag_snapshot(phone, new_flag, new_count)
+        await index_guest({**guest, "no_show_count": new_count, "flag": new_flag})
     else:
         # Create new guest record
         new_guest = {
@@ -414,6 +506,8 @@ async def update_guest_no_show(phone: str, increment: int = 1):
             "archived": False
         }
         await db.guests.insert_one(new_guest)
+        await sync_guest_flag_snapshot(phone, new_guest["flag"], increment)
+        await index_guest(new_guest)
 
 async def check_capacity(date_str: str, time_str: str, party_size: int, area_id: str = None) -> dict:
     """Check if there's capacity for the reservation"""
@@ -520,6 +614,7 @@ async def change_password(data: PasswordChange, user: dict = Depends(get_current
         {"id": user["id"]},
         {"$set": {"password_hash": hash_password(data.new_password), "must_change_password": False, "updated_at": now_iso()}}
     )
+    invalidate_principal(user["id"])
     
     await create_audit_log(user, "user", user["id"], "password_change", before, {**before, "must_change_password": False})
     return {"message": "Passwort erfolgreich geändert", "success": True}
@@ -559,6 +654,7 @@ async def archive_user(user_id: str, user: dict = Depends(require_admin)):
     
     before = safe_dict_for_audit(existing)
     await db.users.update_one({"id": user_id}, {"$set": {"archived": True, "updated_at": now_iso()}})
+    invalidate_principal(user_id)
     await create_audit_log(user, "user", user_id, "archive", before, {**before, "archived": True})
     
     return {"message": "Benutzer archiviert", "success": True}
@@ -589,6 +685,7 @@ async def link_user_to_staff(user_id: str, staff_member_id: str = None, user: di
             {"id": user_id},
             {"$set": {"staff_member_id": None, "updated_at": now_iso()}}
         )
+        invalidate_principal(user_id)
         await create_audit_log(user, "user", user_id, "unlink_staff", before, {**before, "staff_member_id": None})
         return {"message": "Verknüpfung aufgehoben", "success": True}
     
@@ -614,6 +711,7 @@ async def link_user_to_staff(user_id: str, staff_member_id: str = None, user: di
         {"id": user_id},
         {"$set": {"staff_member_id": staff_member_id, "updated_at": now_iso()}}
     )
+    invalidate_principal(user_id)
     
     staff_name = f"{staff.get('first_name', '')} {staff.get('last_name', '')}".strip()
     await create_audit_log(user, "user", user_id, "link_staff", before, {**before, "staff_member_id": staff_member_id})
@@ -700,7 +798,7 @@ async def get_reservations(
     source: Optional[str] = None,
     search: Optional[str] = None,
     limit: int = 200,
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_read_principal)
 ):
     if user["role"] == UserRole.MITARBEITER.value:
         raise ForbiddenException("Kein Zugriff auf Reservierungen")
@@ -722,12 +820,15 @@ async def get_reservations(
     
     reservations = await db.reservations.find(query, {"_id": 0}).sort("time", 1).limit(limit).to_list(limit)
     
-    # Enrich with guest flags
+    # Enrich with guest flags - one $in lookup for the whole list
+    guests_by_phone = await get_guests_by_phones([r.get("guest_phone", "") for r in reservations])
     for res in reservations:
-        guest = await get_guest_by_phone(res.get("guest_phone", ""))
-        if guest and guest.get("flag") and guest["flag"] != "none":
-            res["guest_flag"] = guest["flag"]
-            res["no_show_count"] = guest.get("no_show_count", 0)
+        snapshot = guest_flag_snapshot(guests_by_phone.get(res.get("guest_phone", "")))
+        if snapshot:
+            res.update(snapshot)
+        else:
+            res.pop("guest_flag", None)
+            res.pop("no_show_count", None)
     
     return reservations
 
@@ -736,11 +837,15 @@ async def get_reservations(
 async def get_reservations_summary(
     days: int = Query(default=7, ge=1, le=30, description="Anzahl Tage"),
     start: Optional[str] = Query(default=None, description="Startdatum (YYYY-MM-DD), default=heute"),
+    group_by: str = Query(default="day", pattern="^(hour|day|area|source)$", description="Gruppierung: hour|day|area|source"),
     user: dict = Depends(require_manager)
 ):
     """
     7-Tage Übersicht für Dashboard.
     Liefert pro Tag: Anzahl Reservierungen + Summe Gäste.
+    Eine Aggregation über den ganzen Zeitraum, leere Tage werden ergänzt.
+    
+    group_by != day liefert zusätzlich "groups" über den ganzen Zeitraum.
     
     Nur für Admin/Schichtleiter.
     """
@@ -757,44 +862,37 @@ async def get_reservations_summary(
             raise HTTPException(status_code=400, detail="Ungültiges Datumsformat (YYYY-MM-DD)")
     else:
         start_date = datetime.now().date()
+    end_date = start_date + timedelta(days=days - 1)
     
     result = {
         "start": start_date.isoformat(),
         "days": []
     }
     
-    # Für jeden Tag aggregieren
+    # Eine Aggregation für alle Tage (alle nicht archivierten Reservierungen)
+    per_day = {
+        r["key"]: r
+        for r in await aggregate_reservation_stats(
+            start_date.isoformat(), end_date.isoformat(), group_by="day", statuses=None
+        )
+    }
+    
     for i in range(days):
         current_date = start_date + timedelta(days=i)
         date_str = current_date.isoformat()
-        weekday_de = WEEKDAYS_DE[current_date.weekday()]  # 0=Mo, 6=So
-        
-        # Aggregation: Zähle Reservierungen und summiere Gäste
-        pipeline = [
-            {"$match": {"date": date_str, "archived": False}},
-            {"$group": {
-                "_id": None,
-                "reservations": {"$sum": 1},
-                "guests": {"$sum": {"$ifNull": ["$party_size", 0]}}
-            }}
-        ]
-        
-        agg_result = await db.reservations.aggregate(pipeline).to_list(1)
-        
-        if agg_result:
-            result["days"].append({
-                "date": date_str,
-                "weekday": weekday_de,
-                "reservations": agg_result[0]["reservations"],
-                "guests": agg_result[0]["guests"]
-            })
-        else:
-            result["days"].append({
-                "date": date_str,
-                "weekday": weekday_de,
-                "reservations": 0,
-                "guests": 0
-            })
+        day_stats = per_day.get(date_str, {})
+        result["days"].append({
+            "date": date_str,
+            "weekday": WEEKDAYS_DE[current_date.weekday()],  # 0=Mo, 6=So
+            "reservations": day_stats.get("reservations", 0),
+            "guests": day_stats.get("guests", 0)
+        })
+    
+    if group_by != "day":
+        result["group_by"] = group_by
+        result["groups"] = await aggregate_reservation_stats(
+            start_date.isoformat(), end_date.isoformat(), group_by=group_by, statuses=None
+        )
     
     return result
 
@@ -803,20 +901,42 @@ async def get_reservations_summary(
 @api_router.get("/reservations/hourly", tags=["Reservations"])
 async def get_reservations_hourly(
     date: str = Query(..., description="Datum YYYY-MM-DD"),
+    date_to: Optional[str] = Query(default=None, description="Optional: Enddatum YYYY-MM-DD (Zeitraum)"),
+    group_by: str = Query(default="hour", pattern="^(hour|day|area|source)$", description="Gruppierung: hour|day|area|source"),
     user: dict = Depends(require_manager)
 ):
     """
     C1) Gäste pro Stunde aggregieren.
     Für Modul 30 (Schichtbelegung) und Dashboard.
+    
+    Mit date_to und/oder group_by != hour wird dieselbe Aggregation über
+    einen Zeitraum bzw. nach Tag/Bereich/Quelle gruppiert ("groups").
     """
-    hourly_data = await get_hourly_overview(date)
+    if group_by == "hour" and not date_to:
+        hourly_data = await get_hourly_overview(date)
+        
+        return {
+            "date": date,
+            "hours": hourly_data,
+            "total_guests": sum(h["guests"] for h in hourly_data),
+            "total_reservations": sum(h["reservations"] for h in hourly_data)
+        }
     
-    return {
+    groups = await aggregate_reservation_stats(date, date_to, group_by=group_by)
+    response = {
         "date": date,
-        "hours": hourly_data,
-        "total_guests": sum(h["guests"] for h in hourly_data),
-        "total_reservations": sum(h["reservations"] for h in hourly_data)
+        "date_to": date_to or date,
+        "group_by": group_by,
+        "groups": groups,
+        "total_guests": sum(g["guests"] for g in groups),
+        "total_reservations": sum(g["reservations"] for g in groups)
     }
+    if group_by == "hour":
+        response["hours"] = [
+            {"hour": g["key"], "hour_display": f"{g['key']}:00", "guests": g["guests"], "reservations": g["reservations"]}
+            for g in groups
+        ]
+    return response
 
 
 
@@ -973,11 +1093,15 @@ async def create_reservation(
             "status": initial_status,
             "reminder_sent": False,
             "source": data.source or "intern",
+            **guest_flag_snapshot(guest),
             **event_pricing_data
         }
     )
     
-    await db.reservations.insert_one(reservation)
+    # Event-Buchungen haben eigene Kontingente - Belegung wird gezählt, aber nicht begrenzt
+    if not await insert_reservation_with_claim(reservation, enforce=not data.event_id):
+        raise CapacityExceededException("Keine Kapazität verfügbar. Der Durchgang ist ausgebucht.")
+    await on_reservation_changed(None, reservation)
     await create_audit_log(user, "reservation", reservation["id"], "create", None, safe_dict_for_audit(reservation))
     
     # Send confirmation email
@@ -1017,6 +1141,7 @@ async def update_reservation(reservation_id: str, data: ReservationUpdate, user:
     await db.reservations.update_one({"id": reservation_id}, {"$set": update_data})
     
     updated = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    await on_reservation_changed(existing, updated)
     await create_audit_log(user, "reservation", reservation_id, "update", before, safe_dict_for_audit(updated))
     return updated
 
@@ -1044,6 +1169,7 @@ async def update_reservation_status(
     await db.reservations.update_one({"id": reservation_id}, {"$set": update_data})
     
     updated = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    await on_reservation_changed(existing, updated)
     await create_audit_log(user, "reservation", reservation_id, "status_change", before, safe_dict_for_audit(updated))
     
     # B4: Wartelisten-Trigger bei Admin-Stornierung
@@ -1086,6 +1212,7 @@ async def assign_table(
     await db.reservations.update_one({"id": reservation_id}, {"$set": update_data})
     
     updated = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    await on_reservation_changed(existing, updated)
     await create_audit_log(user, "reservation", reservation_id, "update", before, safe_dict_for_audit(updated))
     return updated
 
@@ -1097,6 +1224,7 @@ async def archive_reservation(reservation_id: str, user: dict = Depends(require_
     
     before = safe_dict_for_audit(existing)
     await db.reservations.update_one({"id": reservation_id}, {"$set": {"archived": True, "updated_at": now_iso()}})
+    await on_reservation_changed(existing, None)
     await create_audit_log(user, "reservation", reservation_id, "archive", before, {**before, "archived": True})
     return {"message": "Reservierung archiviert", "success": True}
 
@@ -1123,6 +1251,7 @@ async def create_walk_in(data: WalkInCreate, user: dict = Depends(require_termin
     })
     
     await db.reservations.insert_one(reservation)
+    await on_reservation_changed(None, reservation)
     await create_audit_log(user, "reservation", reservation["id"], "create", None, safe_dict_for_audit(reservation))
     
     return {k: v for k, v in reservation.items() if k != "_id"}
@@ -1133,7 +1262,7 @@ async def create_walk_in(data: WalkInCreate, user: dict = Depends(require_termin
 async def get_waitlist(
     date: Optional[str] = None,
     status: Optional[str] = None,
-    user: dict = Depends(require_terminal)
+    user: dict = Depends(require_terminal_read)
 ):
     query = {"archived": False}
     if date:
@@ -1211,6 +1340,7 @@ async def convert_waitlist_to_reservation(
     }, {"status": "bestaetigt", "reminder_sent": False})
     
     await db.reservations.insert_one(reservation)
+    await on_reservation_changed(None, reservation)
     await create_audit_log(user, "reservation", reservation["id"], "create", None, safe_dict_for_audit(reservation))
     
     # Update waitlist entry
@@ -1278,162 +1408,11 @@ async def autocomplete_guests(
 ):
     """
     Schnelle Gäste-Suche für Autocomplete.
-    Sucht in Name, Telefon und E-Mail.
+    Sucht in Name, Telefon und E-Mail (Präfix-Suche) über den Gäste-Suchindex
+    (guests, guest_contacts, reservations) - 1 Query, sortiert nach Besuchszähler.
     Gibt Besuchszähler und letzten Besuch mit zurück.
     """
-    safe_search = escape_regex(q)
-    
-    # Suche in Gäste-Datenbank
-    guests = await db.guests.find(
-        {
-            "archived": False,
-            "$or": [
-                {"name": {"$regex": safe_search, "$options": "i"}},
-                {"phone": {"$regex": safe_search, "$options": "i"}},
-                {"email": {"$regex": safe_search, "$options": "i"}}
-            ]
-        },
-        {"_id": 0}
-    ).limit(limit).to_list(limit)
-    
-    # Für jeden Gast: Besuchszähler und letzten Besuch hinzufügen
-    result = []
-    for guest in guests:
-        # Zähle abgeschlossene Reservierungen
-        visit_count = await db.reservations.count_documents({
-            "guest_phone": guest.get("phone"),
-            "status": {"$in": ["abgeschlossen", "angekommen"]},
-            "archived": False
-        })
-        
-        # Letzter Besuch
-        last_visit = await db.reservations.find_one(
-            {
-                "guest_phone": guest.get("phone"),
-                "status": {"$in": ["abgeschlossen", "angekommen"]},
-                "archived": False
-            },
-            {"_id": 0, "date": 1, "time": 1},
-            sort=[("date", -1), ("time", -1)]
-        )
-        
-        result.append({
-            "id": guest.get("id"),
-            "name": guest.get("name"),
-            "phone": guest.get("phone"),
-            "email": guest.get("email"),
-            "flag": guest.get("flag"),
-            "notes": guest.get("notes"),
-            "newsletter_subscribed": guest.get("newsletter_subscribed", True),
-            "visit_count": visit_count,
-            "last_visit": last_visit.get("date") if last_visit else None,
-            "source": "guests"
-        })
-    
-    # NEU: Suche auch in guest_contacts (Legacy-Import, nur Reservierung)
-    if len(result) < limit:
-        existing_phones = {g["phone"] for g in result if g.get("phone")}
-        existing_emails = {g["email"] for g in result if g.get("email")}
-        
-        contacts = await db.guest_contacts.find(
-            {
-                "archived": False,
-                "contact_type": "reservation_guest",
-                "$or": [
-                    {"first_name": {"$regex": safe_search, "$options": "i"}},
-                    {"last_name": {"$regex": safe_search, "$options": "i"}},
-                    {"phone": {"$regex": safe_search, "$options": "i"}},
-                    {"email": {"$regex": safe_search, "$options": "i"}}
-                ]
-            },
-            {"_id": 0}
-        ).limit(limit * 2).to_list(limit * 2)
-        
-        for contact in contacts:
-            # Skip wenn bereits über phone oder email gefunden
-            if contact.get("phone") in existing_phones:
-                continue
-            if contact.get("email") and contact.get("email") in existing_emails:
-                continue
-            
-            # Namen formatieren: "V. Nachname"
-            fn = contact.get("first_name", "")
-            ln = contact.get("last_name", "")
-            if fn and ln:
-                display_name = f"{fn[0]}. {ln}"
-            elif ln:
-                display_name = ln
-            elif fn:
-                display_name = fn
-            else:
-                display_name = "Unbekannt"
-            
-            result.append({
-                "id": contact.get("id"),
-                "name": display_name,
-                "phone": contact.get("phone"),
-                "email": contact.get("email"),
-                "flag": None,
-                "notes": contact.get("notes"),
-                "newsletter_subscribed": False,  # WICHTIG: Legacy-Kontakte haben KEIN Marketing
-                "marketing_consent": contact.get("marketing_consent", False),
-                "visit_count": contact.get("reservation_count", 0),
-                "last_visit": contact.get("last_reservation_date"),
-                "source": "guest_contacts"
-            })
-            existing_phones.add(contact.get("phone"))
-            if contact.get("email"):
-                existing_emails.add(contact.get("email"))
-            
-            if len(result) >= limit:
-                break
-    
-    # Auch in Reservierungen suchen (für Gäste die noch nicht in guests sind)
-    if len(result) < limit:
-        res_guests = await db.reservations.aggregate([
-            {
-                "$match": {
-                    "archived": False,
-                    "$or": [
-                        {"guest_name": {"$regex": safe_search, "$options": "i"}},
-                        {"guest_phone": {"$regex": safe_search, "$options": "i"}}
-                    ]
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$guest_phone",
-                    "name": {"$first": "$guest_name"},
-                    "phone": {"$first": "$guest_phone"},
-                    "email": {"$first": "$guest_email"},
-                    "visit_count": {"$sum": 1},
-                    "last_visit": {"$max": "$date"}
-                }
-            },
-            {"$limit": limit - len(result)}
-        ]).to_list(limit)
-        
-        # Nur hinzufügen wenn nicht bereits in result
-        existing_phones = {g["phone"] for g in result}
-        for rg in res_guests:
-            if rg["_id"] and rg["_id"] not in existing_phones:
-                result.append({
-                    "id": None,
-                    "name": rg["name"],
-                    "phone": rg["phone"],
-                    "email": rg.get("email"),
-                    "flag": None,
-                    "notes": None,
-                    "newsletter_subscribed": True,
-                    "visit_count": rg["visit_count"],
-                    "last_visit": rg["last_visit"],
-                    "source": "reservations"
-                })
-    
-    # Sortiere nach Besuchszähler (Stammgäste zuerst)
-    result.sort(key=lambda x: x["visit_count"], reverse=True)
-    
-    return result[:limit]
+    return await search_guest_index(q, limit)
 
 
 # NEU: Dedizierter Endpoint für guest_contacts (nur Reservierungskontakte, KEIN Marketing)
@@ -1531,6 +1510,7 @@ async def create_guest(data: GuestCreate, user: dict = Depends(require_manager))
     if "newsletter_subscribed" not in guest:
         guest["newsletter_subscribed"] = True
     await db.guests.insert_one(guest)
+    await index_guest(guest)
     await create_audit_log(user, "guest", guest["id"], "create", None, safe_dict_for_audit(guest))
     
     return {k: v for k, v in guest.items() if k != "_id"}
@@ -1548,6 +1528,9 @@ async def update_guest(guest_id: str, data: GuestUpdate, user: dict = Depends(re
     await db.guests.update_one({"id": guest_id}, {"$set": update_data})
     
     updated = await db.guests.find_one({"id": guest_id}, {"_id": 0})
+    if data.flag is not None and data.flag != existing.get("flag"):
+        await sync_guest_flag_snapshot(updated.get("phone"), updated.get("flag"), updated.get("no_show_count", 0))
+    await index_guest(updated)
     await create_audit_log(user, "guest", guest_id, "update", before, safe_dict_for_audit(updated))
     return updated
 
@@ -1751,6 +1734,30 @@ async def check_availability(
     
     return response
 
+async def add_public_booking_to_waitlist(data: PublicBookingCreate) -> dict:
+    """Ausgebuchte Widget-Anfrage auf die Warteliste setzen"""
+    waitlist_entry = create_entity({
+        "guest_name": data.guest_name,
+        "guest_phone": data.guest_phone,
+        "guest_email": data.guest_email,
+        "party_size": data.party_size,
+        "date": data.date,
+        "preferred_time": data.time,
+        "notes": data.notes,
+        "language": data.language or "de",
+        "priority": 1
+    }, {"status": "offen"})
+    
+    await db.waitlist.insert_one(waitlist_entry)
+    await create_audit_log(SYSTEM_ACTOR, "waitlist", waitlist_entry["id"], "create", None, safe_dict_for_audit(waitlist_entry))
+    
+    return {
+        "success": True,
+        "waitlist": True,
+        "message": "Leider ausgebucht. Sie wurden auf die Warteliste gesetzt.",
+        "waitlist_id": waitlist_entry["id"]
+    }
+
 @public_router.post("/book", tags=["Public"])
 async def public_booking(data: PublicBookingCreate, background_tasks: BackgroundTasks):
     """Public endpoint for online reservations (widget)"""
@@ -1770,28 +1777,7 @@ async def public_booking(data: PublicBookingCreate, background_tasks: Background
     # Check capacity
     capacity = await check_capacity(data.date, data.time, data.party_size)
     if not capacity["available"]:
-        # Create waitlist entry instead
-        waitlist_entry = create_entity({
-            "guest_name": data.guest_name,
-            "guest_phone": data.guest_phone,
-            "guest_email": data.guest_email,
-            "party_size": data.party_size,
-            "date": data.date,
-            "preferred_time": data.time,
-            "notes": data.notes,
-            "language": data.language or "de",
-            "priority": 1
-        }, {"status": "offen"})
-        
-        await db.waitlist.insert_one(waitlist_entry)
-        await create_audit_log(SYSTEM_ACTOR, "waitlist", waitlist_entry["id"], "create", None, safe_dict_for_audit(waitlist_entry))
-        
-        return {
-            "success": True,
-            "waitlist": True,
-            "message": "Leider ausgebucht. Sie wurden auf die Warteliste gesetzt.",
-            "waitlist_id": waitlist_entry["id"]
-        }
+        return await add_public_booking_to_waitlist(data)
     
     # Check guest blacklist
     guest = await get_guest_by_phone(data.guest_phone)
@@ -1814,7 +1800,10 @@ async def public_booking(data: PublicBookingCreate, background_tasks: Background
         "language": data.language or "de"
     }, {"status": "neu", "reminder_sent": False})
     
-    await db.reservations.insert_one(reservation)
+    # Atomare Belegung: parallele Buchungen können den Durchgang nicht überbuchen
+    if not await insert_reservation_with_claim(reservation):
+        return await add_public_booking_to_waitlist(data)
+    await on_reservation_changed(None, reservation)
     await create_audit_log(SYSTEM_ACTOR, "reservation", reservation["id"], "create", None, safe_dict_for_audit(reservation))
     
     # Send confirmation email
@@ -1844,6 +1833,7 @@ async def cancel_reservation_public(reservation_id: str, token: str, background_
     old_status = existing.get("status")
     
     await db.reservations.update_one({"id": reservation_id}, {"$set": {"status": "storniert", "updated_at": now_iso()}})
+    await on_reservation_changed(existing, {**existing, "status": "storniert"})
     await create_audit_log(SYSTEM_ACTOR, "reservation", reservation_id, "cancel_by_guest", before, {**before, "status": "storniert"})
     
     # B4: Wartelisten-Trigger bei Stornierung
@@ -1963,6 +1953,12 @@ async def send_test_email_endpoint(
     return result
 
 
+@api_router.get("/smtp/outbox", tags=["Admin"])
+async def get_email_outbox_status(user: dict = Depends(require_admin)):
+    """Outbox-Status: Warteschlange je Status, Worker-Zähler, SMTP-Pool"""
+    return await email_outbox.stats()
+
+
 # ============== DATA IMPORT (Sprint: Data Onboarding) ==============
 class StaffImportRequest(BaseModel):
     data: str
@@ -2313,6 +2309,29 @@ async def database_diagnostics():
     }
 
 
+@api_router.get("/diagnostics/indexes", tags=["Health"])
+async def index_diagnostics():
+    """
+    Read-only Index-Diagnose: Vergleicht die Index-Registry mit der Live-DB.
+    Fehlende, abweichende und zusätzliche (nicht registrierte) Indizes werden gemeldet.
+    Es wird nichts erstellt oder gelöscht.
+    """
+    report = await reconcile_indexes(db, create_missing=False)
+    
+    return {
+        "summary": summarize_index_report(report),
+        "collections": report,
+        "startup": summarize_index_report(_startup_index_report) if _startup_index_report else None,
+        "registry": get_registered_indexes()
+    }
+
+
+@api_router.get("/diagnostics/auth-cache", tags=["Health"])
+async def auth_cache_diagnostics():
+    """Read-only: Treffer/Fehlzugriffe des Principal-Caches (pro Worker-Prozess)"""
+    return principal_cache.stats()
+
+
 @api_router.get("/version", tags=["Health"])
 async def get_version():
     """
@@ -2497,6 +2516,7 @@ async def create_reminder_rule(data: ReminderRuleCreate, user: dict = Depends(re
     rule = create_entity(data.model_dump())
     await db.reminder_rules.insert_one(rule)
     await create_audit_log(user, "reminder_rule", rule["id"], "create", None, safe_dict_for_audit(rule))
+    await backfill_reminder_queue()
     return {k: v for k, v in rule.items() if k != "_id"}
 
 
@@ -2513,6 +2533,7 @@ async def update_reminder_rule(rule_id: str, data: ReminderRuleCreate, user: dic
     
     updated = await db.reminder_rules.find_one({"id": rule_id}, {"_id": 0})
     await create_audit_log(user, "reminder_rule", rule_id, "update", before, safe_dict_for_audit(updated))
+    await backfill_reminder_queue()
     return updated
 
 
@@ -2526,6 +2547,7 @@ async def delete_reminder_rule(rule_id: str, user: dict = Depends(require_admin)
     before = safe_dict_for_audit(existing)
     await db.reminder_rules.update_one({"id": rule_id}, {"$set": {"archived": True, "updated_at": now_iso()}})
     await create_audit_log(user, "reminder_rule", rule_id, "archive", before, {**before, "archived": True})
+    await backfill_reminder_queue()
     return {"message": "Reminder-Regel archiviert", "success": True}
 
 
@@ -2562,59 +2584,26 @@ async def get_whatsapp_reminder_link(reservation_id: str, user: dict = Depends(r
 
 
 # --- Smart Reminder Processing ---
+# Versand läuft automatisch über reminder_queue (Hintergrund-Worker, siehe reminder_queue.py).
+# Der Endpoint plant die kommenden Tage nach und arbeitet fällige Einträge sofort ab.
 @api_router.post("/reminders/process", tags=["Reminders"])
-async def process_reminders(background_tasks: BackgroundTasks, user: dict = Depends(require_admin)):
-    """Process all due reminders based on configured rules"""
-    now = datetime.now(timezone.utc)
-    
-    # Get active reminder rules
-    rules = await db.reminder_rules.find({"is_active": True, "archived": False}, {"_id": 0}).to_list(100)
-    if not rules:
-        return {"message": "Keine aktiven Reminder-Regeln", "processed": 0}
-    
-    processed = 0
-    for rule in rules:
-        hours_before = rule.get("hours_before", 24)
-        channel = rule.get("channel", "email")
-        
-        # Calculate target datetime
-        target_time = now + timedelta(hours=hours_before)
-        target_date = target_time.strftime("%Y-%m-%d")
-        target_hour = target_time.strftime("%H")
-        
-        # Find reservations that need reminders
-        reminder_key = f"reminder_{hours_before}h_sent"
-        query = {
-            "date": target_date,
-            "status": "bestaetigt",  # Only confirmed reservations
-            "archived": False,
-            reminder_key: {"$ne": True}
-        }
-        
-        reservations = await db.reservations.find(query, {"_id": 0}).to_list(500)
-        
-        for res in reservations:
-            # Check if reservation time matches (within the hour)
-            res_hour = res.get("time", "00:00").split(":")[0]
-            if res_hour == target_hour or hours_before >= 24:  # For 24h+ reminders, send for all
-                
-                if channel in ["email", "both"] and res.get("guest_email"):
-                    area_name = None
-                    if res.get("area_id"):
-                        area_doc = await db.areas.find_one({"id": res["area_id"]}, {"_id": 0})
-                        area_name = area_doc.get("name") if area_doc else None
-                    
-                    background_tasks.add_task(send_reminder_email, res, area_name, res.get("language", "de"))
-                    await log_message(res["id"], "email", "reminder", res["guest_email"], "sent")
-                
-                # Mark as sent
-                await db.reservations.update_one(
-                    {"id": res["id"]}, 
-                    {"$set": {reminder_key: True, "updated_at": now_iso()}}
-                )
-                processed += 1
-    
-    return {"message": f"Reminders verarbeitet: {processed}", "processed": processed, "success": True}
+async def process_reminders(user: dict = Depends(require_admin)):
+    """Reminder-Warteschlange nachplanen und fällige Reminder sofort versenden"""
+    planned = await backfill_reminder_queue()
+    result = await reminder_scheduler.run_due()
+    return {
+        "message": f"Reminders verarbeitet: {result['sent']}",
+        "processed": result["sent"],
+        "cancelled": result["cancelled"],
+        "scheduled": planned["scheduled"],
+        "success": True
+    }
+
+
+@api_router.get("/reminders/queue", tags=["Reminders"])
+async def get_reminder_queue_status(user: dict = Depends(require_admin)):
+    """Status der Reminder-Warteschlange (Zähler je Status, nächste Fälligkeit)"""
+    return await reminder_scheduler.stats()
 
 
 # ============== SLOT AVAILABILITY API (Sprint: Kapazität/Slots) ==============
@@ -2879,8 +2868,10 @@ async def confirm_reservation_by_guest(reservation_id: str, token: str):
         {"$set": {"guest_confirmed": True, "status": "bestaetigt", "updated_at": now_iso()}}
     )
     
+    updated = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    await on_reservation_changed(reservation, updated)
     await create_audit_log(SYSTEM_ACTOR, "reservation", reservation_id, "guest_confirm", before, 
-                           {**before, "guest_confirmed": True, "status": "bestaetigt"})
+                           safe_dict_for_audit(updated))
     
     return {"message": "Reservierung erfolgreich bestätigt", "success": True}
 
@@ -3061,7 +3052,9 @@ async def init_default_reminder_rules():
 # ============== APP CONFIG ==============
 
 # Import Events Module (Sprint 4 - ADDITIV)
-from events_module import events_router, public_events_router, seed_events
+from events_module import (
+    events_router, public_events_router, seed_events, event_counter_reconcile_loop, wordpress_sync_scheduler
+)
 
 # Import Payment Module (Sprint 4 - Zahlungen)
 from payment_module import payment_router, payment_webhook_router, seed_payment_rules
@@ -3201,12 +3194,18 @@ app.include_router(admin_documents_router)
 # POS Mail Automation Module (Sprint: POS PDF Mail-Automation V1)
 app.include_router(pos_mail_router)
 
+# POS Z-Bericht Import
+app.include_router(pos_zreport_router)
+
 # Shift Template Migration Module (Sprint: Schema V2 Migration)
 app.include_router(shift_migration_router)
 
 # Seeds Backup & Restore Module (Modul 10_COCKPIT)
 app.include_router(seeds_router)
 
+# Guest Search Index (Autocomplete)
+app.include_router(guest_search_router)
+
 # Staff Import Module (Mode A – Strict Full Import + Merge)
 app.include_router(staff_import_router)
 
@@ -3225,9 +3224,24 @@ async def startup():
     # Set DB reference for POS Mail Module
     set_pos_mail_db(db)
     
+    # Set DB reference for POS Z-Report Module
+    set_pos_zreport_db(db)
+    
     # Set DB reference for Shift Template Migration Module
     set_migration_db(db)
     
+    # INDEX-REGISTRY: Fehlende Indizes anlegen, Abweichungen melden
+    try:
+        _startup_index_report.clear()
+        _startup_index_report.update(await reconcile_indexes(db))
+        totals = summarize_index_report(_startup_index_report)
+        logger.info(
+            f"✓ Indizes: {totals['ok']} ok, {totals['created']} erstellt, "
+            f"{totals['missing']} fehlend, {totals['mismatched']} abweichend, {totals['extra']} zusätzlich"
+        )
+    except Exception as e:
+        logger.warning(f"⚠ Index-Abgleich fehlgeschlagen: {e}")
+    
     # AUTO-RESTORE: Prüfe ob kritische Collections leer sind und stelle ggf. wieder her
     try:
         from auto_restore import check_and_restore
@@ -3247,224 +3261,33 @@ async def startup():
     await init_default_settings()
     await init_default_reminder_rules()
     
+    # GUEST-SEARCH: Such-Index aufbauen, falls leer (Hintergrund)
+    await ensure_guest_search_index()
+    
     # TABLES STARTUP-GUARD: Prüfe ob aktive Tische vorhanden sind
     # Wichtig für active/is_active Feldkompatibilität
     await startup_tables_check()
     
-    # WordPress Sync Scheduler starten
+    # E-Mail-Outbox: Versand-Worker starten
+    email_outbox.start()
+    
+    # Reminder-Warteschlange: Versand zur Fälligkeit (ohne manuellen Sweep)
+    reminder_scheduler.start()
+    
+    # WordPress Sync Scheduler starten (DB-Lease: ein Lauf pro Intervall über alle Worker)
     import asyncio
     asyncio.create_task(wordpress_sync_scheduler())
     
+    # Event-Buchungszähler: Initialisierung + periodischer Drift-Abgleich
+    asyncio.create_task(event_counter_reconcile_loop())
+    
     logger.info("GastroCore v7.0.0 started - Events + Payment + Staff + TaxOffice + Loyalty Module enabled")
 
 
-# ============== WORDPRESS SYNC SCHEDULER ==============
-async def wordpress_sync_scheduler():
-    """
-    Hintergrund-Scheduler für WordPress Event Sync.
-    Läuft alle 60 Minuten automatisch.
-    """
-    import asyncio
-    from pathlib import Path
-    
-    SYNC_INTERVAL_SECONDS = 3600  # 60 Minuten
-    LOCK_FILE = Path("/tmp/wp_sync.lock")
-    INITIAL_DELAY = 120  # 2 Minuten nach Start warten
-    
-    logger.info(f"[WP-SYNC] Scheduler gestartet (Intervall: {SYNC_INTERVAL_SECONDS}s)")
-    
-    # Initiale Verzögerung damit alle Services hochgefahren sind
-    await asyncio.sleep(INITIAL_DELAY)
-    logger.info("[WP-SYNC] Initiale Verzögerung abgeschlossen, starte Sync-Loop")
-    
-    while True:
-        try:
-            # Lock prüfen
-            if LOCK_FILE.exists():
-                try:
-                    lock_age = (datetime.now(timezone.utc) - 
-                               datetime.fromtimestamp(LOCK_FILE.stat().st_mtime, tz=timezone.utc)).total_seconds()
-                    if lock_age > 3600:
-                        logger.warning(f"[WP-SYNC] Veralteter Lock gefunden ({lock_age:.0f}s), entferne...")
-                        LOCK_FILE.unlink()
-                    else:
-                        logger.info("[WP-SYNC] Sync übersprungen (Lock aktiv)")
-                        await asyncio.sleep(SYNC_INTERVAL_SECONDS)
-                        continue
-                except Exception:
-                    pass
-            
-            # Lock setzen
-            LOCK_FILE.write_text(f"scheduler:{datetime.now(timezone.utc).isoformat()}")
-            
-            try:
-                logger.info("[WP-SYNC] Starte automatischen Sync...")
-                
-                # Sync direkt ausführen (Funktion aus events_module)
-                from events_module import (
-                    fetch_wordpress_events, map_wordpress_event_to_gastrocore,
-                    has_real_changes, SYNC_SOURCE, WORDPRESS_EVENTS_API
-                )
-                import time
-                
-                start_time = time.time()
-                
-                report = {
-                    "fetched": 0, "created": 0, "updated": 0, 
-                    "unchanged": 0, "archived": 0, "skipped": 0, "errors": []
-                }
-                
-                # Events holen
-                wp_events = await fetch_wordpress_events()
-                report["fetched"] = len(wp_events)
-                
-                seen_external_ids = set()
-                
-                for wp_event in wp_events:
-                    try:
-                        mapped = map_wordpress_event_to_gastrocore(wp_event)
-                        external_id = mapped["external_id"]
-                        seen_external_ids.add(external_id)
-                        
-                        existing = await db.events.find_one({
-                            "external_source": SYNC_SOURCE,
-                            "external_id": external_id,
-                            "archived": {"$ne": True}
-                        })
-                        
-                        now_str = datetime.now(timezone.utc).isoformat()
-                        
-                        if existing:
-                            if has_real_changes(existing, mapped):
-                                await db.events.update_one(
-                                    {"id": existing["id"]},
-                                    {"$set": {
-                                        "title": mapped["title"],
-                                        "description": mapped["description"],
-                                        "short_description": mapped["short_description"],
-                                        "image_url": mapped["image_url"],
-                                        "start_datetime": mapped["start_datetime"],
-                                        "end_datetime": mapped["end_datetime"],
-                                        "entry_price": mapped["entry_price"],
-                                        "website_url": mapped["website_url"],
-                                        "slug": mapped["slug"],
-                                        "event_type": mapped["event_type"],
-                                        "content_category": mapped.get("content_category", "VERANSTALTUNG"),
-                                        "wp_categories": mapped["wp_categories"],
-                                        # Aktionen-Felder (Sprint: Aktionen-Infrastruktur)
-                                        "action_type": mapped.get("action_type"),
-                                        "menu_only": mapped.get("menu_only"),
-                                        "restriction_notice": mapped.get("restriction_notice"),
-                                        "guest_notice": mapped.get("guest_notice"),
-                                        "updated_at": now_str,
-                                        "last_sync_at": now_str,
-                                    }}
-                                )
-                                report["updated"] += 1
-                            else:
-                                await db.events.update_one(
-                                    {"id": existing["id"]},
-                                    {"$set": {"last_sync_at": now_str}}
-                                )
-                                report["unchanged"] += 1
-                        else:
-                            new_event = {
-                                "id": str(uuid.uuid4()),
-                                "external_source": mapped["external_source"],
-                                "external_id": mapped["external_id"],
-                                "title": mapped["title"],
-                                "description": mapped["description"],
-                                "short_description": mapped["short_description"],
-                                "image_url": mapped["image_url"],
-                                "start_datetime": mapped["start_datetime"],
-                                "end_datetime": mapped["end_datetime"],
-                                "entry_price": mapped["entry_price"],
-                                "website_url": mapped["website_url"],
-                                "slug": mapped["slug"],
-                                "event_type": mapped["event_type"],
-                                "content_category": mapped.get("content_category", "VERANSTALTUNG"),
-                                "wp_categories": mapped["wp_categories"],
-                                # Aktionen-Felder (Sprint: Aktionen-Infrastruktur)
-                                "action_type": mapped.get("action_type"),
-                                "menu_only": mapped.get("menu_only"),
-                                "restriction_notice": mapped.get("restriction_notice"),
-                                "guest_notice": mapped.get("guest_notice"),
-                                "status": "published",
-                                "capacity_total": 100,
-                                "booking_mode": "ticket_only",
-                                "pricing_mode": "free_config",
-                                "requires_payment": False,
-                                "is_public": True,
-                                "archived": False,
-                                "created_at": now_str,
-                                "updated_at": now_str,
-                                "last_sync_at": now_str,
-                            }
-                            await db.events.insert_one(new_event)
-                            report["created"] += 1
-                            
-                    except Exception as e:
-                        report["errors"].append(str(e))
-                        report["skipped"] += 1
-                
-                # Archivieren
-                cutoff_date = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
-                all_wp_in_db = await db.events.find({
-                    "external_source": SYNC_SOURCE,
-                    "archived": {"$ne": True}
-                }).to_list(1000)
-                
-                for db_event in all_wp_in_db:
-                    ext_id = db_event.get("external_id")
-                    end_dt = db_event.get("end_datetime")
-                    should_archive = ext_id not in seen_external_ids or (end_dt and end_dt < cutoff_date)
-                    
-                    if should_archive:
-                        await db.events.update_one(
-                            {"id": db_event["id"]},
-                            {"$set": {"archived": True, "status": "archived", "updated_at": datetime.now(timezone.utc).isoformat()}}
-                        )
-                        report["archived"] += 1
-                
-                # Import-Log
-                duration_ms = int((time.time() - start_time) * 1000)
-                await db.import_logs.insert_one({
-                    "id": str(uuid.uuid4()),
-                    "type": "wordpress_events_sync",
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "user": "scheduler",
-                    "source": WORDPRESS_EVENTS_API,
-                    "fetched": report["fetched"],
-                    "created": report["created"],
-                    "updated": report["updated"],
-                    "unchanged": report["unchanged"],
-                    "archived": report["archived"],
-                    "skipped": report["skipped"],
-                    "errors": report["errors"][:10],
-                    "duration_ms": duration_ms,
-                    "success": len(report["errors"]) == 0,
-                    "result": "success" if len(report["errors"]) == 0 else "partial",
-                })
-                
-                logger.info(f"[WP-SYNC] Abgeschlossen: {report['created']} neu, {report['updated']} geändert, {report['unchanged']} unverändert ({duration_ms}ms)")
-                
-            finally:
-                # Lock freigeben
-                if LOCK_FILE.exists():
-                    LOCK_FILE.unlink()
-                    
-        except Exception as e:
-            logger.error(f"[WP-SYNC] Fehler: {e}")
-            # Lock freigeben bei Fehler
-            try:
-                if LOCK_FILE.exists():
-                    LOCK_FILE.unlink()
-            except:
-                pass
-        
-        # Warten bis zum nächsten Lauf
-        await asyncio.sleep(SYNC_INTERVAL_SECONDS)
-
 @app.on_event("shutdown")
 async def shutdown():
+    await reminder_scheduler.stop()
+    await email_outbox.stop()
+    # Z-Bericht Prozesspool (Worker-Prozesse) beenden
+    shutdown_parse_pool()
     await close_db_connection()
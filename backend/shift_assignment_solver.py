@@ -0,0 +1,413 @@
+"""
+GastroCore Shift Assignment Solver
+================================================================================
+Besetzt offene Schichten einer Woche als Min-Cost-Zuordnung
+(genutzt von POST /api/staff/schedules/{id}/apply-suggestions).
+
+Vorberechnung (einmal pro Lauf):
+- Pro Mitarbeiter: Schicht-Intervalle (absolute Minuten, inkl. Nachbartage
+  für die Ruhezeit), geplante Stunden, Schichten je Tag/Woche,
+  Wochenend-Zähler je Monat, Verfügbarkeits-Bitmaske über die Tage der Woche
+- Pro Schicht: Intervall, Tag-Bit, Rolle, Bereich
+
+Lösung:
+- Tage chronologisch; pro Tag ungarische Methode (Schichten x Mitarbeiter,
+  Dummy-Spalten = unbesetzt). Weitere Runden pro Tag erlauben geteilte
+  Dienste (zweite, nicht überlappende Schicht am selben Tag).
+- Kosten = -Score (calculate_suggestion_score), Score sinkt mit jeder
+  Zuweisung (Stunden, Schichten heute/Woche) - verteilt fair.
+- Harte Regeln: Rolle, Bereich, Verfügbarkeit, max. Schichten/Woche, Constraints;
+  Überlappung und 11h Ruhezeit prüft der ShiftConflictValidator (shift_validation),
+  damit Solver und Einzelprüfung dieselben Intervalle und Nachtschicht-Regeln nutzen.
+
+Untere Schranke: jede Schicht zu ihren Kosten im Ausgangszustand, begrenzt
+durch die Wochen-Kapazität (Kosten steigen nur, Regeln werden nur strenger) -
+daraus die Optimalitätslücke.
+"""
+
+import time as time_module
+from datetime import datetime, date as date_type
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from staff_module import check_availability_block, calculate_suggestion_score
+from shift_validation import ShiftConflictValidator
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+UNASSIGNED_COST = 1000.0
+ROLE_PRIORITY_WEIGHT = 50.0
+MAX_ROUNDS_PER_DAY = 3
+DEFAULT_SHIFT_HOURS = 8.0
+INF = float("inf")
+
+
+def shift_date(shift: dict) -> str:
+    return shift.get("date") or shift.get("shift_date") or ""
+
+
+def shift_staff_id(shift: dict) -> Optional[str]:
+    return shift.get("staff_member_id") or (shift.get("assigned_staff_ids") or [None])[0]
+
+
+def shift_hours(shift: dict) -> float:
+    """Stunden einer Schicht (wie calculate_staff_hours_this_week)"""
+    try:
+        start = datetime.strptime(shift.get("start_time", "09:00"), "%H:%M")
+        end = datetime.strptime(shift.get("end_time", "17:00"), "%H:%M")
+        return (end - start).seconds / 3600
+    except (ValueError, TypeError):
+        return DEFAULT_SHIFT_HOURS
+
+
+def _day_ordinal(date_str: str) -> Optional[int]:
+    try:
+        return date_type.fromisoformat(date_str[:10]).toordinal()
+    except (ValueError, TypeError):
+        return None
+
+
+# ============== HUNGARIAN ==============
+
+def hungarian(cost: List[List[float]]) -> List[int]:
+    """
+    Min-Cost-Zuordnung (n Zeilen <= m Spalten), O(n^2 m).
+    Returns: Spalte je Zeile
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = INF
+            j1 = 0
+            ui0 = u[i0]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+    result = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            result[p[j] - 1] = j - 1
+    return result
+
+
+# ============== COMPILED STATE ==============
+
+class StaffState:
+    """Vorberechneter Planungsstand eines Mitarbeiters"""
+
+    __slots__ = (
+        "staff", "id", "name", "roles", "primary_area", "secondary_areas",
+        "available_mask", "availability_notes", "conflicts",
+        "hours", "week_count", "day_counts", "weekend_counts",
+    )
+
+    def __init__(self, staff: dict, conflicts: ShiftConflictValidator):
+        self.staff = staff
+        self.id = staff.get("id")
+        self.name = staff.get("name", self.id[:8] if self.id else "?")
+        self.roles = staff.get("roles", []) or []
+        self.primary_area = staff.get("work_area_id")
+        self.secondary_areas = set(staff.get("work_area_ids", []) or [])
+        self.available_mask = 0
+        self.availability_notes: Dict[str, str] = {}
+        self.conflicts = conflicts
+        self.hours = 0.0
+        self.week_count = 0
+        self.day_counts: Dict[str, int] = {}
+        self.weekend_counts: Dict[Tuple[int, int, int], int] = {}
+
+    def add_shift(self, shift: dict, in_schedule: bool):
+        """Schicht in den Planungsstand übernehmen (bestehend oder neu zugewiesen)"""
+        self.conflicts.add(self.id, shift)
+        if not in_schedule:
+            return
+        d = shift_date(shift)
+        self.hours += shift_hours(shift)
+        self.week_count += 1
+        self.day_counts[d] = self.day_counts.get(d, 0) + 1
+        try:
+            dt = date_type.fromisoformat(d[:10])
+            if dt.weekday() in (5, 6):
+                key = (dt.year, dt.month, dt.weekday())
+                self.weekend_counts[key] = self.weekend_counts.get(key, 0) + 1
+        except ValueError:
+            pass
+
+    def blocks(self, shift: dict) -> bool:
+        """
+        Überlappung oder Ruhezeit < 11h laut ShiftConflictValidator.
+        Offene Schichten ohne gültige Zeiten blockieren nicht (keine Intervalle).
+        """
+        result = self.conflicts.check(
+            self.id, shift_date(shift), shift.get("start_time"), shift.get("end_time")
+        )
+        return result["has_conflict"] and result["conflict_type"] != "invalid_time"
+
+
+class ShiftAssignmentProblem:
+    """
+    Eine Woche: offene Schichten, Mitarbeiter-Zustände, Tages-Bits.
+
+    all_shifts: Schichten des Schedules
+    context_shifts: zugewiesene Schichten der Nachbartage (nur Ruhezeit)
+    """
+
+    def __init__(
+        self,
+        schedule_id: str,
+        open_shifts: List[dict],
+        all_shifts: List[dict],
+        context_shifts: List[dict],
+        staff_list: List[dict],
+        max_shifts_per_week: int,
+        min_score: float,
+        role_priority: List[str]
+    ):
+        self.schedule_id = schedule_id
+        self.open_shifts = open_shifts
+        self.max_shifts_per_week = max_shifts_per_week
+        self.min_score = min_score
+        # Bester Score zulässiger Kandidaten unter min_score (Skip-Grund below_min_score)
+        self.best_below_min: Dict[str, float] = {}
+        self.role_order = {role: idx for idx, role in enumerate(role_priority)}
+        self.role_count = len(role_priority)
+
+        dates = sorted({shift_date(s) for s in all_shifts if shift_date(s)})
+        self.day_bits = {d: 1 << i for i, d in enumerate(dates)}
+
+        # Nur Überlappung/Ruhezeit - Stunden- und Schichtlimits prüft evaluate
+        self.conflicts = ShiftConflictValidator()
+        self.staff: List[StaffState] = [StaffState(s, self.conflicts) for s in staff_list]
+        by_id = {st.id: st for st in self.staff}
+
+        for shift in all_shifts:
+            st = by_id.get(shift_staff_id(shift))
+            if st:
+                st.add_shift(shift, in_schedule=shift.get("schedule_id", schedule_id) == schedule_id)
+        schedule_ids = {s.get("id") for s in all_shifts}
+        for shift in context_shifts:
+            st = by_id.get(shift_staff_id(shift))
+            if st and shift.get("id") not in schedule_ids:
+                st.add_shift(shift, in_schedule=False)
+
+        # Verfügbarkeits-Bitmasken (Abwesenheiten + "nur Wochenende")
+        for st in self.staff:
+            weekend_only = (st.staff.get("constraints") or {}).get("weekend_only")
+            for d, bit in self.day_bits.items():
+                try:
+                    available, note = check_availability_block(st.staff, d)
+                except Exception:
+                    available, note = True, ""
+                if available and weekend_only:
+                    available = _day_ordinal(d) is not None and date_type.fromisoformat(d[:10]).weekday() in (5, 6)
+                if available:
+                    st.available_mask |= bit
+                    if note:
+                        st.availability_notes[d] = note
+
+    # ---------- Bewertung ----------
+
+    def unassigned_cost(self, shift: dict) -> float:
+        """Unbesetzt lassen: hohe Kosten, Rollen mit Priorität noch höher"""
+        rank = self.role_order.get(shift.get("role", "service"), self.role_count)
+        return UNASSIGNED_COST + (self.role_count - rank) * ROLE_PRIORITY_WEIGHT
+
+    def evaluate(self, shift: dict, st: StaffState) -> Optional[Dict[str, Any]]:
+        """Kosten + Begründung einer Zuweisung, None wenn unzulässig"""
+        d = shift_date(shift)
+        role = shift.get("role", "")
+        if role and st.roles and role not in st.roles:
+            return None
+        if st.week_count >= self.max_shifts_per_week:
+            return None
+        if not st.available_mask & self.day_bits.get(d, 0):
+            return None
+
+        area = shift.get("work_area_id", "")
+        if area:
+            is_primary = area == st.primary_area
+            if not is_primary and area not in st.secondary_areas:
+                return None
+        else:
+            is_primary = True
+
+        if st.blocks(shift):
+            return None
+
+        warnings = self._constraint_warnings(st, d)
+        if warnings is None:
+            return None
+
+        score, reasons, score_warnings = calculate_suggestion_score(
+            st.staff, shift, st.hours, st.day_counts.get(d, 0), st.week_count, is_primary
+        )
+        if score < self.min_score:
+            key = shift.get("id")
+            self.best_below_min[key] = max(score, self.best_below_min.get(key, score))
+            return None
+        note = st.availability_notes.get(d)
+        return {
+            "cost": -score,
+            "score": round(score, 1),
+            "reasons": reasons,
+            "warnings": score_warnings + warnings + ([note] if note else []),
+        }
+
+    def _constraint_warnings(self, st: StaffState, d: str) -> Optional[List[str]]:
+        """Monatliche Samstags-/Sonntagslimits (None = verletzt)"""
+        constraints = st.staff.get("constraints") or {}
+        max_sat = constraints.get("max_saturdays_per_month")
+        max_sun = constraints.get("max_sundays_per_month")
+        if not (max_sat or max_sun):
+            return []
+        try:
+            dt = date_type.fromisoformat(d[:10])
+        except ValueError:
+            return []
+        limit = {5: max_sat, 6: max_sun}.get(dt.weekday())
+        if not limit:
+            return []
+        used = st.weekend_counts.get((dt.year, dt.month, dt.weekday()), 0)
+        if used >= limit:
+            return None
+        label = "Samstag" if dt.weekday() == 5 else "Sonntag"
+        return [f"letzter erlaubter {label} ({used + 1}/{limit})"] if used == limit - 1 else []
+
+    # ---------- Lösung ----------
+
+    def lower_bound(self) -> float:
+        """
+        Jede Schicht zum günstigsten zulässigen Mitarbeiter im Ausgangszustand,
+        höchstens so viele Zuweisungen wie die Wochen-Kapazität aller Mitarbeiter
+        """
+        total = 0.0
+        savings = []
+        for shift in self.open_shifts:
+            unassigned = self.unassigned_cost(shift)
+            best = unassigned
+            for st in self.staff:
+                ev = self.evaluate(shift, st)
+                if ev and ev["cost"] < best:
+                    best = ev["cost"]
+            total += unassigned
+            if best < unassigned:
+                savings.append(best - unassigned)
+        capacity = sum(max(self.max_shifts_per_week - st.week_count, 0) for st in self.staff)
+        savings.sort()
+        return total + sum(savings[:capacity])
+
+    def solve(self) -> Dict[str, Any]:
+        started = time_module.perf_counter()
+        lower_bound = self.lower_bound()
+
+        by_day: Dict[str, List[dict]] = {}
+        for shift in self.open_shifts:
+            by_day.setdefault(shift_date(shift), []).append(shift)
+
+        assignments: List[Dict[str, Any]] = []
+        had_candidates = set()
+        objective = 0.0
+        rounds = 0
+
+        for d in sorted(by_day):
+            remaining = sorted(by_day[d], key=lambda s: (s.get("start_time") or "", s.get("id") or ""))
+            for _ in range(MAX_ROUNDS_PER_DAY):
+                rows = []
+                for shift in remaining:
+                    options = {}
+                    for idx, st in enumerate(self.staff):
+                        ev = self.evaluate(shift, st)
+                        if ev:
+                            options[idx] = ev
+                    if options:
+                        had_candidates.add(shift.get("id"))
+                    rows.append((shift, options))
+                columns = sorted({idx for _, options in rows for idx in options})
+                if not columns:
+                    break
+
+                rounds += 1
+                n = len(rows)
+                col_pos = {idx: k for k, idx in enumerate(columns)}
+                matrix = []
+                for shift, options in rows:
+                    line = [INF] * len(columns) + [self.unassigned_cost(shift)] * n
+                    for idx, ev in options.items():
+                        line[col_pos[idx]] = ev["cost"]
+                    matrix.append(line)
+                # INF durch große endliche Kosten ersetzen (Potentiale bleiben stabil)
+                big = UNASSIGNED_COST * 10
+                matrix = [[c if c != INF else big for c in line] for line in matrix]
+
+                chosen = hungarian(matrix)
+                next_remaining = []
+                progress = False
+                for (shift, options), col in zip(rows, chosen):
+                    staff_idx = columns[col] if col < len(columns) else None
+                    if staff_idx is None or staff_idx not in options:
+                        next_remaining.append(shift)
+                        continue
+                    st = self.staff[staff_idx]
+                    ev = options[staff_idx]
+                    st.add_shift({**shift, "staff_member_id": st.id}, in_schedule=True)
+                    objective += ev["cost"]
+                    progress = True
+                    assignments.append({"shift": shift, "staff": st, **ev})
+                remaining = next_remaining
+                if not progress or not remaining:
+                    break
+
+        unassigned = [s for s in self.open_shifts if s.get("id") not in {a["shift"].get("id") for a in assignments}]
+        objective += sum(self.unassigned_cost(s) for s in unassigned)
+        gap = (objective - lower_bound) / max(abs(lower_bound), 1.0)
+
+        return {
+            "assignments": assignments,
+            "unassigned": unassigned,
+            "had_candidates": had_candidates,
+            "best_below_min": {k: round(v, 1) for k, v in self.best_below_min.items()},
+            "stats": {
+                "objective": round(objective, 1),
+                "lower_bound": round(lower_bound, 1),
+                "gap": round(max(gap, 0.0), 4),
+                "rounds": rounds,
+                "runtime_ms": round((time_module.perf_counter() - started) * 1000, 1),
+            },
+        }
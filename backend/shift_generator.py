@@ -0,0 +1,184 @@
+"""
+GastroCore Shift Generator
+================================================================================
+Gemeinsame Bausteine für die Bulk-Erzeugung von Schichten
+(Vorlagen-Generatoren in staff_module / shifts_v2_module, Woche kopieren).
+
+- Öffnungszeiten für den ganzen Zeitraum einmal auflösen (closing_times_for_range)
+- Bestand mit einem Query vorab laden - Existenzprüfung als Mengendifferenz
+- Schreiben per geordnetem insert_many
+- Idempotenz: eindeutiger Schlüssel (template_code, date_local) - auch parallele
+  Läufe erzeugen jede Vorlagen-Schicht höchstens einmal pro Tag
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, List, Tuple, Set
+import logging
+
+from pymongo.errors import BulkWriteError
+
+from core.database import db
+from core.indexes import register_indexes, index
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+GENERATOR_MAX_DAYS = 366  # eine ganze Saison (bzw. ein Jahr) pro Request
+INSERT_BATCH_SIZE = 1000
+DEFAULT_CLOSING_TIME = "20:00"
+DUPLICATE_KEY_ERROR = 11000
+
+# Eine Vorlagen-Schicht pro Tag - gelöschte (archived) Schichten blockieren nicht,
+# Schichten ohne Vorlagen-Code / ohne date_local (Legacy) sind ausgenommen
+register_indexes(
+    "shifts",
+    index(
+        ("template_code", 1), ("date_local", 1),
+        name="template_code_date_local_unique",
+        unique=True,
+        partial_filter={
+            "template_code": {"$type": "string"},
+            "date_local": {"$type": "string"},
+            "archived": False,
+        }
+    ),
+)
+
+
+def date_range(start_date: date, end_date: date) -> List[date]:
+    days = []
+    current = start_date
+    while current <= end_date:
+        days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def closing_time_from_effective(effective: dict) -> Optional[str]:
+    """Schließzeit aus effektiven Öffnungszeiten - None = geschlossen"""
+    if not effective.get("is_open") or effective.get("is_closed_full_day"):
+        return None
+    blocks = effective.get("blocks", [])
+    if blocks:
+        return blocks[-1].get("end", DEFAULT_CLOSING_TIME)
+    return DEFAULT_CLOSING_TIME
+
+
+async def closing_times_for_range(start_date: date, end_date: date) -> Dict[str, Optional[str]]:
+    """
+    Schließzeiten für alle Tage des Zeitraums (ein Regelwerk-Load).
+
+    SOURCE OF TRUTH: opening_hours_master (via opening_hours_module)
+    Returns: {"YYYY-MM-DD": "HH:MM" oder None (geschlossen)}
+    """
+    days = {d.isoformat(): DEFAULT_CLOSING_TIME for d in date_range(start_date, end_date)}
+    try:
+        from opening_hours_module import calculate_effective_hours_range
+        effective_by_date = await calculate_effective_hours_range(start_date, end_date)
+    except Exception as e:
+        logger.warning(f"Could not get closing times for {start_date} - {end_date}: {e}")
+        return days
+    for date_str, effective in effective_by_date.items():
+        days[date_str] = closing_time_from_effective(effective)
+    return days
+
+
+def close_plus_end_time(closing_time: Optional[str], plus_minutes: int) -> Optional[str]:
+    """Endzeit = Schließzeit + Minuten (None bei fehlender/ungültiger Schließzeit)"""
+    if not closing_time:
+        return None
+    try:
+        close_dt = datetime.strptime(closing_time, "%H:%M") + timedelta(minutes=plus_minutes or 0)
+    except ValueError:
+        return None
+    return close_dt.strftime("%H:%M")
+
+
+def shift_hours(start_time: str, end_time: str, default: float = 8.0) -> float:
+    """Stunden einer Schicht (über Mitternacht +24h)"""
+    try:
+        start_h, start_m = map(int, start_time.split(":"))
+        end_h, end_m = map(int, end_time.split(":"))
+    except (ValueError, AttributeError):
+        return default
+    hours = ((end_h * 60 + end_m) - (start_h * 60 + start_m)) / 60
+    if hours < 0:
+        hours += 24  # Overnight shift
+    return hours
+
+
+# ============== EXISTENZPRÜFUNG ==============
+
+def template_slot_keys(template: dict, date_str: str) -> List[Tuple[str, str, str]]:
+    """Schlüssel einer Vorlagen-Schicht: per Code und per Vorlagen-ID"""
+    keys = []
+    if template.get("code"):
+        keys.append(("code", template["code"], date_str))
+    if template.get("id"):
+        keys.append(("id", template["id"], date_str))
+    return keys
+
+
+async def existing_template_slots(templates: List[dict], start_date: date, end_date: date) -> Set[Tuple[str, str, str]]:
+    """
+    Bereits vorhandene Vorlagen-Schichten im Zeitraum - ein Query.
+    Erkennt Legacy- (shift_date) und V2-Schichten (date_local).
+    """
+    codes = [t["code"] for t in templates if t.get("code")]
+    ids = [t["id"] for t in templates if t.get("id")]
+    if not codes and not ids:
+        return set()
+    range_query = {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
+    slots = set()
+    async for shift in db.shifts.find(
+        {
+            "archived": {"$ne": True},
+            "$and": [
+                {"$or": [{"template_code": {"$in": codes}}, {"template_id": {"$in": ids}}]},
+                {"$or": [{"date_local": range_query}, {"shift_date": range_query}]},
+            ],
+        },
+        {"_id": 0, "template_code": 1, "template_id": 1, "date_local": 1, "shift_date": 1}
+    ):
+        date_str = (shift.get("date_local") or shift.get("shift_date") or "")[:10]
+        if shift.get("template_code"):
+            slots.add(("code", shift["template_code"], date_str))
+        if shift.get("template_id"):
+            slots.add(("id", shift["template_id"], date_str))
+    return slots
+
+
+# ============== SCHREIBEN ==============
+
+async def insert_shifts(docs: List[dict]) -> Tuple[List[dict], int]:
+    """
+    Schichten per geordnetem insert_many schreiben (in Blöcken).
+    Duplikate (Unique-Key, z.B. paralleler Lauf) werden übersprungen,
+    der Rest des Blocks wird danach weiter geschrieben.
+
+    Returns: (geschriebene Dokumente, Anzahl Duplikate)
+    """
+    inserted: List[dict] = []
+    duplicates = 0
+    for offset in range(0, len(docs), INSERT_BATCH_SIZE):
+        pending = docs[offset:offset + INSERT_BATCH_SIZE]
+        while pending:
+            try:
+                await db.shifts.insert_many(pending, ordered=True)
+                inserted.extend(pending)
+                break
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                failed_index = errors[0]["index"] if errors else len(pending)
+                if not errors or errors[0].get("code") != DUPLICATE_KEY_ERROR:
+                    inserted.extend(pending[:failed_index])
+                    raise
+                # Geordnet: alles vor dem Fehler ist geschrieben, danach nichts
+                inserted.extend(pending[:failed_index])
+                duplicates += 1
+                pending = pending[failed_index + 1:]
+    # insert_many setzt _id auf den übergebenen Dokumenten
+    for doc in inserted:
+        doc.pop("_id", None)
+    return inserted, duplicates
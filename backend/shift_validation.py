@@ -0,0 +1,315 @@
+"""
+GastroCore Shift Validation
+================================================================================
+Mengenbasierte Konfliktprüfung für Schichtzuweisungen.
+
+Statt drei Queries pro Schicht (gleicher Tag, Vortag, Folgetag) lädt der
+Validator die Schichten aller betroffenen Mitarbeiter für das ganze Fenster
+mit EINEM Query und prüft dann beliebig viele Vorschläge im Speicher:
+
+- Doppelbelegung (überlappende Zeiten am selben Tag)
+- Ruhezeit (min. 11 Stunden zu Schichten anderer Tage)
+- Höchstarbeitszeit (optional: pro Tag / pro ISO-Woche)
+
+Angenommene Vorschläge werden übernommen (add), damit sich ein Bulk-Lauf
+nicht selbst Konflikte erzeugt.
+
+Genutzt von check_shift_conflicts (Einzelprüfung) und Bulk-Pfaden wie
+copy_schedule_to_next_week.
+"""
+
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+import logging
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+MIN_REST_HOURS = 11
+MAX_DAILY_HOURS = 10  # ArbZG §3 (inkl. Verlängerung)
+MAX_WEEKLY_HOURS = 48  # ArbZG Wochenhöchstarbeitszeit
+DAY_MINUTES = 24 * 60
+DATE_FIELDS = ("shift_date", "date", "date_local")
+
+# Interval: (start, end, day_ordinal, shift_id, start_time, end_time) - Zeiten in absoluten Minuten
+Interval = Tuple[int, int, int, Optional[str], str, str]
+
+
+def shift_day(shift: dict) -> Optional[str]:
+    """Datum einer Schicht (Legacy shift_date, V1 date, V2 date_local)"""
+    for field in DATE_FIELDS:
+        if shift.get(field):
+            return shift[field][:10]
+    return None
+
+
+def shift_staff_ids(shift: dict) -> List[str]:
+    ids = list(shift.get("assigned_staff_ids") or [])
+    if shift.get("staff_member_id") and shift["staff_member_id"] not in ids:
+        ids.append(shift["staff_member_id"])
+    return ids
+
+
+def _minutes(time_str: str) -> int:
+    hours, minutes = time_str.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def to_interval(
+    shift_date: str,
+    start_time: str,
+    end_time: str,
+    shift_id: Optional[str] = None
+) -> Optional[Interval]:
+    """Schicht als absolutes Intervall - über Mitternacht endet am Folgetag"""
+    try:
+        day = date.fromisoformat(shift_date[:10]).toordinal()
+        start = _minutes(start_time)
+        end = _minutes(end_time)
+    except (ValueError, TypeError, AttributeError, IndexError):
+        return None
+    if end < start:
+        end += DAY_MINUTES
+    base = day * DAY_MINUTES
+    return (base + start, base + end, day, shift_id, start_time, end_time)
+
+
+def _interval_start(interval: Interval) -> Tuple[int, int]:
+    """Sortierschlüssel - nie über shift_id vergleichen (None vs. str wäre ein TypeError)"""
+    return (interval[0], interval[1])
+
+
+def _hours(interval: Interval) -> float:
+    return (interval[1] - interval[0]) / 60
+
+
+def _iso_week(day: int) -> Tuple[int, int]:
+    return date.fromordinal(day).isocalendar()[:2]
+
+
+def _no_conflict() -> Dict[str, Any]:
+    return {"has_conflict": False, "conflict_type": None, "message": None}
+
+
+def _conflict(conflict_type: str, message: str) -> Dict[str, Any]:
+    return {"has_conflict": True, "conflict_type": conflict_type, "message": message}
+
+
+class ShiftConflictValidator:
+    """
+    Schichten der betroffenen Mitarbeiter als sortierte Intervall-Listen.
+
+    max_daily_hours / max_weekly_hours: None = nicht prüfen
+    """
+
+    def __init__(
+        self,
+        min_rest_hours: float = MIN_REST_HOURS,
+        max_daily_hours: Optional[float] = None,
+        max_weekly_hours: Optional[float] = None
+    ):
+        self.min_rest_minutes = int(min_rest_hours * 60)
+        self.max_daily_hours = max_daily_hours
+        self.max_weekly_hours = max_weekly_hours
+        self.intervals: Dict[str, List[Interval]] = {}
+        self.daily_hours: Dict[Tuple[str, int], float] = {}
+        self.weekly_hours: Dict[Tuple[str, Tuple[int, int]], float] = {}
+        # Schichten ohne auswertbare Zeiten blockieren ihren Tag (sicherheitshalber)
+        self.invalid_days: Dict[str, set] = {}
+
+    async def load(
+        self,
+        staff_ids: Iterable[str],
+        from_date: str,
+        to_date: str,
+        exclude_ids: Iterable[str] = ()
+    ) -> "ShiftConflictValidator":
+        """
+        Alle Schichten der Mitarbeiter im Fenster laden - ein Query.
+        Das Fenster wird für die Ruhezeit um einen Tag, für die Wochenstunden
+        auf ganze ISO-Wochen erweitert.
+        """
+        staff_ids = [sid for sid in set(staff_ids) if sid]
+        if not staff_ids:
+            return self
+        start = date.fromisoformat(from_date[:10])
+        end = date.fromisoformat(to_date[:10])
+        start = min(start - timedelta(days=1), start - timedelta(days=start.weekday()))
+        end = max(end + timedelta(days=1), end + timedelta(days=6 - end.weekday()))
+        range_query = {"$gte": start.isoformat(), "$lte": end.isoformat()}
+
+        query: Dict[str, Any] = {
+            "archived": {"$ne": True},
+            "status": {"$ne": "CANCELLED"},
+            "$and": [
+                {"$or": [
+                    {"staff_member_id": {"$in": staff_ids}},
+                    {"assigned_staff_ids": {"$in": staff_ids}},
+                ]},
+                {"$or": [{field: range_query} for field in DATE_FIELDS]},
+            ],
+        }
+        exclude_ids = list(exclude_ids)
+        if exclude_ids:
+            query["id"] = {"$nin": exclude_ids}
+
+        wanted = set(staff_ids)
+        async for shift in db.shifts.find(
+            query,
+            {"_id": 0, "id": 1, "staff_member_id": 1, "assigned_staff_ids": 1,
+             "start_time": 1, "end_time": 1, **{field: 1 for field in DATE_FIELDS}}
+        ):
+            for staff_id in shift_staff_ids(shift):
+                if staff_id in wanted:
+                    self.add(staff_id, shift)
+        return self
+
+    def add(self, staff_id: str, shift: dict):
+        """Schicht in den Bestand übernehmen (geladen oder gerade angenommen)"""
+        day_str = shift_day(shift)
+        if not day_str:
+            return
+        interval = to_interval(day_str, shift.get("start_time"), shift.get("end_time"), shift.get("id"))
+        if interval is None:
+            try:
+                self.invalid_days.setdefault(staff_id, set()).add(date.fromisoformat(day_str).toordinal())
+            except ValueError:
+                pass
+            return
+        insort(self.intervals.setdefault(staff_id, []), interval, key=_interval_start)
+        day = interval[2]
+        self.daily_hours[(staff_id, day)] = self.daily_hours.get((staff_id, day), 0) + _hours(interval)
+        week = (staff_id, _iso_week(day))
+        self.weekly_hours[week] = self.weekly_hours.get(week, 0) + _hours(interval)
+
+    def check(
+        self,
+        staff_id: str,
+        shift_date: str,
+        start_time: str,
+        end_time: str,
+        exclude_shift_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Prüft eine Zuweisung gegen den Bestand.
+
+        Returns: {"has_conflict": bool, "conflict_type": str, "message": str}
+        (Format wie check_shift_conflicts)
+        """
+        new = to_interval(shift_date, start_time, end_time)
+        if new is None:
+            return _conflict("invalid_time", "Ungültige Schichtzeiten")
+        new_start, new_end, new_day = new[0], new[1], new[2]
+
+        if new_day in self.invalid_days.get(staff_id, ()):
+            return _conflict("overlap", "Konflikt: Mitarbeiter hat an diesem Tag eine Schicht ohne gültige Zeiten")
+
+        # Nur Intervalle, die innerhalb der Ruhezeit beginnen können (sortiert nach Start)
+        intervals = self.intervals.get(staff_id, [])
+        window = self.min_rest_minutes + 2 * DAY_MINUTES
+        idx = bisect_left(intervals, (new_start - window, new_start - window), key=_interval_start)
+        for existing in intervals[idx:]:
+            ex_start, ex_end, ex_day, ex_id, ex_start_time, ex_end_time = existing
+            if ex_start >= new_end + self.min_rest_minutes:
+                break
+            if exclude_shift_id and ex_id == exclude_shift_id:
+                continue
+
+            if ex_day == new_day:
+                if new_start < ex_end and ex_start < new_end:
+                    return _conflict(
+                        "overlap",
+                        f"Konflikt: Mitarbeiter ist bereits eingeplant ({ex_start_time}-{ex_end_time})"
+                    )
+                continue  # Geteilte Dienste am selben Tag sind erlaubt
+
+            if new_start < ex_end and ex_start < new_end:
+                return _conflict(
+                    "overlap",
+                    f"Konflikt: Mitarbeiter ist bereits eingeplant ({date.fromordinal(ex_day).isoformat()} {ex_start_time}-{ex_end_time})"
+                )
+            if ex_day < new_day:
+                rest = new_start - ex_end
+                if rest < self.min_rest_minutes:
+                    return _conflict(
+                        "rest_time",
+                        f"Ruhezeit von {self.min_rest_minutes // 60}h unterschritten (nur {rest / 60:.1f}h seit Schichtende am Vortag)"
+                    )
+            else:
+                rest = ex_start - new_end
+                if rest < self.min_rest_minutes:
+                    return _conflict(
+                        "rest_time",
+                        f"Ruhezeit von {self.min_rest_minutes // 60}h unterschritten (nur {rest / 60:.1f}h bis Schichtbeginn am Folgetag)"
+                    )
+
+        hours = _hours(new)
+        if self.max_daily_hours is not None:
+            planned = self.daily_hours.get((staff_id, new_day), 0) - self._excluded_hours(staff_id, exclude_shift_id, new_day)
+            if planned + hours > self.max_daily_hours:
+                return _conflict(
+                    "max_hours",
+                    f"Tageshöchstarbeitszeit überschritten ({planned + hours:.1f}h > {self.max_daily_hours}h)"
+                )
+        if self.max_weekly_hours is not None:
+            week = _iso_week(new_day)
+            planned = self.weekly_hours.get((staff_id, week), 0) - self._excluded_hours(staff_id, exclude_shift_id, week=week)
+            if planned + hours > self.max_weekly_hours:
+                return _conflict(
+                    "max_hours",
+                    f"Wochenhöchstarbeitszeit überschritten ({planned + hours:.1f}h > {self.max_weekly_hours}h in KW {week[1]})"
+                )
+
+        return _no_conflict()
+
+    def _excluded_hours(self, staff_id: str, shift_id: Optional[str], day: Optional[int] = None, week=None) -> float:
+        if not shift_id:
+            return 0
+        for interval in self.intervals.get(staff_id, []):
+            if interval[3] == shift_id and (day is None or interval[2] == day) and (week is None or _iso_week(interval[2]) == week):
+                return _hours(interval)
+        return 0
+
+    def validate(self, proposals: List[dict], staff_field: str = "staff_member_id") -> List[Dict[str, Any]]:
+        """
+        Viele Vorschläge nacheinander prüfen, angenommene in den Bestand übernehmen.
+        Vorschläge ohne Mitarbeiter sind immer konfliktfrei.
+
+        Returns: ein Ergebnis je Vorschlag (Reihenfolge wie proposals)
+        """
+        results = []
+        for shift in proposals:
+            staff_id = shift.get(staff_field)
+            if not staff_id:
+                results.append(_no_conflict())
+                continue
+            result = self.check(
+                staff_id, shift_day(shift) or "", shift.get("start_time"), shift.get("end_time"),
+                exclude_shift_id=shift.get("id")
+            )
+            if not result["has_conflict"]:
+                self.add(staff_id, shift)
+            results.append(result)
+        return results
+
+
+async def load_validator_for(
+    proposals: List[dict],
+    staff_field: str = "staff_member_id",
+    exclude_ids: Iterable[str] = (),
+    **limits
+) -> ShiftConflictValidator:
+    """Validator für eine Menge vorgeschlagener Schichten (Fenster = deren Datumsbereich)"""
+    validator = ShiftConflictValidator(**limits)
+    days = [shift_day(s) for s in proposals if s.get(staff_field) and shift_day(s)]
+    if days:
+        await validator.load(
+            (s.get(staff_field) for s in proposals),
+            min(days), max(days),
+            exclude_ids=exclude_ids
+        )
+    return validator
@@ -22,9 +22,24 @@ from core.database import db, client
 from core.auth import get_current_user, require_manager, require_admin
 from core.audit import create_audit_log, safe_dict_for_audit
 from core.exceptions import NotFoundException, ValidationException, ConflictException
+from core.indexes import register_indexes, index
+from hours_ledger import refresh_ledger_for_shifts
+from shift_generator import (
+    GENERATOR_MAX_DAYS, date_range, closing_times_for_range, close_plus_end_time,
+    template_slot_keys, existing_template_slots, insert_shifts
+)
 
 logger = logging.getLogger(__name__)
 
+# ============== INDEXES ==============
+# V2-Struktur: date_local + assigned_staff_ids (Multikey)
+register_indexes(
+    "shifts",
+    index(("date_local", 1), ("status", 1)),
+    index(("assigned_staff_ids", 1), ("date_local", 1)),
+    index(("template_id", 1), ("date_local", 1)),
+)
+
 # ============== CONSTANTS ==============
 BERLIN_TZ = pytz.timezone("Europe/Berlin")
 
@@ -384,6 +399,7 @@ async def create_shift_v2(data: ShiftV2Create, user: dict = Depends(require_mana
     # Create shift
     shift = create_shift_entity(data.model_dump())
     await db.shifts.insert_one(shift)
+    await refresh_ledger_for_shifts(shift)
     
     # Audit log
     await create_audit_log(
@@ -432,6 +448,7 @@ async def update_shift_v2(shift_id: str, data: ShiftV2Update, user: dict = Depen
     await db.shifts.update_one({"id": shift_id}, {"$set": update_data})
     
     updated = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
+    await refresh_ledger_for_shifts(shift, updated)
     
     await create_audit_log(
         user, "shift", shift_id, "update",
@@ -453,6 +470,7 @@ async def delete_shift_v2(shift_id: str, user: dict = Depends(require_manager)):
         {"id": shift_id},
         {"$set": {"archived": True, "updated_at": now_iso()}}
     )
+    await refresh_ledger_for_shifts(shift)
     
     await create_audit_log(
         user, "shift", shift_id, "archive",
@@ -534,6 +552,7 @@ async def cancel_shift(shift_id: str, reason: Optional[str] = None, user: dict =
             "updated_at": now_iso()
         }}
     )
+    await refresh_ledger_for_shifts(shift)
     
     await create_audit_log(
         user, "shift", shift_id, "cancel",
@@ -583,6 +602,7 @@ async def assign_staff_to_shift(shift_id: str, data: AssignStaffRequest, user: d
             "updated_at": now_iso()
         }}
     )
+    await refresh_ledger_for_shifts({**shift, "assigned_staff_ids": [data.staff_member_id]})
     
     staff_name = staff.get("full_name") or f"{staff.get('first_name', '')} {staff.get('last_name', '')}".strip()
     
@@ -627,6 +647,7 @@ async def unassign_staff_from_shift(shift_id: str, data: AssignStaffRequest, use
             "updated_at": now_iso()
         }}
     )
+    await refresh_ledger_for_shifts({**shift, "assigned_staff_ids": [data.staff_member_id]})
     
     # Get staff name for audit
     staff = await db.staff_members.find_one({"id": data.staff_member_id}, {"_id": 0})
@@ -725,6 +746,7 @@ async def swap_shift_assignment(shift_id: str, data: SwapRequest, user: dict = D
             status_code=409,
             detail="Schicht wurde zwischenzeitlich geändert. Bitte erneut versuchen."
         )
+    await refresh_ledger_for_shifts(shift, result)
     
     # Create swap audit log
     await create_audit_log(
@@ -800,6 +822,9 @@ async def generate_shifts_from_templates(
     """
     Generate shifts from templates for a date range.
     Does NOT assign staff - only creates the shift slots.
+    
+    Öffnungszeiten und Bestand werden einmal für den Zeitraum geladen,
+    geschrieben wird per insert_many (Unique-Key template_code + date_local).
     """
     # Parse dates
     try:
@@ -811,8 +836,8 @@ async def generate_shifts_from_templates(
     if end_date < start_date:
         raise ValidationException("Enddatum muss nach Startdatum liegen")
     
-    if (end_date - start_date).days > 31:
-        raise ValidationException("Maximaler Zeitraum: 31 Tage")
+    if (end_date - start_date).days >= GENERATOR_MAX_DAYS:
+        raise ValidationException(f"Maximaler Zeitraum: {GENERATOR_MAX_DAYS} Tage")
     
     # Get templates
     template_query = {"archived": {"$ne": True}, "active": True}
@@ -830,38 +855,34 @@ async def generate_shifts_from_templates(
             "created_count": 0
         }
     
+    # Einmal für den ganzen Zeitraum: Schließzeiten + bestehende Vorlagen-Schichten
+    closing_times = await closing_times_for_range(start_date, end_date)
+    existing_slots = await existing_template_slots(templates, start_date, end_date)
+    
     # Generate shifts for each day
-    created_shifts = []
+    new_shifts = []
     skipped_count = 0
-    current_date = start_date
     
-    while current_date <= end_date:
+    for current_date in date_range(start_date, end_date):
         date_str = current_date.isoformat()
         
         for template in templates:
             # Check if shift already exists
-            existing = await db.shifts.find_one({
-                "date_local": date_str,
-                "template_id": template["id"],
-                "archived": {"$ne": True}
-            })
-            
-            if existing:
+            slot_keys = template_slot_keys(template, date_str)
+            if any(key in existing_slots for key in slot_keys):
                 skipped_count += 1
                 continue
+            existing_slots.update(slot_keys)
             
             # Determine start and end times
             start_time = template.get("start_time") or template.get("start_time_local", "09:00")
             end_time = template.get("end_time_fixed") or template.get("end_time_local", "17:00")
             
-            # Handle close_plus_minutes - would need opening hours
-            # For now, use fixed end time if close_plus_minutes
+            # close_plus_minutes: Schließzeit des Tages (Ruhetag/unbekannt: 22:00) + Offset
             if template.get("end_time_type") == "close_plus_minutes":
-                # Default to 22:00 + offset
-                close_plus = template.get("close_plus_minutes", 0)
-                base_close = datetime.strptime("22:00", "%H:%M")
-                end_dt = base_close + timedelta(minutes=close_plus)
-                end_time = end_dt.strftime("%H:%M")
+                end_time = close_plus_end_time(
+                    closing_times.get(date_str) or "22:00", template.get("close_plus_minutes", 0)
+                ) or end_time
             
             # Map department to role
             role = template.get("role") or template.get("department", "service")
@@ -879,16 +900,24 @@ async def generate_shifts_from_templates(
             }
             
             shift = create_shift_entity(shift_data)
-            await db.shifts.insert_one(shift)
-            created_shifts.append({
-                "id": shift["id"],
-                "date": date_str,
-                "template_name": template.get("name"),
-                "start_time": start_time,
-                "end_time": end_time
-            })
-        
-        current_date += timedelta(days=1)
+            if template.get("code"):
+                shift["template_code"] = template["code"]
+            new_shifts.append(shift)
+    
+    # Geordnetes insert_many - Duplikate (paralleler Lauf) zählen als übersprungen
+    inserted, duplicates = await insert_shifts(new_shifts)
+    skipped_count += duplicates
+    template_names = {t["id"]: t.get("name") for t in templates}
+    created_shifts = [
+        {
+            "id": shift["id"],
+            "date": shift["date_local"],
+            "template_name": template_names.get(shift["template_id"]),
+            "start_time": shift["start_time"],
+            "end_time": shift["end_time"]
+        }
+        for shift in inserted
+    ]
     
     await create_audit_log(
         user, "shift", "generate", "generate_from_templates",
@@ -28,9 +28,36 @@ from core.database import db
 from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit, SYSTEM_ACTOR
 from core.exceptions import NotFoundException, ValidationException, ForbiddenException
+from core.indexes import register_indexes, index
+from pymongo import UpdateOne
+
+from shift_validation import ShiftConflictValidator, load_validator_for, MAX_DAILY_HOURS, MAX_WEEKLY_HOURS
+from hours_ledger import refresh_ledger_for_shifts, read_ledger, rebuild_ledger
+from email_service import send_email_template, register_outbox_hook
+from shift_generator import (
+    GENERATOR_MAX_DAYS, date_range, closing_times_for_range, closing_time_from_effective,
+    close_plus_end_time, shift_hours, template_slot_keys, existing_template_slots, insert_shifts
+)
 
 logger = logging.getLogger(__name__)
 
+# ============== INDEXES ==============
+# Legacy-Schichtstruktur (staff_member_id + shift_date) und Dienstpläne
+register_indexes(
+    "shifts",
+    index(("id", 1), unique=True),
+    index(("staff_member_id", 1), ("shift_date", 1), ("archived", 1)),
+    index(("schedule_id", 1), ("archived", 1)),
+)
+register_indexes(
+    "schedules",
+    index(("year", 1), ("week", 1)),
+)
+register_indexes(
+    "staff_members",
+    index(("id", 1), unique=True),
+)
+
 # ============== FILE STORAGE CONFIG ==============
 UPLOAD_DIR = Path("/app/uploads/staff_documents")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -171,97 +198,13 @@ async def check_shift_conflicts(
     A) Doppelbelegung (überlappende Zeiten am gleichen Tag)
     B) Ruhezeit (min. 11 Stunden zwischen Schichten)
     
+    Ein Query für Vortag bis Folgetag (ShiftConflictValidator).
+    
     Returns: {"has_conflict": bool, "conflict_type": str, "message": str}
     """
-    from datetime import datetime, timedelta
-    
-    # A) Prüfe Doppelbelegung am gleichen Tag
-    query = {
-        "staff_member_id": staff_member_id,
-        "shift_date": shift_date,
-        "archived": False
-    }
-    if exclude_shift_id:
-        query["id"] = {"$ne": exclude_shift_id}
-    
-    same_day_shifts = await db.shifts.find(query, {"_id": 0}).to_list(100)
-    
-    # Parse times
-    new_start = datetime.strptime(start_time, "%H:%M")
-    new_end = datetime.strptime(end_time, "%H:%M")
-    if new_end < new_start:
-        new_end += timedelta(days=1)
-    
-    for existing in same_day_shifts:
-        ex_start = datetime.strptime(existing["start_time"], "%H:%M")
-        ex_end = datetime.strptime(existing["end_time"], "%H:%M")
-        if ex_end < ex_start:
-            ex_end += timedelta(days=1)
-        
-        # Check overlap
-        if not (new_end <= ex_start or new_start >= ex_end):
-            return {
-                "has_conflict": True,
-                "conflict_type": "overlap",
-                "message": f"Konflikt: Mitarbeiter ist bereits eingeplant ({existing['start_time']}-{existing['end_time']})"
-            }
-    
-    # B) Prüfe Ruhezeit (11 Stunden)
-    shift_datetime = datetime.fromisoformat(shift_date)
-    prev_day = (shift_datetime - timedelta(days=1)).strftime("%Y-%m-%d")
-    next_day = (shift_datetime + timedelta(days=1)).strftime("%Y-%m-%d")
-    
-    # Schichten am Vortag (für Ruhezeit nach Schichtende)
-    prev_query = {
-        "staff_member_id": staff_member_id,
-        "shift_date": prev_day,
-        "archived": False
-    }
-    prev_shifts = await db.shifts.find(prev_query, {"_id": 0}).to_list(100)
-    
-    for prev in prev_shifts:
-        prev_end = datetime.strptime(prev["end_time"], "%H:%M")
-        # Wenn Schicht nach Mitternacht endet
-        if prev_end < datetime.strptime(prev["start_time"], "%H:%M"):
-            prev_end_full = shift_datetime.replace(hour=prev_end.hour, minute=prev_end.minute)
-        else:
-            prev_end_full = (shift_datetime - timedelta(days=1)).replace(hour=prev_end.hour, minute=prev_end.minute)
-        
-        new_start_full = shift_datetime.replace(hour=new_start.hour, minute=new_start.minute)
-        
-        rest_hours = (new_start_full - prev_end_full).total_seconds() / 3600
-        if 0 < rest_hours < 11:
-            return {
-                "has_conflict": True,
-                "conflict_type": "rest_time",
-                "message": f"Ruhezeit von 11h unterschritten (nur {rest_hours:.1f}h seit Schichtende am Vortag)"
-            }
-    
-    # Schichten am Folgetag (für Ruhezeit vor Schichtbeginn)
-    next_query = {
-        "staff_member_id": staff_member_id,
-        "shift_date": next_day,
-        "archived": False
-    }
-    next_shifts = await db.shifts.find(next_query, {"_id": 0}).to_list(100)
-    
-    for nxt in next_shifts:
-        nxt_start = datetime.strptime(nxt["start_time"], "%H:%M")
-        nxt_start_full = (shift_datetime + timedelta(days=1)).replace(hour=nxt_start.hour, minute=nxt_start.minute)
-        
-        new_end_full = shift_datetime.replace(hour=new_end.hour, minute=new_end.minute)
-        if new_end < new_start:
-            new_end_full += timedelta(days=1)
-        
-        rest_hours = (nxt_start_full - new_end_full).total_seconds() / 3600
-        if 0 < rest_hours < 11:
-            return {
-                "has_conflict": True,
-                "conflict_type": "rest_time",
-                "message": f"Ruhezeit von 11h unterschritten (nur {rest_hours:.1f}h bis Schichtbeginn am Folgetag)"
-            }
-    
-    return {"has_conflict": False, "conflict_type": None, "message": None}
+    validator = ShiftConflictValidator()
+    await validator.load([staff_member_id], shift_date, shift_date)
+    return validator.check(staff_member_id, shift_date, start_time, end_time, exclude_shift_id=exclude_shift_id)
 
 
 def get_week_dates(year: int, week: int) -> tuple:
@@ -1403,17 +1346,41 @@ async def copy_schedule_to_next_week(schedule_id: str, user: dict = Depends(requ
     source_start = date.fromisoformat(source["week_start"])
     days_offset = (target_start - source_start).days
     
-    copied_count = 0
-    for shift in source_shifts:
-        # Neues Datum berechnen
-        old_date = date.fromisoformat(shift["shift_date"])
-        new_date = old_date + timedelta(days=days_offset)
+    # Zuweisungen der Zielwoche vorab prüfen (ein Query für alle Mitarbeiter):
+    # Konflikte (Doppelbelegung, Ruhezeit, Höchstarbeitszeit) werden offen kopiert
+    proposals = [
+        {
+            "staff_member_id": shift.get("staff_member_id"),
+            "shift_date": (date.fromisoformat(shift["shift_date"]) + timedelta(days=days_offset)).isoformat(),
+            "start_time": shift.get("start_time"),
+            "end_time": shift.get("end_time"),
+        }
+        for shift in source_shifts
+    ]
+    validator = await load_validator_for(
+        proposals, max_daily_hours=MAX_DAILY_HOURS, max_weekly_hours=MAX_WEEKLY_HOURS
+    )
+    checks = validator.validate(proposals)
+    
+    new_shifts = []
+    conflicts = []
+    for shift, proposal, check in zip(source_shifts, proposals, checks):
+        staff_member_id = shift["staff_member_id"]
+        if check["has_conflict"]:
+            conflicts.append({
+                "source_shift_id": shift["id"],
+                "staff_member_id": staff_member_id,
+                "shift_date": proposal["shift_date"],
+                "conflict_type": check["conflict_type"],
+                "message": check["message"]
+            })
+            staff_member_id = None
         
         new_shift = create_entity({
             "schedule_id": new_schedule["id"],
-            "staff_member_id": shift["staff_member_id"],
+            "staff_member_id": staff_member_id,
             "work_area_id": shift["work_area_id"],
-            "shift_date": new_date.isoformat(),
+            "shift_date": proposal["shift_date"],
             "start_time": shift["start_time"],
             "end_time": shift["end_time"],
             "hours": shift["hours"],
@@ -1421,20 +1388,25 @@ async def copy_schedule_to_next_week(schedule_id: str, user: dict = Depends(requ
             "notes": shift.get("notes")
         })
         
-        await db.shifts.insert_one(new_shift)
-        copied_count += 1
+        new_shifts.append(new_shift)
+    
+    copied_shifts = (await insert_shifts(new_shifts))[0]
+    copied_count = len(copied_shifts)
+    await refresh_ledger_for_shifts(*copied_shifts)
     
     await create_audit_log(
         user, "schedule", new_schedule["id"], "copy",
         {"source_id": schedule_id, "source_week": f"KW {source_week}/{source_year}"},
-        {"target_week": f"KW {target_week}/{target_year}", "shifts_copied": copied_count}
+        {"target_week": f"KW {target_week}/{target_year}", "shifts_copied": copied_count, "conflicts": len(conflicts)}
     )
     
     return {
-        "message": f"Dienstplan nach KW {target_week}/{target_year} kopiert",
+        "message": f"Dienstplan nach KW {target_week}/{target_year} kopiert"
+                   + (f", {len(conflicts)} Zuweisungen wegen Konflikten offen gelassen" if conflicts else ""),
         "success": True,
         "new_schedule_id": new_schedule["id"],
-        "shifts_copied": copied_count
+        "shifts_copied": copied_count,
+        "conflicts": conflicts
     }
 
 
@@ -1596,6 +1568,7 @@ async def create_shift(data: ShiftCreate, user: dict = Depends(require_manager))
     })
     
     await db.shifts.insert_one(shift)
+    await refresh_ledger_for_shifts(shift)
     await create_audit_log(user, "shift", shift["id"], "create", None, safe_dict_for_audit(shift))
     return {k: v for k, v in shift.items() if k != "_id"}
 
@@ -1638,6 +1611,7 @@ async def update_shift(shift_id: str, data: ShiftUpdate, user: dict = Depends(re
     
     await db.shifts.update_one({"id": shift_id}, {"$set": update_data})
     updated = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
+    await refresh_ledger_for_shifts(existing, updated)
     await create_audit_log(user, "shift", shift_id, "update", before, safe_dict_for_audit(updated))
     return updated
 
@@ -1655,6 +1629,7 @@ async def delete_shift(shift_id: str, user: dict = Depends(require_manager)):
         raise ValidationException("Schichten in archivierten Dienstplänen können nicht gelöscht werden")
     
     await db.shifts.update_one({"id": shift_id}, {"$set": {"archived": True, "updated_at": now_iso()}})
+    await refresh_ledger_for_shifts(existing)
     await create_audit_log(user, "shift", shift_id, "archive", safe_dict_for_audit(existing), {"archived": True})
     return {"message": "Schicht gelöscht", "success": True}
 
@@ -1683,36 +1658,15 @@ async def get_hours_overview(
     work_areas = await db.work_areas.find({"archived": {"$ne": True}}, {"_id": 0}).to_list(100)
     work_area_map = {a["id"]: a["name"] for a in work_areas}
     
-    # Helper: Calculate hours from start_time and end_time strings
-    def calc_hours_from_times(start_time: str, end_time: str) -> float:
-        """Calculate hours between two time strings (HH:MM format)"""
-        try:
-            if not start_time or not end_time:
-                return 0
-            start_h, start_m = map(int, start_time.split(":"))
-            end_h, end_m = map(int, end_time.split(":"))
-            return (end_h * 60 + end_m - start_h * 60 - start_m) / 60
-        except:
-            return 0
-    
-    # Get all shifts for this week
-    shifts = await db.shifts.find({
-        "shift_date": {"$gte": week_start.isoformat(), "$lte": week_end.isoformat()},
-        "archived": False
-    }, {"_id": 0}).to_list(1000)
+    # Stundenkonto der Woche: ein Range-Query (Soll aus Schichten, Ist aus time_sessions)
+    ledger = await read_ledger(week_start, week_end)
     
     # Calculate hours per staff member
     overview = []
     for member in staff_members:
-        member_shifts = [s for s in shifts if s.get("staff_member_id") == member.get("id")]
-        
-        # Calculate planned hours: use hours field OR calculate from times
-        planned_hours = 0
-        for s in member_shifts:
-            if s.get("hours"):
-                planned_hours += s.get("hours", 0)
-            else:
-                planned_hours += calc_hours_from_times(s.get("start_time"), s.get("end_time"))
+        member_ledger = ledger.get(member.get("id"), {})
+        planned_hours = member_ledger.get("planned_hours", 0)
+        actual_hours = member_ledger.get("actual_hours", 0)
         
         weekly_hours = member.get("weekly_hours", 0) or 0
         
@@ -1749,8 +1703,10 @@ async def get_hours_overview(
             "employment_type": member.get("employment_type"),
             "weekly_hours_target": weekly_hours,
             "planned_hours": round(planned_hours, 2),
+            "actual_hours": round(actual_hours, 2),
             "difference": round(planned_hours - weekly_hours, 2),
-            "shift_count": len(member_shifts)
+            "actual_difference": round(actual_hours - weekly_hours, 2),
+            "shift_count": member_ledger.get("shift_count", 0)
         })
     
     # Bereichs-Aggregation (Service / Küche / Sonstige)
@@ -1762,12 +1718,14 @@ async def get_hours_overview(
                 "area": area,
                 "target_hours": 0,
                 "planned_hours": 0,
+                "actual_hours": 0,
                 "difference": 0,
                 "staff_count": 0,
                 "shift_count": 0
             }
         area_summary[area]["target_hours"] += o["weekly_hours_target"]
         area_summary[area]["planned_hours"] += o["planned_hours"]
+        area_summary[area]["actual_hours"] += o["actual_hours"]
         area_summary[area]["difference"] += o["difference"]
         area_summary[area]["staff_count"] += 1
         area_summary[area]["shift_count"] += o["shift_count"]
@@ -1776,6 +1734,7 @@ async def get_hours_overview(
     for area in area_summary:
         area_summary[area]["target_hours"] = round(area_summary[area]["target_hours"], 2)
         area_summary[area]["planned_hours"] = round(area_summary[area]["planned_hours"], 2)
+        area_summary[area]["actual_hours"] = round(area_summary[area]["actual_hours"], 2)
         area_summary[area]["difference"] = round(area_summary[area]["difference"], 2)
     
     return {
@@ -1785,11 +1744,34 @@ async def get_hours_overview(
         "week_end": week_end.isoformat(),
         "overview": overview,
         "total_planned": round(sum(o["planned_hours"] for o in overview), 2),
+        "total_actual": round(sum(o["actual_hours"] for o in overview), 2),
         "total_target": round(sum(o["weekly_hours_target"] for o in overview), 2),
         "area_summary": list(area_summary.values())  # NEU: Bereichs-Summen
     }
 
 
+@staff_router.post("/hours-ledger/rebuild")
+async def rebuild_hours_ledger(
+    from_date: str = Query(..., description="Start-Datum (YYYY-MM-DD)"),
+    to_date: str = Query(..., description="End-Datum (YYYY-MM-DD)"),
+    user: dict = Depends(require_admin)
+):
+    """Stundenkonto für einen Zeitraum aus Schichten + time_sessions neu aufbauen"""
+    try:
+        start = date.fromisoformat(from_date)
+        end = date.fromisoformat(to_date)
+    except ValueError:
+        raise ValidationException("Ungültiges Datumsformat. Erwartet: YYYY-MM-DD")
+    if end < start:
+        raise ValidationException("End-Datum muss nach Start-Datum liegen")
+    if (end - start).days >= GENERATOR_MAX_DAYS:
+        raise ValidationException(f"Maximaler Zeitraum: {GENERATOR_MAX_DAYS} Tage")
+    
+    rows = await rebuild_ledger(start, end)
+    await create_audit_log(user, "hours_ledger", "rebuild", "rebuild", None, {"from_date": from_date, "to_date": to_date, "rows": rows})
+    return {"success": True, "rows": rows, "from_date": from_date, "to_date": to_date}
+
+
 # ============== EXPORTS ==============
 @staff_router.get("/export/schedule/{schedule_id}/pdf")
 async def export_schedule_pdf(schedule_id: str, user: dict = Depends(require_manager)):
@@ -1966,9 +1948,6 @@ async def send_welcome_email(
     if not member.get("email"):
         raise ValidationException("Mitarbeiter hat keine E-Mail-Adresse")
     
-    # Import email service
-    from email_service import send_email_template
-    
     # Prepare template data
     templates = {
         "de": {
@@ -2024,38 +2003,53 @@ Zespół GastroCore
         "recipient": member.get("email"),
         "staff_member_id": member_id,
         "language": lang,
-        "status": "pending"
+        "status": "queued"
     })
     await db.message_logs.insert_one(email_log)
     
     try:
-        # Send email (using existing email service)
-        await send_email_template(
+        # In die E-Mail-Outbox - sent / failed setzt on_welcome_mail_outcome
+        outbox_id = await send_email_template(
             to_email=member.get("email"),
             subject=template["subject"],
-            body=f"{template['greeting']}\n{template['body']}"
-        )
-        
-        # Update log
-        await db.message_logs.update_one(
-            {"id": email_log["id"]},
-            {"$set": {"status": "sent", "sent_at": now_iso()}}
+            body=f"{template['greeting']}\n{template['body']}",
+            template_type="welcome_email",
+            meta={"message_log_id": email_log["id"], "staff_member_id": member_id}
         )
-        
-        await create_audit_log(
-            user, "staff_member", member_id, "welcome_email_sent",
-            None, {"email": member.get("email"), "language": lang}
-        )
-        
-        return {"message": "Begrüßungs-E-Mail gesendet", "success": True}
-        
+        error = None if outbox_id else "SMTP nicht konfiguriert"
     except Exception as e:
         logger.error(f"Failed to send welcome email: {e}")
+        outbox_id = None
+        error = str(e)
+    
+    if not outbox_id:
         await db.message_logs.update_one(
             {"id": email_log["id"]},
-            {"$set": {"status": "failed", "error": str(e)}}
+            {"$set": {"status": "failed", "error": error}}
         )
-        raise HTTPException(status_code=500, detail=f"E-Mail-Versand fehlgeschlagen: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"E-Mail-Versand fehlgeschlagen: {error}")
+    
+    await db.message_logs.update_one({"id": email_log["id"]}, {"$set": {"outbox_id": outbox_id}})
+    await create_audit_log(
+        user, "staff_member", member_id, "welcome_email_sent",
+        None, {"email": member.get("email"), "language": lang, "status": "queued"}
+    )
+    
+    return {"message": "Begrüßungs-E-Mail zum Versand eingereiht", "success": True, "outbox_id": outbox_id}
+
+
+async def on_welcome_mail_outcome(item: dict, status: str, error: Optional[str]):
+    """Outbox-Hook: Nachrichten-Log der Begrüßungs-E-Mail auf das Versandergebnis setzen"""
+    message_log_id = (item.get("meta") or {}).get("message_log_id")
+    if not message_log_id:
+        return
+    update = {"status": status, "error": error}
+    if status == "sent":
+        update["sent_at"] = now_iso()
+    await db.message_logs.update_one({"id": message_log_id}, {"$set": update})
+
+
+register_outbox_hook("welcome_email", on_welcome_mail_outcome)
 
 
 # ============== SEED DEFAULT DATA ==============
@@ -2406,9 +2400,11 @@ async def generate_shifts_from_templates(
     Erzeugt aus ausgewählten shift_templates konkrete shifts (Status: DRAFT)
     für einen definierten Zeitraum.
     
-    - Idempotent: Keine Duplikate bei skip_existing=true
+    - Idempotent: Keine Duplikate bei skip_existing=true (Unique-Key template_code + date_local)
     - Eismacher: Darf auch an Ruhetagen erzeugt werden (keine Öffnungszeiten-Prüfung)
     - Alle erzeugten Shifts haben status=draft, created_from=TEMPLATE_GENERATOR_V1
+    - Ganze Saison in einem Request: ein Dienstplan je ISO-Woche, Öffnungszeiten
+      und Bestand einmal geladen, Schreiben per insert_many
     
     Args:
         from_date: Start-Datum (YYYY-MM-DD)
@@ -2423,7 +2419,7 @@ async def generate_shifts_from_templates(
         details: Liste der erzeugten Shift-IDs
     """
     import re
-    from datetime import datetime, timedelta
+    from datetime import datetime
     
     # Validate dates
     try:
@@ -2435,8 +2431,8 @@ async def generate_shifts_from_templates(
     if end_date < start_date:
         raise ValidationException("End-Datum muss nach Start-Datum liegen")
     
-    if (end_date - start_date).days > 90:
-        raise ValidationException("Maximaler Zeitraum: 90 Tage")
+    if (end_date - start_date).days >= GENERATOR_MAX_DAYS:
+        raise ValidationException(f"Maximaler Zeitraum: {GENERATOR_MAX_DAYS} Tage")
     
     # Build template query from codes
     # Support wildcards: SERVICE_WINTER_* -> regex
@@ -2465,21 +2461,21 @@ async def generate_shifts_from_templates(
     
     logger.info(f"[SHIFT-GENERATOR] {len(templates)} Templates gefunden für Codes: {request.template_codes}")
     
-    # Find or create a schedule for the period
-    # Use ISO week of start_date
-    iso_year, iso_week, _ = start_date.isocalendar()
-    
-    schedule = await db.schedules.find_one({
-        "year": iso_year,
-        "week": iso_week,
-        "archived": {"$ne": True}
-    })
-    
-    if not schedule:
-        # Create new schedule
-        week_start = start_date - timedelta(days=start_date.weekday())
-        week_end = week_start + timedelta(days=6)
-        
+    # Dienstpläne je ISO-Woche des Zeitraums - ein Query, fehlende per insert_many
+    days = date_range(start_date, end_date)
+    weeks = sorted({d.isocalendar()[:2] for d in days})
+    schedules_by_week = {}
+    async for schedule in db.schedules.find(
+        {"$or": [{"year": y, "week": w} for y, w in weeks], "archived": {"$ne": True}},
+        {"_id": 0}
+    ):
+        schedules_by_week.setdefault((schedule["year"], schedule["week"]), schedule)
+    
+    new_schedules = []
+    for iso_year, iso_week in weeks:
+        if (iso_year, iso_week) in schedules_by_week:
+            continue
+        week_start, week_end = get_week_dates(iso_year, iso_week)
         schedule = {
             "id": str(uuid.uuid4()),
             "year": iso_year,
@@ -2492,62 +2488,54 @@ async def generate_shifts_from_templates(
             "updated_at": now_iso(),
             "archived": False
         }
-        await db.schedules.insert_one(schedule)
-        logger.info(f"[SHIFT-GENERATOR] Neuer Dienstplan erstellt: KW{iso_week}/{iso_year}")
+        schedules_by_week[(iso_year, iso_week)] = schedule
+        new_schedules.append(schedule)
+    if new_schedules:
+        await db.schedules.insert_many([dict(s) for s in new_schedules])
+        logger.info(f"[SHIFT-GENERATOR] {len(new_schedules)} neue Dienstpläne erstellt")
     
-    schedule_id = schedule["id"]
+    schedule_id = schedules_by_week[weeks[0]]["id"]
+    
+    # Öffnungszeiten + Bestand einmal für den ganzen Zeitraum
+    closing_times = await closing_times_for_range(start_date, end_date)
+    existing_slots = await existing_template_slots(templates, start_date, end_date) if request.skip_existing else set()
     
     # Generate shifts
-    created_count = 0
     skipped_count = 0
-    created_ids = []
+    new_shifts = []
     now = now_iso()
     
-    current_date = start_date
-    while current_date <= end_date:
+    for current_date in days:
         date_str = current_date.isoformat()
         
         for template in templates:
             template_code = template.get("code", "")
             
             # Check if shift already exists (skip_existing)
-            if request.skip_existing:
-                existing = await db.shifts.find_one({
-                    "shift_date": date_str,
-                    "template_code": template_code,
-                    "archived": {"$ne": True}
-                })
-                
-                if existing:
-                    skipped_count += 1
-                    continue
-            
-            # Create shift
-            shift_id = str(uuid.uuid4())
+            slot_keys = template_slot_keys(template, date_str)
+            if request.skip_existing and any(key in existing_slots for key in slot_keys):
+                skipped_count += 1
+                continue
+            existing_slots.update(slot_keys)
             
             # Parse times from template
             start_time = template.get("start_time", template.get("start_time_local", "09:00"))
             end_time = template.get("end_time", template.get("end_time_local", "17:00"))
-            
-            # Calculate hours
-            try:
-                start_h, start_m = map(int, start_time.split(":"))
-                end_h, end_m = map(int, end_time.split(":"))
-                hours = ((end_h * 60 + end_m) - (start_h * 60 + start_m)) / 60
-                if hours < 0:
-                    hours += 24  # Overnight shift
-            except:
-                hours = 8.0
+            if template.get("end_time_type") == "close_plus_minutes":
+                # Eismacher & Co. auch an Ruhetagen: dann feste Endzeit der Vorlage
+                end_time = close_plus_end_time(
+                    closing_times.get(date_str), template.get("close_plus_minutes", 0)
+                ) or template.get("end_time_fixed") or end_time
             
             shift = {
-                "id": shift_id,
+                "id": str(uuid.uuid4()),
                 "template_id": template.get("id"),
-                "template_code": template_code,
-                "schedule_id": schedule_id,
+                "schedule_id": schedules_by_week[current_date.isocalendar()[:2]]["id"],
+                "date_local": date_str,
                 "shift_date": date_str,
                 "start_time": start_time,
                 "end_time": end_time,
-                "hours": hours,
+                "hours": shift_hours(start_time, end_time),
                 "role": template.get("role", "service"),
                 "department": template.get("department", template.get("role", "service")),
                 "station": template.get("station", ""),
@@ -2561,12 +2549,15 @@ async def generate_shifts_from_templates(
                 "updated_at": now,
                 "archived": False
             }
-            
-            await db.shifts.insert_one(shift)
-            created_ids.append(shift_id)
-            created_count += 1
-        
-        current_date += timedelta(days=1)
+            if template_code:
+                shift["template_code"] = template_code
+            new_shifts.append(shift)
+    
+    # Geordnetes insert_many - Duplikate (paralleler Lauf) zählen als übersprungen
+    created, duplicates = await insert_shifts(new_shifts)
+    created_ids = [s["id"] for s in created]
+    created_count = len(created)
+    skipped_count += duplicates
     
     # Audit log
     await create_audit_log(
@@ -2588,6 +2579,7 @@ async def generate_shifts_from_templates(
         "created": created_count,
         "skipped": skipped_count,
         "schedule_id": schedule_id,
+        "schedule_ids": [schedules_by_week[week]["id"] for week in weeks],
         "details": {
             "period": f"{request.from_date} bis {request.to_date}",
             "templates_used": len(templates),
@@ -2660,17 +2652,8 @@ async def get_closing_time_for_date(date_str: str) -> Optional[str]:
         # Use central opening hours resolver
         effective = await calculate_effective_hours(target_date)
         
-        # If closed, return None
-        if not effective.get("is_open") or effective.get("is_closed_full_day"):
-            return None
-        
-        # Get last block's end time
-        blocks = effective.get("blocks", [])
-        if blocks:
-            last_block = blocks[-1]
-            return last_block.get("end", "20:00")
-        
-        return "20:00"  # Default fallback
+        # Closed -> None, sonst Ende des letzten Blocks (Default 20:00)
+        return closing_time_from_effective(effective)
         
     except Exception as e:
         logger.warning(f"Could not get closing time for {date_str}: {e}")
@@ -2833,7 +2816,37 @@ async def apply_templates_to_schedule(
             raise ValidationException("Schedule hat weder start_date noch year/week")
     
     week_start = datetime.fromisoformat(week_start_str).date()
-    created_shifts = []
+    week_end = week_start + timedelta(days=6)
+    
+    # Einmal für die ganze Woche: Schließzeiten, Kultur-Event-Tage, bestehende Vorlagen-Schichten
+    closing_times = await closing_times_for_range(week_start, week_end)
+    
+    kultur_days = set()
+    async for event in db.events.find(
+        {
+            "start_datetime": {"$gte": week_start.isoformat(), "$lt": (week_end + timedelta(days=1)).isoformat()},
+            "content_category": {"$in": ["VERANSTALTUNG", "veranstaltung", "kultur"]},
+            "archived": False
+        },
+        {"_id": 0, "start_datetime": 1}
+    ):
+        kultur_days.add(event["start_datetime"][:10])
+    
+    existing_keys = set()
+    async for existing_shift in db.shifts.find(
+        {
+            "schedule_id": schedule_id,
+            "template_id": {"$in": [t.get("id") for t in templates]},
+            "archived": False
+        },
+        {"_id": 0, "date": 1, "start_time": 1, "end_time": 1, "department": 1, "template_id": 1}
+    ):
+        existing_keys.add((
+            existing_shift.get("date"), existing_shift.get("start_time"), existing_shift.get("end_time"),
+            existing_shift.get("department"), existing_shift.get("template_id")
+        ))
+    
+    new_shifts = []
     skipped_existing = 0
     
     for day_offset in range(7):
@@ -2842,14 +2855,10 @@ async def apply_templates_to_schedule(
         is_wknd = current_date.weekday() >= 5
         
         # Check if this day has a Kultur-Event
-        has_kultur_event = await db.events.find_one({
-            "start_datetime": {"$regex": f"^{date_str}"},
-            "content_category": {"$in": ["VERANSTALTUNG", "veranstaltung", "kultur"]},
-            "archived": False
-        })
+        has_kultur_event = date_str in kultur_days
         
         # Get closing time for this day
-        closing_time = await get_closing_time_for_date(date_str)
+        closing_time = closing_times.get(date_str)
         if closing_time is None:
             continue  # Day is closed, skip
         
@@ -2908,19 +2917,11 @@ async def apply_templates_to_schedule(
             template_id = template.get("id")
             
             # IDEMPOTENT CHECK: Skip if shift already exists
-            existing_shift = await db.shifts.find_one({
-                "schedule_id": schedule_id,
-                "date": date_str,
-                "start_time": start_time,
-                "end_time": end_time,
-                "department": department,
-                "template_id": template_id,
-                "archived": False
-            })
-            
-            if existing_shift:
+            slot_key = (date_str, start_time, end_time, department, template_id)
+            if slot_key in existing_keys:
                 skipped_existing += 1
                 continue  # Shift already exists, skip
+            existing_keys.add(slot_key)
             
             # Create N shifts based on headcount_default
             headcount = template.get("headcount_default", 1)
@@ -2940,8 +2941,9 @@ async def apply_templates_to_schedule(
                     "template_id": template_id,
                     "status": "offen"
                 })
-                await db.shifts.insert_one(shift)
-                created_shifts.append(shift["id"])
+                new_shifts.append(shift)
+    
+    created_shifts = [shift["id"] for shift in (await insert_shifts(new_shifts))[0]]
     
     await create_audit_log(
         user, "schedule", schedule_id, "apply_templates",
@@ -3710,6 +3712,7 @@ async def apply_shift_suggestion(
             }
         }
     )
+    await refresh_ledger_for_shifts(shift, {**shift, "staff_member_id": staff_member_id})
     
     # Audit Log
     await create_audit_log(
@@ -3771,32 +3774,61 @@ async def batch_apply_suggestions(
     """
     Batch-Anwendung von Schichtvorschlägen mit Guards.
     
+    Löst die Woche als Min-Cost-Zuordnung (shift_assignment_solver):
+    Mitarbeiter-Zustände werden einmal vorberechnet statt je Kandidat
+    alle Schichten erneut zu durchsuchen.
+    
     Guards:
-    - Keine Überschneidungen (time overlap check)
+    - Keine Überschneidungen (time overlap check) + 11h Ruhezeit
     - Manuelle Zuweisungen schützen (skip_if_assigned)
     - Max Schichten pro Woche pro Mitarbeiter
     - Rollen-Matching (shift.role muss in staff.roles[])
     
     dry_run=true: nur Vorschau
-    dry_run=false: tatsächliche Anwendung
+    dry_run=false: tatsächliche Anwendung (ein bulk_write)
     """
+    from shift_assignment_solver import ShiftAssignmentProblem, shift_date as get_shift_date
+
     # Lade Schedule
     schedule = await db.schedules.find_one({"id": schedule_id})
     if not schedule:
         raise NotFoundException(f"Schedule {schedule_id} nicht gefunden")
     
     # Lade alle Daten (mit korrektem active-Query)
-    all_shifts = await db.shifts.find({"schedule_id": schedule_id}).to_list(1000)
+    all_shifts = await db.shifts.find({"schedule_id": schedule_id}, {"_id": 0}).to_list(1000)
     all_staff = await db.staff_members.find({
         "$or": [{"active": True}, {"is_active": True}],
         "archived": {"$ne": True}
-    }).to_list(500)
-    work_area_list = await db.work_areas.find().to_list(100)
+    }, {"_id": 0}).to_list(500)
+    work_area_list = await db.work_areas.find({}, {"_id": 0}).to_list(100)
     work_areas = {wa["id"]: wa["name"] for wa in work_area_list}
     work_area_ids_by_name = {wa["name"].lower(): wa["id"] for wa in work_area_list}
     
+    # Zugewiesene Schichten am Tag vor/nach der Woche (nur für die Ruhezeit)
+    dates = sorted({get_shift_date(s) for s in all_shifts if get_shift_date(s)})
+    context_shifts = []
+    if dates:
+        try:
+            range_start = (date.fromisoformat(dates[0][:10]) - timedelta(days=1)).isoformat()
+            range_end = (date.fromisoformat(dates[-1][:10]) + timedelta(days=1)).isoformat()
+            context_shifts = await db.shifts.find(
+                {
+                    "schedule_id": {"$ne": schedule_id},
+                    "archived": {"$ne": True},
+                    "$or": [
+                        {"date": {"$gte": range_start, "$lte": range_end}},
+                        {"shift_date": {"$gte": range_start, "$lte": range_end}},
+                    ],
+                },
+                {"_id": 0, "id": 1, "date": 1, "shift_date": 1, "start_time": 1, "end_time": 1,
+                 "staff_member_id": 1, "assigned_staff_ids": 1, "schedule_id": 1}
+            ).to_list(5000)
+        except ValueError:
+            context_shifts = []
+    
     # Filter: nur offene Schichten
-    open_shifts = [s for s in all_shifts if not s.get("staff_member_id") and not s.get("assigned_staff_ids")]
+    all_open_shifts = [s for s in all_shifts if not s.get("staff_member_id") and not s.get("assigned_staff_ids")]
+    open_shifts = all_open_shifts
     
     # Optional: Work Area Filter
     if request.work_area_filter:
@@ -3808,7 +3840,7 @@ async def batch_apply_suggestions(
         if filter_ids:
             open_shifts = [s for s in open_shifts if s.get("work_area_id") in filter_ids]
     
-    # Sortiere nach Rollen-Priorität (ice_maker zuerst!)
+    # Sortiere nach Rollen-Priorität (ice_maker zuerst!) - bestimmt, was ins Limit fällt
     role_order = {role: idx for idx, role in enumerate(request.role_priority)}
     open_shifts.sort(key=lambda s: role_order.get(s.get("role", "service"), 99))
     
@@ -3819,7 +3851,7 @@ async def batch_apply_suggestions(
     result = {
         "schedule_id": schedule_id,
         "schedule_name": schedule.get("name", f"KW{schedule.get('week')}/{schedule.get('year')}"),
-        "open_shifts": len([s for s in all_shifts if not s.get("staff_member_id") and not s.get("assigned_staff_ids")]),
+        "open_shifts": len(all_open_shifts),
         "processed": len(open_shifts),
         "would_apply": [],
         "applied": [],
@@ -3832,191 +3864,116 @@ async def batch_apply_suggestions(
         }
     }
     
-    # Track: Schichten pro Mitarbeiter diese Woche (für max_shifts_per_week)
-    staff_shifts_this_week = {}
-    for shift in all_shifts:
-        staff_id = shift.get("staff_member_id") or (shift.get("assigned_staff_ids", []) or [None])[0]
-        if staff_id:
-            staff_shifts_this_week[staff_id] = staff_shifts_this_week.get(staff_id, 0) + 1
+    problem = ShiftAssignmentProblem(
+        schedule_id=schedule_id,
+        open_shifts=open_shifts,
+        all_shifts=all_shifts,
+        context_shifts=context_shifts,
+        staff_list=all_staff,
+        max_shifts_per_week=request.max_shifts_per_staff_per_week,
+        min_score=request.min_score,
+        role_priority=request.role_priority
+    )
+    solution = problem.solve()
+    result["solver"] = solution["stats"]
     
-    # Track: Schichten pro Staff pro Tag (für Overlap-Detection nach Apply)
-    applied_assignments = []  # [(staff_id, shift)]
+    def shift_label(shift: dict) -> str:
+        return shift.get("shift_name", shift.get("notes", f"Schicht {shift.get('start_time', '')}"))
     
-    # Für jeden offenen Shift den besten Kandidaten finden
-    for shift in open_shifts:
-        shift_id = shift.get("id")
-        shift_date = shift.get("date", shift.get("shift_date", ""))
-        shift_work_area = shift.get("work_area_id", "")
-        shift_role = shift.get("role", "")
-        shift_name = shift.get("shift_name", shift.get("notes", f"Schicht {shift.get('start_time', '')}"))
-        
-        # Bereits zugewiesen? (Sicherheitscheck)
-        if shift.get("staff_member_id") or shift.get("assigned_staff_ids"):
-            result["skipped"].append({
-                "shift_id": shift_id,
-                "shift_name": shift_name,
-                "reason": SkipReason.ALREADY_ASSIGNED.value
-            })
-            result["stats"]["skipped_count"] += 1
-            continue
-        
-        # Kandidaten sammeln
-        candidates = []
-        
-        for staff in all_staff:
-            staff_id = staff.get("id")
-            staff_name = staff.get("name", staff_id[:8] if staff_id else "?")
-            staff_roles = staff.get("roles", [])
-            
-            # 0. Rollen-Check (Pflicht!)
-            if shift_role and staff_roles:
-                if shift_role not in staff_roles:
-                    continue  # Rolle passt nicht
-            
-            # 1. Max Shifts per Week Check
-            current_count = staff_shifts_this_week.get(staff_id, 0)
-            if current_count >= request.max_shifts_per_staff_per_week:
-                continue  # Max erreicht
-            
-            # 2. Verfügbarkeits-Check (falls verfügbar)
-            try:
-                is_available, avail_reason = check_availability_block(staff, shift_date)
-                if not is_available:
-                    continue
-            except:
-                pass  # Availability-Check optional für V1
-            
-            # 3. Bereichs-Kompatibilität (optional wenn work_area_id leer)
-            primary_area = staff.get("work_area_id")
-            secondary_areas = staff.get("work_area_ids", [])
-            
-            if shift_work_area:  # Nur prüfen wenn gesetzt
-                is_primary = (shift_work_area == primary_area)
-                is_secondary = (shift_work_area in secondary_areas)
-                if not is_primary and not is_secondary:
-                    continue
-            else:
-                is_primary = True  # Default
-            
-            # 4. Zeit-Overlap-Check (inkl. bereits applied)
-            # Prüfe gegen alle bestehenden UND bereits in dieser Session zugewiesenen
-            all_shifts_for_overlap = all_shifts + [a[1] for a in applied_assignments if a[0] == staff_id]
-            has_overlap, overlapping_shift, overlap_reason = check_shift_overlap_for_staff(
-                staff_id, shift, all_shifts_for_overlap, buffer_minutes=0
-            )
-            if has_overlap:
-                continue
-            
-            # 5. Constraint-Check (falls vorhanden)
-            try:
-                is_valid, constraint_warnings = check_constraints(staff, shift_date, shift, all_shifts)
-                if not is_valid:
-                    continue
-            except:
-                pass  # Constraint-Check optional
-            
-            # 6. Berechne Score
-            hours_planned = calculate_staff_hours_this_week(staff_id, schedule_id, all_shifts)
-            shifts_today = sum(1 for s in all_shifts 
-                             if s.get("staff_member_id") == staff_id 
-                             and (s.get("date") == shift_date or s.get("shift_date") == shift_date))
-            shifts_this_week = staff_shifts_this_week.get(staff_id, 0)
-            
-            score, reasons, warnings = calculate_suggestion_score(
-                staff, shift, hours_planned, shifts_today, shifts_this_week, is_primary
-            )
-            
-            if score >= request.min_score:
-                candidates.append({
-                    "staff_member_id": staff_id,
-                    "staff_name": staff_name,
-                    "score": round(score, 1),
-                    "reasons": reasons,
-                    "warnings": warnings
-                })
-        
-        # Keine Kandidaten?
-        if not candidates:
-            result["skipped"].append({
-                "shift_id": shift_id,
-                "shift_name": shift_name,
-                "date": shift_date,
-                "role": shift_role,
-                "work_area": work_areas.get(shift_work_area, "Unbekannt"),
-                "reason": SkipReason.NO_CANDIDATES.value
-            })
-            result["stats"]["skipped_count"] += 1
-            continue
-        
-        # Sortiere nach Score und nimm Top-1
-        candidates.sort(key=lambda x: x["score"], reverse=True)
-        best = candidates[0]
-        
-        # Min-Score Check
-        if best["score"] < request.min_score:
-            result["skipped"].append({
-                "shift_id": shift_id,
-                "shift_name": shift_name,
-                "reason": SkipReason.BELOW_MIN_SCORE.value,
-                "best_score": best["score"],
-                "min_score": request.min_score
-            })
-            result["stats"]["skipped_count"] += 1
-            continue
-        
-        # Zu would_apply hinzufügen
-        apply_item = {
-            "shift_id": shift_id,
-            "shift_name": shift_name,
-            "date": shift_date,
-            "role": shift_role,
-            "time": f"{shift.get('start_time', '?')}-{shift.get('end_time', '?')}",
-            "work_area": work_areas.get(shift_work_area, "Unbekannt"),
-            "staff_member_id": best["staff_member_id"],
-            "staff_name": best["staff_name"],
-            "score": best["score"],
-            "reasons": best["reasons"]
+    for shift in solution["unassigned"]:
+        skip = {
+            "shift_id": shift.get("id"),
+            "shift_name": shift_label(shift),
+            "date": get_shift_date(shift),
+            "role": shift.get("role", ""),
+            "work_area": work_areas.get(shift.get("work_area_id", ""), "Unbekannt"),
+            "reason": SkipReason.NO_CANDIDATES.value
         }
-        result["would_apply"].append(apply_item)
+        if shift.get("id") in solution["had_candidates"]:
+            # Zulässige Kandidaten gab es, sie waren aber anderen Schichten zugeteilt
+            skip["candidates_assigned_elsewhere"] = True
+        elif shift.get("id") in solution["best_below_min"]:
+            skip["reason"] = SkipReason.BELOW_MIN_SCORE.value
+            skip["best_score"] = solution["best_below_min"][shift.get("id")]
+            skip["min_score"] = request.min_score
+        result["skipped"].append(skip)
+        result["stats"]["skipped_count"] += 1
+    
+    apply_items = []
+    for assignment in solution["assignments"]:
+        shift = assignment["shift"]
+        staff_state = assignment["staff"]
+        apply_items.append({
+            "shift_id": shift.get("id"),
+            "shift_name": shift_label(shift),
+            "date": get_shift_date(shift),
+            "role": shift.get("role", ""),
+            "time": f"{shift.get('start_time', '?')}-{shift.get('end_time', '?')}",
+            "work_area": work_areas.get(shift.get("work_area_id", ""), "Unbekannt"),
+            "staff_member_id": staff_state.id,
+            "staff_name": staff_state.name,
+            "score": assignment["score"],
+            "reasons": assignment["reasons"],
+            "warnings": assignment["warnings"]
+        })
+    apply_items.sort(key=lambda item: (item["date"], item["time"], role_order.get(item["role"] or "service", 99)))
+    result["would_apply"] = apply_items
+    
+    if request.dry_run:
+        result["stats"]["applied_count"] = len(apply_items)  # Für dry_run: zeigt was angewendet WÜRDE
+        return result
+    
+    # Bei dry_run=false: ein bulk_write, jede Zuweisung nur wenn noch offen
+    if apply_items:
+        now = datetime.now(timezone.utc).isoformat()
+        ops = [
+            UpdateOne(
+                {"id": item["shift_id"], "$or": [
+                    {"staff_member_id": None},
+                    {"staff_member_id": ""},
+                    {"staff_member_id": {"$exists": False}}
+                ]},  # Nur wenn noch nicht zugewiesen
+                {"$set": {
+                    "staff_member_id": item["staff_member_id"],
+                    "updated_at": now,
+                    "assigned_by": current_user.get("id"),
+                    "assignment_source": "batch_auto"
+                }}
+            )
+            for item in apply_items
+        ]
+        write_error = None
+        try:
+            await db.shifts.bulk_write(ops, ordered=False)
+        except Exception as e:
+            write_error = str(e)
         
-        # Track für Overlap-Detection in späteren Iterationen
-        applied_assignments.append((best["staff_member_id"], shift))
-        staff_shifts_this_week[best["staff_member_id"]] = staff_shifts_this_week.get(best["staff_member_id"], 0) + 1
+        # Tatsächlichen Stand lesen: parallel manuell besetzte Schichten zählen als failed
+        confirmed = {}
+        applied_shifts = []
+        shifts_by_id = {a["shift"].get("id"): a["shift"] for a in solution["assignments"]}
+        async for doc in db.shifts.find(
+            {"id": {"$in": [item["shift_id"] for item in apply_items]}},
+            {"_id": 0, "id": 1, "staff_member_id": 1}
+        ):
+            confirmed[doc["id"]] = doc.get("staff_member_id")
         
-        # Bei dry_run=false: tatsächlich anwenden
-        if not request.dry_run:
-            try:
-                await db.shifts.update_one(
-                    {"id": shift_id, "$or": [
-                        {"staff_member_id": None},
-                        {"staff_member_id": ""},
-                        {"staff_member_id": {"$exists": False}}
-                    ]},  # Nur wenn noch nicht zugewiesen
-                    {
-                        "$set": {
-                            "staff_member_id": best["staff_member_id"],
-                            "updated_at": datetime.now(timezone.utc).isoformat(),
-                            "assigned_by": current_user.get("id"),
-                            "assignment_source": "batch_auto"
-                        }
-                    }
-                )
-                
-                result["applied"].append(apply_item)
+        for item in apply_items:
+            if confirmed.get(item["shift_id"]) == item["staff_member_id"]:
+                result["applied"].append(item)
                 result["stats"]["applied_count"] += 1
-                
-            except Exception as e:
+                applied_shifts.append({**shifts_by_id[item["shift_id"]], "staff_member_id": item["staff_member_id"]})
+            else:
                 result["failed"].append({
-                    "shift_id": shift_id,
-                    "shift_name": shift_name,
-                    "error": str(e)
+                    "shift_id": item["shift_id"],
+                    "shift_name": item["shift_name"],
+                    "error": write_error or SkipReason.ALREADY_ASSIGNED.value
                 })
                 result["stats"]["failed_count"] += 1
-        else:
-            result["stats"]["applied_count"] += 1  # Für dry_run: zeigt was angewendet WÜRDE
+        await refresh_ledger_for_shifts(*applied_shifts)
     
     # Audit Log bei tatsächlicher Anwendung
-    if not request.dry_run and result["stats"]["applied_count"] > 0:
+    if result["stats"]["applied_count"] > 0:
         await create_audit_log(
             current_user,  # actor
             "schedule",    # entity
@@ -4027,7 +3984,9 @@ async def batch_apply_suggestions(
                 "applied_count": result["stats"]["applied_count"],
                 "skipped_count": result["stats"]["skipped_count"],
                 "strategy": request.strategy,
-                "limit": request.limit
+                "limit": request.limit,
+                "objective": solution["stats"]["objective"],
+                "gap": solution["stats"]["gap"]
             }
         )
     
@@ -0,0 +1,159 @@
+"""
+GastroCore Streaming Export
+================================================================================
+Exporte mit konstantem Speicherbedarf - unabhängig von der Collection-Größe.
+
+- Cursor-Iteration statt to_list(n) (kein stilles Abschneiden bei 1000)
+- XLSX über openpyxl write-only (Zeilen landen direkt in Temp-Dateien)
+- JSON-Arrays / ZIP-Einträge werden dokumentweise geschrieben
+- Auslieferung per StreamingResponse in Blöcken, Temp-Datei wird danach gelöscht
+
+Genutzt von backup_module (XLSX/JSON) und seeds_backup_module (ZIP).
+"""
+
+import os
+import json
+import asyncio
+import tempfile
+import logging
+from typing import Optional, Dict, Any, List, AsyncIterator, Iterator, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+STREAM_CHUNK_SIZE = 64 * 1024
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+HEADER_FONT_COLOR = "FFFFFF"
+HEADER_FILL_COLOR = "002f02"
+MAX_COLUMN_WIDTH = 40
+
+
+# ============== CURSOR / FILES ==============
+
+async def iter_documents(
+    collection,
+    query: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    sort: Optional[List[tuple]] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[dict]:
+    """Alle Dokumente per Cursor (batchweise vom Server, nie komplett im Speicher)"""
+    cursor = collection.find(query or {}, projection or {"_id": 0}).batch_size(batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    async for doc in cursor:
+        yield doc
+
+
+def new_temp_path(suffix: str) -> str:
+    """Leere Temp-Datei für einen Export anlegen"""
+    fd, path = tempfile.mkstemp(prefix="gastrocore_export_", suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def iter_file(path: str, chunk_size: int = STREAM_CHUNK_SIZE, delete: bool = True) -> Iterator[bytes]:
+    """Datei blockweise ausliefern (StreamingResponse), danach optional löschen"""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if delete:
+            remove_file(path)
+
+
+# ============== JSON ==============
+
+def json_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+async def write_json_array(fp: TextIO, docs: AsyncIterator[dict]) -> int:
+    """
+    JSON-Array dokumentweise schreiben (ein Dokument pro Zeile).
+    Ergebnis ist normales JSON (json.load-kompatibel).
+
+    Returns: Anzahl Dokumente
+    """
+    count = 0
+    fp.write("[")
+    async for doc in docs:
+        fp.write(("\n" if count == 0 else ",\n") + json_dumps(doc))
+        count += 1
+    fp.write("\n]" if count else "]")
+    return count
+
+
+# ============== XLSX ==============
+
+class XlsxSheet:
+    """
+    Ein Tabellenblatt für write_xlsx.
+
+    rows: async Iterator über Zeilen (Listen von Zellwerten)
+    widths: feste Spaltenbreiten (write-only kann nicht nachträglich messen)
+    """
+
+    def __init__(self, title: str, headers: List[str], rows: AsyncIterator[list], widths: Optional[List[int]] = None):
+        self.title = title
+        self.headers = headers
+        self.rows = rows
+        self.widths = widths
+
+
+async def write_xlsx(path: str, sheets: List[XlsxSheet], counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    XLSX im write-only Modus schreiben.
+
+    counts wird während des Schreibens gefüllt (title -> Zeilen), damit
+    spätere Blätter (z.B. "meta") die Zahlen früherer Blätter nutzen können.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    counts = counts if counts is not None else {}
+    header_font = Font(bold=True, color=HEADER_FONT_COLOR)
+    header_fill = PatternFill(start_color=HEADER_FILL_COLOR, end_color=HEADER_FILL_COLOR, fill_type="solid")
+
+    wb = Workbook(write_only=True)
+    for sheet in sheets:
+        ws = wb.create_sheet(sheet.title)
+
+        for idx, header in enumerate(sheet.headers, 1):
+            width = sheet.widths[idx - 1] if sheet.widths else max(len(header) + 4, 14)
+            ws.column_dimensions[get_column_letter(idx)].width = min(width, MAX_COLUMN_WIDTH)
+
+        header_row = []
+        for header in sheet.headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = Alignment(horizontal="center")
+            header_row.append(cell)
+        ws.append(header_row)
+
+        count = 0
+        async for row in sheet.rows:
+            ws.append(row)
+            count += 1
+        counts[sheet.title] = count
+
+    # Zusammenpacken der Blätter ist blockierend
+    await asyncio.to_thread(wb.save, path)
+    return counts
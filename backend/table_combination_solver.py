@@ -0,0 +1,247 @@
+"""
+GastroCore Table Combination Solver
+================================================================================
+Findet Einzeltische und k-Tisch-Kombinationen für eine Gruppe.
+
+Grundlage:
+- Kombinierbarkeit aus den Tisch-Stammdaten (combinable, combinable_with)
+- Nachbarschaft aus den Kombinations-Vorlagen in table_combinations
+  (Dokumente ohne Datum, Feld "tables" mit Tisch-IDs oder -Nummern)
+
+Kosten (niedriger = besser):
+- Verschwendete Plätze
+- Anzahl Stoßkanten (Tische - 1)
+- Fragmentierung: freie Nachbartische, die danach isoliert sind
+- Aufschlag für Kombinationen, die keiner Vorlage entsprechen
+
+Die Suche über zusammenhängende Tischgruppen ist durch ein Zeitbudget begrenzt.
+"""
+
+import time as time_module
+from typing import Optional, Dict, Any, List, Set, Tuple, FrozenSet
+import logging
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+MAX_COMBINATION_TABLES = 6
+SOLVER_TIME_BUDGET_SECONDS = 0.25
+MAX_CANDIDATES = 2000
+
+WASTE_WEIGHT = 10
+JOINT_WEIGHT = 8
+FRAGMENT_WEIGHT = 5
+UNTEMPLATED_PENALTY = 6
+
+
+def table_group(table: dict) -> Tuple[str, str]:
+    """Kombinationen nur innerhalb gleicher Bereiche (Restaurant zusätzlich gleicher Subbereich)"""
+    area = table.get("area") or ""
+    sub_area = (table.get("sub_area") or "") if area == "restaurant" else ""
+    return (area, sub_area)
+
+
+NEVER_COMBINABLE_TABLES = {"3"}  # Tisch 3 (Exot/Oval)
+
+
+def is_combinable(table: dict) -> bool:
+    if str(table.get("table_number")) in NEVER_COMBINABLE_TABLES:
+        return False
+    return table.get("combinable", True) is not False
+
+
+class TableGraph:
+    """
+    Nachbarschaftsgraph der kombinierbaren Tische.
+
+    tables:    table_id -> Tisch
+    adjacency: table_id -> benachbarte table_ids (gleiche Gruppe, beide kombinierbar)
+    templates: Tischmengen der Kombinations-Vorlagen (mit combo_id)
+    """
+
+    def __init__(self, tables: List[dict], templates: List[dict]):
+        self.tables: Dict[str, dict] = {t["id"]: t for t in tables}
+        self.adjacency: Dict[str, Set[str]] = {tid: set() for tid in self.tables}
+        self.templates: Dict[FrozenSet[str], str] = {}
+
+        numbers: Dict[str, List[str]] = {}
+        for t in tables:
+            numbers.setdefault(str(t.get("table_number")), []).append(t["id"])
+
+        def resolve(token: Any, group: Optional[Tuple[str, str]] = None) -> Optional[str]:
+            token = str(token)
+            if token in self.tables:
+                return token
+            candidates = numbers.get(token, [])
+            if group is not None:
+                candidates = [c for c in candidates if table_group(self.tables[c]) == group]
+            return candidates[0] if len(candidates) == 1 else None
+
+        # combinable_with (Tischnummern) aus den Stammdaten
+        for t in tables:
+            for token in t.get("combinable_with") or []:
+                other = resolve(token, table_group(t))
+                if other:
+                    self._link(t["id"], other)
+
+        # Vorlagen: alle Tische einer Vorlage gelten als benachbart
+        for template in templates:
+            tokens = template.get("tables") or template.get("table_ids") or []
+            members = [resolve(tok) for tok in tokens]
+            if len(members) < 2 or None in members:
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    self._link(a, b)
+            self.templates[frozenset(members)] = template.get("combo_id") or template.get("id")
+
+        # Gruppen ohne jede Nachbarschaftsinfo: alle Tische der Gruppe gelten als kombinierbar
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for tid, t in self.tables.items():
+            if is_combinable(t):
+                groups.setdefault(table_group(t), []).append(tid)
+        self.fallback_groups = set()
+        for group, members in groups.items():
+            if not any(self.adjacency[m] for m in members):
+                self.fallback_groups.add(group)
+                for i, a in enumerate(members):
+                    for b in members[i + 1:]:
+                        self._link(a, b)
+
+    def _link(self, a: str, b: str):
+        if a == b or a not in self.tables or b not in self.tables:
+            return
+        ta, tb = self.tables[a], self.tables[b]
+        if not (is_combinable(ta) and is_combinable(tb)):
+            return
+        if table_group(ta) != table_group(tb):
+            return
+        self.adjacency[a].add(b)
+        self.adjacency[b].add(a)
+
+    def seats(self, table_id: str) -> int:
+        return self.tables[table_id].get("seats_max", 0) or 0
+
+
+async def load_table_graph(tables: List[dict]) -> TableGraph:
+    """Graph aus Tischen + Kombinations-Vorlagen (ein Query)"""
+    templates = await db.table_combinations.find(
+        {"date": {"$exists": False}, "active": {"$ne": False}, "archived": {"$ne": True}},
+        {"_id": 0}
+    ).to_list(500)
+    return TableGraph(tables, templates)
+
+
+def _fragmentation(graph: TableGraph, chosen: FrozenSet[str], free: Set[str]) -> int:
+    """Freie Nachbartische, die nach der Belegung keinen freien Nachbarn mehr haben"""
+    isolated = 0
+    touched = set()
+    for tid in chosen:
+        touched |= graph.adjacency[tid]
+    for other in touched - chosen:
+        if other not in free:
+            continue
+        free_neighbors = graph.adjacency[other] & free
+        if free_neighbors and free_neighbors <= chosen:
+            isolated += 1
+    return isolated
+
+
+def _candidate(graph: TableGraph, chosen: FrozenSet[str], free: Set[str], party_size: int) -> Dict[str, Any]:
+    seats = sum(graph.seats(tid) for tid in chosen)
+    waste = seats - party_size
+    joints = len(chosen) - 1
+    template = graph.templates.get(chosen) if joints else None
+    fragments = _fragmentation(graph, chosen, free)
+    cost = waste * WASTE_WEIGHT + joints * JOINT_WEIGHT + fragments * FRAGMENT_WEIGHT
+    if joints and not template:
+        cost += UNTEMPLATED_PENALTY
+    ordered = sorted(chosen, key=lambda tid: (-graph.seats(tid), str(graph.tables[tid].get("table_number"))))
+    return {
+        "table_ids": ordered,
+        "seats": seats,
+        "waste": waste,
+        "joints": joints,
+        "fragments": fragments,
+        "template": template,
+        "cost": cost,
+    }
+
+
+def solve_party(
+    graph: TableGraph,
+    free_ids: Set[str],
+    party_size: int,
+    allow_combinations: bool = True,
+    max_tables: int = MAX_COMBINATION_TABLES,
+    time_budget: float = SOLVER_TIME_BUDGET_SECONDS,
+    limit: int = 5
+) -> Dict[str, Any]:
+    """
+    Beste Tischlösungen für eine Gruppe.
+
+    Returns:
+        {"candidates": [...] (nach Kosten sortiert), "complete": bool (Suche nicht vom Budget abgebrochen)}
+    """
+    deadline = time_module.monotonic() + time_budget
+    free = {tid for tid in free_ids if tid in graph.tables}
+    found: Dict[FrozenSet[str], Dict[str, Any]] = {}
+    complete = True
+
+    # 1. Einzeltische
+    for tid in free:
+        if graph.seats(tid) >= party_size:
+            chosen = frozenset([tid])
+            found[chosen] = _candidate(graph, chosen, free, party_size)
+
+    if allow_combinations and max_tables > 1:
+        # 2. Vorlagen, deren Tische alle frei sind
+        for members in graph.templates:
+            if members <= free and len(members) <= max_tables:
+                if sum(graph.seats(tid) for tid in members) >= party_size:
+                    found[members] = _candidate(graph, members, free, party_size)
+
+        # 3. Zusammenhängende Tischgruppen (minimal: kein Tisch verzichtbar beim Aufbau)
+        combinable_free = sorted(tid for tid in free if is_combinable(graph.tables[tid]) and graph.adjacency[tid])
+        group_max_seat: Dict[Tuple[str, str], int] = {}
+        for tid in combinable_free:
+            group = table_group(graph.tables[tid])
+            group_max_seat[group] = max(group_max_seat.get(group, 0), graph.seats(tid))
+
+        seen: Set[FrozenSet[str]] = set()
+        stack: List[Tuple[FrozenSet[str], int]] = [
+            (frozenset([tid]), graph.seats(tid)) for tid in reversed(combinable_free)
+        ]
+        while stack:
+            if time_module.monotonic() > deadline or len(found) >= MAX_CANDIDATES:
+                complete = False
+                break
+            chosen, seats = stack.pop()
+            if len(chosen) >= max_tables:
+                continue
+            group = table_group(graph.tables[next(iter(chosen))])
+            # Obergrenze: selbst mit den größten Tischen der Gruppe nicht erreichbar
+            if seats + (max_tables - len(chosen)) * group_max_seat.get(group, 0) < party_size:
+                continue
+            frontier = set()
+            for tid in chosen:
+                frontier |= graph.adjacency[tid]
+            for nxt in sorted((frontier & free) - chosen):
+                grown = chosen | {nxt}
+                if grown in seen:
+                    continue
+                seen.add(grown)
+                grown_seats = seats + graph.seats(nxt)
+                if grown_seats >= party_size:
+                    if grown not in found:
+                        found[grown] = _candidate(graph, grown, free, party_size)
+                else:
+                    stack.append((grown, grown_seats))
+
+    candidates = sorted(found.values(), key=lambda c: (c["cost"], c["joints"], c["table_ids"]))
+    if not complete:
+        logger.info(f"Tisch-Solver: Zeitbudget erreicht (Gruppe {party_size}, {len(found)} Kandidaten)")
+    return {"candidates": candidates[:limit], "complete": complete}
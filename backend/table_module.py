@@ -6,7 +6,8 @@ FEATURES:
 1. Tisch-Stammdaten mit Bereichen & Subbereichen
 2. Tischkombinationen (zeitgebunden)
 3. Belegungsberechnung
-4. KI-Vorschläge für Tischzuweisungen
+4. KI-Vorschläge für Tischzuweisungen (Kombinations-Solver)
+5. Batch-Zuweisung aller offenen Reservierungen eines Abends
 
 BEREICHE:
 - Restaurant (Subbereiche: saal, wintergarten)
@@ -22,17 +23,24 @@ ADDITIV - Keine Breaking Changes
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, date, timedelta
 from enum import Enum
+import time as time_module
 import uuid
 
+from pymongo import UpdateOne
+
 # Core imports
 from core.database import db
 from core.auth import require_admin, require_manager, get_current_user
 from core.audit import create_audit_log, safe_dict_for_audit
 from core.exceptions import NotFoundException, ValidationException, ConflictException
 
+from table_occupancy import load_day_table_occupancy, time_to_minutes, minutes_to_time
+from table_combination_solver import TableGraph, load_table_graph, solve_party
+from reservation_hooks import on_reservation_changed
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -306,7 +314,14 @@ async def validate_combination_tables(table_ids: List[str]) -> Dict[str, Any]:
         table = await get_table_by_id(tid)
         if not table:
             return {"valid": False, "error": f"Tisch mit ID {tid} nicht gefunden"}
-        
+        tables.append(table)
+    return check_combination_rules(tables)
+
+
+def check_combination_rules(tables: List[dict]) -> Dict[str, Any]:
+    """Kombinationsregeln auf bereits geladene Tische anwenden (ohne DB-Zugriff)"""
+    checked = []
+    for table in tables:
         # Normalisiere active-Feld und prüfe
         table = normalize_table_active_field(table)
         if not table.get("active") and not table.get("is_active"):
@@ -316,7 +331,8 @@ async def validate_combination_tables(table_ids: List[str]) -> Dict[str, Any]:
         # Sonderfall: Tisch 3 (oval/Exot)
         if table.get("table_number") == "3":
             return {"valid": False, "error": "Tisch 3 (Exot/Oval) darf nicht kombiniert werden"}
-        tables.append(table)
+        checked.append(table)
+    tables = checked
     
     if len(tables) < 2:
         return {"valid": False, "error": "Mindestens 2 Tische erforderlich"}
@@ -381,28 +397,13 @@ async def check_combination_conflict(
     return {"conflict": False}
 
 
-async def calculate_table_occupancy(
+def _resolve_time_window(
     date_str: str,
-    time_str: Optional[str] = None,
-    time_slot: Optional[str] = None,
-    area: Optional[str] = None,
-    duration_minutes: int = 110
-) -> List[TableOccupancy]:
-    """
-    Berechne Belegungsstatus für alle Tische.
-    Quelle der Wahrheit: Reservierungen + Kombinationen + Events.
-    KEINE persistente occupancy-Tabelle.
-    
-    HINWEIS: Nutzt build_active_tables_query für active/is_active Kompatibilität.
-    """
-    # Alle aktiven Tische laden - mit Normalisierung für active/is_active
-    base_query = {"area": area} if area else {}
-    table_query = build_active_tables_query(base_query)
-    
-    tables_raw = await db.tables.find(table_query, {"_id": 0}).to_list(500)
-    tables = [normalize_table_active_field(t) for t in tables_raw]
-    
-    # Zeit-Bereich berechnen
+    time_str: Optional[str],
+    time_slot: Optional[str],
+    duration_minutes: int
+) -> Tuple[datetime, int, int]:
+    """Abfragefenster als (start_dt, start_min, end_min) - Minuten seit Mitternacht"""
     if time_str:
         start_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
         end_dt = start_dt + timedelta(minutes=duration_minutes)
@@ -416,13 +417,91 @@ async def calculate_table_occupancy(
         start_dt = datetime.strptime(f"{date_str} 00:00", "%Y-%m-%d %H:%M")
         end_dt = datetime.strptime(f"{date_str} 23:59", "%Y-%m-%d %H:%M")
     
-    # Reservierungen laden
-    res_query = {
+    start_min = start_dt.hour * 60 + start_dt.minute
+    end_min = start_min + int((end_dt - start_dt).total_seconds() // 60)
+    return start_dt, start_min, end_min
+
+
+def _event_block_for(events: List[dict], date_str: str, start_dt: datetime) -> Optional[dict]:
+    """Erstes Event, dessen Cut-Off vor dem Abfragebeginn liegt (gilt für alle Event-Tische)"""
+    for event in events:
+        # Event-Zeit kann in verschiedenen Formaten sein
+        event_start = event.get("start_datetime", event.get("start_time", event.get("time", "")))
+        if not event_start:
+            continue
+        try:
+            # Parse event datetime
+            if isinstance(event_start, str):
+                if "T" in event_start:
+                    event_dt = datetime.fromisoformat(event_start.replace("Z", "+00:00"))
+                else:
+                    event_dt = datetime.strptime(f"{date_str} {event_start}", "%Y-%m-%d %H:%M")
+            else:
+                event_dt = event_start
+            
+            # Event Cut-Off berücksichtigen (Standard: 120 Min)
+            cutoff_minutes = event.get("last_alacarte_reservation_minutes", 
+                                       event.get("last_alacarte_minutes_before", 120))
+            block_start = event_dt - timedelta(minutes=cutoff_minutes)
+            
+            if start_dt >= block_start:
+                event_time_str = event_dt.strftime("%H:%M") if hasattr(event_dt, 'strftime') else str(event_start)
+                return {
+                    "blocked_by": "event",
+                    "event_id": event.get("id"),
+                    "event_name": event.get("title", event.get("name")),
+                    "message": f"Event ab {event_time_str}"
+                }
+        except (ValueError, TypeError):
+            # Wenn Event-Zeit nicht parsbar ist, ignorieren
+            pass
+    return None
+
+
+async def load_day_events(date_str: str) -> List[dict]:
+    """Aktive Events eines Tages (sperren den Event-Bereich ab ihrem Cut-Off)"""
+    event_query = {
         "date": date_str,
-        "status": {"$in": ["neu", "bestaetigt", "angekommen"]},
+        "status": {"$in": ["published", "aktiv"]},
         "archived": False
     }
-    reservations = await db.reservations.find(res_query, {"_id": 0}).to_list(1000)
+    return await db.events.find(event_query, {"_id": 0}).to_list(50)
+
+
+async def load_active_tables(area: Optional[str] = None) -> List[dict]:
+    """Aktive Tische (optional pro Bereich) - mit Normalisierung für active/is_active"""
+    base_query = {"area": area} if area else {}
+    table_query = build_active_tables_query(base_query)
+    tables_raw = await db.tables.find(table_query, {"_id": 0}).to_list(500)
+    return [normalize_table_active_field(t) for t in tables_raw]
+
+
+async def calculate_table_occupancy(
+    date_str: str,
+    time_str: Optional[str] = None,
+    time_slot: Optional[str] = None,
+    area: Optional[str] = None,
+    duration_minutes: int = 110,
+    tables: Optional[List[dict]] = None
+) -> List[TableOccupancy]:
+    """
+    Berechne Belegungsstatus für alle Tische.
+    Quelle der Wahrheit: Reservierungen + Kombinationen + Events.
+    KEINE persistente occupancy-Tabelle.
+    
+    Reservierungen werden einmal in einen DayTableOccupancy-Index geladen,
+    die Prüfung pro Tisch ist dann eine Binärsuche.
+    
+    HINWEIS: Nutzt build_active_tables_query für active/is_active Kompatibilität.
+    """
+    if tables is None:
+        tables = await load_active_tables(area)
+    
+    # Zeit-Bereich berechnen
+    start_dt, start_min, end_min = _resolve_time_window(date_str, time_str, time_slot, duration_minutes)
+    
+    # Reservierungen laden (ein Query, Index pro Tisch)
+    day_index = await load_day_table_occupancy(date_str)
     
     # Aktive Kombinationen laden
     comb_query = {
@@ -431,14 +510,14 @@ async def calculate_table_occupancy(
         "archived": False
     }
     combinations = await db.table_combinations.find(comb_query, {"_id": 0}).to_list(100)
+    combination_by_table: Dict[str, dict] = {}
+    for comb in combinations:
+        for tid in comb.get("table_ids", []):
+            combination_by_table.setdefault(tid, comb)
     
     # Events laden (für Sperrungen)
-    event_query = {
-        "date": date_str,
-        "status": {"$in": ["published", "aktiv"]},
-        "archived": False
-    }
-    events = await db.events.find(event_query, {"_id": 0}).to_list(50)
+    events = await load_day_events(date_str)
+    event_block = _event_block_for(events, date_str, start_dt) if events else None
     
     # Belegung pro Tisch berechnen
     occupancy_list = []
@@ -453,96 +532,54 @@ async def calculate_table_occupancy(
         is_extended = False
         
         # Prüfe Reservierungen für diesen Tisch
-        for res in reservations:
-            if res.get("table_id") == table_id or res.get("table_number") == table_number:
-                # Prüfe zeitliche Überlappung
-                res_start = datetime.strptime(f"{res['date']} {res['time']}", "%Y-%m-%d %H:%M")
-                res_duration = res.get("duration_minutes", 110)
-                res_end = res_start + timedelta(minutes=res_duration)
-                
-                if start_dt < res_end and end_dt > res_start:
-                    res_status = res.get("status")
-                    if res_status == "angekommen":
+        res = day_index.find_conflict(start_min, end_min, table_id, table_number)
+        if res:
+            res_status = res.get("status")
+            if res_status == "angekommen":
+                status = OccupancyStatus.BELEGT
+            elif res_status in ["neu", "bestaetigt"]:
+                status = OccupancyStatus.RESERVIERT
+            res_id = res.get("id")
+            res_data = {
+                "id": res.get("id"),
+                "guest_name": res.get("guest_name"),
+                "party_size": res.get("party_size"),
+                "time": res.get("time"),
+                "status": res.get("status"),
+                "occasion": res.get("occasion"),
+                "allergies": res.get("allergies"),
+                "notes": res.get("notes"),
+                "is_extended": res.get("is_extended", False)
+            }
+            is_extended = res.get("is_extended", False)
+        
+        # Prüfe Kombinationen
+        comb = combination_by_table.get(table_id)
+        if comb:
+            comb_id = comb["id"]
+            # Wenn Kombination eine Reservierung hat, Status übernehmen
+            if comb.get("reservation_id") and not res_id:
+                res_id = comb["reservation_id"]
+                comb_res = day_index.reservations_by_id.get(res_id)
+                if comb_res:
+                    if comb_res.get("status") == "angekommen":
                         status = OccupancyStatus.BELEGT
-                    elif res_status in ["neu", "bestaetigt"]:
+                    else:
                         status = OccupancyStatus.RESERVIERT
-                    res_id = res.get("id")
                     res_data = {
-                        "id": res.get("id"),
-                        "guest_name": res.get("guest_name"),
-                        "party_size": res.get("party_size"),
-                        "time": res.get("time"),
-                        "status": res.get("status"),
-                        "occasion": res.get("occasion"),
-                        "allergies": res.get("allergies"),
-                        "notes": res.get("notes"),
-                        "is_extended": res.get("is_extended", False)
+                        "id": comb_res.get("id"),
+                        "guest_name": comb_res.get("guest_name"),
+                        "party_size": comb_res.get("party_size"),
+                        "time": comb_res.get("time"),
+                        "status": comb_res.get("status"),
+                        "combination_id": comb_id,
+                        "combination_tables": comb.get("table_numbers", [])
                     }
-                    is_extended = res.get("is_extended", False)
-                    break
-        
-        # Prüfe Kombinationen
-        for comb in combinations:
-            if table_id in comb.get("table_ids", []):
-                comb_id = comb["id"]
-                # Wenn Kombination eine Reservierung hat, Status übernehmen
-                if comb.get("reservation_id") and not res_id:
-                    res_id = comb["reservation_id"]
-                    # Reservierung laden
-                    comb_res = next(
-                        (r for r in reservations if r.get("id") == res_id),
-                        None
-                    )
-                    if comb_res:
-                        if comb_res.get("status") == "angekommen":
-                            status = OccupancyStatus.BELEGT
-                        else:
-                            status = OccupancyStatus.RESERVIERT
-                        res_data = {
-                            "id": comb_res.get("id"),
-                            "guest_name": comb_res.get("guest_name"),
-                            "party_size": comb_res.get("party_size"),
-                            "time": comb_res.get("time"),
-                            "status": comb_res.get("status"),
-                            "combination_id": comb_id,
-                            "combination_tables": comb.get("table_numbers", [])
-                        }
-                break
         
         # Prüfe Event-Sperrungen (für Event-Bereich)
-        if table.get("area") == TableArea.EVENT.value:
-            for event in events:
-                # Event-Zeit kann in verschiedenen Formaten sein
-                event_start = event.get("start_datetime", event.get("start_time", event.get("time", "")))
-                if event_start:
-                    try:
-                        # Parse event datetime
-                        if isinstance(event_start, str):
-                            if "T" in event_start:
-                                event_dt = datetime.fromisoformat(event_start.replace("Z", "+00:00"))
-                            else:
-                                event_dt = datetime.strptime(f"{date_str} {event_start}", "%Y-%m-%d %H:%M")
-                        else:
-                            event_dt = event_start
-                        
-                        # Event Cut-Off berücksichtigen (Standard: 120 Min)
-                        cutoff_minutes = event.get("last_alacarte_reservation_minutes", 
-                                                   event.get("last_alacarte_minutes_before", 120))
-                        block_start = event_dt - timedelta(minutes=cutoff_minutes)
-                        
-                        if start_dt >= block_start:
-                            status = OccupancyStatus.GESPERRT
-                            event_time_str = event_dt.strftime("%H:%M") if hasattr(event_dt, 'strftime') else str(event_start)
-                            res_data = {
-                                "blocked_by": "event",
-                                "event_id": event.get("id"),
-                                "event_name": event.get("title", event.get("name")),
-                                "message": f"Event ab {event_time_str}"
-                            }
-                            break
-                    except (ValueError, TypeError):
-                        # Wenn Event-Zeit nicht parsbar ist, ignorieren
-                        pass
+        if event_block and table.get("area") == TableArea.EVENT.value:
+            status = OccupancyStatus.GESPERRT
+            res_data = dict(event_block)
         
         occupancy_list.append(TableOccupancy(
             table_id=table_id,
@@ -557,6 +594,38 @@ async def calculate_table_occupancy(
     return occupancy_list
 
 
+def suggestion_from_candidate(graph: TableGraph, candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """Solver-Kandidat im Format der Tisch-Vorschläge"""
+    tables = [graph.tables[tid] for tid in candidate["table_ids"]]
+    first = tables[0]
+    score = max(100 - candidate["cost"], 0)
+    
+    if len(tables) == 1:
+        return {
+            "type": "single",
+            "table_id": first["id"],
+            "table_number": first["table_number"],
+            "seats": candidate["seats"],
+            "area": first["area"],
+            "sub_area": first.get("sub_area"),
+            "score": score,
+            "message": f"Tisch {first['table_number']} ({candidate['seats']} Plätze)"
+        }
+    
+    numbers = [t["table_number"] for t in tables]
+    return {
+        "type": "combination",
+        "table_ids": [t["id"] for t in tables],
+        "table_numbers": numbers,
+        "seats": candidate["seats"],
+        "area": first["area"],
+        "sub_area": first.get("sub_area"),
+        "template": candidate["template"],
+        "score": score,
+        "message": f"Kombination Tisch {' + '.join(numbers)} ({candidate['seats']} Plätze)"
+    }
+
+
 async def suggest_tables_for_party(
     date_str: str,
     time_str: str,
@@ -572,72 +641,28 @@ async def suggest_tables_for_party(
     """
     suggestions = []
     
-    # Belegung berechnen
-    occupancy = await calculate_table_occupancy(date_str, time_str, area=area)
+    # Tische einmal laden, Belegung auf denselben Dokumenten berechnen
+    tables = await load_active_tables(area)
+    table_docs = {t["id"]: t for t in tables}
+    occupancy = await calculate_table_occupancy(date_str, time_str, area=area, tables=tables)
     free_tables = [o for o in occupancy if o.status == OccupancyStatus.FREI]
     
-    # Alle Tische laden für Details - mit Normalisierung für active/is_active
-    query = build_active_tables_query()
-    tables_raw = await db.tables.find(query, {"_id": 0}).to_list(500)
-    table_docs = {t["id"]: normalize_table_active_field(t) for t in tables_raw}
-    
-    # 1. Einzeltische die passen
-    for occ in free_tables:
-        table = table_docs.get(occ.table_id)
-        if table and table.get("seats_max", 0) >= party_size:
-            # Bewertung: Je näher an party_size, desto besser
-            waste = table["seats_max"] - party_size
-            score = 100 - (waste * 10)  # Weniger Platzverschwendung = höherer Score
-            
-            suggestions.append({
-                "type": "single",
-                "table_id": table["id"],
-                "table_number": table["table_number"],
-                "seats": table["seats_max"],
-                "area": table["area"],
-                "sub_area": table.get("sub_area"),
-                "score": max(score, 0),
-                "message": f"Tisch {table['table_number']} ({table['seats_max']} Plätze)"
-            })
+    # Solver: Einzeltische + Kombinationen aus Nachbarschaft/Vorlagen
+    graph = await load_table_graph(tables)
+    free_ids = {o.table_id for o in free_tables}
+    fits_single = any(
+        table_docs[tid].get("seats_max", 0) >= party_size for tid in free_ids if tid in table_docs
+    )
+    solution = solve_party(
+        graph,
+        free_ids,
+        party_size,
+        allow_combinations=party_size > 4 or not fits_single,
+        limit=5
+    )
     
-    # 2. Kombinationsvorschläge
-    if party_size > 4:  # Nur für größere Gruppen
-        # Gruppiere freie Tische nach Bereich+Subbereich
-        grouped = {}
-        for occ in free_tables:
-            table = table_docs.get(occ.table_id)
-            if table and table.get("combinable", True) and table.get("table_number") != "3":
-                key = f"{table['area']}_{table.get('sub_area', '')}"
-                if key not in grouped:
-                    grouped[key] = []
-                grouped[key].append(table)
-        
-        # Finde Kombinationen
-        for key, tables in grouped.items():
-            if len(tables) < 2:
-                continue
-            
-            # Sortiere nach Plätzen
-            tables.sort(key=lambda x: x["seats_max"], reverse=True)
-            
-            # Versuche 2er-Kombinationen
-            for i, t1 in enumerate(tables):
-                for t2 in tables[i+1:]:
-                    combined_seats = t1["seats_max"] + t2["seats_max"]
-                    if combined_seats >= party_size:
-                        waste = combined_seats - party_size
-                        score = 80 - (waste * 5)  # Kombinationen leicht niedriger bewertet
-                        
-                        suggestions.append({
-                            "type": "combination",
-                            "table_ids": [t1["id"], t2["id"]],
-                            "table_numbers": [t1["table_number"], t2["table_number"]],
-                            "seats": combined_seats,
-                            "area": t1["area"],
-                            "sub_area": t1.get("sub_area"),
-                            "score": max(score, 0),
-                            "message": f"Kombination Tisch {t1['table_number']} + {t2['table_number']} ({combined_seats} Plätze)"
-                        })
+    for candidate in solution["candidates"]:
+        suggestions.append(suggestion_from_candidate(graph, candidate))
     
     # Sortiere nach Score (höchster zuerst)
     suggestions.sort(key=lambda x: x["score"], reverse=True)
@@ -961,15 +986,14 @@ async def assign_reservation_to_combination(
     )
     
     # Aktualisiere auch Reservierung
-    await db.reservations.update_one(
-        {"id": reservation_id},
-        {"$set": {
-            "combination_id": combination_id,
-            "table_ids": comb["table_ids"],
-            "table_numbers": comb["table_numbers"],
-            "updated_at": now_iso()
-        }}
-    )
+    res_update = {
+        "combination_id": combination_id,
+        "table_ids": comb["table_ids"],
+        "table_numbers": comb["table_numbers"],
+        "updated_at": now_iso()
+    }
+    await db.reservations.update_one({"id": reservation_id}, {"$set": res_update})
+    await on_reservation_changed(res, {**res, **res_update})
     
     await create_audit_log(current_user, "table_combination", combination_id, "assign_reservation")
     
@@ -999,10 +1023,14 @@ async def dissolve_combination(
     
     # Entferne Kombinationsreferenz aus Reservierung
     if comb.get("reservation_id"):
-        await db.reservations.update_one(
+        res_before = await db.reservations.find_one_and_update(
             {"id": comb["reservation_id"]},
-            {"$unset": {"combination_id": "", "table_ids": "", "table_numbers": ""}}
+            {"$unset": {"combination_id": "", "table_ids": "", "table_numbers": ""}},
+            projection={"_id": 0}
         )
+        if res_before:
+            res_after = {k: v for k, v in res_before.items() if k not in ("combination_id", "table_ids", "table_numbers")}
+            await on_reservation_changed(res_before, res_after)
     
     await create_audit_log(current_user, "table_combination", combination_id, "dissolve", before)
     
@@ -1096,6 +1124,7 @@ async def assign_table_to_reservation(
     )
     
     updated = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    await on_reservation_changed(res, updated)
     await create_audit_log(current_user, "reservation", reservation_id, "assign_table", before, safe_dict_for_audit(updated))
     
     return {
@@ -1106,6 +1135,222 @@ async def assign_table_to_reservation(
     }
 
 
+# ============== BATCH-ZUWEISUNG (ABEND) ==============
+
+BATCH_TIME_BUDGET_SECONDS = 2.0
+UNASSIGNED_STATUSES = ["neu", "bestaetigt"]
+
+
+def _is_unassigned(res: dict) -> bool:
+    return not (res.get("table_id") or res.get("table_number") or res.get("table_ids") or res.get("combination_id"))
+
+
+async def auto_assign_reservations(
+    date_str: str,
+    from_time: str = "00:00",
+    to_time: str = "23:59",
+    area: Optional[str] = None,
+    dry_run: bool = True,
+    actor: Optional[dict] = None
+) -> Dict[str, Any]:
+    """
+    Weist alle Reservierungen ohne Tisch im Zeitfenster auf einmal zu.
+    
+    - Größte Gruppen zuerst (schwerste Platzierung), dann nach Uhrzeit
+    - Jede Zuweisung wird sofort im Tages-Index eingetragen (keine Doppelbelegung im Lauf)
+    - Kombinationen werden als table_combinations-Dokument mit reservation_id angelegt
+    - dry_run: nur Plan zurückgeben, nichts schreiben
+    """
+    started = time_module.monotonic()
+    deadline = started + BATCH_TIME_BUDGET_SECONDS
+    
+    tables = await load_active_tables(area)
+    graph = await load_table_graph(tables)
+    day_index = await load_day_table_occupancy(date_str)
+    events = await load_day_events(date_str)
+    
+    start_window = time_to_minutes(from_time)
+    end_window = time_to_minutes(to_time)
+    if start_window is None or end_window is None:
+        raise ValidationException("Ungültiges Zeitformat (HH:MM erwartet)")
+    
+    pending = [
+        res for res in day_index.reservations_by_id.values()
+        if res.get("status") in UNASSIGNED_STATUSES
+        and _is_unassigned(res)
+        and time_to_minutes(res.get("time")) is not None
+        and start_window <= time_to_minutes(res.get("time")) <= end_window
+    ]
+    pending.sort(key=lambda r: (-(r.get("party_size") or 0), r.get("time")))
+    
+    assigned = []
+    unassigned = []
+    complete = True
+    
+    for res in pending:
+        party_size = res.get("party_size") or 1
+        res_start = time_to_minutes(res["time"])
+        res_end = day_index.reservation_end(res)
+        
+        remaining = deadline - time_module.monotonic()
+        if remaining <= 0:
+            complete = False
+            unassigned.append({"reservation_id": res["id"], "reason": "Zeitbudget erschöpft"})
+            continue
+        
+        free_tables = day_index.free_tables(tables, res_start, res_end)
+        # Event-Sperre wie in calculate_table_occupancy: Event-Tische ab Cut-Off nicht vergeben
+        res_start_dt = datetime.strptime(date_str, "%Y-%m-%d") + timedelta(minutes=res_start)
+        if events and _event_block_for(events, date_str, res_start_dt):
+            free_tables = [t for t in free_tables if t.get("area") != TableArea.EVENT.value]
+        free_ids = {t["id"] for t in free_tables}
+        solution = solve_party(
+            graph,
+            free_ids,
+            party_size,
+            time_budget=min(remaining, 0.25),
+            limit=1
+        )
+        complete = complete and solution["complete"]
+        
+        if not solution["candidates"]:
+            unassigned.append({
+                "reservation_id": res["id"],
+                "guest_name": res.get("guest_name"),
+                "party_size": party_size,
+                "time": res.get("time"),
+                "reason": "Keine passenden freien Tische"
+            })
+            continue
+        
+        suggestion = suggestion_from_candidate(graph, solution["candidates"][0])
+        table_ids = suggestion.get("table_ids") or [suggestion["table_id"]]
+        table_numbers = suggestion.get("table_numbers") or [suggestion["table_number"]]
+        
+        # Kombinationen nach denselben Regeln wie manuell angelegte prüfen
+        if len(table_ids) > 1:
+            rules = check_combination_rules([graph.tables[tid] for tid in table_ids])
+            if not rules["valid"]:
+                unassigned.append({
+                    "reservation_id": res["id"],
+                    "guest_name": res.get("guest_name"),
+                    "party_size": party_size,
+                    "time": res.get("time"),
+                    "reason": rules["error"]
+                })
+                continue
+        
+        # Im Index eintragen, damit spätere Gruppen die Tische nicht erneut erhalten
+        day_index.add({**res, "table_ids": table_ids, "table_numbers": table_numbers})
+        
+        assigned.append({
+            "reservation_id": res["id"],
+            "guest_name": res.get("guest_name"),
+            "party_size": party_size,
+            "time": res.get("time"),
+            "time_slot": f"{res['time']}-{minutes_to_time(res_end)}",
+            **suggestion
+        })
+    
+    if not dry_run and assigned:
+        combination_docs = []
+        reservation_updates = []
+        changes = []
+        now = now_iso()
+        
+        for item in assigned:
+            if item["type"] == "single":
+                fields = {"table_id": item["table_id"], "table_number": item["table_number"], "updated_at": now}
+                reservation_updates.append(UpdateOne({"id": item["reservation_id"]}, {"$set": fields}))
+                changes.append((item["reservation_id"], fields))
+                continue
+            
+            doc = create_entity({
+                "name": f"Kombination {' + '.join(item['table_numbers'])}",
+                "date": date_str,
+                "time_slot": item["time_slot"],
+                "table_ids": item["table_ids"],
+                "table_numbers": item["table_numbers"],
+                "total_seats": item["seats"],
+                "area": item["area"],
+                "sub_area": item.get("sub_area"),
+                "reservation_id": item["reservation_id"],
+                "template_combo_id": item.get("template"),
+                "active": True,
+                "source": "auto_assign",
+                "created_by": actor.get("id") if actor else None
+            })
+            combination_docs.append(doc)
+            item["combination_id"] = doc["id"]
+            fields = {
+                "combination_id": doc["id"],
+                "table_ids": item["table_ids"],
+                "table_numbers": item["table_numbers"],
+                "updated_at": now
+            }
+            reservation_updates.append(UpdateOne({"id": item["reservation_id"]}, {"$set": fields}))
+            changes.append((item["reservation_id"], fields))
+        
+        if combination_docs:
+            await db.table_combinations.insert_many(combination_docs)
+        if reservation_updates:
+            await db.reservations.bulk_write(reservation_updates, ordered=False)
+        for reservation_id, fields in changes:
+            before = day_index.reservations_by_id.get(reservation_id)
+            if before:
+                await on_reservation_changed(before, {**before, **fields})
+        
+        if actor:
+            await create_audit_log(
+                actor, "reservation", f"auto_assign_{date_str}", "auto_assign_tables", None,
+                {"date": date_str, "assigned": len(assigned), "unassigned": len(unassigned)}
+            )
+    
+    return {
+        "date": date_str,
+        "from_time": from_time,
+        "to_time": to_time,
+        "dry_run": dry_run,
+        "assigned": assigned,
+        "unassigned": unassigned,
+        "stats": {
+            "pending": len(pending),
+            "assigned": len(assigned),
+            "unassigned": len(unassigned),
+            "search_complete": complete,
+            "elapsed_ms": int((time_module.monotonic() - started) * 1000)
+        }
+    }
+
+
+@table_router.post("/auto-assign")
+async def auto_assign_tables(
+    date_str: str = Query(..., alias="date"),
+    from_time: str = Query("00:00"),
+    to_time: str = Query("23:59"),
+    area: Optional[TableArea] = None,
+    dry_run: bool = Query(True, description="Nur Vorschau, keine Zuweisung"),
+    current_user: dict = Depends(require_manager)
+):
+    """
+    Batch-Zuweisung: alle Reservierungen ohne Tisch eines Abends auf einmal.
+    dry_run=true (Standard) liefert nur den Plan.
+    """
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        raise ValidationException("Ungültiges Datumsformat (YYYY-MM-DD)")
+    
+    return await auto_assign_reservations(
+        date_str,
+        from_time=from_time,
+        to_time=to_time,
+        area=area.value if area else None,
+        dry_run=dry_run,
+        actor=current_user
+    )
+
+
 # ============== EXPORT ==============
 __all__ = [
     "table_router",
@@ -1115,5 +1360,6 @@ __all__ = [
     "OccupancyStatus",
     "calculate_table_occupancy",
     "suggest_tables_for_party",
+    "auto_assign_reservations",
     "validate_combination_tables"
 ]
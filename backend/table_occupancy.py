@@ -0,0 +1,187 @@
+"""
+GastroCore Table Occupancy Index
+================================================================================
+Tagesbezogener Belegungs-Index für Tische.
+
+- Reservierungszeiten werden einmal pro Request in Minuten-Offsets umgerechnet
+- Pro Tisch sortierte Intervalle [start, end) mit Präfix-Maximum der Enden
+- "Ist Tisch X in [t, t+d) frei?" in O(log n) per Binärsuche
+
+Genutzt von calculate_table_occupancy / suggest_tables_for_party (table_module)
+und check_table_conflict / get_available_tables_for_slot (reservation_config_module).
+"""
+
+from bisect import bisect_left
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+import logging
+
+from core.database import db
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+OCCUPYING_STATUSES = ["neu", "bestaetigt", "angekommen"]
+DEFAULT_OCCUPANCY_DURATION = 110  # Minuten
+
+
+def time_to_minutes(time_str: Optional[str]) -> Optional[int]:
+    """HH:MM -> Minuten seit Mitternacht (None bei ungültigem Wert)"""
+    if not time_str or not isinstance(time_str, str):
+        return None
+    try:
+        h, m = time_str.strip()[:5].split(":")
+        return int(h) * 60 + int(m)
+    except (ValueError, TypeError):
+        return None
+
+
+def minutes_to_time(minutes: int) -> str:
+    """Minuten seit Mitternacht -> HH:MM (über Mitternacht hinaus modulo 24h)"""
+    minutes = minutes % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class IntervalIndex:
+    """
+    Sortierte Intervalle [start, end) eines Tisches.
+
+    starts:      Startzeiten aufsteigend (Binärsuche)
+    max_end_idx: Index des Intervalls mit dem größten Ende unter items[:k+1]
+
+    Ein Intervall überlappt [s, e) genau dann, wenn start < e und end > s.
+    Unter allen Intervallen mit start < e hat das mit dem größten Ende die
+    beste Chance auf end > s - ein Lookup genügt.
+    """
+
+    __slots__ = ("_items", "_starts", "_max_end_idx")
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Any]]):
+        self._items = sorted(intervals, key=lambda x: (x[0], x[1]))
+        self._starts = [item[0] for item in self._items]
+        self._max_end_idx = []
+        best = -1
+        for i, item in enumerate(self._items):
+            if best < 0 or item[1] > self._items[best][1]:
+                best = i
+            self._max_end_idx.append(best)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def find_overlap(self, start: int, end: int) -> Optional[Any]:
+        """Payload eines Intervalls, das [start, end) überlappt - sonst None"""
+        k = bisect_left(self._starts, end)
+        if k == 0:
+            return None
+        candidate = self._items[self._max_end_idx[k - 1]]
+        if candidate[1] > start:
+            return candidate[2]
+        return None
+
+    def is_free(self, start: int, end: int) -> bool:
+        return self.find_overlap(start, end) is None
+
+
+class DayTableOccupancy:
+    """
+    Belegungs-Index eines Tages.
+
+    Reservierungen werden über table_id UND table_number zugeordnet
+    (Altdaten haben teils nur eines von beiden), Kombinationen über
+    table_ids / table_numbers.
+    """
+
+    def __init__(self, date_str: str, reservations: List[dict], default_duration: int = DEFAULT_OCCUPANCY_DURATION):
+        self.date = date_str
+        self.default_duration = default_duration
+        self.reservations_by_id: Dict[str, dict] = {}
+
+        self._intervals_by_table_id: Dict[str, List[Tuple[int, int, dict]]] = {}
+        self._intervals_by_table_number: Dict[str, List[Tuple[int, int, dict]]] = {}
+        for res in reservations:
+            self._collect(res)
+
+        self._by_table_id = {k: IntervalIndex(v) for k, v in self._intervals_by_table_id.items()}
+        self._by_table_number = {k: IntervalIndex(v) for k, v in self._intervals_by_table_number.items()}
+
+    def _collect(self, res: dict) -> Tuple[set, set]:
+        """Intervall einer Reservierung den Tischen zuordnen (Einzeltisch + Kombinations-Tische)"""
+        if res.get("id"):
+            self.reservations_by_id[res["id"]] = res
+        start = time_to_minutes(res.get("time"))
+        if start is None:
+            return set(), set()
+        duration = res.get("duration_minutes") or self.default_duration
+        interval = (start, start + duration, res)
+
+        table_ids = set(res.get("table_ids") or [])
+        if res.get("table_id"):
+            table_ids.add(res["table_id"])
+        table_numbers = {str(n) for n in (res.get("table_numbers") or [])}
+        if res.get("table_number"):
+            table_numbers.add(str(res["table_number"]))
+
+        for tid in table_ids:
+            self._intervals_by_table_id.setdefault(tid, []).append(interval)
+        for number in table_numbers:
+            self._intervals_by_table_number.setdefault(number, []).append(interval)
+        return table_ids, table_numbers
+
+    def add(self, reservation: dict):
+        """Reservierung nachträglich eintragen (z.B. Zuweisungen innerhalb eines Batch-Laufs)"""
+        table_ids, table_numbers = self._collect(reservation)
+        for tid in table_ids:
+            self._by_table_id[tid] = IntervalIndex(self._intervals_by_table_id[tid])
+        for number in table_numbers:
+            self._by_table_number[number] = IntervalIndex(self._intervals_by_table_number[number])
+
+    def find_conflict(
+        self,
+        start: int,
+        end: int,
+        table_id: Optional[str] = None,
+        table_number: Optional[str] = None
+    ) -> Optional[dict]:
+        """Reservierung, die den Tisch in [start, end) belegt - sonst None"""
+        if table_id and table_id in self._by_table_id:
+            hit = self._by_table_id[table_id].find_overlap(start, end)
+            if hit is not None:
+                return hit
+        if table_number is not None and str(table_number) in self._by_table_number:
+            return self._by_table_number[str(table_number)].find_overlap(start, end)
+        return None
+
+    def free_tables(self, tables: List[dict], start: int, end: int) -> List[dict]:
+        """Alle Tische ohne Überlappung in [start, end)"""
+        return [
+            t for t in tables
+            if self.find_conflict(start, end, t.get("id"), t.get("table_number")) is None
+        ]
+
+    def reservation_end(self, reservation: dict) -> Optional[int]:
+        start = time_to_minutes(reservation.get("time"))
+        if start is None:
+            return None
+        return start + (reservation.get("duration_minutes") or self.default_duration)
+
+
+async def load_day_table_occupancy(
+    date_str: str,
+    default_duration: int = DEFAULT_OCCUPANCY_DURATION,
+    table_number: Optional[str] = None,
+    exclude_reservation_id: Optional[str] = None
+) -> DayTableOccupancy:
+    """Ein Query für alle belegenden Reservierungen des Tages (optional auf einen Tisch eingeschränkt)"""
+    query = {
+        "date": date_str,
+        "status": {"$in": OCCUPYING_STATUSES},
+        "archived": False
+    }
+    if table_number:
+        query["$or"] = [{"table_number": table_number}, {"table_numbers": table_number}]
+    if exclude_reservation_id:
+        query["id"] = {"$ne": exclude_reservation_id}
+
+    reservations = await db.reservations.find(query, {"_id": 0}).to_list(1000)
+    return DayTableOccupancy(date_str, reservations, default_duration)
@@ -30,7 +30,10 @@ from core.audit import create_audit_log, safe_dict_for_audit, SYSTEM_ACTOR
 from core.exceptions import NotFoundException, ValidationException
 
 # Email service
-from email_service import send_email_with_attachments
+from email_service import send_email_with_attachments, register_attachment_loader, register_outbox_hook, AttachmentUnavailable
+
+# Stundenkonto (Soll/Ist je Mitarbeiter und Tag)
+from hours_ledger import read_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +43,7 @@ class ExportJobStatus(str, Enum):
     PENDING = "pending"
     GENERATING = "generating"
     READY = "ready"
+    QUEUED = "queued"  # in der E-Mail-Outbox, Versand ausstehend
     SENT = "sent"
     FAILED = "failed"
 
@@ -355,11 +359,8 @@ async def generate_hours_csv(start_date: date, end_date: date) -> str:
     # Get all active staff members
     staff = await db.staff_members.find({"archived": False}, {"_id": 0}).to_list(500)
     
-    # Get all shifts in period
-    shifts = await db.shifts.find({
-        "shift_date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()},
-        "archived": False
-    }, {"_id": 0}).to_list(5000)
+    # Stundenkonto der Periode: ein Range-Query (geplant aus Schichten, Ist aus time_sessions)
+    ledger = await read_ledger(start_date, end_date)
     
     # Calculate hours per staff member
     weeks_in_period = get_weeks_in_period(start_date, end_date)
@@ -373,15 +374,15 @@ async def generate_hours_csv(start_date: date, end_date: date) -> str:
     ])
     
     for member in staff:
-        member_shifts = [s for s in shifts if s.get("staff_member_id") == member.get("id")]
-        planned_hours = sum(s.get("hours", 0) for s in member_shifts)
+        member_ledger = ledger.get(member.get("id"), {})
+        planned_hours = member_ledger.get("planned_hours", 0)
         
         # Calculate target hours for period
         weekly_hours = member.get("weekly_hours", 0)
         target_hours = round(weekly_hours * weeks_in_period, 2)
         
-        # For now, ist = planned (no time entries yet)
-        ist_hours = planned_hours
+        # Ist = Netto-Arbeitszeit aus abgeschlossenen time_sessions
+        ist_hours = member_ledger.get("actual_hours", 0)
         
         writer.writerow([
             member.get("id"),
@@ -446,10 +447,7 @@ async def generate_hours_pdf(start_date: date, end_date: date, year: int, month:
     
     # Get data
     staff = await db.staff_members.find({"archived": False}, {"_id": 0}).to_list(500)
-    shifts = await db.shifts.find({
-        "shift_date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()},
-        "archived": False
-    }, {"_id": 0}).to_list(5000)
+    ledger = await read_ledger(start_date, end_date)
     
     weeks_in_period = get_weeks_in_period(start_date, end_date)
     
@@ -481,11 +479,11 @@ async def generate_hours_pdf(start_date: date, end_date: date, year: int, month:
     total_ist = 0
     
     for member in staff:
-        member_shifts = [s for s in shifts if s.get("staff_member_id") == member.get("id")]
-        planned_hours = sum(s.get("hours", 0) for s in member_shifts)
+        member_ledger = ledger.get(member.get("id"), {})
+        planned_hours = member_ledger.get("planned_hours", 0)
         weekly_hours = member.get("weekly_hours", 0)
         target_hours = round(weekly_hours * weeks_in_period, 2)
-        ist_hours = planned_hours  # For now
+        ist_hours = member_ledger.get("actual_hours", 0)
         diff = round(ist_hours - target_hours, 2)
         
         total_target += target_hours
@@ -602,8 +600,75 @@ async def send_to_taxoffice(
     body = data.custom_message or body_templates.get(data.language, body_templates["de"])
     body = body.replace("{period}", period_str)
     
-    # Prepare attachments
+    # Nur ein Versand je Job: READY -> QUEUED vor dem Einreihen (sent / failed setzt der Outbox-Hook)
+    claimed = await db.export_jobs.update_one(
+        {"id": job_id, "status": ExportJobStatus.READY.value},
+        {"$set": {
+            "status": ExportJobStatus.QUEUED.value,
+            "queued_at": now_iso(),
+            "sent_to": recipients,
+            "updated_at": now_iso()
+        }}
+    )
+    if claimed.modified_count == 0:
+        raise ValidationException("Export-Job ist nicht bereit zum Versand")
+    
+    message_log = create_entity({
+        "type": "taxoffice_export",
+        "recipient": ", ".join(recipients),
+        "subject": subject,
+        "status": "queued",
+        "job_id": job_id,
+        "files": [f.get("name") for f in job.get("files", [])]
+    })
+    await db.message_logs.insert_one(dict(message_log))
+    
+    # Anhänge nicht in die Outbox kopieren - der Worker lädt sie beim Versand aus dem Job
+    try:
+        outbox_id = await send_email_with_attachments(
+            to_emails=recipients,
+            cc_emails=settings.get("cc_emails", []),
+            subject=subject,
+            body=body,
+            attachment_ref={"type": "export_job", "id": job_id},
+            meta={"job_id": job_id, "message_log_id": message_log["id"]}
+        )
+        error = None if outbox_id else "SMTP nicht konfiguriert"
+    except Exception as e:
+        logger.error(f"Failed to send export {job_id}: {e}")
+        outbox_id = None
+        error = str(e)
+    
+    if not outbox_id:
+        await db.export_jobs.update_one(
+            {"id": job_id, "status": ExportJobStatus.QUEUED.value},
+            {"$set": {"status": ExportJobStatus.READY.value, "updated_at": now_iso()}}
+        )
+        # Log failed attempt
+        await db.message_logs.update_one(
+            {"id": message_log["id"]},
+            {"$set": {"status": "failed", "error": error, "updated_at": now_iso()}}
+        )
+        raise HTTPException(status_code=500, detail=f"Versand fehlgeschlagen: {error}")
+    
+    await db.message_logs.update_one({"id": message_log["id"]}, {"$set": {"outbox_id": outbox_id}})
+    await db.export_jobs.update_one({"id": job_id}, {"$set": {"outbox_id": outbox_id}})
+    
+    # Audit log
+    await create_audit_log(
+        user, "export_job", job_id, "sent_to_taxoffice",
+        {"status": "ready"}, {"status": "queued", "sent_to": recipients}
+    )
+    
+    return {"message": "Export zum Versand eingereiht", "success": True, "sent_to": recipients, "outbox_id": outbox_id}
+
+
+async def export_job_attachments(ref: dict) -> List[dict]:
+    """Anhang-Loader der E-Mail-Outbox: Dateien eines Export-Jobs"""
     import base64
+    job = await db.export_jobs.find_one({"id": ref.get("id"), "archived": False}, {"_id": 0, "files": 1})
+    if not job:
+        raise AttachmentUnavailable(f"Export-Job {ref.get('id')} nicht gefunden")
     attachments = []
     for file_info in job.get("files", []):
         if file_info.get("type") == "csv":
@@ -618,62 +683,36 @@ async def send_to_taxoffice(
                 "content": base64.b64decode(file_info.get("content_base64", "")),
                 "content_type": "application/pdf"
             })
-    
-    # Send email
-    try:
-        await send_email_with_attachments(
-            to_emails=recipients,
-            cc_emails=settings.get("cc_emails", []),
-            subject=subject,
-            body=body,
-            attachments=attachments
-        )
-        
-        # Update job status
+    return attachments
+
+
+async def on_export_mail_outcome(item: dict, status: str, error: Optional[str]):
+    """Outbox-Hook: Job und Nachrichten-Log auf das tatsächliche Versandergebnis setzen"""
+    meta = item.get("meta") or {}
+    job_id = meta.get("job_id")
+    if status == "sent":
+        job_update = {"status": ExportJobStatus.SENT.value, "sent_at": now_iso(), "error": None}
+    else:
+        job_update = {"status": ExportJobStatus.FAILED.value, "error": f"Versand fehlgeschlagen: {error}"}
+    if job_id:
         await db.export_jobs.update_one(
-            {"id": job_id},
-            {"$set": {
-                "status": ExportJobStatus.SENT.value,
-                "sent_at": now_iso(),
-                "sent_to": recipients,
-                "updated_at": now_iso()
-            }}
+            {"id": job_id, "status": ExportJobStatus.QUEUED.value},
+            {"$set": {**job_update, "updated_at": now_iso()}}
         )
-        
-        # Create message log
-        message_log = create_entity({
-            "type": "taxoffice_export",
-            "recipient": ", ".join(recipients),
-            "subject": subject,
-            "status": "sent",
-            "job_id": job_id,
-            "files": [f.get("name") for f in job.get("files", [])]
-        })
-        await db.message_logs.insert_one(message_log)
-        
-        # Audit log
+    if meta.get("message_log_id"):
+        await db.message_logs.update_one(
+            {"id": meta["message_log_id"]},
+            {"$set": {"status": status, "error": error, "updated_at": now_iso()}}
+        )
+    if job_id:
         await create_audit_log(
-            user, "export_job", job_id, "sent_to_taxoffice",
-            {"status": "ready"}, {"status": "sent", "sent_to": recipients}
+            SYSTEM_ACTOR, "export_job", job_id, f"taxoffice_mail_{status}",
+            {"status": ExportJobStatus.QUEUED.value}, {"status": job_update["status"], "error": error}
         )
-        
-        return {"message": "Export erfolgreich versendet", "success": True, "sent_to": recipients}
-        
-    except Exception as e:
-        logger.error(f"Failed to send export {job_id}: {e}")
-        
-        # Log failed attempt
-        message_log = create_entity({
-            "type": "taxoffice_export",
-            "recipient": ", ".join(recipients),
-            "subject": subject,
-            "status": "failed",
-            "error": str(e),
-            "job_id": job_id
-        })
-        await db.message_logs.insert_one(message_log)
-        
-        raise HTTPException(status_code=500, detail=f"Versand fehlgeschlagen: {str(e)}")
+
+
+register_attachment_loader("export_job", export_job_attachments)
+register_outbox_hook("taxoffice_export", on_export_mail_outcome)
 
 
 # ============== STAFF REGISTRATION PACKAGE ==============
@@ -26,9 +26,25 @@ from core.database import db, client
 from core.auth import get_current_user, require_manager, require_admin
 from core.audit import create_audit_log, safe_dict_for_audit
 from core.exceptions import NotFoundException, ValidationException, ConflictException
+from core.indexes import register_indexes, index
+from hours_ledger import refresh_ledger_for_session
 
 logger = logging.getLogger(__name__)
 
+# ============== INDEXES ==============
+# Max 1 time_session pro Mitarbeiter & Tag - der Index erzwingt das auch DB-seitig
+register_indexes(
+    "time_sessions",
+    index(("id", 1), unique=True),
+    index(("staff_member_id", 1), ("day_key", 1), unique=True),
+    index(("day_key", 1), ("state", 1)),
+)
+register_indexes(
+    "time_events",
+    index(("idempotency_key", 1)),
+    index(("session_id", 1), ("timestamp_utc", 1)),
+)
+
 # ============== CONSTANTS ==============
 BERLIN_TZ = pytz.timezone("Europe/Berlin")
 SHIFT_LINK_WINDOW_BEFORE_MINUTES = 60  # Clock-in bis 60 min vor Schichtbeginn
@@ -585,6 +601,7 @@ async def clock_out(
     }
     
     await db.time_sessions.update_one({"id": session["id"]}, {"$set": update_data})
+    await refresh_ledger_for_session(session)
     
     # Create event
     await create_time_event(
@@ -1013,6 +1030,7 @@ async def correct_time_session(
         update_data["breaks"] = [b.model_dump() for b in data.breaks]
     
     await db.time_sessions.update_one({"id": session_id}, {"$set": update_data})
+    await refresh_ledger_for_session(session)
     
     # Create correction event
     await create_time_event(
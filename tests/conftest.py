@@ -0,0 +1,17 @@
+"""
+Unit-Tests für die reinen Python-Kerne im Backend (ohne laufenden Server).
+
+Die Backend-Module importieren core.* relativ zum backend/-Verzeichnis;
+core.config verlangt MONGO_URL und JWT_SECRET - für die Tests reichen
+Platzhalter, der Motor-Client verbindet erst beim ersten Query.
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "test-secret-not-for-production")
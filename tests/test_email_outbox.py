@@ -0,0 +1,182 @@
+"""
+E-Mail-Outbox: Retry-Regeln, SMTP-Pool, Worker-Ergebnis (user-012)
+"""
+
+import asyncio
+import smtplib
+
+import pytest
+
+import email_service
+from core import database
+from email_service import (
+    EMAIL_RETRY_MAX_SECONDS,
+    AttachmentUnavailable,
+    EmailOutbox,
+    OutboxStatus,
+    SMTPConnectionPool,
+    _is_permanent_error,
+    retry_delay_seconds,
+)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.updates = []
+        self.inserted = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+    async def insert_one(self, doc):
+        self.inserted.append(doc)
+
+
+class FakeDB:
+    def __init__(self):
+        self.email_outbox = FakeCollection()
+        self.email_logs = FakeCollection()
+
+
+class FakeSMTP:
+    def __init__(self, fail_with=None):
+        self.fail_with = fail_with
+        self.sent = []
+        self.closed = False
+
+    def sendmail(self, from_addr, recipients, message):
+        if self.fail_with:
+            raise self.fail_with
+        self.sent.append((from_addr, recipients, message))
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(database, "db", db)
+    return db
+
+
+def outbox_item(**extra) -> dict:
+    return {
+        "id": "m1",
+        "recipients": ["gast@example.de"],
+        "subject": "Bestätigung",
+        "message": "raw-mime",
+        "template_type": "test_outcome",
+        "provider": "smtp.example.de",
+        "attempts": 1,
+        **extra,
+    }
+
+
+def test_retry_delay_is_exponential_and_capped():
+    assert [retry_delay_seconds(n) for n in (1, 2, 3)] == [30, 60, 120]
+    assert retry_delay_seconds(20) == EMAIL_RETRY_MAX_SECONDS
+
+
+def test_permanent_error_classification():
+    assert _is_permanent_error(AttachmentUnavailable("weg"))
+    assert _is_permanent_error(smtplib.SMTPRecipientsRefused({}))
+    assert _is_permanent_error(smtplib.SMTPDataError(550, b"mailbox unavailable"))
+    assert not _is_permanent_error(smtplib.SMTPDataError(552, b"mailbox full"))
+    assert not _is_permanent_error(smtplib.SMTPAuthenticationError(535, b"auth"))
+    assert not _is_permanent_error(smtplib.SMTPServerDisconnected("weg"))
+
+
+def test_pool_reuses_idle_connection():
+    pool = SMTPConnectionPool(1)
+    server = FakeSMTP()
+    pool._connect = lambda: server
+
+    pool.send("a@x.de", ["b@x.de"], "m1")
+    pool.send("a@x.de", ["b@x.de"], "m2")
+
+    assert [m for _, _, m in server.sent] == ["m1", "m2"]
+    assert pool.reuses == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_pool_retries_once_and_closes_failed_reconnect():
+    pool = SMTPConnectionPool(1)
+    broken = FakeSMTP(fail_with=smtplib.SMTPServerDisconnected("weg"))
+    still_broken = FakeSMTP(fail_with=smtplib.SMTPDataError(451, b"try later"))
+    connections = iter([broken, still_broken])
+    pool._connect = lambda: next(connections)
+
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send("a@x.de", ["b@x.de"], "m1")
+
+    assert broken.closed and still_broken.closed
+    assert pool.stats()["idle"] == 0
+
+
+def test_process_success_unsets_message_and_calls_hook(fake_db, monkeypatch):
+    delivered, outcomes = [], []
+
+    async def fake_deliver(recipients, message):
+        delivered.append(message)
+
+    async def hook(item, status, error):
+        outcomes.append((item["id"], status, error))
+
+    monkeypatch.setattr(email_service, "deliver_message", fake_deliver)
+    monkeypatch.setitem(email_service._outcome_hooks, "test_outcome", hook)
+
+    outbox = EmailOutbox(workers=1)
+    asyncio.run(outbox._process(outbox_item()))
+
+    _, update = fake_db.email_outbox.updates[-1]
+    assert delivered == ["raw-mime"]
+    assert update["$set"]["status"] == OutboxStatus.SENT
+    assert update["$unset"] == {"message": "", "content": ""}
+    assert outcomes == [("m1", OutboxStatus.SENT, None)]
+
+
+def test_process_transient_error_reschedules_without_hook(fake_db, monkeypatch):
+    outcomes = []
+
+    async def fake_deliver(recipients, message):
+        raise smtplib.SMTPServerDisconnected("weg")
+
+    async def hook(item, status, error):
+        outcomes.append(status)
+
+    monkeypatch.setattr(email_service, "deliver_message", fake_deliver)
+    monkeypatch.setitem(email_service._outcome_hooks, "test_outcome", hook)
+
+    outbox = EmailOutbox(workers=1)
+    asyncio.run(outbox._process(outbox_item(attempts=2)))
+
+    _, update = fake_db.email_outbox.updates[-1]
+    assert update["$set"]["status"] == OutboxStatus.PENDING
+    assert update["$set"]["next_attempt_at"]
+    assert outbox.retried == 1
+    assert outcomes == []
+
+
+def test_process_permanent_error_fails_and_calls_hook(fake_db, monkeypatch):
+    outcomes = []
+
+    async def fake_deliver(recipients, message):
+        raise smtplib.SMTPRecipientsRefused({"gast@example.de": (550, b"unknown")})
+
+    async def hook(item, status, error):
+        outcomes.append(status)
+
+    monkeypatch.setattr(email_service, "deliver_message", fake_deliver)
+    monkeypatch.setitem(email_service._outcome_hooks, "test_outcome", hook)
+
+    outbox = EmailOutbox(workers=1)
+    asyncio.run(outbox._process(outbox_item()))
+
+    _, update = fake_db.email_outbox.updates[-1]
+    assert update["$set"]["status"] == OutboxStatus.FAILED
+    assert outcomes == [OutboxStatus.FAILED]
+    assert fake_db.email_logs.inserted[-1]["status"] == "failed"
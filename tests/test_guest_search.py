@@ -0,0 +1,85 @@
+"""
+Präfix-Suchindex für das Gäste-Autocomplete (user-004)
+"""
+
+from guest_search_module import (
+    MAX_PREFIX_LENGTH,
+    build_prefixes,
+    entry_from_contact,
+    entry_from_reservation,
+    identity_key,
+    normalize_phone,
+    normalize_text,
+    query_tokens,
+    _finalize,
+)
+
+
+def matches(entry_prefixes, q: str) -> bool:
+    """Wie search_guest_index: alle Tokens müssen im Präfix-Array stehen"""
+    tokens = query_tokens(q)
+    return bool(tokens) and all(t in entry_prefixes for t in tokens)
+
+
+def test_normalize_text_umlauts_and_accents():
+    assert normalize_text("Müller") == "mueller"
+    assert normalize_text("Straßer") == "strasser"
+    assert normalize_text("José") == "jose"
+    assert normalize_text(None) == ""
+
+
+def test_normalize_phone_german_prefixes():
+    assert normalize_phone("0170 1234567") == "491701234567"
+    assert normalize_phone("+49 170 1234567") == "491701234567"
+    assert normalize_phone("0049-170-1234567") == "491701234567"
+    assert normalize_phone("") == ""
+
+
+def test_identity_key_prefers_phone_then_email():
+    assert identity_key("0170 1234567", "a@b.de", "x") == "phone:491701234567"
+    assert identity_key(None, " Max@Example.DE ", "x") == "email:max@example.de"
+    assert identity_key(None, None, "reservation:1") == "reservation:1"
+    # Walk-ins ohne Kontakt bekommen bei leerem Fallback keinen Schlüssel (Rebuild überspringt sie)
+    assert not identity_key("", "", "")
+
+
+def test_prefixes_cover_name_phone_and_email():
+    prefixes = build_prefixes("Max Müller", "0170 1234567", "max.mueller@example.de")
+    for q in ("Ma", "mül", "muell", "max mu", "0170 123", "+49170", "1701234", "max.mueller@ex"):
+        assert matches(prefixes, q), q
+    assert not matches(prefixes, "schmidt")
+
+
+def test_prefixes_are_bounded():
+    prefixes = build_prefixes("A" * 40, None, None)
+    assert min(len(p) for p in prefixes) == 2
+    assert max(len(p) for p in prefixes) == MAX_PREFIX_LENGTH
+
+
+def test_query_tokens_short_and_phone_input():
+    assert query_tokens("m") == []
+    assert query_tokens("0049 170") == ["49170"]
+    assert query_tokens("  Max   Mu ") == ["max", "mu"]
+
+
+def test_contact_entry_is_marketing_free_and_hidden_unless_reservation_guest():
+    contact = {"id": "c1", "first_name": "Erika", "last_name": "Muster", "contact_type": "reservation_guest",
+               "reservation_count": 3, "last_reservation_date": "2024-05-01"}
+    entry = _finalize(entry_from_contact(contact))
+    assert entry["name"] == "E. Muster"
+    assert entry["newsletter_subscribed"] is False
+    assert entry["archived"] is False
+    assert entry["visit_count"] == 3
+    assert matches(entry["prefixes"], "erika")
+
+    assert entry_from_contact({**contact, "contact_type": "supplier"})["archived"] is True
+
+
+def test_finalize_merges_visit_counts_and_last_visit():
+    entry = entry_from_reservation({"id": "r1", "guest_name": "Max", "guest_phone": "0170 1"})
+    entry.update({"visits": 2, "last_visit_date": "2025-02-01",
+                  "legacy_visit_count": 5, "legacy_last_visit": "2024-12-24"})
+    entry = _finalize(entry)
+    assert entry["key"] == "phone:491701"
+    assert entry["visit_count"] == 7
+    assert entry["last_visit"] == "2025-02-01"
@@ -0,0 +1,90 @@
+"""
+Stunden-Ledger: Netto-Zeiten, geplante Stunden, Tageszeilen (user-025)
+"""
+
+from datetime import date
+
+from hours_ledger import (
+    _accumulate,
+    _months,
+    planned_shift_hours,
+    session_net_seconds,
+    shift_ledger_keys,
+)
+
+
+def session(clock_in: str, clock_out: str, breaks=(), staff_id: str = "m1", day_key: str = "2025-03-03") -> dict:
+    return {
+        "staff_member_id": staff_id,
+        "day_key": day_key,
+        "clock_in_at": clock_in,
+        "clock_out_at": clock_out,
+        "breaks": [{"start_at": s, "end_at": e} for s, e in breaks],
+    }
+
+
+def test_session_net_seconds_subtracts_breaks():
+    s = session("2025-03-03T08:00:00Z", "2025-03-03T16:30:00+00:00",
+                breaks=[("2025-03-03T12:00:00Z", "2025-03-03T12:30:00Z")])
+    assert session_net_seconds(s) == (8 * 3600, 30 * 60)
+
+
+def test_session_net_seconds_overnight_and_broken_break():
+    s = session("2025-03-03T20:00:00Z", "2025-03-04T02:00:00Z",
+                breaks=[("2025-03-03T23:00:00Z", None)])
+    assert session_net_seconds(s) == (6 * 3600, 0)
+
+
+def test_session_net_seconds_open_or_negative():
+    assert session_net_seconds({"clock_in_at": "2025-03-03T08:00:00Z"}) == (0, 0)
+    s = session("2025-03-03T08:00:00Z", "2025-03-03T09:00:00Z",
+                breaks=[("2025-03-03T08:00:00Z", "2025-03-03T10:00:00Z")])
+    assert session_net_seconds(s)[0] == 0
+
+
+def test_planned_shift_hours():
+    assert planned_shift_hours({"hours": "7.5"}) == 7.5
+    assert planned_shift_hours({"start_time": "18:00", "end_time": "01:30"}) == 7.5
+    assert planned_shift_hours({"start_time": "kaputt"}) == 0.0
+
+
+def test_accumulate_rows_per_staff_and_day():
+    shifts = [
+        {"date_local": "2025-03-03", "staff_member_id": "m1", "start_time": "10:00", "end_time": "14:00"},
+        {"shift_date": "2025-03-03", "assigned_staff_ids": ["m1", "m2"], "start_time": "17:00", "end_time": "21:00"},
+        {"date": "2025-03-03", "staff_member_id": "m1", "hours": 3, "status": "CANCELLED"},
+        {"date": "2025-03-03", "staff_member_id": "m1", "hours": 3, "archived": True},
+    ]
+    sessions = [
+        session("2025-03-03T09:00:00Z", "2025-03-03T13:00:00Z"),
+        session("2025-03-03T16:00:00Z", "2025-03-03T21:00:00Z",
+                breaks=[("2025-03-03T18:00:00Z", "2025-03-03T18:30:00Z")]),
+        {"staff_member_id": None, "day_key": "2025-03-03"},
+    ]
+    rows = {}
+    _accumulate(rows, shifts, sessions, None)
+
+    m1 = rows[("m1", "2025-03-03")]
+    assert m1["planned_hours"] == 8 and m1["planned_shift_count"] == 2
+    assert m1["actual_hours"] == 8.5 and m1["break_hours"] == 0.5
+    assert m1["session_count"] == 2
+    assert (m1["iso_year"], m1["iso_week"]) == (2025, 10)
+    assert rows[("m2", "2025-03-03")]["planned_hours"] == 4
+    assert len(rows) == 2
+
+
+def test_accumulate_respects_key_filter():
+    shifts = [{"date_local": "2025-03-03", "assigned_staff_ids": ["m1", "m2"], "hours": 5}]
+    rows = {}
+    _accumulate(rows, shifts, [], {("m2", "2025-03-03")})
+    assert list(rows) == [("m2", "2025-03-03")]
+
+
+def test_shift_ledger_keys_cover_before_and_after():
+    before = {"date_local": "2025-03-03", "staff_member_id": "m1"}
+    after = {"date_local": "2025-03-04", "assigned_staff_ids": ["m2"]}
+    assert shift_ledger_keys(before, after, None) == {("m1", "2025-03-03"), ("m2", "2025-03-04")}
+
+
+def test_months_spans_year_boundary():
+    assert _months(date(2024, 11, 30), date(2025, 1, 1)) == ["2024-11", "2024-12", "2025-01"]
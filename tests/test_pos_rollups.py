@@ -0,0 +1,152 @@
+"""
+POS-KPI-Rollups: Buckets und summarize_range an Monatsgrenzen (user-016)
+"""
+
+import asyncio
+import re
+from datetime import date, timedelta
+
+import pytest
+
+import pos_rollups
+from pos_rollups import ROLLUP_COLLECTION, bucket_range, summarize_range, week_bucket
+
+SOURCE = "pos_daily_metrics"
+
+
+class FakeUpdateOne:
+    def __init__(self, query, update, upsert=False):
+        self.query = query
+        self.update = update
+
+
+def _match(doc: dict, query: dict) -> bool:
+    for field, cond in query.items():
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            if "$gte" in cond and not (value is not None and value >= cond["$gte"]):
+                return False
+            if "$lte" in cond and not (value is not None and value <= cond["$lte"]):
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$regex" in cond and not (value and re.search(cond["$regex"], value)):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda d: d.get(field), reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(d) for d in self.docs if _match(d, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _match(d, query)), None)
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            existing = next((d for d in self.docs if _match(d, op.query)), None)
+            if existing is None:
+                self.docs.append(dict(op.update["$set"]))
+            else:
+                existing.update(op.update["$set"])
+
+
+class FakeDB(dict):
+    def __getitem__(self, name):
+        return self.setdefault(name, FakeCollection())
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(pos_rollups, "db", db)
+    monkeypatch.setattr(pos_rollups, "UpdateOne", FakeUpdateOne)
+    return db
+
+
+def seed_days(db, first: date, last: date):
+    day = first
+    while day <= last:
+        db[SOURCE].docs.append({
+            "date": day.isoformat(),
+            "net_total": 100.0 + day.day,
+            "food_net": 60.0,
+            "beverage_net": 40.0 + day.day,
+        })
+        day += timedelta(days=1)
+
+
+def naive_sum(db, from_date: str, to_date: str) -> dict:
+    days = [d for d in db[SOURCE].docs if from_date <= d["date"] <= to_date]
+    return {
+        "days": len(days),
+        "net_total": sum(d["net_total"] for d in days),
+        "beverage_net": sum(d["beverage_net"] for d in days),
+    }
+
+
+def test_week_bucket_uses_iso_year():
+    assert week_bucket(date(2021, 1, 3)) == "2020-W53"
+    assert week_bucket(date(2024, 12, 30)) == "2025-W01"
+
+
+def test_bucket_range_edges():
+    assert bucket_range("week", "2020-W53") == ("2020-12-28", "2021-01-03")
+    assert bucket_range("month", "2024-02") == ("2024-02-01", "2024-02-29")
+    assert bucket_range("month", "2024-12") == ("2024-12-01", "2024-12-31")
+    assert bucket_range("year", "2024") == ("2024-01-01", "2024-12-31")
+
+
+@pytest.mark.parametrize("from_date,to_date", [
+    ("2024-01-30", "2024-03-02"),  # Randtage + ein voller Monat
+    ("2024-02-01", "2024-02-29"),  # genau ein Monat (Schaltjahr)
+    ("2024-02-29", "2024-02-29"),  # einzelner Tag
+    ("2023-12-31", "2024-01-01"),  # Jahreswechsel, nur Randtage
+])
+def test_summarize_range_matches_daily_sum(fake_db, from_date, to_date):
+    seed_days(fake_db, date(2023, 12, 1), date(2024, 3, 31))
+
+    result = asyncio.run(summarize_range(SOURCE, from_date, to_date))
+    expected = naive_sum(fake_db, from_date, to_date)
+
+    assert result["days"] == expected["days"]
+    assert result["sums"]["net_total"] == pytest.approx(expected["net_total"])
+    assert result["groups"]["beverage"] == pytest.approx(expected["beverage_net"])
+    assert sum(wd["days"] for wd in result["by_weekday"].values()) == expected["days"]
+
+
+def test_summarize_range_rebuilds_stale_month_rollup(fake_db):
+    seed_days(fake_db, date(2024, 2, 1), date(2024, 2, 29))
+    # Rollup aus einer älteren Version ohne beverage_net
+    fake_db[ROLLUP_COLLECTION].docs.append({
+        "key": f"{SOURCE}:month:2024-02", "source": SOURCE, "period": "month", "bucket": "2024-02",
+        "days": 1, "sums": {"net_total": 1.0, "food_net": 1.0}, "by_weekday": {},
+    })
+
+    result = asyncio.run(summarize_range(SOURCE, "2024-02-01", "2024-02-29"))
+
+    assert result["days"] == 29
+    assert result["sums"]["net_total"] == pytest.approx(naive_sum(fake_db, "2024-02-01", "2024-02-29")["net_total"])
+
+
+def test_summarize_range_invalid_input(fake_db):
+    result = asyncio.run(summarize_range(SOURCE, "2024-03-02", "2024-03-01"))
+    assert result["days"] == 0 and result["groups"] == {}
+    assert asyncio.run(summarize_range(SOURCE, "kaputt", "2024-03-01"))["days"] == 0
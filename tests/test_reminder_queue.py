@@ -0,0 +1,202 @@
+"""
+Reminder-Queue: Planung und Versand der Reservierungs-Erinnerungen (user-021)
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import reminder_queue
+from reminder_queue import (
+    BERLIN_TZ,
+    REMINDER_LATE_GRACE_MINUTES,
+    REMINDER_MAX_ATTEMPTS,
+    REMINDER_STATUS,
+    QueueStatus,
+    build_queue_ops,
+    reservation_start_utc,
+)
+
+RULE_24H = {"id": "rule-24", "hours_before": 24, "channel": "email"}
+RULE_3H = {"id": "rule-3", "hours_before": 3, "channel": "email"}
+
+
+class FakeOp:
+    def __init__(self, query, update, upsert=False):
+        self.query = query
+        self.update = update
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.bulk_ops = []
+        self.inserted = []
+
+    def find(self, query, projection=None):
+        ids = (query.get("id") or {}).get("$in")
+        return FakeCursor([dict(d) for d in self.docs if ids is None or d["id"] in ids])
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_ops.extend(ops)
+
+    async def insert_many(self, docs):
+        self.inserted.extend(docs)
+
+
+class FakeDB:
+    def __init__(self, reservations):
+        self.reservations = FakeCollection(reservations)
+        self.areas = FakeCollection()
+        self.reminder_queue = FakeCollection()
+        self.message_logs = FakeCollection()
+
+
+@pytest.fixture(autouse=True)
+def fake_ops(monkeypatch):
+    monkeypatch.setattr(reminder_queue, "UpdateOne", FakeOp)
+    monkeypatch.setattr(reminder_queue, "UpdateMany", FakeOp)
+
+
+def reservation_in(hours: float, **extra) -> dict:
+    """Bestätigte Reservierung in n Stunden (auf volle Minuten, Ortszeit Berlin)"""
+    local = (datetime.now(timezone.utc) + timedelta(hours=hours)).astimezone(BERLIN_TZ)
+    return {
+        "id": "res-1",
+        "date": local.strftime("%Y-%m-%d"),
+        "time": local.strftime("%H:%M"),
+        "status": REMINDER_STATUS,
+        "guest_email": "gast@example.de",
+        **extra,
+    }
+
+
+def test_reservation_start_utc_follows_dst():
+    assert reservation_start_utc({"date": "2025-07-01", "time": "18:00"}) == datetime(2025, 7, 1, 16, 0, tzinfo=timezone.utc)
+    assert reservation_start_utc({"date": "2025-01-15", "time": "18:00:00"}) == datetime(2025, 1, 15, 17, 0, tzinfo=timezone.utc)
+    assert reservation_start_utc({"date": "2025-01-15", "time": None}) is None
+
+
+def test_build_queue_ops_schedules_each_pending_rule():
+    now = datetime.now(timezone.utc)
+    res = reservation_in(48)
+    ops = build_queue_ops(res, [RULE_24H, RULE_3H], now)
+
+    assert [op.query["key"] for op in ops] == ["res-1:rule-24", "res-1:rule-3"]
+    start = reservation_start_utc(res)
+    assert ops[0].update["$set"]["due_at"] == (start - timedelta(hours=24)).isoformat()
+    assert ops[0].update["$set"]["event_at"] == start.isoformat()
+    assert ops[0].query["status"] == {"$nin": [QueueStatus.SENT, QueueStatus.SENDING]}
+
+
+def test_build_queue_ops_skips_sent_flags_and_missed_rules():
+    now = datetime.now(timezone.utc)
+    # 24h-Regel längst verpasst, 3h-Regel bereits versendet
+    res = reservation_in(5, reminder_3h_sent=True)
+    assert build_queue_ops(res, [RULE_24H, RULE_3H], now) == []
+    # Vergangene Reservierung
+    assert build_queue_ops(reservation_in(-1), [RULE_3H], now) == []
+
+
+def test_build_queue_ops_late_within_grace_is_due_now():
+    now = datetime.now(timezone.utc)
+    res = reservation_in(3 - (REMINDER_LATE_GRACE_MINUTES / 2) / 60)
+    ops = build_queue_ops(res, [RULE_3H], now)
+    assert len(ops) == 1
+    assert ops[0].update["$set"]["due_at"] == now.isoformat()
+
+
+def test_schedule_only_replans_on_date_or_time_change(monkeypatch):
+    calls = []
+
+    async def fake_rules():
+        return [RULE_24H]
+
+    async def fake_cancel(reservation_id):
+        calls.append(("cancel", reservation_id))
+
+    async def fake_write(ops):
+        calls.append(("write", len(ops)))
+
+    monkeypatch.setattr(reminder_queue, "load_active_rules", fake_rules)
+    monkeypatch.setattr(reminder_queue, "cancel_reservation_reminders", fake_cancel)
+    monkeypatch.setattr(reminder_queue, "_write_queue", fake_write)
+    monkeypatch.setattr(reminder_queue.reminder_scheduler, "wake", lambda: None)
+
+    before = reservation_in(48)
+    asyncio.run(reminder_queue.schedule_reservation_reminders(before, {**before, "notes": "Fensterplatz"}))
+    assert calls == []
+
+    asyncio.run(reminder_queue.schedule_reservation_reminders(before, reservation_in(72)))
+    assert calls == [("cancel", "res-1"), ("write", 1)]
+
+    calls.clear()
+    asyncio.run(reminder_queue.schedule_reservation_reminders(before, {**before, "status": "storniert"}))
+    assert calls == [("cancel", "res-1")]
+
+
+def test_dispatch_sends_current_and_cancels_stale_items(monkeypatch):
+    res = reservation_in(20)
+    moved = {**reservation_in(30), "id": "res-2"}
+    flagged = {**reservation_in(20), "id": "res-3", "reminder_24h_sent": True}
+    db = FakeDB([res, moved, flagged])
+    sent = []
+
+    async def fake_send(reservation, area_name, lang, dedupe_key=None):
+        sent.append(dedupe_key)
+
+    monkeypatch.setattr(reminder_queue, "db", db)
+    monkeypatch.setattr(reminder_queue, "send_reminder_email", fake_send)
+
+    def item(item_id, reservation, event_at):
+        return {"id": item_id, "key": f"{reservation['id']}:rule-24", "reservation_id": reservation["id"],
+                "reminder_key": "reminder_24h_sent", "event_at": event_at, "attempts": 1}
+
+    items = [
+        item("q1", res, reservation_start_utc(res).isoformat()),
+        item("q2", moved, reservation_start_utc(res).isoformat()),  # Zeit seit der Planung geändert
+        item("q3", flagged, reservation_start_utc(flagged).isoformat()),
+    ]
+    result = asyncio.run(reminder_queue.dispatch_reminders(items))
+
+    assert result == {"sent": 1, "cancelled": 2}
+    assert sent == ["reminder:res-1:rule-24"]
+    assert db.reservations.bulk_ops[0].query == {"id": {"$in": ["res-1"]}}
+    assert len(db.message_logs.inserted) == 1
+
+
+def test_dispatch_failure_keeps_lease_until_max_attempts(monkeypatch):
+    res = reservation_in(20)
+    db = FakeDB([res])
+
+    async def failing_send(*args, **kwargs):
+        raise RuntimeError("SMTP down")
+
+    monkeypatch.setattr(reminder_queue, "db", db)
+    monkeypatch.setattr(reminder_queue, "send_reminder_email", failing_send)
+
+    item = {"id": "q1", "key": "res-1:rule-24", "reservation_id": "res-1", "reminder_key": "reminder_24h_sent",
+            "event_at": reservation_start_utc(res).isoformat(), "attempts": 1}
+    assert asyncio.run(reminder_queue.dispatch_reminders([item])) == {"sent": 0, "cancelled": 0}
+
+    item["attempts"] = REMINDER_MAX_ATTEMPTS
+    assert asyncio.run(reminder_queue.dispatch_reminders([item])) == {"sent": 0, "cancelled": 1}
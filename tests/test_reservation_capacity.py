@@ -0,0 +1,155 @@
+"""
+DayCapacityLedger + build_slot_capacity (user-002)
+"""
+
+import asyncio
+import time
+from datetime import date, timedelta
+
+import reservation_capacity
+from reservation_capacity import (
+    DayCapacityLedger,
+    build_slot_capacity,
+    reservation_counts_for_capacity,
+)
+
+
+def future_day(offset: int = 7) -> date:
+    return date.today() + timedelta(days=offset)
+
+
+def seed(ledger: DayCapacityLedger, date_str: str, contributions: dict) -> dict:
+    """Eintrag wie nach _build, ohne DB"""
+    slot_usage = {}
+    for res_time, seats in contributions.values():
+        slot_usage[res_time] = slot_usage.get(res_time, 0) + seats
+    entry = {
+        "date": date_str,
+        "version": ledger._version,
+        "built_at": time.monotonic(),
+        "seatings_data": {"open": True},
+        "contributions": dict(contributions),
+        "slot_usage": slot_usage,
+    }
+    ledger._days[date_str] = entry
+    return entry
+
+
+def reservation(res_id: str, date_str: str, res_time: str = "18:00", party_size: int = 4, **extra) -> dict:
+    return {"id": res_id, "date": date_str, "time": res_time, "party_size": party_size, **extra}
+
+
+def test_counts_for_capacity_rules():
+    assert reservation_counts_for_capacity({"time": "18:00", "status": "confirmed"})
+    assert not reservation_counts_for_capacity(None)
+    assert not reservation_counts_for_capacity({"time": "18:00", "status": "storniert"})
+    assert not reservation_counts_for_capacity({"time": "18:00", "status": "no_show"})
+    assert not reservation_counts_for_capacity({"time": "18:00", "archived": True})
+    assert not reservation_counts_for_capacity({"status": "confirmed"})
+
+
+def test_apply_create_move_and_cancel():
+    ledger = DayCapacityLedger()
+    day = future_day().isoformat()
+    entry = seed(ledger, day, {"r0": ("18:00", 2)})
+
+    created = reservation("r1", day)
+    ledger.apply(None, created)
+    assert entry["slot_usage"] == {"18:00": 6}
+
+    moved = {**created, "time": "20:00", "party_size": 5}
+    ledger.apply(created, moved)
+    assert entry["slot_usage"] == {"18:00": 2, "20:00": 5}
+
+    cancelled = {**moved, "status": "cancelled"}
+    ledger.apply(moved, cancelled)
+    assert entry["slot_usage"] == {"18:00": 2}
+    assert "r1" not in entry["contributions"]
+
+
+def test_apply_is_idempotent():
+    ledger = DayCapacityLedger()
+    day = future_day().isoformat()
+    entry = seed(ledger, day, {})
+
+    res = reservation("r1", day, party_size=3)
+    ledger.apply(None, res)
+    ledger.apply(None, res)
+    assert entry["slot_usage"] == {"18:00": 3}
+
+
+def test_apply_moves_between_dates():
+    ledger = DayCapacityLedger()
+    day_a = future_day(7).isoformat()
+    day_b = future_day(8).isoformat()
+    entry_a = seed(ledger, day_a, {"r1": ("18:00", 4)})
+    entry_b = seed(ledger, day_b, {})
+
+    ledger.apply(reservation("r1", day_a), reservation("r1", day_b))
+    assert entry_a["slot_usage"] == {}
+    assert entry_b["slot_usage"] == {"18:00": 4}
+
+
+def test_evict_drops_past_days_then_least_recently_used():
+    ledger = DayCapacityLedger(max_dates=2)
+    past = (date.today() - timedelta(days=5)).isoformat()
+    days = [future_day(i).isoformat() for i in (1, 2, 3)]
+    seed(ledger, past, {})
+    for d in days:
+        seed(ledger, d, {})
+    ledger._days.move_to_end(days[0])
+
+    ledger._evict()
+
+    assert past not in ledger._days
+    assert list(ledger._days) == [days[2], days[0]]
+    assert ledger.evictions == 2
+
+
+def test_build_discarded_when_reservation_changes_meanwhile(monkeypatch):
+    ledger = DayCapacityLedger()
+    target = future_day()
+    day = target.isoformat()
+
+    async def fake_seatings(_target):
+        # Parallele Änderung während des Aufbaus
+        ledger.apply(None, reservation("late", day))
+        return {"open": True}
+
+    async def fake_reservations(_target):
+        return [reservation("r1", day, party_size=2)]
+
+    monkeypatch.setattr(reservation_capacity, "calculate_seatings_and_slots", fake_seatings)
+    monkeypatch.setattr(reservation_capacity, "get_reservations_for_date", fake_reservations)
+
+    entry = asyncio.run(ledger.get(target))
+    assert entry["slot_usage"] == {"18:00": 2}
+    assert day not in ledger._days
+
+
+def test_build_slot_capacity_shares_usage_per_seating():
+    seatings_data = {
+        "date": "2025-03-01",
+        "weekday_de": "Samstag",
+        "day_type": "weekend",
+        "capacity_per_seating": 10,
+        "block_duration_minutes": 120,
+        "closing_time": "22:00",
+        "seatings": [],
+        "all_slots": [
+            {"time": "17:00", "seating_number": 1},
+            {"time": "17:30", "seating_number": 1},
+            {"time": "19:30", "seating_number": 2},
+        ],
+    }
+    result = build_slot_capacity(seatings_data, {"17:00": 6, "17:30": 4, "19:30": 3})
+    by_time = {slot["time"]: slot for slot in result["slots"]}
+
+    assert by_time["17:00"]["capacity_used"] == 10
+    assert by_time["17:30"]["disabled"] is True
+    assert by_time["19:30"]["capacity_available"] == 7
+
+
+def test_build_slot_capacity_closed_day():
+    result = build_slot_capacity({"date": "2025-03-03", "open": False, "notes": ["Ruhetag"]}, {})
+    assert result == {"date": "2025-03-03", "open": False, "slots": [], "notes": ["Ruhetag"]}
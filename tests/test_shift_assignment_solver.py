@@ -0,0 +1,116 @@
+"""
+Shift Assignment Solver: ungarische Methode, harte Regeln, Optimalitätslücke (user-022)
+"""
+
+import itertools
+import random
+
+from shift_assignment_solver import ShiftAssignmentProblem, hungarian
+
+SCHEDULE_ID = "S"
+
+
+def brute_force(cost):
+    n, m = len(cost), len(cost[0])
+    return min(
+        sum(cost[i][cols[i]] for i in range(n))
+        for cols in itertools.permutations(range(m), n)
+    )
+
+
+def staff(staff_id: str, **extra) -> dict:
+    return {"id": staff_id, "name": staff_id, "roles": ["service"], "work_area_id": "A", "weekly_hours": 40, **extra}
+
+
+def shift(shift_id: str, day: str, start: str, end: str, **extra) -> dict:
+    return {"id": shift_id, "schedule_id": SCHEDULE_ID, "date": day, "start_time": start, "end_time": end,
+            "role": "service", "work_area_id": "A", **extra}
+
+
+def solve(open_shifts, staff_list, existing=(), context=(), max_shifts=5):
+    problem = ShiftAssignmentProblem(
+        SCHEDULE_ID, list(open_shifts), list(open_shifts) + list(existing), list(context),
+        staff_list, max_shifts_per_week=max_shifts, min_score=0, role_priority=["service"],
+    )
+    result = problem.solve()
+    result["by_shift"] = {a["shift"]["id"]: a["staff"].id for a in result["assignments"]}
+    return result
+
+
+def test_hungarian_known_matrix():
+    cost = [[4, 1, 3], [2, 0, 5], [3, 2, 2]]
+    cols = hungarian(cost)
+    assert sorted(cols) == [0, 1, 2]
+    assert sum(cost[i][c] for i, c in enumerate(cols)) == 5
+
+
+def test_hungarian_matches_brute_force_on_rectangular_matrices():
+    rng = random.Random(7)
+    for _ in range(50):
+        n = rng.randint(1, 4)
+        m = rng.randint(n, 6)
+        cost = [[rng.randint(-20, 20) for _ in range(m)] for _ in range(n)]
+        cols = hungarian(cost)
+        assert len(set(cols)) == n
+        assert sum(cost[i][c] for i, c in enumerate(cols)) == brute_force(cost)
+
+
+def test_hungarian_empty():
+    assert hungarian([]) == []
+
+
+def test_uncontended_week_has_zero_gap():
+    open_shifts = [shift("s1", "2025-03-03", "10:00", "16:00"), shift("s2", "2025-03-04", "10:00", "16:00")]
+    result = solve(open_shifts, [staff("m1"), staff("m2")])
+
+    assert set(result["by_shift"]) == {"s1", "s2"}
+    assert result["stats"]["gap"] == 0
+    assert result["stats"]["objective"] >= result["stats"]["lower_bound"]
+
+
+def test_spreads_work_across_staff():
+    open_shifts = [shift("s1", "2025-03-03", "10:00", "16:00"), shift("s2", "2025-03-03", "17:00", "22:00")]
+    result = solve(open_shifts, [staff("m1"), staff("m2")])
+    assert sorted(result["by_shift"].values()) == ["m1", "m2"]
+
+
+def test_overnight_shift_blocks_next_morning_via_rest_time():
+    # Vortag 18:00-02:00 -> nur 10h bis 12:00
+    existing = [shift("late", "2025-03-03", "18:00", "02:00", staff_member_id="m1")]
+    open_shifts = [shift("s1", "2025-03-04", "12:00", "18:00")]
+    result = solve(open_shifts, [staff("m1")], existing=existing)
+
+    assert result["by_shift"] == {}
+    assert [s["id"] for s in result["unassigned"]] == ["s1"]
+
+
+def test_context_shift_of_neighbour_week_counts_for_rest():
+    context = [shift("prev", "2025-03-02", "16:00", "23:30", schedule_id="other", staff_member_id="m1")]
+    open_shifts = [shift("s1", "2025-03-03", "09:00", "15:00")]
+    result = solve(open_shifts, [staff("m1"), staff("m2")], context=context)
+    assert result["by_shift"] == {"s1": "m2"}
+
+
+def test_same_day_split_shift_allowed_but_not_overlap():
+    open_shifts = [
+        shift("s1", "2025-03-03", "10:00", "14:00"),
+        shift("s2", "2025-03-03", "12:00", "16:00"),
+        shift("s3", "2025-03-03", "18:00", "22:00"),
+    ]
+    result = solve(open_shifts, [staff("m1")])
+    assert result["by_shift"].get("s3") == "m1"
+    assert len(result["by_shift"]) == 2
+
+
+def test_role_area_and_weekly_limit_are_hard_rules():
+    open_shifts = [
+        shift("kitchen", "2025-03-03", "10:00", "16:00", role="kitchen"),
+        shift("other_area", "2025-03-04", "10:00", "16:00", work_area_id="B"),
+        shift("d5", "2025-03-05", "10:00", "16:00"),
+        shift("d6", "2025-03-06", "10:00", "16:00"),
+    ]
+    result = solve(open_shifts, [staff("m1")], max_shifts=1)
+
+    assert "kitchen" not in result["by_shift"]
+    assert "other_area" not in result["by_shift"]
+    assert len(result["by_shift"]) == 1
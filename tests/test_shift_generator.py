@@ -0,0 +1,102 @@
+"""
+Shift Generator: Hilfsfunktionen und insert_shifts mit Duplikaten (user-024)
+"""
+
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import shift_generator
+from shift_generator import (
+    DUPLICATE_KEY_ERROR,
+    close_plus_end_time,
+    closing_time_from_effective,
+    insert_shifts,
+    shift_hours,
+)
+
+
+class FakeShifts:
+    """insert_many wie Mongo (ordered): Unique-Key (template_code, date_local), Abbruch beim ersten Fehler"""
+
+    def __init__(self, existing=(), fail_on=None):
+        self.docs = [dict(d) for d in existing]
+        self.fail_on = fail_on
+        self.calls = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        keys = {(d.get("template_code"), d.get("date_local")) for d in self.docs}
+        for index, doc in enumerate(docs):
+            if doc.get("id") == self.fail_on:
+                raise BulkWriteError({"writeErrors": [{"index": index, "code": 121}], "nInserted": index})
+            key = (doc.get("template_code"), doc.get("date_local"))
+            if key in keys:
+                raise BulkWriteError({"writeErrors": [{"index": index, "code": DUPLICATE_KEY_ERROR}], "nInserted": index})
+            doc["_id"] = f"oid-{doc['id']}"
+            self.docs.append(dict(doc))
+            keys.add(key)
+
+
+class FakeDB:
+    def __init__(self, shifts):
+        self.shifts = shifts
+
+
+def shift(n: int, day: str = None) -> dict:
+    return {"id": f"s{n}", "template_code": "SERVICE_EARLY", "date_local": day or f"2025-03-{n:02d}"}
+
+
+def test_insert_shifts_skips_duplicates_and_resumes(monkeypatch):
+    shifts = FakeShifts(existing=[shift(2), shift(5)])
+    monkeypatch.setattr(shift_generator, "db", FakeDB(shifts))
+    monkeypatch.setattr(shift_generator, "INSERT_BATCH_SIZE", 3)
+
+    docs = [shift(n) for n in range(1, 8)]
+    inserted, duplicates = asyncio.run(insert_shifts(docs))
+
+    assert [d["id"] for d in inserted] == ["s1", "s3", "s4", "s6", "s7"]
+    assert duplicates == 2
+    assert all("_id" not in d for d in inserted)
+    assert len(shifts.docs) == 7
+
+
+def test_insert_shifts_duplicate_inside_the_same_batch(monkeypatch):
+    shifts = FakeShifts()
+    monkeypatch.setattr(shift_generator, "db", FakeDB(shifts))
+
+    docs = [shift(1), {**shift(1), "id": "s1b"}, shift(2)]
+    inserted, duplicates = asyncio.run(insert_shifts(docs))
+
+    assert [d["id"] for d in inserted] == ["s1", "s2"]
+    assert duplicates == 1
+
+
+def test_insert_shifts_reraises_other_write_errors(monkeypatch):
+    shifts = FakeShifts(fail_on="s2")
+    monkeypatch.setattr(shift_generator, "db", FakeDB(shifts))
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(insert_shifts([shift(1), shift(2), shift(3)]))
+    assert [d["id"] for d in shifts.docs] == ["s1"]
+
+
+def test_insert_shifts_empty():
+    assert asyncio.run(insert_shifts([])) == ([], 0)
+
+
+def test_shift_hours_overnight_and_invalid():
+    assert shift_hours("10:00", "16:30") == 6.5
+    assert shift_hours("20:00", "02:00") == 6
+    assert shift_hours("", "02:00") == 8.0
+
+
+def test_closing_time_helpers():
+    assert closing_time_from_effective({"is_open": False}) is None
+    assert closing_time_from_effective({"is_open": True, "is_closed_full_day": True}) is None
+    assert closing_time_from_effective({"is_open": True, "blocks": [{"end": "15:00"}, {"end": "22:30"}]}) == "22:30"
+    assert closing_time_from_effective({"is_open": True}) == "20:00"
+    assert close_plus_end_time("23:30", 60) == "00:30"
+    assert close_plus_end_time(None, 30) is None
+    assert close_plus_end_time("spät", 30) is None
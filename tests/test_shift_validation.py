@@ -0,0 +1,87 @@
+"""
+ShiftConflictValidator: Überlappung, Ruhezeit, Nachtschichten, Höchstarbeitszeit (user-023)
+"""
+
+from shift_validation import ShiftConflictValidator, shift_day, shift_staff_ids, to_interval
+
+
+def validator_with(*shifts, **limits) -> ShiftConflictValidator:
+    validator = ShiftConflictValidator(**limits)
+    for shift in shifts:
+        validator.add(shift["staff_member_id"], shift)
+    return validator
+
+
+def shift(shift_id: str, day: str, start: str, end: str, staff_id: str = "m1") -> dict:
+    return {"id": shift_id, "shift_date": day, "start_time": start, "end_time": end, "staff_member_id": staff_id}
+
+
+def test_to_interval_wraps_only_when_end_before_start():
+    start, end = to_interval("2025-03-03", "18:00", "02:00")[:2]
+    assert end - start == 8 * 60
+    start, end = to_interval("2025-03-03", "10:00", "10:00")[:2]
+    assert end == start
+    assert to_interval("2025-03-03", "", "10:00") is None
+
+
+def test_shift_day_and_staff_ids_cover_legacy_fields():
+    assert shift_day({"date_local": "2025-03-03T00:00:00"}) == "2025-03-03"
+    assert shift_day({"date": "2025-03-04"}) == "2025-03-04"
+    assert shift_staff_ids({"staff_member_id": "a", "assigned_staff_ids": ["b", "a"]}) == ["b", "a"]
+
+
+def test_overlap_same_day_but_split_shift_allowed():
+    validator = validator_with(shift("x", "2025-03-03", "10:00", "14:00"))
+    assert validator.check("m1", "2025-03-03", "13:00", "17:00")["conflict_type"] == "overlap"
+    assert not validator.check("m1", "2025-03-03", "14:00", "18:00")["has_conflict"]
+    assert not validator.check("m2", "2025-03-03", "10:00", "14:00")["has_conflict"]
+
+
+def test_rest_time_boundary():
+    validator = validator_with(shift("x", "2025-03-03", "12:00", "22:00"))
+    # Genau 11h Ruhe ist erlaubt, eine Minute weniger nicht
+    assert not validator.check("m1", "2025-03-04", "09:00", "15:00")["has_conflict"]
+    assert validator.check("m1", "2025-03-04", "08:59", "15:00")["conflict_type"] == "rest_time"
+    # Ruhezeit auch vor einer bestehenden Schicht am Folgetag
+    assert validator.check("m1", "2025-03-02", "14:00", "01:30")["conflict_type"] == "rest_time"
+
+
+def test_overnight_shift_overlaps_next_day_and_checks_rest():
+    validator = validator_with(shift("night", "2025-03-03", "20:00", "03:00"))
+    assert validator.check("m1", "2025-03-04", "01:00", "06:00")["conflict_type"] == "overlap"
+    assert validator.check("m1", "2025-03-04", "12:00", "18:00")["conflict_type"] == "rest_time"
+    assert not validator.check("m1", "2025-03-04", "14:00", "20:00")["has_conflict"]
+
+
+def test_excluded_shift_is_ignored():
+    validator = validator_with(shift("x", "2025-03-03", "10:00", "14:00"))
+    assert not validator.check("m1", "2025-03-03", "11:00", "15:00", exclude_shift_id="x")["has_conflict"]
+
+
+def test_invalid_times_block_the_day():
+    validator = validator_with(shift("broken", "2025-03-03", "", ""))
+    assert validator.check("m1", "2025-03-03", "18:00", "22:00")["has_conflict"]
+    assert validator.check("m1", "2025-03-03", "kaputt", "22:00")["conflict_type"] == "invalid_time"
+
+
+def test_daily_and_weekly_hour_limits():
+    validator = validator_with(
+        shift("a", "2025-03-03", "08:00", "14:00"),
+        max_daily_hours=10, max_weekly_hours=20,
+    )
+    assert validator.check("m1", "2025-03-03", "15:00", "20:00")["conflict_type"] == "max_hours"
+    validator.add("m1", shift("b", "2025-03-05", "08:00", "16:00"))
+    # 6h + 8h + 8h > 20h in KW 10
+    assert validator.check("m1", "2025-03-07", "08:00", "16:00")["conflict_type"] == "max_hours"
+    # Folgewoche ist frei
+    assert not validator.check("m1", "2025-03-10", "08:00", "16:00")["has_conflict"]
+
+
+def test_validate_accepts_proposals_incrementally():
+    validator = ShiftConflictValidator()
+    results = validator.validate([
+        shift("p1", "2025-03-03", "10:00", "16:00"),
+        shift("p2", "2025-03-03", "15:00", "20:00"),
+        {"id": "p3", "shift_date": "2025-03-03", "start_time": "10:00", "end_time": "16:00"},
+    ])
+    assert [r["has_conflict"] for r in results] == [False, True, False]